@@ -27,6 +27,9 @@ def get_app_paths():
         # 开发环境数据目录
         data_dir = os.path.join(base_dir, 'app', 'data', 'dao', 'storage')
 
+    # 允许通过环境变量指定数据目录 (基准测试/调试时使用临时目录，不污染真实数据)
+    data_dir = os.getenv('FLOW_STATE_DATA_DIR') or data_dir
+
     return base_dir, data_dir
 
 # 全局初始化路径
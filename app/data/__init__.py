@@ -5,6 +5,11 @@
 from .core.database import init_db, get_db_connection, get_db_path
 from .dao.activity_dao import ActivityDAO, StatsDAO
 from .services.history_service import ActivityHistoryManager
+from .services.time_ledger import TimeLedger
+from .services.llm_output_cache import LLMOutputCache
+from .services.chat_context import ChatContextRetriever
+from .services.chat_sessions import ChatSessionStore
+from .services.reclassify_engine import ReclassifyEngine
 
 __all__ = [
     'init_db',
@@ -12,5 +17,10 @@ __all__ = [
     'get_db_path',
     'ActivityDAO',
     'StatsDAO',
-    'ActivityHistoryManager'
+    'ActivityHistoryManager',
+    'TimeLedger',
+    'LLMOutputCache',
+    'ChatContextRetriever',
+    'ChatSessionStore',
+    'ReclassifyEngine'
 ]
\ No newline at end of file
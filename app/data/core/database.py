@@ -17,6 +17,7 @@ if not os.path.exists(DB_DIR):
 DB_PATH = os.path.join(DB_DIR, 'focus_app.db')
 PERIOD_STATS_DB_PATH = os.path.join(DB_DIR, 'period_stats.db')
 CORE_EVENTS_DB_PATH = os.path.join(DB_DIR, 'core_events.db')
+LLM_CACHE_DB_PATH = os.path.join(DB_DIR, 'llm_cache.db')
 
 def check_and_restore_db(db_name, target_path):
     """
@@ -80,6 +81,23 @@ def get_core_events_db_connection():
     with get_db_connection(CORE_EVENTS_DB_PATH) as conn:
         yield conn
 
+@contextmanager
+def get_attached_connection():
+    """
+    主库连接，并 ATTACH period_stats.db (period) 与 core_events.db (core)，
+    让会话、daily_stats、period_stats、core_events 的修改在同一个事务里提交或回滚
+    """
+    with get_db_connection() as conn:
+        conn.execute('ATTACH DATABASE ? AS period', (PERIOD_STATS_DB_PATH,))
+        conn.execute('ATTACH DATABASE ? AS core', (CORE_EVENTS_DB_PATH,))
+        yield conn
+
+@contextmanager
+def get_llm_cache_db_connection():
+    """获取 LLM 输出缓存数据库连接"""
+    with get_db_connection(LLM_CACHE_DB_PATH) as conn:
+        yield conn
+
 def init_db():
     """初始化数据库表结构 (统一管理所有表)"""
     # 1. 初始化主数据库 (focus_app.db)
@@ -159,7 +177,225 @@ def init_db():
         except sqlite3.OperationalError:
             pass
             
+        # 窗口区间账本 (Time Ledger)
+        # 焦点一切换就精确记录区间起止；标签 (AI/缓存/规则) 可以稍后再补上，
+        # 区间既已结束又有标签后才计入派生统计 (settled = 1)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS window_intervals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start_ts REAL NOT NULL,      -- 区间开始 (epoch 秒)
+                end_ts REAL,                 -- 区间结束，NULL 表示仍在进行
+                window_title TEXT,
+                process_name TEXT,
+                status TEXT,                 -- 标签，NULL 表示尚未分类
+                summary TEXT,
+                label_source TEXT,           -- 'ai' / 'cache' / 'rule' / 'fallback' (等待超时的兜底标签)
+                raw_data TEXT,
+                settled INTEGER DEFAULT 0    -- 是否已计入派生统计
+            )
+        ''')
+
+        # 离线分类队列
+        # Ollama 不可达或输出无法解析时，未分类区间持久化在这里，由后台线程退避重试
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS classification_queue (
+                interval_id INTEGER PRIMARY KEY,  -- 对应 window_intervals.id
+                window_title TEXT,
+                process_name TEXT,
+                duration REAL DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_ts REAL DEFAULT 0,   -- 下次可重试时间 (epoch 秒)
+                last_error TEXT,
+                created_ts REAL
+            )
+        ''')
+
+        # 对话检索索引 (FTS5)
+        # doc 为预先序列化好的一行上下文，terms 为中文二元组/英文单词，供全文检索
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS context_fts USING fts5(
+                    terms,
+                    doc UNINDEXED,
+                    source UNINDEXED,    -- 'session' / 'core' / 'day'
+                    day UNINDEXED,       -- YYYY-MM-DD
+                    duration UNINDEXED,  -- 秒
+                    tokenize = 'unicode61'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"[Database] FTS5 unavailable, chat falls back to recent activities: {e}")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS context_index_state (
+                source TEXT PRIMARY KEY,
+                last_id INTEGER DEFAULT 0,   -- 已索引到的源表最大 id
+                refreshed_ts REAL
+            )
+        ''')
+
+        # 对话会话
+        # system_prompt 在会话开始时固定下来，之后每轮请求的消息前缀保持不变，Ollama 可复用 KV 缓存；
+        # 较早的轮次被折叠进 summary，summarized_upto 记录已折叠到的消息 id
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                system_prompt TEXT,
+                summary TEXT,
+                summarized_upto INTEGER DEFAULT 0,
+                created_ts REAL,
+                updated_ts REAL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,          -- 'user' / 'assistant'
+                content TEXT,
+                ts REAL
+            )
+        ''')
+
+        # 历史重分类任务 (换模型/提示词后批量重新打标签，可断点续跑)
+        # phase: scan -> classify -> apply -> rebuild -> done，各阶段的进度都落在表里
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS relabel_jobs (
+                job_id TEXT PRIMARY KEY,
+                model TEXT,
+                prompt_version TEXT,
+                phase TEXT DEFAULT 'scan',
+                scanned_upto INTEGER DEFAULT 0,   -- 已扫描到的 window_sessions.id
+                applied_upto INTEGER DEFAULT 0,   -- 已回写到的 window_sessions.id
+                max_session_id INTEGER DEFAULT 0, -- 任务创建时的会话上界，之后的新会话不在本任务范围内
+                changed_sessions INTEGER DEFAULT 0,
+                created_ts REAL,
+                updated_ts REAL
+            )
+        ''')
+        # 去重后的 (进程, 归一化标题) 键，每个键只请求一次 LLM
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS relabel_keys (
+                job_id TEXT NOT NULL,
+                process_key TEXT NOT NULL,
+                title_key TEXT NOT NULL,
+                sample_title TEXT,               -- 时长最长的原始标题，作为分类输入
+                sample_process TEXT,
+                sample_duration INTEGER DEFAULT 0,
+                total_duration INTEGER DEFAULT 0,
+                session_count INTEGER DEFAULT 0,
+                status TEXT,
+                summary TEXT,
+                confidence REAL,
+                state TEXT DEFAULT 'pending',    -- 'pending' / 'done' / 'failed'
+                attempts INTEGER DEFAULT 0,
+                PRIMARY KEY (job_id, process_key, title_key)
+            )
+        ''')
+        # 标签变更记录 (也用于核对与撤销)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS relabel_changes (
+                job_id TEXT NOT NULL,
+                session_id INTEGER NOT NULL,
+                day TEXT,
+                duration INTEGER,
+                old_status TEXT,
+                new_status TEXT,
+                PRIMARY KEY (job_id, session_id)
+            )
+        ''')
+        # 受影响的日期，rebuilt 标记派生统计 (period_stats / core_events / 检索索引) 是否已重算
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS relabel_days (
+                job_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                rebuilt INTEGER DEFAULT 0,
+                PRIMARY KEY (job_id, day)
+            )
+        ''')
+
+        # 规则重分类的撤销日志：每次执行一行，journal 记录每个会话改动前后的标签
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reclassify_runs (
+                run_id TEXT PRIMARY KEY,
+                created_ts REAL,
+                rules TEXT,                      -- 执行时的规则 (JSON)
+                sessions INTEGER DEFAULT 0,
+                duration INTEGER DEFAULT 0,
+                undone_ts REAL                   -- 已撤销的时间，NULL 表示仍生效
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reclassify_journal (
+                run_id TEXT NOT NULL,
+                session_id INTEGER NOT NULL,
+                day TEXT,
+                duration INTEGER,
+                old_status TEXT,
+                new_status TEXT,
+                PRIMARY KEY (run_id, session_id)
+            )
+        ''')
+
+        # 回填指纹：按天记录上次计算 core_events / period_stats 时的 (会话数:最大 id:最近修改时间)，
+        # 指纹没变的日期回填时直接跳过
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS backfill_days (
+                date TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                computed_ts REAL
+            )
+        ''')
+        # 会话最近修改时间，由触发器维护 (插入、改时长、重分类等任何写入都会更新)
+        try:
+            cursor.execute('ALTER TABLE window_sessions ADD COLUMN updated_at REAL')
+        except sqlite3.OperationalError: pass
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_window_sessions_inserted AFTER INSERT ON window_sessions
+            BEGIN
+                UPDATE window_sessions SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_window_sessions_updated
+            AFTER UPDATE OF start_time, end_time, window_title, process_name, status, duration ON window_sessions
+            BEGIN
+                UPDATE window_sessions SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = NEW.id;
+            END
+        ''')
+
+        # 会话变更序号 (供看板增量刷新 since=<version>)
+        # 每个会话只保留最近一次变更 (插入、改时长/标题/摘要/状态、删除) 的全局递增序号，
+        # 客户端拿上次的最大序号来取之后新增、修改或删除的会话
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS window_session_changes (
+                session_id INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                deleted INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_window_session_changes_seq ON window_session_changes(seq)')
+        for name, event, row in (
+            ('trg_window_sessions_change_insert', 'AFTER INSERT', 'NEW'),
+            ('trg_window_sessions_change_update',
+             'AFTER UPDATE OF start_time, end_time, window_title, process_name, status, duration, summary', 'NEW'),
+            ('trg_window_sessions_change_delete', 'AFTER DELETE', 'OLD'),
+        ):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {name} {event} ON window_sessions
+                BEGIN
+                    INSERT OR REPLACE INTO window_session_changes (session_id, seq, deleted)
+                    VALUES ({row}.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM window_session_changes), {int(row == 'OLD')});
+                END
+            ''')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_window_sessions_start ON window_sessions(start_time)')
+        # 历史列表按 (start_time, id) 键集分页
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_window_sessions_start_id ON window_sessions(start_time, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_relabel_keys_state ON relabel_keys(job_id, state)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity_logs(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_classify_queue_due ON classification_queue(next_attempt_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_intervals_settled ON window_intervals(settled, end_ts)')
         conn.commit()
 
     # 2. 初始化 Core Events 数据库
@@ -187,6 +423,43 @@ def init_db():
             pass
             
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_core_events_date ON core_events(date)')
+
+        # 核心事件增量聚合：每个合格会话 (专注/娱乐且 > 30s) 的贡献，以及按 (日期, 类别, 应用, 清洗后标题) 的累计，
+        # 会话结束、改时长或改标签时只把差值计入累计表，每日 Top-N 从累计表按索引读取
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS core_event_sessions (
+                session_id INTEGER PRIMARY KEY, -- window_sessions.id
+                date TEXT,
+                category TEXT,
+                app_name TEXT,
+                clean_title TEXT,
+                duration INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS core_event_totals (
+                date TEXT,
+                category TEXT,
+                app_name TEXT,
+                clean_title TEXT,
+                total_duration INTEGER,
+                event_count INTEGER,
+                PRIMARY KEY (date, category, app_name, clean_title)
+            )
+        ''')
+        # 每天已同步到的会话修改时间 (window_sessions.updated_at)，以及同步时的标题归一化规则版本
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS core_event_sync (
+                date TEXT PRIMARY KEY,
+                synced_upto REAL,
+                rules_version TEXT
+            )
+        ''')
+        try:
+            cursor.execute('ALTER TABLE core_event_sync ADD COLUMN rules_version TEXT')
+        except sqlite3.OperationalError: pass
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_core_event_sessions_date ON core_event_sessions(date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_core_event_totals_rank ON core_event_totals(date, category, total_duration DESC)')
         conn.commit()
 
     # 3. 初始化 Period Stats 数据库
@@ -233,6 +506,88 @@ def init_db():
         except sqlite3.OperationalError: pass
 
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_period_stats_date ON period_stats(date)')
+
+        # 6.1 周/月/年汇总 (Period Rollups)
+        # 由 period_stats 的日行维护 (写入某天时重算它所在的 ISO 周、月、年)，
+        # “最近 12 周”“今年”这类长周期视图只读几十行，不再扫一整年的会话
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS period_rollups (
+                period_type TEXT,       -- 'week' / 'month' / 'year'
+                period_key TEXT,        -- '2026-W42' (ISO 周) / '2026-10' / '2026'
+                start_date DATE,
+                end_date DATE,
+                days INTEGER,           -- 有 period_stats 行的天数
+                active_days INTEGER,    -- 有专注时长的天数
+                total_focus INTEGER,
+                total_entertainment INTEGER,
+                avg_focus REAL,         -- 按 active_days 平均 (秒/天)
+                max_streak INTEGER,
+                willpower_wins INTEGER,
+                avg_efficiency REAL,
+                best_day DATE,          -- 专注时长最多的一天
+                best_day_focus INTEGER,
+                peak_hour INTEGER,      -- 作为黄金时段出现天数最多的小时
+                peak_hour_hist TEXT,    -- JSON: 24 个小时各自作为黄金时段的天数
+                avg_fragmentation REAL,
+                avg_switch_freq REAL,
+                fragmentation_trend REAL, -- 专注/碎片比的日变化斜率 (每天)
+                switch_freq_trend REAL,   -- 切换频率的日变化斜率 (每天)
+                updated_ts REAL,
+                PRIMARY KEY (period_type, period_key)
+            )
+        ''')
+
+        # 6.2 个人基线 (Period Baselines)
+        # 每天一行滚动状态：指标 x 窗口 (7/30 天) 的天数、和、平方和与 EWMA，
+        # 由前一天的状态加一天、减一天得到；洞察与报告用截至昨天的基线和今天比较
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS period_baselines (
+                date DATE,
+                metric TEXT,        -- total_focus / max_streak / context_switch_freq / focus_fragmentation_ratio
+                span INTEGER,       -- 窗口天数 (7 / 30)，也是 EWMA 的跨度
+                n INTEGER,          -- 窗口内有数据的天数
+                total REAL,
+                total_sq REAL,
+                ewma REAL,
+                ewvar REAL,
+                PRIMARY KEY (date, metric, span)
+            )
+        ''')
+        conn.commit()
+
+        # 首次升级：已有日行但还没有汇总 / 基线时，整体重建一次
+        has_stats = cursor.execute('SELECT 1 FROM period_stats LIMIT 1').fetchone() is not None
+        if has_stats and cursor.execute('SELECT 1 FROM period_rollups LIMIT 1').fetchone() is None:
+            from app.data.dao.period_rollup_dao import PeriodRollupDAO
+            PeriodRollupDAO.rebuild(cursor)
+            conn.commit()
+        if has_stats and cursor.execute('SELECT 1 FROM period_baselines LIMIT 1').fetchone() is None:
+            from app.data.dao.period_baseline_dao import PeriodBaselineDAO
+            first = cursor.execute('SELECT MIN(date) FROM period_stats').fetchone()[0]
+            if first is not None:
+                PeriodBaselineDAO.update(cursor, [first])
+                conn.commit()
+
+    # 4. 初始化 LLM 输出缓存数据库
+    with get_db_connection(LLM_CACHE_DB_PATH) as conn:
+        cursor = conn.cursor()
+        # 7. LLM 输出缓存 (内容寻址)
+        # key = hash(提示词模板版本, 模型, 输入上下文)，输入没变就直接复用上次的输出
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                kind TEXT,              -- 'core_items' / 'encouragement' ...
+                scope TEXT,             -- 作用范围 (如日期)，用于按范围失效
+                model TEXT,
+                template_version TEXT,
+                output TEXT,
+                created_ts REAL,
+                last_access_ts REAL,    -- LRU 淘汰依据
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_kind_scope ON llm_cache(kind, scope)')
         conn.commit()
         
     print(f"[Database] Initialized databases at {DB_DIR}")
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 from app.data.core.database import get_db_connection, get_period_stats_db_connection
+from app.data.dao.session_metrics import get_day_metrics, efficiency_score
+from app.data.dao.period_rollup_dao import PeriodRollupDAO
+from app.data.dao.period_baseline_dao import PeriodBaselineDAO
 
 from datetime import datetime
 
@@ -170,6 +173,71 @@ class WindowSessionDAO:
             ).fetchall()
             return [dict(row) for row in rows]
 
+    @staticmethod
+    def get_recent_sessions(days=1):
+        """最近 days 天 (含今天) 的会话，按开始时间正序"""
+        from datetime import date, timedelta
+        start_time = (date.today() - timedelta(days=max(1, int(days)) - 1)).strftime('%Y-%m-%d 00:00:00')
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT * FROM window_sessions WHERE start_time >= ? ORDER BY start_time ASC, id ASC',
+                (start_time,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_sessions_page(before=None, limit=20):
+        """
+        历史列表的键集分页：按 (start_time, id) 倒序取 before 之后的 limit 条。
+        before 为上一页最后一条的 (start_time, id)，None 表示第一页；
+        不用 OFFSET，翻得再深也只走索引，期间插入的新会话也不会让后面的页重复或漏掉
+        """
+        with get_db_connection() as conn:
+            if before is None:
+                rows = conn.execute(
+                    'SELECT * FROM window_sessions ORDER BY start_time DESC, id DESC LIMIT ?',
+                    (limit,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    '''SELECT * FROM window_sessions
+                       WHERE (start_time, id) < (?, ?)
+                       ORDER BY start_time DESC, id DESC LIMIT ?''',
+                    (before[0], before[1], limit)
+                ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_change_version():
+        """当前的会话变更序号 (客户端之后用 since=该值 取增量)"""
+        with get_db_connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM window_session_changes').fetchone()[0]
+
+    @staticmethod
+    def get_changes_since(since, limit=500):
+        """
+        变更序号大于 since 的会话 (按序号正序，最多 limit 条)：
+        返回 (有变化的会话列表, 已删除的会话 id 列表, 本批最大序号)
+        """
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT c.seq AS change_seq, c.deleted AS change_deleted, c.session_id AS change_session_id, w.*
+                   FROM window_session_changes c
+                   LEFT JOIN window_sessions w ON w.id = c.session_id
+                   WHERE c.seq > ?
+                   ORDER BY c.seq ASC LIMIT ?''',
+                (since, limit)
+            ).fetchall()
+        sessions, deleted = [], []
+        version = since
+        for row in rows:
+            version = row['change_seq']
+            if row['change_deleted'] or row['id'] is None:
+                deleted.append(row['change_session_id'])
+            else:
+                sessions.append({k: row[k] for k in row.keys() if not k.startswith('change_')})
+        return sessions, deleted, version
+
     @staticmethod
     def check_overlap(start_time_str, end_time_str):
         """检查时间段是否与现有会话重叠"""
@@ -221,6 +289,180 @@ class WindowSessionDAO:
             return [dict(row) for row in rows]
 
 
+class IntervalDAO:
+    """窗口区间账本数据访问对象 (window_intervals)"""
+
+    @staticmethod
+    def open_interval(window_title, process_name, start_ts):
+        """开启一个新区间 (尚无标签)，返回区间 ID"""
+        with get_db_connection() as conn:
+            cur = conn.execute(
+                '''INSERT INTO window_intervals (start_ts, window_title, process_name)
+                   VALUES (?, ?, ?)''',
+                (start_ts, window_title, process_name)
+            )
+            conn.commit()
+            return cur.lastrowid
+
+    @staticmethod
+    def close_interval(interval_id, end_ts):
+        """结束区间 (只对仍在进行的区间生效)"""
+        with get_db_connection() as conn:
+            conn.execute(
+                'UPDATE window_intervals SET end_ts = ? WHERE id = ? AND end_ts IS NULL',
+                (end_ts, interval_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def set_label(interval_id, status, summary, label_source, raw_data=None):
+        """为区间补上标签 (已计入统计的区间不再改动)"""
+        with get_db_connection() as conn:
+            conn.execute(
+                '''UPDATE window_intervals
+                   SET status = ?, summary = ?, label_source = ?, raw_data = ?
+                   WHERE id = ? AND settled = 0''',
+                (status, summary, label_source, raw_data, interval_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def replace_fallback_label(interval_id, status, summary, label_source, raw_data=None):
+        """迟到的标签替换已计入统计的兜底标签，返回是否改写"""
+        with get_db_connection() as conn:
+            cur = conn.execute(
+                '''UPDATE window_intervals
+                   SET status = ?, summary = ?, label_source = ?, raw_data = ?
+                   WHERE id = ? AND settled = 1 AND label_source = ?''',
+                (status, summary, label_source, raw_data, interval_id, 'fallback')
+            )
+            conn.commit()
+            return cur.rowcount > 0
+
+    @staticmethod
+    def get_interval(interval_id):
+        with get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT * FROM window_intervals WHERE id = ?', (interval_id,)
+            ).fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    @staticmethod
+    def mark_settled(interval_id):
+        with get_db_connection() as conn:
+            conn.execute('UPDATE window_intervals SET settled = 1 WHERE id = ?', (interval_id,))
+            conn.commit()
+
+    @staticmethod
+    def get_unsettled_closed():
+        """获取已结束但尚未计入统计的区间 (按时间顺序，含尚无标签的区间)"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT * FROM window_intervals
+                   WHERE settled = 0 AND end_ts IS NOT NULL
+                   ORDER BY start_ts ASC'''
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_labeled_samples(limit=200):
+        """最近由模型打过标签的不同窗口 (用于模型基准测试的参照标签)"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT window_title, process_name, status, MAX(start_ts) AS last_ts
+                   FROM window_intervals
+                   WHERE label_source IN ('ai', 'cache') AND status IS NOT NULL
+                         AND window_title IS NOT NULL AND window_title != ''
+                   GROUP BY window_title, process_name
+                   ORDER BY last_ts DESC LIMIT ?''',
+                (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def close_dangling(end_ts):
+        """上次进程异常退出遗留的未结束区间：无法得知真实结束时间，直接丢弃"""
+        with get_db_connection() as conn:
+            cur = conn.execute(
+                'DELETE FROM window_intervals WHERE end_ts IS NULL AND start_ts < ?',
+                (end_ts,)
+            )
+            conn.commit()
+            return cur.rowcount
+
+
+class ClassificationQueueDAO:
+    """离线分类队列数据访问对象 (classification_queue)"""
+
+    @staticmethod
+    def enqueue(interval_id, window_title, process_name, duration=0, next_attempt_ts=0):
+        """加入队列 (同一区间只保留一条)"""
+        import time
+        with get_db_connection() as conn:
+            conn.execute(
+                '''INSERT OR IGNORE INTO classification_queue
+                   (interval_id, window_title, process_name, duration, next_attempt_ts, created_ts)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (interval_id, window_title, process_name, duration, next_attempt_ts, time.time())
+            )
+            conn.commit()
+
+    @staticmethod
+    def enqueue_unlabeled():
+        """
+        启动兜底：把账本中已结束却仍无标签、且不在队列中的区间补入队列
+        (上次异常退出时分析尚未返回；运行期间漏掉的区间由 Worker 实时入队)
+        """
+        import time
+        with get_db_connection() as conn:
+            cur = conn.execute(
+                '''INSERT OR IGNORE INTO classification_queue
+                   (interval_id, window_title, process_name, duration, next_attempt_ts, created_ts)
+                   SELECT id, window_title, process_name, end_ts - start_ts, 0, ?
+                   FROM window_intervals
+                   WHERE status IS NULL AND end_ts IS NOT NULL AND settled = 0''',
+                (time.time(),)
+            )
+            conn.commit()
+            return cur.rowcount
+
+    @staticmethod
+    def get_due(now_ts, limit=20):
+        """获取已到重试时间的队列项 (最早入队的优先)"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT * FROM classification_queue
+                   WHERE next_attempt_ts <= ?
+                   ORDER BY created_ts ASC LIMIT ?''',
+                (now_ts, limit)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def reschedule(interval_id, attempts, next_attempt_ts, last_error=None):
+        with get_db_connection() as conn:
+            conn.execute(
+                '''UPDATE classification_queue
+                   SET attempts = ?, next_attempt_ts = ?, last_error = ?
+                   WHERE interval_id = ?''',
+                (attempts, next_attempt_ts, last_error, interval_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def remove(interval_id):
+        with get_db_connection() as conn:
+            conn.execute('DELETE FROM classification_queue WHERE interval_id = ?', (interval_id,))
+            conn.commit()
+
+    @staticmethod
+    def count():
+        with get_db_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM classification_queue').fetchone()[0]
+
+
 class StatsDAO:
     """统计数据访问对象"""
     
@@ -330,36 +572,36 @@ class StatsDAO:
         """一刀切：从今日00:00开始统计，重算并回写 daily_stats"""
         from datetime import date
         today_str = date.today().strftime('%Y-%m-%d')
-        start_time = f"{today_str} 00:00:00"
-        focus_sum = 0
-        ent_sum = 0
+        metrics = get_day_metrics(today_str)
+        focus_sum = metrics.focus_seconds
+        ent_sum = metrics.entertainment_seconds
         with get_db_connection() as conn:
-            # 聚合今日开始的会话
-            for row in conn.execute(
-                "SELECT status, SUM(duration) AS total_sec FROM window_sessions WHERE start_time >= ? GROUP BY status",
-                (start_time,)
-            ):
-                status = (row["status"] or "").lower()
-                total_sec = int(row["total_sec"] or 0)
-                if status in ["focus", "work"]:
-                    focus_sum += total_sec
-                elif status == "entertainment":
-                    ent_sum += total_sec
             # 确保存在记录
             conn.execute("INSERT OR IGNORE INTO daily_stats (date) VALUES (?)", (today_str,))
-            # 写入总时长
+            # 写入总时长、最长心流与意志力胜利 (与 period_stats 同一口径)
             conn.execute("""
                 UPDATE daily_stats
                 SET total_focus_time = ?,
                     total_entertainment_time = ?,
+                    max_focus_streak = ?,
+                    willpower_wins = ?,
                     efficiency_score = CASE 
                         WHEN (? + ?) > 0 THEN (? * 100 / (? + ?))
                         ELSE 0 END
                 WHERE date = ?
-            """, (focus_sum, ent_sum, focus_sum, ent_sum, focus_sum, focus_sum, ent_sum, today_str))
+            """, (focus_sum, ent_sum, metrics.max_streak, metrics.willpower_wins,
+                  focus_sum, ent_sum, focus_sum, focus_sum, ent_sum, today_str))
             conn.commit()
 
     # ====== Period Stats 访问接口 ======
+    @staticmethod
+    def get_personal_norm(date_obj=None):
+        """
+        截至 date_obj 前一天的个人基线 (默认与今天比较，疲劳提醒据此定级)，
+        {metric: {7: {n, mean, std, ewma, ewstd}, 30: {...}}}，还没有数据时返回 None
+        """
+        return PeriodBaselineDAO.get_norm(date_obj)
+
     @staticmethod
     def get_period_summary(date_obj):
         """获取周期统计(period_stats)的当日摘要"""
@@ -388,45 +630,16 @@ class StatsDAO:
         """一刀切：从今日00:00开始统计，重算并写入 period_stats"""
         from datetime import date
         today_str = date.today().strftime('%Y-%m-%d')
-        start_time = f"{today_str} 00:00:00"
-        focus_sum = 0
-        ent_sum = 0
-        max_streak = 0
-        willpower_wins = 0
         
-        # 1. 计算 (从 Main DB)
-        with get_db_connection() as conn:
-            # 聚合总时长
-            for row in conn.execute(
-                "SELECT status, SUM(duration) AS total_sec FROM window_sessions WHERE start_time >= ? GROUP BY status",
-                (start_time,)
-            ):
-                status = (row["status"] or "").lower()
-                total_sec = int(row["total_sec"] or 0)
-                if status in ["focus", "work"]:
-                    focus_sum += total_sec
-                elif status == "entertainment":
-                    ent_sum += total_sec
-            # 计算最长心流 (取当日 focus/work 会话的最大 duration)
-            r = conn.execute(
-                "SELECT MAX(duration) AS max_dur FROM window_sessions WHERE start_time >= ? AND status IN ('focus','work')",
-                (start_time,)
-            ).fetchone()
-            max_streak = int((r or {}).get("max_dur") or 0)
-            # 计算意志力胜利次数：统计娱乐 -> (focus/work) 的切换次数
-            rows = conn.execute(
-                "SELECT status FROM window_sessions WHERE start_time >= ? ORDER BY start_time ASC",
-                (start_time,)
-            ).fetchall()
-            last_status = None
-            for rr in rows or []:
-                cur = (rr["status"] or "").lower()
-                if last_status == "entertainment" and cur in ["focus", "work"]:
-                    willpower_wins += 1
-                last_status = cur
+        # 1. 计算 (从 Main DB，统一使用 SessionMetrics 的口径)
+        metrics = get_day_metrics(today_str)
+        focus_sum = metrics.focus_seconds
+        ent_sum = metrics.entertainment_seconds
+        max_streak = metrics.max_streak
+        willpower_wins = metrics.willpower_wins
         
         # 2. 写入 (到 Period Stats DB)
-        eff = int((focus_sum * 100 / (focus_sum + ent_sum)) if (focus_sum + ent_sum) > 0 else 0)
+        eff = efficiency_score(focus_sum, willpower_wins)
         with get_period_stats_db_connection() as conn:
             # UPSERT period_stats
             exists = conn.execute("SELECT id FROM period_stats WHERE date = ?", (today_str,)).fetchone()
@@ -441,4 +654,6 @@ class StatsDAO:
                     INSERT INTO period_stats (date, total_focus, total_entertainment, efficiency_score, max_streak, willpower_wins)
                     VALUES (?, ?, ?, ?, ?, ?)
                 """, (today_str, focus_sum, ent_sum, eff, max_streak, willpower_wins))
+            PeriodRollupDAO.refresh(conn.cursor(), [today_str])
+            PeriodBaselineDAO.update(conn.cursor(), [today_str])
             conn.commit()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import time
+
+from app.data.core.database import get_db_connection, get_period_stats_db_connection
+
+
+class BackfillDAO:
+    """回填指纹 (backfill_days)：记录每天派生统计计算时的数据版本，没变化的日期不再重算"""
+
+    @staticmethod
+    def fingerprints(start_date, end_date):
+        """
+        区间内每天的数据指纹 "会话数:最大 id:最近修改时间"，一次 GROUP BY 得出；
+        没有会话的日期不在结果中 (调用方按 "0::" 处理)
+        """
+        with get_db_connection() as conn:
+            rows = conn.execute('''
+                SELECT substr(start_time, 1, 10) AS day, COUNT(*), MAX(id), MAX(updated_at)
+                FROM window_sessions
+                WHERE start_time BETWEEN ? AND ?
+                GROUP BY day
+            ''', (f"{start_date} 00:00:00", f"{end_date} 23:59:59")).fetchall()
+        return {r[0]: f"{r[1]}:{r[2]}:{r[3] or ''}" for r in rows}
+
+    @staticmethod
+    def get_state(start_date, end_date):
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT date, fingerprint FROM backfill_days WHERE date BETWEEN ? AND ?', (start_date, end_date)
+            ).fetchall()
+        return {r['date']: r['fingerprint'] for r in rows}
+
+    @staticmethod
+    def save_state(conn, fingerprints):
+        """fingerprints: {date: fingerprint}，在调用方的事务中写入"""
+        now = time.time()
+        conn.executemany(
+            '''INSERT INTO backfill_days (date, fingerprint, computed_ts) VALUES (?, ?, ?)
+               ON CONFLICT(date) DO UPDATE SET fingerprint = excluded.fingerprint, computed_ts = excluded.computed_ts''',
+            [(d, fp, now) for d, fp in fingerprints.items()]
+        )
+
+    @staticmethod
+    def get_period_dates(start_date, end_date):
+        """已有 period_stats 行的日期 (派生库被删除或清空时，即使指纹没变也要重算)"""
+        with get_period_stats_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT DISTINCT date FROM period_stats WHERE date BETWEEN ? AND ?', (start_date, end_date)
+            ).fetchall()
+        return {str(r[0]) for r in rows}
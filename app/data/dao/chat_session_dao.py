@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import time
+
+from app.data.core.database import get_db_connection
+
+
+class ChatSessionDAO:
+    """对话会话数据访问对象 (chat_sessions / chat_messages)"""
+
+    @staticmethod
+    def create(session_id: str, system_prompt: str):
+        now = time.time()
+        with get_db_connection() as conn:
+            conn.execute(
+                '''INSERT INTO chat_sessions (session_id, system_prompt, summary, summarized_upto, created_ts, updated_ts)
+                   VALUES (?, ?, NULL, 0, ?, ?)''',
+                (session_id, system_prompt, now, now)
+            )
+            conn.commit()
+
+    @staticmethod
+    def get(session_id: str):
+        with get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT * FROM chat_sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    @staticmethod
+    def add_message(session_id: str, role: str, content: str) -> int:
+        now = time.time()
+        with get_db_connection() as conn:
+            cur = conn.execute(
+                'INSERT INTO chat_messages (session_id, role, content, ts) VALUES (?, ?, ?, ?)',
+                (session_id, role, content, now)
+            )
+            conn.execute('UPDATE chat_sessions SET updated_ts = ? WHERE session_id = ?', (now, session_id))
+            conn.commit()
+            return cur.lastrowid
+
+    @staticmethod
+    def get_messages(session_id: str, after_id: int = 0):
+        """获取尚未折叠进摘要的消息 (id > after_id)，按时间顺序"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT id, role, content FROM chat_messages WHERE session_id = ? AND id > ? ORDER BY id ASC',
+                (session_id, after_id)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def update_summary(session_id: str, summary: str, summarized_upto: int):
+        with get_db_connection() as conn:
+            conn.execute(
+                'UPDATE chat_sessions SET summary = ?, summarized_upto = ? WHERE session_id = ?',
+                (summary, summarized_upto, session_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def delete(session_id: str):
+        with get_db_connection() as conn:
+            conn.execute('DELETE FROM chat_messages WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM chat_sessions WHERE session_id = ?', (session_id,))
+            conn.commit()
+
+    @staticmethod
+    def purge(older_than_ts: float) -> int:
+        """删除长期未使用的会话，返回删除的会话数"""
+        with get_db_connection() as conn:
+            conn.execute(
+                '''DELETE FROM chat_messages WHERE session_id IN
+                   (SELECT session_id FROM chat_sessions WHERE updated_ts < ?)''',
+                (older_than_ts,)
+            )
+            cur = conn.execute('DELETE FROM chat_sessions WHERE updated_ts < ?', (older_than_ts,))
+            conn.commit()
+            return cur.rowcount
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+import re
+import time
+import sqlite3
+from datetime import date
+
+from app.data.core.database import (
+    get_db_connection, get_core_events_db_connection, get_period_stats_db_connection
+)
+
+# 中文按二元组 (bigram) 切分，英文/数字按单词切分；
+# 写入索引与查询使用同一套切分，FTS5 本身用 unicode61 按空格分词即可
+_CJK_RUN = re.compile(r'[一-鿿]+')
+_WORD = re.compile(r'[a-z0-9_]{2,}')
+
+STATUS_NAMES = {
+    'work': '学习工作', 'focus': '学习工作',
+    'entertainment': '娱乐', 'rest': '休息', 'idle': '休息',
+}
+
+
+def ngram_terms(text: str):
+    """切分出检索词 (去重，保持顺序)"""
+    if not text:
+        return []
+    text = text.lower()
+    terms = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(_WORD.findall(text))
+    return list(dict.fromkeys(terms))
+
+
+def _hours(seconds) -> str:
+    return f"{(seconds or 0) / 3600:.1f}h"
+
+
+class ContextIndexDAO:
+    """
+    对话检索索引 (context_fts)
+    把窗口会话、每日核心事项、每日统计预先序列化成一行文本 (doc) 存入 FTS5，
+    检索时直接拼进提示词，不再逐条解析 raw_data JSON。
+    按天增量刷新：只重建有新数据的日期 (以及今天)。
+    """
+
+    SOURCES = ('session', 'core', 'day')
+    MIN_SESSION_SECONDS = 30
+
+    @staticmethod
+    def available() -> bool:
+        with get_db_connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'context_fts'"
+            ).fetchone()
+            return row is not None
+
+    # ---------- 刷新 ----------
+
+    @staticmethod
+    def _watermark(conn, source):
+        row = conn.execute(
+            'SELECT last_id FROM context_index_state WHERE source = ?', (source,)
+        ).fetchone()
+        return row['last_id'] if row else 0
+
+    @staticmethod
+    def _replace_day(conn, source, day, docs):
+        conn.execute('DELETE FROM context_fts WHERE source = ? AND day = ?', (source, day))
+        conn.executemany(
+            'INSERT INTO context_fts (terms, doc, source, day, duration) VALUES (?, ?, ?, ?, ?)',
+            [(' '.join(ngram_terms(text)), doc, source, day, duration) for text, doc, duration in docs]
+        )
+
+    @staticmethod
+    def _session_docs(day):
+        with get_db_connection() as conn:
+            rows = conn.execute('''
+                SELECT process_name, window_title, status,
+                       SUM(duration) AS total, MIN(start_time) AS first, MAX(end_time) AS last,
+                       MAX(summary) AS summary
+                FROM window_sessions
+                WHERE start_time >= ? AND start_time <= ?
+                GROUP BY process_name, window_title, status
+                HAVING total >= ?
+            ''', (f"{day} 00:00:00", f"{day} 23:59:59", ContextIndexDAO.MIN_SESSION_SECONDS)).fetchall()
+        docs = []
+        for r in rows:
+            title = r['window_title'] or '未知窗口'
+            status = STATUS_NAMES.get(r['status'], r['status'] or '未知')
+            span = f"{(r['first'] or '')[11:16]}-{(r['last'] or '')[11:16]}"
+            doc = f"[{day} {span}] {r['process_name']} · {title} — {status} {_hours(r['total'])}"
+            if r['summary'] and r['summary'] != title:
+                doc += f"：{r['summary']}"
+            docs.append((f"{r['process_name']} {title} {r['summary'] or ''} {status}", doc, r['total']))
+        return docs
+
+    @staticmethod
+    def _core_docs(day):
+        with get_core_events_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT app_name, clean_title, total_duration, category FROM core_events WHERE date = ? ORDER BY rank',
+                (day,)
+            ).fetchall()
+        docs = []
+        for r in rows:
+            kind = '娱乐' if r['category'] == 'entertainment' else '核心事项'
+            doc = f"[{day}] {kind}: {r['clean_title']} ({r['app_name']}) {_hours(r['total_duration'])}"
+            docs.append((f"{r['app_name']} {r['clean_title']} {kind}", doc, r['total_duration']))
+        return docs
+
+    @staticmethod
+    def _day_docs(day):
+        with get_period_stats_db_connection() as conn:
+            r = conn.execute(
+                'SELECT * FROM period_stats WHERE date = ? ORDER BY id DESC LIMIT 1', (day,)
+            ).fetchone()
+        if not r:
+            return []
+        doc = (f"[{day}] 当日汇总: 专注 {_hours(r['total_focus'])}，娱乐 {_hours(r['total_entertainment'])}，"
+               f"最长心流 {_hours(r['max_streak'])}，效能 {r['efficiency_score'] or 0}")
+        if r['daily_summary']:
+            doc += f"；{r['daily_summary']}"
+        return [(f"汇总 {r['daily_summary'] or ''}", doc, r['total_focus'] or 0)]
+
+    @staticmethod
+    def _dirty_days(source, last_id):
+        """返回 (需要重建的日期集合, 当前最大 id)"""
+        if source == 'session':
+            ctx, sql = get_db_connection, 'SELECT DISTINCT substr(start_time, 1, 10) AS day FROM window_sessions WHERE id > ?'
+            max_sql = 'SELECT COALESCE(MAX(id), 0) FROM window_sessions'
+        elif source == 'core':
+            ctx, sql = get_core_events_db_connection, 'SELECT DISTINCT date AS day FROM core_events WHERE id > ?'
+            max_sql = 'SELECT COALESCE(MAX(id), 0) FROM core_events'
+        else:
+            ctx, sql = get_period_stats_db_connection, 'SELECT DISTINCT date AS day FROM period_stats WHERE id > ?'
+            max_sql = 'SELECT COALESCE(MAX(id), 0) FROM period_stats'
+        with ctx() as conn:
+            days = {str(r['day']) for r in conn.execute(sql, (last_id,)).fetchall() if r['day']}
+            max_id = conn.execute(max_sql).fetchone()[0]
+        return days, max_id
+
+    @staticmethod
+    def refresh() -> int:
+        """增量刷新索引，返回重建的 (来源, 日期) 数量"""
+        builders = {
+            'session': ContextIndexDAO._session_docs,
+            'core': ContextIndexDAO._core_docs,
+            'day': ContextIndexDAO._day_docs,
+        }
+        today = date.today().isoformat()
+        rebuilt = 0
+        for source in ContextIndexDAO.SOURCES:
+            with get_db_connection() as conn:
+                last_id = ContextIndexDAO._watermark(conn, source)
+            days, max_id = ContextIndexDAO._dirty_days(source, last_id)
+            if source == 'session':
+                days.add(today)  # 进行中的会话只更新时长，不产生新 id
+            docs_by_day = {day: builders[source](day) for day in sorted(days)}
+            with get_db_connection() as conn:
+                for day, docs in docs_by_day.items():
+                    ContextIndexDAO._replace_day(conn, source, day, docs)
+                conn.execute(
+                    'INSERT OR REPLACE INTO context_index_state (source, last_id, refreshed_ts) VALUES (?, ?, ?)',
+                    (source, max_id, time.time())
+                )
+                conn.commit()
+            rebuilt += len(docs_by_day)
+        return rebuilt
+
+    @staticmethod
+    def reindex_days(days) -> int:
+        """重建指定日期的全部来源 (历史数据被原地修改、id 水位线感知不到时使用)"""
+        builders = {
+            'session': ContextIndexDAO._session_docs,
+            'core': ContextIndexDAO._core_docs,
+            'day': ContextIndexDAO._day_docs,
+        }
+        days = sorted(set(days))
+        docs = {(source, day): builders[source](day) for source in ContextIndexDAO.SOURCES for day in days}
+        with get_db_connection() as conn:
+            for (source, day), day_docs in docs.items():
+                ContextIndexDAO._replace_day(conn, source, day, day_docs)
+            conn.commit()
+        return len(days)
+
+    @staticmethod
+    def rebuild() -> int:
+        """清空后全量重建"""
+        with get_db_connection() as conn:
+            conn.execute('DELETE FROM context_fts')
+            conn.execute('DELETE FROM context_index_state')
+            conn.commit()
+        return ContextIndexDAO.refresh()
+
+    # ---------- 检索 ----------
+
+    @staticmethod
+    def search(terms, start_day=None, end_day=None, limit=50):
+        """按相关度 (bm25) 检索，可选日期范围；返回 [{doc, source, day, duration}]"""
+        if not terms:
+            return []
+        match = ' OR '.join('"%s"' % t.replace('"', '') for t in terms)
+        sql = 'SELECT doc, source, day, duration FROM context_fts WHERE context_fts MATCH ?'
+        params = [match]
+        if start_day:
+            sql += ' AND day >= ?'
+            params.append(start_day)
+        if end_day:
+            sql += ' AND day <= ?'
+            params.append(end_day)
+        sql += ' ORDER BY bm25(context_fts) LIMIT ?'
+        params.append(limit)
+        try:
+            with get_db_connection() as conn:
+                return [dict(r) for r in conn.execute(sql, params).fetchall()]
+        except sqlite3.OperationalError as e:
+            print(f"[ContextIndex] Search failed: {e}")
+            return []
+
+    @staticmethod
+    def by_range(start_day, end_day, sources=None, limit=50):
+        """日期范围内的文档，按时长降序 (问题里没有可检索的关键词时使用)"""
+        sql = 'SELECT doc, source, day, duration FROM context_fts WHERE day >= ? AND day <= ?'
+        params = [start_day, end_day]
+        if sources:
+            sql += ' AND source IN (%s)' % ','.join('?' * len(sources))
+            params.extend(sources)
+        sql += ' ORDER BY CAST(duration AS REAL) DESC, day DESC LIMIT ?'
+        params.append(limit)
+        with get_db_connection() as conn:
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
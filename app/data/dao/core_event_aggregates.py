@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+from app.data.core.database import get_attached_connection
+from app.data.dao.core_events_extractor import clean_title, aggregate_events, fallback_rows
+from app.data.services.title_normalizer import get_normalizer
+
+# 与 select_core_events 相同的口径：专注/娱乐会话，单条 > 30s 才计入
+CATEGORY_STATUSES = {
+    'focus': ('work', 'focus'),
+    'entertainment': ('entertainment',),
+}
+MIN_DURATION = 30
+TOP_N = {'focus': 3, 'entertainment': 2}
+# 其他进程的事务可能晚于本次同步才提交，水位回退一小段重新比对 (按会话做差，重复处理无副作用)
+SYNC_OVERLAP_SECONDS = 5.0
+
+
+def contribution(row):
+    """会话对核心事件的贡献 (category, app, clean_title, duration)，不合格返回 None"""
+    duration = int(row['duration'] or 0)
+    if duration <= MIN_DURATION:
+        return None
+    for category, statuses in CATEGORY_STATUSES.items():
+        if row['status'] in statuses:
+            app = row['process_name'] or "Unknown"
+            return category, app, clean_title(row['window_title'] or "", app), duration
+    return None
+
+
+class CoreEventAggregateDAO:
+    """
+    核心事件增量聚合 (core_event_sessions / core_event_totals / core_event_sync)。
+    conn 必须是 ATTACH 了 core_events.db (别名 core) 的主库连接 (get_attached_connection)，
+    会话与聚合在同一个连接里读写，由调用方提交。
+    """
+
+    @staticmethod
+    def sync_day(conn, day):
+        """
+        把 day 当天自上次同步以来修改过的会话计入累计表，返回变动的会话数。
+        - 按 updated_at 水位只读新增/修改的会话，与已记录的贡献做差，差值写入 core_event_totals
+        - 已删除或改到别的日期的会话，从当天累计中扣除
+        - 标题归一化规则版本变化时重读全天
+        """
+        day = str(day)
+        start_ts, end_ts = f"{day} 00:00:00", f"{day} 23:59:59"
+        rules_version = get_normalizer().version
+        state = conn.execute('SELECT synced_upto, rules_version FROM core.core_event_sync WHERE date = ?',
+                             (day,)).fetchone()
+        if state is None or state['rules_version'] != rules_version:
+            # 首次同步，或标题归一化规则变了 (清洗后标题可能不同)：重读全天，与已记录的贡献逐条做差
+            rows = conn.execute('''
+                SELECT id, process_name, window_title, status, duration, updated_at
+                FROM window_sessions WHERE start_time BETWEEN ? AND ?
+            ''', (start_ts, end_ts)).fetchall()
+            upto = None
+        else:
+            upto = state['synced_upto']
+            rows = conn.execute('''
+                SELECT id, process_name, window_title, status, duration, updated_at
+                FROM window_sessions WHERE start_time BETWEEN ? AND ? AND updated_at >= ?
+            ''', (start_ts, end_ts, (upto or 0) - SYNC_OVERLAP_SECONDS)).fetchall()
+
+        stored = {}
+        if rows:
+            ids = [r['id'] for r in rows]
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                for s in conn.execute(f'''
+                    SELECT session_id, date, category, app_name, clean_title, duration
+                    FROM core.core_event_sessions WHERE session_id IN ({','.join('?' * len(chunk))})
+                ''', chunk).fetchall():
+                    stored[s['session_id']] = s
+
+        deltas = {}    # (date, category, app, title) -> [duration, count]
+        upserts, removed = [], []
+
+        def add(date, category, app, title, duration, sign):
+            d = deltas.setdefault((date, category, app, title), [0, 0])
+            d[0] += sign * duration
+            d[1] += sign
+
+        for r in rows:
+            if r['updated_at'] is not None:
+                upto = r['updated_at'] if upto is None else max(upto, r['updated_at'])
+            new = contribution(r)
+            old = stored.get(r['id'])
+            if old is not None:
+                old_key = (old['date'], old['category'], old['app_name'], old['clean_title'], old['duration'])
+                if new is not None and old_key == (day,) + new:
+                    continue
+                add(*old_key, -1)
+                if new is None:
+                    removed.append(r['id'])
+            if new is not None:
+                add(day, *new, 1)
+                upserts.append((r['id'], day) + new)
+
+        # 已删除、或 start_time 改到其他日期的会话
+        for s in conn.execute('''
+            SELECT s.session_id, s.category, s.app_name, s.clean_title, s.duration
+            FROM core.core_event_sessions s
+            LEFT JOIN window_sessions w ON w.id = s.session_id
+            WHERE s.date = ? AND (w.id IS NULL OR w.start_time NOT BETWEEN ? AND ?)
+        ''', (day, start_ts, end_ts)).fetchall():
+            add(day, s['category'], s['app_name'], s['clean_title'], s['duration'], -1)
+            removed.append(s['session_id'])
+
+        changes = [k + tuple(v) for k, v in deltas.items() if v != [0, 0]]
+        if removed:
+            conn.executemany('DELETE FROM core.core_event_sessions WHERE session_id = ?', [(i,) for i in removed])
+        if upserts:
+            conn.executemany('''
+                INSERT OR REPLACE INTO core.core_event_sessions (session_id, date, category, app_name, clean_title, duration)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', upserts)
+        if changes:
+            conn.executemany('''
+                INSERT INTO core.core_event_totals (date, category, app_name, clean_title, total_duration, event_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(date, category, app_name, clean_title) DO UPDATE SET
+                    total_duration = total_duration + excluded.total_duration,
+                    event_count = event_count + excluded.event_count
+            ''', changes)
+            conn.executemany('DELETE FROM core.core_event_totals WHERE date = ? AND event_count <= 0',
+                             [(d,) for d in {c[0] for c in changes}])
+        if state is None or upto != state['synced_upto'] or state['rules_version'] != rules_version:
+            conn.execute('''
+                INSERT INTO core.core_event_sync (date, synced_upto, rules_version) VALUES (?, ?, ?)
+                ON CONFLICT(date) DO UPDATE SET synced_upto = excluded.synced_upto, rules_version = excluded.rules_version
+            ''', (day, upto, rules_version))
+        return len(upserts) + len(removed)
+
+    @staticmethod
+    def refresh(days):
+        """会话结束后调用：独立连接同步若干天并提交，返回变动的会话数"""
+        with get_attached_connection() as conn:
+            changed = sum(CoreEventAggregateDAO.sync_day(conn, d) for d in sorted(set(str(d) for d in days)))
+            conn.commit()
+        return changed
+
+    @staticmethod
+    def top_events(conn, day, verbose=True):
+        """
+        从累计表读取当天 Top 3 专注 + Top 2 娱乐，结构同 select_core_events:
+        [{category, rank, app, title, duration, count}]。
+        需先 sync_day。当天没有合格的专注会话时，与 select_core_events 一样兜底取任意状态最长的 5 条会话。
+        """
+        day = str(day)
+        selected = []
+        for category, limit in TOP_N.items():
+            rows = conn.execute('''
+                SELECT app_name, clean_title, total_duration, event_count
+                FROM core.core_event_totals
+                WHERE date = ? AND category = ?
+                ORDER BY total_duration DESC, event_count DESC, app_name, clean_title
+                LIMIT ?
+            ''', (day, category, limit)).fetchall()
+            events = [{'app': r['app_name'], 'title': r['clean_title'],
+                       'duration': r['total_duration'], 'count': r['event_count']} for r in rows]
+            if not events and category == 'focus':
+                events = aggregate_events(fallback_rows(conn.cursor(), day, verbose))[:limit]
+            elif not events and verbose:
+                print(f"  No {category} sessions found for {day}")
+            for rank, event in enumerate(events, 1):
+                selected.append(dict(event, category=category, rank=rank))
+        return selected
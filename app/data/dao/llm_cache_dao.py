@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import time
+import json
+import hashlib
+
+from app.data.core.database import get_llm_cache_db_connection
+
+
+class LLMCacheDAO:
+    """LLM 输出缓存数据访问对象 (内容寻址 + LRU 淘汰)"""
+
+    MAX_ENTRIES = 2000
+
+    @staticmethod
+    def make_key(template_version: str, model: str, context) -> str:
+        """缓存键：hash(模板版本, 模型, 输入上下文)"""
+        if not isinstance(context, str):
+            context = json.dumps(context, ensure_ascii=False, sort_keys=True)
+        raw = f"{template_version}\x1f{model}\x1f{context}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get(cache_key: str):
+        """命中返回输出文本并刷新访问时间，未命中返回 None"""
+        with get_llm_cache_db_connection() as conn:
+            row = conn.execute(
+                'SELECT output FROM llm_cache WHERE cache_key = ?', (cache_key,)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                'UPDATE llm_cache SET last_access_ts = ?, hits = hits + 1 WHERE cache_key = ?',
+                (time.time(), cache_key)
+            )
+            conn.commit()
+            return row['output']
+
+    @staticmethod
+    def put(cache_key: str, output: str, kind: str = None, scope: str = None,
+            model: str = None, template_version: str = None, max_entries: int = None):
+        now = time.time()
+        with get_llm_cache_db_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO llm_cache
+                    (cache_key, kind, scope, model, template_version, output, created_ts, last_access_ts, hits)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+            ''', (cache_key, kind, scope, model, template_version, output, now, now))
+            # 超出容量时按最久未访问淘汰
+            limit = max_entries or LLMCacheDAO.MAX_ENTRIES
+            conn.execute('''
+                DELETE FROM llm_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_cache
+                    ORDER BY last_access_ts DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (limit,))
+            conn.commit()
+
+    @staticmethod
+    def invalidate(kind: str = None, scope: str = None) -> int:
+        """显式失效：按类别和/或范围删除；都不传则清空全部。返回删除条数"""
+        sql = 'DELETE FROM llm_cache WHERE 1=1'
+        params = []
+        if kind:
+            sql += ' AND kind = ?'
+            params.append(kind)
+        if scope:
+            sql += ' AND scope = ?'
+            params.append(scope)
+        with get_llm_cache_db_connection() as conn:
+            cur = conn.execute(sql, params)
+            conn.commit()
+            return cur.rowcount
+
+    @staticmethod
+    def stats():
+        with get_llm_cache_db_connection() as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) AS entries, COALESCE(SUM(hits), 0) AS hits FROM llm_cache'
+            ).fetchone()
+            return {"entries": row['entries'], "hits": row['hits']}
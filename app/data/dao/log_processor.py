@@ -1,29 +1,34 @@
 import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 import os
-import re
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Add project root to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
-from app.data.core.database import DB_PATH
+from app.data.core.database import DB_PATH, DB_DIR
+from app.data.services.title_normalizer import get_normalizer
 
 # 1. 数据库路径
 SOURCE_DB = DB_PATH
-TARGET_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'storage', 'cleaned_data.db')
+TARGET_DB = os.path.join(DB_DIR, 'cleaned_data.db')
 
 # 2. 读取数据
-def load_data():
+def load_data(start_date=None, end_date=None):
+    """读取 [start_date, end_date] 的会话 (默认今天)，按开始时间排序"""
+    start_date = str(start_date or datetime.now().date())
+    end_date = str(end_date or start_date)
     try:
         conn = sqlite3.connect(SOURCE_DB)
-        conn.row_factory = sqlite3.Row
-        
-        # 只读取今天的数据
-        # Added window_title to the query
-        query = "SELECT start_time, process_name as app, window_title, status as raw_status, duration, summary FROM window_sessions WHERE start_time LIKE '2026-01-21%'"
-        
-        df = pd.read_sql_query(query, conn)
+        query = '''
+            SELECT id, start_time, process_name as app, window_title, status as raw_status, duration, summary
+            FROM window_sessions
+            WHERE start_time BETWEEN ? AND ?
+            ORDER BY start_time ASC, id ASC
+        '''
+        df = pd.read_sql_query(query, conn, params=(f"{start_date} 00:00:00", f"{end_date} 23:59:59"))
         # Rename columns to match the logic
         df.rename(columns={'start_time': 'start'}, inplace=True)
         conn.close()
@@ -33,106 +38,169 @@ def load_data():
         return pd.DataFrame()
 
 # 3. 核心算法配置
+DEV = 'Dev (开发/文档)'
+RESEARCH = 'Research (研判/查阅)'
+BROWSING = 'Browsing (浏览)'
+SOCIAL = 'Social/Media (社交媒体)'
+SYSTEM = 'System (系统)'
+
 def get_context(row):
     app = str(row['app']).lower()
     summary = str(row['summary']) if row['summary'] else ""
-    
+
     if any(x in app for x in ['trae', 'python', 'github', 'wps', 'notepad', 'snipping']):
-        return 'Dev (开发/文档)'
+        return DEV
     if 'msedge' in app:
         if 'flow state' in summary or '飞书' in summary or 'google' in summary.lower():
-            return 'Research (研判/查阅)'
-        return 'Browsing (浏览)'
+            return RESEARCH
+        return BROWSING
     if any(x in app for x in ['weixin', 'wechat', '哔哩哔哩']):
-        return 'Social/Media (社交媒体)'
-    return 'System (系统)'
+        return SOCIAL
+    return SYSTEM
+
+def get_contexts(df):
+    """get_context 的列运算版本"""
+    app = df['app'].astype(str).str.lower()
+    summary = df['summary'].fillna('').astype(str)
+    is_edge = app.str.contains('msedge', regex=False)
+    is_research = is_edge & (summary.str.contains('flow state', regex=False) |
+                             summary.str.contains('飞书', regex=False) |
+                             summary.str.lower().str.contains('google', regex=False))
+    conditions = [
+        app.str.contains('trae|python|github|wps|notepad|snipping'),
+        is_research,
+        is_edge,
+        app.str.contains('weixin|wechat|哔哩哔哩'),
+    ]
+    return pd.Series(np.select(conditions, [DEV, RESEARCH, BROWSING, SOCIAL], SYSTEM), index=df.index)
 
 # 新增：提取主导主题
 def extract_dominant_topic(session_details):
-    # session_details 结构: [{'title': '黑色四叶草-xx', 'duration': 900}, ...]
-    
+    # session_details 结构: [{'title': '黑色四叶草-xx', 'app': 'msedge.exe', 'duration': 900}, ...]
+
     # 1. 统计每个标题的总时长
     title_stats = {}
+    normalizer = get_normalizer()
     for item in session_details:
-        # 简单清洗：去掉软件名后缀
+        # 清洗：有应用名时与核心事件同一套规则，否则只去掉软件名后缀
         # Ensure title is a string
         title = str(item['title']) if item['title'] else "Unknown"
-        clean_title = re.sub(r' - (Microsoft\u200b Edge|Trae|Google Chrome|Visual Studio Code).*', '', title)
+        if item.get('app'):
+            clean_title = normalizer.clean(title, str(item['app']))
+        else:
+            clean_title = normalizer.strip_suffix(title)
         title_stats[clean_title] = title_stats.get(clean_title, 0) + item['duration']
-    
+
     # 2. 找出时长最长的标题
     if not title_stats:
         return "未知活动"
-    
+
     dominant_title = max(title_stats, key=title_stats.get)
     return dominant_title
 
 INTERRUPTION_THRESHOLD = 120
 
+def session_ids(df, contexts):
+    """
+    向量化的分段：返回每行所属的合并会话编号 (0, 1, 2, ...)。
+    与逐行规则等价：
+    - 同上下文、短暂打断 (< INTERRUPTION_THRESHOLD) 都并入当前会话；Dev 会话中穿插的 Research 也并入
+    - 会话的上下文由它的第一行决定；跨天时一定切分
+    只有 "锚点行" (每天第一行，或时长 >= 阈值的行) 可能开启新会话。锚点的分段键为其上下文，
+    但 Research 锚点若紧跟在 Dev 锚点 (或已并入 Dev 的 Research) 之后，键视为 Dev。
+    键与前一个锚点不同即开启新会话，再对开启标记做 cumsum。
+    """
+    if df.empty:
+        return pd.Series([], dtype=np.int64, index=df.index)
+    day = df['start'].str.slice(0, 10)
+    first = day.ne(day.shift())
+    anchor = first | (df['duration'].fillna(0) >= INTERRUPTION_THRESHOLD)
+
+    a_ctx = contexts[anchor]
+    a_day = day[anchor]
+    prev_non_research = a_ctx.where(a_ctx != RESEARCH).groupby(a_day).ffill()
+    key = a_ctx.mask((a_ctx == RESEARCH) & (prev_non_research == DEV) & ~first[anchor], DEV)
+    starts = first[anchor] | key.ne(key.shift())
+
+    start_flags = pd.Series(False, index=df.index)
+    start_flags[starts.index] = starts
+    return start_flags.cumsum() - 1
+
+SESSION_COLUMNS = ['session_key', 'day', 'start_time', 'end_time', 'context', 'topic',
+                   'total_duration', 'apps_involved', 'details_count']
+
+def sessionize(df):
+    """
+    把会话按上下文合并，返回 DataFrame (每个合并会话一行):
+    session_key (第一条原始会话 id), day, start_time, end_time, context, topic,
+    total_duration, apps_involved, details_count
+    """
+    return _sessionize(df.reset_index(drop=True))[0]
+
+def _sessionize(df):
+    """返回 (合并会话 DataFrame, 每行所属的会话编号)"""
+    if df.empty:
+        return pd.DataFrame(columns=SESSION_COLUMNS), pd.Series([], dtype=np.int64)
+    contexts = get_contexts(df)
+    sid = session_ids(df, contexts)
+    duration = df['duration'].fillna(0).astype(np.int64)
+    start_ts = pd.to_datetime(df['start'])
+
+    # 主导主题：每个 (应用, 标题) 只清洗一次，groupby 求每个会话内总时长最长的清洗后标题 (并列取先出现的)
+    titles = df['window_title'].where(df['window_title'].fillna('') != '', 'Unknown').astype(str)
+    apps = df['app']
+    normalizer = get_normalizer()
+    pairs = pd.DataFrame({'app': apps, 'title': titles}).drop_duplicates()
+    topic_of = {(a, t): (normalizer.clean(t, str(a)) if a else normalizer.strip_suffix(t))
+                for a, t in zip(pairs['app'], pairs['title'])}
+    topic = pd.Series([topic_of[(a, t)] for a, t in zip(apps, titles)], index=df.index)
+    by_topic = pd.DataFrame({'sid': sid, 'topic': topic, 'duration': duration}) \
+        .groupby(['sid', 'topic'], sort=False)['duration'].sum().reset_index()
+    dominant = by_topic.loc[by_topic.groupby('sid')['duration'].idxmax()].set_index('sid')['topic']
+
+    summary = df['summary'].fillna('').astype(str)
+    details = pd.DataFrame({'sid': sid, 'summary': summary})
+    details = details[details['summary'] != ''].drop_duplicates()
+    details_count = details.groupby('sid').size()
+
+    short_name = {a: str(a).split('.')[0] for a in apps.unique()}
+    app_names = pd.DataFrame({'sid': sid, 'app': apps.map(short_name)}).drop_duplicates()
+    apps_involved = app_names.groupby('sid', sort=False)['app'].agg(', '.join)
+
+    end_ts = start_ts + pd.to_timedelta(duration, unit='s')
+    grouped = pd.DataFrame({'sid': sid, 'id': df['id'], 'start': df['start'], 'context': contexts,
+                            'duration': duration, 'end': end_ts}).groupby('sid', sort=True)
+    sessions = grouped.agg(session_key=('id', 'first'), start_time=('start', 'first'), context=('context', 'first'),
+                           total_duration=('duration', 'sum'), end=('end', 'max'))
+    sessions['day'] = sessions['start_time'].str.slice(0, 10)
+    sessions['end_time'] = sessions['end'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    sessions['topic'] = dominant
+    sessions['apps_involved'] = apps_involved
+    sessions['details_count'] = details_count.reindex(sessions.index, fill_value=0)
+    return sessions[SESSION_COLUMNS].reset_index(drop=True), sid
+
 def intelligent_merge(df):
-    merged_sessions = []
-    current_session = None
-
-    for _, row in df.iterrows():
-        context = get_context(row)
-        
-        # 初始化
-        if current_session is None:
-            current_session = {
-                'start_time': row['start'],
-                'end_time': row['start'],
-                'context': context,
-                'total_duration': row['duration'],
-                'apps': {row['app']},
-                'details': [row['summary']] if row['summary'] else [],
-                'raw_logs': [{'title': row['window_title'], 'duration': row['duration']}] # Store raw logs for topic extraction
-            }
-            continue
-
-        # 判断逻辑
-        is_same_context = (context == current_session['context'])
-        is_dev_research = (current_session['context'] == 'Dev (开发/文档)' and context == 'Research (研判/查阅)')
-        is_short_interruption = (row['duration'] < INTERRUPTION_THRESHOLD)
-
-        if is_same_context or is_dev_research or is_short_interruption:
-            # === 执行合并 ===
-            current_session['total_duration'] += row['duration']
-            current_session['apps'].add(row['app'])
-            if row['summary'] and row['summary'] not in current_session['details']:
-                current_session['details'].append(row['summary'])
-            
-            # Add to raw_logs
-            current_session['raw_logs'].append({'title': row['window_title'], 'duration': row['duration']})
-            
-        else:
-            # === 封存当前块，计算 Topic，开启新块 ===
-            current_session['topic'] = extract_dominant_topic(current_session['raw_logs'])
-            merged_sessions.append(current_session)
-            
-            current_session = {
-                'start_time': row['start'],
-                'end_time': row['start'],
-                'context': context,
-                'total_duration': row['duration'],
-                'apps': {row['app']},
-                'details': [row['summary']] if row['summary'] else [],
-                'raw_logs': [{'title': row['window_title'], 'duration': row['duration']}]
-            }
-
-    if current_session:
-        current_session['topic'] = extract_dominant_topic(current_session['raw_logs'])
-        merged_sessions.append(current_session)
-    
-    return merged_sessions
-
-# 4. 存储到新数据库
-def save_to_new_db(sessions):
-    if os.path.exists(TARGET_DB):
-        os.remove(TARGET_DB)
-        
-    conn = sqlite3.connect(TARGET_DB)
+    """兼容旧接口：返回合并后的会话列表 (dict)"""
+    if df.empty:
+        return []
+    df = df.reset_index(drop=True)
+    sessions, sid = _sessionize(df)
+    apps = df.groupby(sid)['app'].agg(set)
+    summaries = df['summary'].where(df['summary'].fillna('') != '')
+    details = summaries.groupby(sid).agg(lambda x: list(dict.fromkeys(x.dropna())))
+    return [{
+        'start_time': s.start_time,
+        'end_time': s.end_time,
+        'context': s.context,
+        'total_duration': int(s.total_duration),
+        'apps': apps.iloc[i],
+        'details': details.iloc[i],
+        'topic': s.topic
+    } for i, s in enumerate(sessions.itertuples(index=False))]
+
+# 4. 增量写入 aggregated_sessions
+def init_target_db(conn):
     cursor = conn.cursor()
-    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS aggregated_sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -144,58 +212,129 @@ def save_to_new_db(sessions):
             details_count INTEGER
         )
     ''')
-    
-    for s in sessions:
-        apps_str = ", ".join([str(a).split('.')[0] for a in s['apps']])
-        topic = s.get('topic', 'Unknown')
-        
-        cursor.execute('''
-            INSERT INTO aggregated_sessions (start_time, context, topic, total_duration, apps_involved, details_count)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (s['start_time'], s['context'], topic, int(s['total_duration']), apps_str, len(s['details'])))
-        
+    for column in ('session_key INTEGER', 'day TEXT', 'end_time TEXT'):
+        try:
+            cursor.execute(f'ALTER TABLE aggregated_sessions ADD COLUMN {column}')
+        except sqlite3.OperationalError:
+            pass
+    # 旧版每次整库重建、没有 session_key 的行无法增量对齐，直接清掉
+    cursor.execute('DELETE FROM aggregated_sessions WHERE session_key IS NULL')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_aggregated_sessions_key ON aggregated_sessions(session_key)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_aggregated_sessions_day ON aggregated_sessions(day)')
     conn.commit()
-    conn.close()
-    print(f"Successfully saved {len(sessions)} aggregated sessions to {TARGET_DB}")
+
+def save_sessions(sessions, start_date, end_date):
+    """
+    按 session_key (合并会话第一条原始会话 id) upsert，内容没变的行不改写；
+    区间内已不存在的旧合并会话删除。返回 (写入/更新行数, 删除行数)
+    """
+    conn = sqlite3.connect(TARGET_DB)
+    try:
+        init_target_db(conn)
+        rows = [(int(s.session_key), s.day, s.start_time, s.end_time, s.context, s.topic, int(s.total_duration),
+                 s.apps_involved, int(s.details_count)) for s in sessions.itertuples(index=False)]
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS current_keys (session_key INTEGER PRIMARY KEY)')
+        conn.execute('DELETE FROM current_keys')
+        conn.executemany('INSERT INTO current_keys VALUES (?)', [(r[0],) for r in rows])
+        deleted = conn.execute('''
+            DELETE FROM aggregated_sessions
+            WHERE day BETWEEN ? AND ? AND session_key NOT IN (SELECT session_key FROM current_keys)
+        ''', (str(start_date), str(end_date))).rowcount
+        before = conn.total_changes
+        conn.executemany('''
+            INSERT INTO aggregated_sessions
+                (session_key, day, start_time, end_time, context, topic, total_duration, apps_involved, details_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(session_key) DO UPDATE SET
+                day = excluded.day, start_time = excluded.start_time, end_time = excluded.end_time,
+                context = excluded.context, topic = excluded.topic, total_duration = excluded.total_duration,
+                apps_involved = excluded.apps_involved, details_count = excluded.details_count
+            WHERE (day, start_time, end_time, context, topic, total_duration, apps_involved, details_count)
+                IS NOT (excluded.day, excluded.start_time, excluded.end_time, excluded.context, excluded.topic,
+                        excluded.total_duration, excluded.apps_involved, excluded.details_count)
+        ''', rows)
+        written = conn.total_changes - before
+        conn.commit()
+        return written, deleted
+    finally:
+        conn.close()
+
+def last_processed_day():
+    """aggregated_sessions 中最新的日期 (增量运行从这一天重新开始，它可能还没结束)"""
+    if not os.path.exists(TARGET_DB):
+        return None
+    conn = sqlite3.connect(TARGET_DB)
+    try:
+        init_target_db(conn)
+        return conn.execute('SELECT MAX(day) FROM aggregated_sessions').fetchone()[0]
+    finally:
+        conn.close()
+
+def run(start_date=None, end_date=None):
+    """
+    对 [start_date, end_date] 做合并并增量写入；不给 start_date 时从上次处理到的最后一天继续 (首次只处理今天)
+    """
+    end_date = str(end_date or datetime.now().date())
+    start_date = str(start_date or last_processed_day() or end_date)
+    t0 = datetime.now()
+    df = load_data(start_date, end_date)
+    sessions = sessionize(df)
+    written, deleted = save_sessions(sessions, start_date, end_date)
+    elapsed = (datetime.now() - t0).total_seconds()
+    print(f"[LogProcessor] {start_date} .. {end_date}: {len(df)} raw -> {len(sessions)} merged sessions, "
+          f"{written} upserted, {deleted} removed ({elapsed:.2f}s)")
+    return sessions
+
+def run_in_background(start_date=None, end_date=None):
+    """后台线程执行 run()，返回线程对象"""
+    def _job():
+        try:
+            run(start_date, end_date)
+        except Exception as e:
+            print(f"[LogProcessor] Background run failed: {e}")
+    thread = threading.Thread(target=_job, daemon=True, name="log-processor")
+    thread.start()
+    return thread
 
 # 5. 显示结果
-def show_results():
+def show_results(start_date=None, end_date=None):
+    start_date = str(start_date or datetime.now().date())
+    end_date = str(end_date or start_date)
     conn = sqlite3.connect(TARGET_DB)
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM aggregated_sessions")
+    cursor.execute('''
+        SELECT start_time, context, topic, total_duration, apps_involved
+        FROM aggregated_sessions WHERE day BETWEEN ? AND ? ORDER BY start_time
+    ''', (start_date, end_date))
     rows = cursor.fetchall()
-    
-    print("\n=== Aggregated Data (Today) with Topics ===")
+
+    print("\n=== Aggregated Data with Topics ===")
     print(f"{'Time':<20} | {'Context':<15} | {'Topic':<30} | {'Dur(m)':<6} | {'Apps'}")
     print("-" * 100)
-    for row in rows:
-        # row: id, start, context, topic, duration, apps, details_count
-        start = row[1]
-        context = row[2]
-        topic = row[3]
+    for start, context, topic, duration, apps in rows:
         # Truncate topic if too long
         if len(topic) > 28:
             topic = topic[:25] + "..."
-            
-        duration_min = round(row[4] / 60, 1)
-        apps = row[5]
+
+        duration_min = round(duration / 60, 1)
         print(f"{start:<20} | {context:<15} | {topic:<30} | {duration_min:<6} | {apps}")
-        
+
     conn.close()
 
 if __name__ == "__main__":
-    print("Step 1: Loading raw data...")
-    df = load_data()
-    if not df.empty:
-        print(f"Loaded {len(df)} raw records.")
-        
-        print("Step 2: Processing data...")
-        sessions = intelligent_merge(df)
-        
-        print("Step 3: Saving to new DB...")
-        save_to_new_db(sessions)
-        
-        print("Step 4: Displaying results...")
-        show_results()
-    else:
-        print("No data found for today.")
+    import argparse
+    parser = argparse.ArgumentParser(description="按上下文合并会话，增量写入 cleaned_data.db")
+    parser.add_argument("--days", type=int, default=None, help="最近 N 天 (默认从上次处理到的日期继续)")
+    parser.add_argument("--since", help="第一天 (YYYY-MM-DD)")
+    parser.add_argument("--until", help="最后一天 (YYYY-MM-DD，默认今天)")
+    parser.add_argument("--show", action="store_true", help="打印区间内的合并结果")
+    args = parser.parse_args()
+
+    until = args.until or str(datetime.now().date())
+    since = args.since
+    if since is None and args.days:
+        since = str(datetime.strptime(until, "%Y-%m-%d").date() - timedelta(days=args.days - 1))
+    since = since or last_processed_day() or until
+    run(since, until)
+    if args.show:
+        show_results(since, until)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+个人基线 (period_baselines)：专注时长、最长心流、切换频率、专注/碎片比的滚动 7 天 / 30 天
+均值与方差，以及对应跨度的 EWMA。每天一行状态 (窗口内的天数、和、平方和、EWMA 均值与方差)，
+由前一天的状态加上当天的值、减去滑出窗口那天的值得到，日结时只做一次 O(1) 更新。
+洞察标签、提醒与报告用“截至昨天”的基线与今天比较，不需要再扫几周的会话。
+"""
+import math
+from datetime import date, datetime, timedelta
+
+from app.data.core.database import get_period_stats_db_connection
+
+METRICS = ('total_focus', 'max_streak', 'context_switch_freq', 'focus_fragmentation_ratio')
+SPANS = (7, 30)
+# 基线至少要有这么多天的数据才用于比较，之前沿用固定阈值
+MIN_BASELINE_DAYS = 5
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def step(state, value, leaving, span):
+    """
+    单步更新 (n, total, total_sq, ewma, ewvar)：value 为当天的值，leaving 为滑出窗口那天的值 (None 表示当天没有数据)。
+    EWMA 只在有数据的日子更新，alpha = 2 / (span + 1)
+    """
+    n, total, total_sq, ewma, ewvar = state
+    if leaving is not None:
+        n, total, total_sq = n - 1, total - leaving, total_sq - leaving * leaving
+    if value is not None:
+        n, total, total_sq = n + 1, total + value, total_sq + value * value
+        if ewma is None:
+            ewma, ewvar = float(value), 0.0
+        else:
+            alpha = 2.0 / (span + 1)
+            delta = value - ewma
+            ewma += alpha * delta
+            ewvar = (1 - alpha) * (ewvar + alpha * delta * delta)
+    if n <= 0:
+        # 窗口清空时归零，顺便消除浮点累计误差
+        n, total, total_sq = 0, 0.0, 0.0
+    return n, total, total_sq, ewma, ewvar
+
+
+def describe(state):
+    """状态 -> {n, mean, std, ewma, ewstd}"""
+    n, total, total_sq, ewma, ewvar = state
+    mean = total / n if n else 0.0
+    var = max(0.0, total_sq / n - mean * mean) if n else 0.0
+    return {
+        'n': n,
+        'mean': round(mean, 4),
+        'std': round(math.sqrt(var), 4),
+        'ewma': round(ewma, 4) if ewma is not None else None,
+        'ewstd': round(math.sqrt(max(0.0, ewvar or 0.0)), 4),
+    }
+
+
+class PeriodBaselineDAO:
+    """
+    period_baselines 的维护与读取。update / norm 接收 period_stats.db 的游标
+    (或 ATTACH 后的主库游标配合 schema='period')，由调用方提交。
+    """
+
+    @staticmethod
+    def update(cursor, days, schema=None):
+        """
+        这些日期的 period_stats 写入后调用：从最早的日期起向后推进到最近有数据的一天，返回推进的天数。
+        日常只改今天，只推进一步；回填改了历史日期时，之后的状态按天依次重推。
+        """
+        days = [_to_date(d) for d in days]
+        if not days:
+            return 0
+        prefix = f"{schema}." if schema else ""
+        first_changed = min(days)
+        last = cursor.execute(f'SELECT MAX(date) FROM {prefix}period_stats').fetchone()[0]
+        if last is None:
+            return 0
+        last = max(_to_date(last), first_changed)
+
+        # 起点：最早改动日期之前最近一天的状态；没有则从最早的一条日行开始
+        prev = cursor.execute(f'SELECT MAX(date) FROM {prefix}period_baselines WHERE date < ?',
+                              (str(first_changed),)).fetchone()[0]
+        states = {(m, s): (0, 0.0, 0.0, None, 0.0) for m in METRICS for s in SPANS}
+        if prev is not None:
+            prev = _to_date(prev)
+            for r in cursor.execute(f'''
+                SELECT metric, span, n, total, total_sq, ewma, ewvar FROM {prefix}period_baselines WHERE date = ?
+            ''', (str(prev),)).fetchall():
+                states[(r['metric'], r['span'])] = (r['n'], r['total'], r['total_sq'], r['ewma'], r['ewvar'])
+            start = prev + timedelta(days=1)
+        else:
+            first = cursor.execute(f'SELECT MIN(date) FROM {prefix}period_stats').fetchone()[0]
+            start = min(_to_date(first), first_changed)
+
+        # 推进所需的日值：推进区间本身 + 往前一个最长窗口 (滑出的值)；同一天多行取最后写入的
+        values = {}
+        for r in cursor.execute(f'''
+            SELECT date, {', '.join(METRICS)} FROM {prefix}period_stats
+            WHERE date BETWEEN ? AND ? ORDER BY date, id
+        ''', (str(start - timedelta(days=max(SPANS))), str(last))).fetchall():
+            values[_to_date(r['date'])] = r
+
+        def value(day, metric):
+            r = values.get(day)
+            return None if r is None or r[metric] is None else float(r[metric])
+
+        out = []
+        day = start
+        while day <= last:
+            for (metric, span), state in states.items():
+                state = step(state, value(day, metric), value(day - timedelta(days=span), metric), span)
+                states[(metric, span)] = state
+                out.append((str(day), metric, span) + state)
+            day += timedelta(days=1)
+
+        cursor.executemany(f'''
+            INSERT OR REPLACE INTO {prefix}period_baselines (date, metric, span, n, total, total_sq, ewma, ewvar)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', out)
+        return (last - start).days + 1
+
+    @staticmethod
+    def norm(cursor, day, schema=None):
+        """
+        截至 day 前一天的个人基线：{metric: {7: {n, mean, std, ewma, ewstd}, 30: {...}}}，
+        还没有任何基线时返回 None
+        """
+        prefix = f"{schema}." if schema else ""
+        rows = cursor.execute(f'''
+            SELECT metric, span, n, total, total_sq, ewma, ewvar FROM {prefix}period_baselines
+            WHERE date = (SELECT MAX(date) FROM {prefix}period_baselines WHERE date < ?)
+        ''', (str(_to_date(day)),)).fetchall()
+        if not rows:
+            return None
+        result = {}
+        for r in rows:
+            result.setdefault(r['metric'], {})[r['span']] = describe(
+                (r['n'], r['total'], r['total_sq'], r['ewma'], r['ewvar']))
+        return result
+
+    @staticmethod
+    def get_norm(day=None):
+        """独立连接读取基线 (默认截至昨天，即与今天比较的常态)"""
+        with get_period_stats_db_connection() as conn:
+            return PeriodBaselineDAO.norm(conn.cursor(), day or date.today())
+
+    @staticmethod
+    def update_days(days):
+        """独立连接推进并提交"""
+        with get_period_stats_db_connection() as conn:
+            count = PeriodBaselineDAO.update(conn.cursor(), days)
+            conn.commit()
+        return count
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+周/月/年汇总 (period_rollups)：由 period_stats 的日行算出，写入某天时只重算它所在的
+ISO 周、自然月、自然年三行。长周期视图 (最近 12 周、今年各月) 直接读这里。
+"""
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from app.data.core.database import get_period_stats_db_connection
+
+PERIOD_TYPES = ('week', 'month', 'year')
+
+ROLLUP_COLUMNS = ('period_type', 'period_key', 'start_date', 'end_date', 'days', 'active_days',
+                  'total_focus', 'total_entertainment', 'avg_focus', 'max_streak', 'willpower_wins',
+                  'avg_efficiency', 'best_day', 'best_day_focus', 'peak_hour', 'peak_hour_hist',
+                  'avg_fragmentation', 'avg_switch_freq', 'fragmentation_trend', 'switch_freq_trend',
+                  'updated_ts')
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def period_bounds(period_type, day):
+    """day 所在周期的 (period_key, 起始日, 结束日)；周按 ISO 周 (周一开始)"""
+    day = _to_date(day)
+    if period_type == 'week':
+        iso_year, iso_week, iso_weekday = day.isocalendar()
+        start = day - timedelta(days=iso_weekday - 1)
+        return f"{iso_year}-W{iso_week:02d}", start, start + timedelta(days=6)
+    if period_type == 'month':
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return f"{day.year}-{day.month:02d}", start, end
+    if period_type == 'year':
+        return str(day.year), date(day.year, 1, 1), date(day.year, 12, 31)
+    raise ValueError(f"Unknown period type: {period_type}")
+
+
+def _slope(points):
+    """最小二乘斜率 (x 为日序号)，少于 2 个点返回 0"""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def build_rollup(period_type, period_key, start, end, rows):
+    """
+    由区间内的日行 (按日期去重后) 计算一行汇总，不读写数据库。
+    平均值只统计有专注时长的天；黄金时段分布同样只计有专注的天 (空白日的 peak_hour 没有意义)。
+    """
+    active = [r for r in rows if (r['total_focus'] or 0) > 0]
+    total_focus = sum(r['total_focus'] or 0 for r in rows)
+    best = max(rows, key=lambda r: (r['total_focus'] or 0, r['date'])) if rows else None
+
+    hist = [0] * 24
+    for r in active:
+        if r['peak_hour'] is not None and 0 <= int(r['peak_hour']) < 24:
+            hist[int(r['peak_hour'])] += 1
+    peak_hour = max(range(24), key=lambda h: (hist[h], -h)) if any(hist) else None
+
+    def avg(key):
+        return round(sum(r[key] or 0 for r in active) / len(active), 4) if active else 0.0
+
+    return {
+        'period_type': period_type,
+        'period_key': period_key,
+        'start_date': str(start),
+        'end_date': str(end),
+        'days': len(rows),
+        'active_days': len(active),
+        'total_focus': total_focus,
+        'total_entertainment': sum(r['total_entertainment'] or 0 for r in rows),
+        'avg_focus': round(total_focus / len(active), 1) if active else 0.0,
+        'max_streak': max((r['max_streak'] or 0 for r in rows), default=0),
+        'willpower_wins': sum(r['willpower_wins'] or 0 for r in rows),
+        'avg_efficiency': avg('efficiency_score'),
+        'best_day': str(best['date']) if best and (best['total_focus'] or 0) > 0 else None,
+        'best_day_focus': (best['total_focus'] or 0) if best else 0,
+        'peak_hour': peak_hour,
+        'peak_hour_hist': json.dumps(hist),
+        'avg_fragmentation': avg('focus_fragmentation_ratio'),
+        'avg_switch_freq': avg('context_switch_freq'),
+        'fragmentation_trend': round(_slope([(r['date'].toordinal(), r['focus_fragmentation_ratio'] or 0) for r in active]), 6),
+        'switch_freq_trend': round(_slope([(r['date'].toordinal(), r['context_switch_freq'] or 0) for r in active]), 6),
+        'updated_ts': time.time(),
+    }
+
+
+class PeriodRollupDAO:
+    """
+    period_rollups 的维护与读取。
+    refresh / rebuild 接收 period_stats.db 的游标 (或 ATTACH 后的主库游标配合 schema='period')，由调用方提交。
+    """
+
+    @staticmethod
+    def _read_days(cursor, start, end, schema=None):
+        """读取区间内的日行，同一天有多行时取最后写入的一行"""
+        prefix = f"{schema}." if schema else ""
+        rows = cursor.execute(f'''
+            SELECT date, total_focus, total_entertainment, max_streak, willpower_wins, peak_hour,
+                   efficiency_score, focus_fragmentation_ratio, context_switch_freq
+            FROM {prefix}period_stats
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, id
+        ''', (str(start), str(end))).fetchall()
+        by_day = {}
+        for r in rows:
+            r = dict(r)
+            r['date'] = _to_date(r['date'])
+            by_day[r['date']] = r
+        return [by_day[d] for d in sorted(by_day)]
+
+    @staticmethod
+    def refresh(cursor, days, schema=None):
+        """
+        某些日期的 period_stats 写入后调用：重算它们所在的周/月/年，返回重算的周期数。
+        一次读出覆盖所有受影响周期的日行 (最多一年多)，再按周期切分。
+        """
+        periods = {}
+        for d in days:
+            for period_type in PERIOD_TYPES:
+                key, start, end = period_bounds(period_type, d)
+                periods[(period_type, key)] = (start, end)
+        if not periods:
+            return 0
+
+        prefix = f"{schema}." if schema else ""
+        rows = PeriodRollupDAO._read_days(cursor, min(s for s, _ in periods.values()),
+                                          max(e for _, e in periods.values()), schema)
+        upserts, removed = [], []
+        for (period_type, key), (start, end) in periods.items():
+            period_rows = [r for r in rows if start <= r['date'] <= end]
+            if period_rows:
+                rollup = build_rollup(period_type, key, start, end, period_rows)
+                upserts.append(tuple(rollup[c] for c in ROLLUP_COLUMNS))
+            else:
+                removed.append((period_type, key))
+        if upserts:
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO {prefix}period_rollups ({', '.join(ROLLUP_COLUMNS)})
+                VALUES ({', '.join('?' * len(ROLLUP_COLUMNS))})
+            ''', upserts)
+        if removed:
+            cursor.executemany(f'DELETE FROM {prefix}period_rollups WHERE period_type = ? AND period_key = ?', removed)
+        return len(periods)
+
+    @staticmethod
+    def rebuild(cursor, schema=None):
+        """按 period_stats 的全部日期重建汇总 (首次升级或手动修复)"""
+        prefix = f"{schema}." if schema else ""
+        cursor.execute(f'DELETE FROM {prefix}period_rollups')
+        days = [r[0] for r in cursor.execute(f'SELECT DISTINCT date FROM {prefix}period_stats WHERE date IS NOT NULL').fetchall()]
+        # 每年单独刷新，避免一次把多年的日行都读进内存
+        by_year = {}
+        for d in days:
+            by_year.setdefault(_to_date(d).year, []).append(d)
+        count = sum(PeriodRollupDAO.refresh(cursor, year_days, schema) for year_days in by_year.values())
+        print(f"[PeriodRollup] Rebuilt {count} rollups from {len(days)} days")
+        return count
+
+    @staticmethod
+    def refresh_days(days):
+        """独立连接重算并提交 (period_stats 由别处写入后调用)"""
+        with get_period_stats_db_connection() as conn:
+            count = PeriodRollupDAO.refresh(conn.cursor(), days)
+            conn.commit()
+        return count
+
+    @staticmethod
+    def get_recent(period_type='week', count=12, today=None):
+        """
+        截至 today 所在周期的最近 count 个周期 (按时间升序)，没有数据的周期补一行空汇总，
+        方便直接画趋势图。例：get_recent('week', 12) / get_recent('year', 1)
+        """
+        if period_type not in PERIOD_TYPES:
+            raise ValueError(f"Unknown period type: {period_type}")
+        periods = []
+        day = _to_date(today or date.today())
+        for _ in range(max(1, int(count))):
+            key, start, end = period_bounds(period_type, day)
+            periods.append((key, start, end))
+            day = start - timedelta(days=1)
+        periods.reverse()
+
+        with get_period_stats_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {', '.join(ROLLUP_COLUMNS)} FROM period_rollups
+                WHERE period_type = ? AND period_key BETWEEN ? AND ?
+            ''', (period_type, periods[0][0], periods[-1][0])).fetchall()
+        stored = {r['period_key']: dict(r) for r in rows}
+
+        results = []
+        for key, start, end in periods:
+            r = stored.get(key) or build_rollup(period_type, key, start, end, [])
+            r = dict(r, start_date=str(r['start_date']), end_date=str(r['end_date']),
+                     best_day=str(r['best_day']) if r['best_day'] else None)
+            r['peak_hour_hist'] = json.loads(r['peak_hour_hist'] or '[]')
+            r.pop('updated_ts', None)
+            results.append(r)
+        return results
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+长周期 (周/月/年) 区间分析：一次查询把区间内的会话读成列式数组
+(开始时间戳、时长、状态编码、应用编号)，按天缓存，只重新读取变化的日期。
+按天的总时长、最长心流、意志力胜利、小时分布、Top 应用等全部用数组运算得出，不做逐行 Python 循环。
+各指标的定义与 SessionMetrics 保持一致 (单日实时统计仍用 SessionMetrics，测试逐天核对两者)。
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from app.data.core.database import get_db_connection
+from app.data.dao.session_metrics import (
+    STREAK_GAP_SECONDS, WILLPOWER_FOCUS_SECONDS, MIN_ACTIVE_HOURS, efficiency_score,
+)
+
+# 状态编码
+NEUTRAL, FOCUS, ENTERTAINMENT, DISTRACTION = 0, 1, 2, 3
+STATUS_CODES = {'work': FOCUS, 'focus': FOCUS, 'entertainment': ENTERTAINMENT, 'other': DISTRACTION, 'unknown': DISTRACTION}
+
+CACHE_DAYS = 400
+
+_STATUS_SQL = ("CASE lower(status) " + " ".join(f"WHEN '{k}' THEN {v}" for k, v in STATUS_CODES.items())
+               + f" ELSE {NEUTRAL} END")
+
+# 按天缓存的列：date -> (指纹, start, duration, status, app, title)；
+# 指纹 (条数, 最大 id, 总时长, id 与状态的加权和) 由一次 GROUP BY 在 SQLite 中算出，
+# 新增、删除、改时长或重分类都会改变指纹，只重新读取这些日期
+_day_columns = OrderedDict()
+# 进程名与窗口标题共用一张字符串表，缓存的列里只存编号
+_strings = []
+_string_ids = {}
+_cache_lock = threading.Lock()
+
+
+def _intern(value):
+    value = value or ''
+    code = _string_ids.get(value)
+    if code is None:
+        code = _string_ids[value] = len(_strings)
+        _strings.append(value)
+    return code
+
+
+def _to_columns(rows):
+    """rows: (秒级时间戳, 时长, 状态编码, 进程名, 窗口标题)，时间戳为 None 的行 (格式异常) 丢弃"""
+    rows = [r for r in rows if r[0] is not None]
+    columns = list(zip(*rows)) or [()] * 5
+
+    def encode(values):
+        # 先在本批内去重，再把去重后的字符串映射到全局编号
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna(''))
+        mapping = np.array([_intern(u) for u in uniques], dtype=np.int32)
+        return mapping[codes] if len(codes) else np.zeros(0, dtype=np.int32)
+
+    return (
+        np.array(columns[0], dtype=np.int64),
+        np.array(columns[1], dtype=np.int64),
+        np.array(columns[2], dtype=np.int8),
+        encode(columns[3]),
+        encode(columns[4]),
+    )
+
+
+def _day_range(start_date, end_date):
+    d = datetime.strptime(str(start_date), "%Y-%m-%d")
+    end = datetime.strptime(str(end_date), "%Y-%m-%d")
+    while d <= end:
+        yield d.strftime("%Y-%m-%d")
+        d += timedelta(days=1)
+
+
+def _day_runs(days):
+    """把排好序的日期合并成连续区间 [(first, last), ...]"""
+    runs = []
+    for day in days:
+        prev = (datetime.strptime(day, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+        if runs and runs[-1][1] == prev:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+class SessionFrame:
+    """区间内会话的列式视图，按 (start_time, id) 排序"""
+
+    def __init__(self, start_date, end_date, start, duration, status, app, apps, title, titles):
+        self.start_date = str(start_date)
+        self.end_date = str(end_date)
+        self.start = start          # int64 本地时间的秒级时间戳
+        self.duration = duration    # int64
+        self.status = status        # int8 状态编码
+        self.app = app              # int32，apps[i] 为进程名
+        self.apps = apps
+        self.title = title          # int32，titles[i] 为窗口标题
+        self.titles = titles
+        first_day = datetime.strptime(self.start_date, "%Y-%m-%d")
+        self.n_days = (datetime.strptime(self.end_date, "%Y-%m-%d") - first_day).days + 1
+        self.dates = [(first_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(max(0, self.n_days))]
+        self.day = (self.start // 86400 - int(np.datetime64(self.start_date, 's').astype(np.int64)) // 86400).astype(np.int64)
+        self.is_focus = self.status == FOCUS
+        self.is_distraction = self.status >= ENTERTAINMENT
+        self._memo_cache = {}
+
+    @classmethod
+    def load(cls, start_date, end_date):
+        """读取整个区间：未变化的日期直接复用缓存的列，只重新读取指纹变化的日期"""
+        start_ts, end_ts = f"{start_date} 00:00:00", f"{end_date} 23:59:59"
+        with _cache_lock, get_db_connection() as conn:
+            conn.row_factory = None
+            fingerprints = {str(r[0]): tuple(r[1:]) for r in conn.execute(f'''
+                SELECT substr(start_time, 1, 10) AS day, COUNT(*), MAX(id), TOTAL(duration), TOTAL(id * ({_STATUS_SQL}))
+                FROM window_sessions
+                WHERE start_time BETWEEN ? AND ?
+                GROUP BY day
+            ''', (start_ts, end_ts))}
+            dirty = sorted(d for d, fp in fingerprints.items()
+                           if d not in _day_columns or _day_columns[d][0] != fp)
+            # 相邻的脏日期合并成一次区间查询 (冷启动时就是整个区间一次查询)
+            for first, last in _day_runs(dirty):
+                rows = conn.execute(f'''
+                    SELECT CAST(strftime('%s', start_time) AS INTEGER),
+                           COALESCE(duration, 0), {_STATUS_SQL}, process_name, window_title
+                    FROM window_sessions
+                    WHERE start_time BETWEEN ? AND ?
+                    ORDER BY start_time ASC, id ASC
+                ''', (f"{first} 00:00:00", f"{last} 23:59:59")).fetchall()
+                columns = _to_columns(rows)
+                # 行已按时间排序，按日期 (时间戳 // 86400) 切分成每天一段
+                days = columns[0] // 86400
+                bounds = np.flatnonzero(days[1:] != days[:-1]) + 1
+                chunks = {str(np.datetime64(int(days[lo]), 'D')): (lo, hi)
+                          for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(days)]) if hi > lo}
+                for day in _day_range(first, last):
+                    if day in fingerprints:
+                        lo, hi = chunks.get(day, (0, 0))
+                        _day_columns[day] = (fingerprints[day],) + tuple(c[lo:hi] for c in columns)
+                        _day_columns.move_to_end(day)
+            days = [d for d in _day_range(start_date, end_date) if d in fingerprints]
+            parts = [_day_columns[d][1:] for d in days]
+            for d in days:
+                _day_columns.move_to_end(d)
+            while len(_day_columns) > CACHE_DAYS:
+                _day_columns.popitem(last=False)
+        columns = [np.concatenate([p[i] for p in parts]) if parts else np.zeros(0, dtype=dt)
+                   for i, dt in enumerate((np.int64, np.int64, np.int8, np.int32, np.int32))]
+        return cls(start_date, end_date, columns[0], columns[1], columns[2], columns[3], _strings, columns[4], _strings)
+
+    def __len__(self):
+        return len(self.start)
+
+    # ---------- 按天聚合 ----------
+    # 帧内的列不再变化，按天结果各算一次后缓存在实例上，max_streaks / willpower_wins / daily_metrics 共用
+
+    def _memo(self, key, compute):
+        if key not in self._memo_cache:
+            self._memo_cache[key] = compute()
+        return self._memo_cache[key]
+
+    def _per_day(self, mask=None, weights=None):
+        day = self.day if mask is None else self.day[mask]
+        if weights is not None and mask is not None:
+            weights = weights[mask]
+        return np.bincount(day, weights=weights, minlength=self.n_days)[:self.n_days]
+
+    def max_streaks(self):
+        """每天的最长心流：专注会话按「与上一条专注会话结束的间隔 < 2 分钟」分组 (cumsum)，组内时长求和后取每天最大"""
+        return self._memo('max_streaks', self._max_streaks)
+
+    def _max_streaks(self):
+        idx = np.flatnonzero(self.is_focus)
+        out = np.zeros(self.n_days, dtype=np.int64)
+        if not len(idx):
+            return out
+        start, dur, day = self.start[idx], self.duration[idx], self.day[idx]
+        gap = start[1:] - (start[:-1] + dur[:-1])
+        new_group = np.concatenate(([True], (gap >= STREAK_GAP_SECONDS) | (np.diff(day) != 0)))
+        group = np.cumsum(new_group) - 1
+        streak = np.bincount(group, weights=dur).astype(np.int64)
+        np.maximum.at(out, day[new_group], streak)
+        return out
+
+    def willpower_wins(self):
+        """
+        每天的意志力胜利次数，与 SessionMetrics 的状态机等价：
+        忽略中性会话后，专注会话 i 计一次胜利 <=> 前一条是 <5min 的走神、再前一条是专注，
+        且那段连续专注中至少有一条 >5min (同一天内)
+        """
+        return self._memo('willpower_wins', self._willpower_wins)
+
+    def _willpower_wins(self):
+        idx = np.flatnonzero(self.is_focus | self.is_distraction)
+        out = np.zeros(self.n_days, dtype=np.int64)
+        if len(idx) < 3:
+            return out
+        focus, dur, day = self.is_focus[idx], self.duration[idx], self.day[idx]
+        run_start = np.concatenate(([True], (np.diff(focus.astype(np.int8)) != 0) | (np.diff(day) != 0)))
+        run = np.cumsum(run_start) - 1
+        run_has_long = np.bincount(run, weights=(focus & (dur > WILLPOWER_FOCUS_SECONDS))) > 0
+        win = (focus[2:] & ~focus[1:-1] & (dur[1:-1] < WILLPOWER_FOCUS_SECONDS) & focus[:-2]
+               & (day[2:] == day[:-2]) & run_has_long[run[:-2]])
+        np.add.at(out, day[2:][win], 1)
+        return out
+
+    def hour_histogram(self, by_day=False):
+        """专注时长的小时分布：by_day=True 返回 (天数, 24)，否则为整个区间的 24 维数组"""
+        hist = self._memo('hour_histogram', self._hour_histogram)
+        return hist if by_day else hist.sum(axis=0)
+
+    def _hour_histogram(self):
+        hour = (self.start % 86400) // 3600
+        key = self.day * 24 + hour
+        return np.bincount(key[self.is_focus], weights=self.duration[self.is_focus],
+                           minlength=self.n_days * 24)[:self.n_days * 24].reshape(self.n_days, 24)
+
+    def peak_hours(self):
+        """每天专注时长最多的小时 (时长并列时取较早的小时)"""
+        hour = (self.start % 86400) // 3600
+        key = (self.day * 24 + hour)[self.is_focus]
+        counts = np.bincount(key, minlength=self.n_days * 24)[:self.n_days * 24].reshape(self.n_days, 24)
+        hist = self.hour_histogram(by_day=True)
+        # 只有时长为 0 的专注会话时，取最早出现的小时
+        return np.argmax(np.where(counts > 0, hist + 1, 0), axis=1)
+
+    def daily_metrics(self) -> pd.DataFrame:
+        """按天的全部指标 (列名与 SessionMetrics.snapshot 一致)，索引为日期字符串"""
+        return self._memo('daily_metrics', self._daily_metrics).copy()
+
+    def _daily_metrics(self):
+        focus = self._per_day(self.is_focus, self.duration).astype(np.int64)
+        focus_n = self._per_day(self.is_focus)
+        ent = self._per_day(self.status == ENTERTAINMENT, self.duration).astype(np.int64)
+        distraction = self._per_day(self.is_distraction, self.duration)
+        distraction_n = self._per_day(self.is_distraction)
+        sessions = self._per_day().astype(np.int64)
+        wins = self.willpower_wins()
+
+        first = np.zeros(self.n_days, dtype=np.int64)
+        last = np.zeros(self.n_days, dtype=np.int64)
+        if len(self):
+            days, first_idx = np.unique(self.day, return_index=True)
+            last_idx = len(self.day) - 1 - np.unique(self.day[::-1], return_index=True)[1]
+            first[days] = self.start[first_idx]
+            last[days] = self.start[last_idx]
+
+        # 比值与取整按天计算 (每天一次，与 SessionMetrics 的舍入结果逐位一致)
+        frag, switch = [], []
+        for i in range(self.n_days):
+            avg_f = focus[i] / focus_n[i] if focus_n[i] else 0
+            avg_d = distraction[i] / distraction_n[i] if distraction_n[i] else 0
+            frag.append(round(avg_f / avg_d, 2) if avg_d > 0 else (10.0 if avg_f > 0 else 0.0))
+            active_hours = (last[i] - first[i]) / 3600
+            switch.append(round(int(sessions[i]) / active_hours, 1) if sessions[i] and active_hours > MIN_ACTIVE_HOURS else 0.0)
+
+        df = pd.DataFrame({
+            'sessions': sessions,
+            'total_focus': focus,
+            'total_entertainment': ent,
+            'max_streak': self.max_streaks(),
+            'willpower_wins': wins,
+            'peak_hour': self.peak_hours(),
+            'focus_fragmentation_ratio': frag,
+            'context_switch_freq': switch,
+        }, index=pd.Index(self.dates, name='date'))
+        df['efficiency_score'] = [efficiency_score(int(f), int(w)) for f, w in zip(focus, wins)]
+        return df
+
+    # ---------- Top-N ----------
+
+    def top_apps(self, limit=3):
+        """区间内专注时长最多的应用"""
+        totals = np.bincount(self.app[self.is_focus], weights=self.duration[self.is_focus], minlength=len(self.apps))
+        order = np.argsort(-totals, kind='stable')
+        return [{"app": self.apps[i], "duration": int(totals[i])} for i in order[:limit] if totals[i] > 0]
+
+    def top_titles_by_day(self):
+        """每天专注时长最多的窗口标题 {date: title}"""
+        if not self.is_focus.any():
+            return {}
+        df = pd.DataFrame({'day': self.day[self.is_focus], 'title': self.title[self.is_focus],
+                           'duration': self.duration[self.is_focus]})
+        totals = df.groupby(['day', 'title'], sort=False)['duration'].sum().reset_index()
+        best = totals.loc[totals.groupby('day')['duration'].idxmax()]
+        return {self.dates[d]: self.titles[t] for d, t in zip(best['day'], best['title'])}
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import time
+
+from app.data.core.database import get_db_connection
+from app.data.dao.core_event_aggregates import CoreEventAggregateDAO
+from app.data.dao.core_events_extractor import write_core_events
+from app.data.dao.session_metrics import SessionMetrics
+from app.data.dao.stats_calculator import build_period_row, write_period_stats
+
+FOCUS_STATUSES = ('work', 'focus')
+
+
+def day_deltas(changes):
+    """按日期汇总 (专注, 娱乐) 时长的变化量"""
+    deltas = {}
+    for c in changes:
+        d = deltas.setdefault(c['day'], [0, 0])
+        for status, sign in ((c['old_status'], -1), (c['new_status'], 1)):
+            if status in FOCUS_STATUSES:
+                d[0] += sign * c['duration']
+            elif status == 'entertainment':
+                d[1] += sign * c['duration']
+    return deltas
+
+
+class ReclassifyDAO:
+    """规则重分类的数据访问对象 (会话匹配、差值回写、撤销日志 reclassify_runs / reclassify_journal)"""
+
+    @staticmethod
+    def find_changes(conn, match_rule, start_day=None, end_day=None):
+        """
+        一次扫描找出需要改标签的会话。
+        match_rule(process_name, window_title, status) -> 命中的规则序号或 None，注册为 SQL 函数在扫描中求值；
+        有日期范围时走 start_time 索引。返回 [{id, day, duration, old_status, rule, window_title, process_name}]
+        """
+        conn.create_function('match_rule', 3, match_rule, deterministic=True)
+        where, params = [], []
+        if start_day:
+            where.append('start_time >= ?')
+            params.append(f"{start_day} 00:00:00")
+        if end_day:
+            where.append('start_time <= ?')
+            params.append(f"{end_day} 23:59:59")
+        rows = conn.execute(f'''
+            SELECT * FROM (
+                SELECT id, substr(start_time, 1, 10) AS day, COALESCE(duration, 0) AS duration,
+                       status AS old_status, window_title, process_name,
+                       match_rule(process_name, window_title, status) AS rule
+                FROM window_sessions
+                {'WHERE ' + ' AND '.join(where) if where else ''}
+            ) WHERE rule IS NOT NULL
+            ORDER BY id
+        ''', params).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def find_interval_sessions(conn, window_title, process_name, start_time, end_time, status):
+        """
+        某个账本区间落成的会话 (同窗口、时间重叠、仍是 status；跨午夜时为两条)，
+        返回与 find_changes 相同结构的行 (不含 rule)
+        """
+        rows = conn.execute('''
+            SELECT id, substr(start_time, 1, 10) AS day, COALESCE(duration, 0) AS duration,
+                   status AS old_status, window_title, process_name
+            FROM window_sessions
+            WHERE start_time <= ? AND end_time >= ?
+              AND window_title IS ? AND process_name IS ? AND status IS ?
+            ORDER BY id
+        ''', (end_time, start_time, window_title, process_name, status)).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def apply_changes(conn, changes):
+        """
+        在调用方的事务中回写标签，并把变化同步到各派生表：
+        daily_stats 的专注、娱乐总时长按差值修正；core_events (Top-N 排名无法按差值推导) 只对受影响的日期重新计算；
+        状态变化还会改变最长心流、意志力胜利、碎片比、切换频率与洞察，这些按受影响日期的会话重算
+        (daily_stats 的最长心流 / 意志力胜利，period_stats 整行及所在的周/月/年汇总与个人基线)。
+        changes: [{id, day, duration, old_status, new_status}]，返回受影响的日期列表
+        """
+        conn.executemany(
+            'UPDATE window_sessions SET status = ? WHERE id = ? AND status IS ?',
+            [(c['new_status'], c['id'], c['old_status']) for c in changes]
+        )
+        deltas = day_deltas(changes)
+        for day, (focus_delta, ent_delta) in deltas.items():
+            if not (focus_delta or ent_delta):
+                continue
+            conn.execute('''
+                UPDATE daily_stats
+                SET total_focus_time = MAX(0, total_focus_time + ?),
+                    total_entertainment_time = MAX(0, total_entertainment_time + ?)
+                WHERE date = ?
+            ''', (focus_delta, ent_delta, day))
+            conn.execute('''
+                UPDATE daily_stats
+                SET efficiency_score = CASE
+                    WHEN (total_focus_time + total_entertainment_time) > 0
+                    THEN (total_focus_time * 100 / (total_focus_time + total_entertainment_time))
+                    ELSE 0 END
+                WHERE date = ?
+            ''', (day,))
+
+        cursor = conn.cursor()
+        # 核心事件累计表按会话差值同步；只改写已经提取过核心事件的日期 (其余日期由日常的 extract_core_events 负责)
+        days = [d for d, (f, e) in deltas.items() if f or e]
+        if days:
+            core_days = {str(r[0]) for r in conn.execute(
+                f"SELECT DISTINCT date FROM core.core_events WHERE date IN ({','.join('?' * len(days))})", days
+            ).fetchall()}
+            for day in days:
+                CoreEventAggregateDAO.sync_day(conn, day)
+                if day in core_days:
+                    write_core_events(cursor, day, CoreEventAggregateDAO.top_events(conn, day), table='core.core_events')
+
+        # 会话类指标按天重算 (核心事件已更新，日摘要随之刷新)；period_stats 行由 write_period_stats 整行替换，
+        # 并重算所在的周/月/年汇总与之后的个人基线
+        rows = [ReclassifyDAO._rebuild_day(conn, day) for day in sorted(deltas)]
+        write_period_stats(cursor, [r for r in rows if r is not None], schema='period')
+        return sorted(deltas)
+
+    @staticmethod
+    def _rebuild_day(conn, day):
+        """
+        按当天会话重算 SessionMetrics (与 calculate_period_stats 同一口径)，回写 daily_stats 的最长心流与意志力胜利；
+        当天已有 period_stats 行时返回重建的行 (没有的日期不补建，由日常的 calculate_period_stats 负责)
+        """
+        metrics = SessionMetrics().extend(conn.execute('''
+            SELECT start_time, duration, status FROM window_sessions
+            WHERE start_time BETWEEN ? AND ?
+            ORDER BY start_time ASC, id ASC
+        ''', (f"{day} 00:00:00", f"{day} 23:59:59")).fetchall())
+        conn.execute(
+            'UPDATE daily_stats SET max_focus_streak = ?, willpower_wins = ? WHERE date = ?',
+            (metrics.max_streak, metrics.willpower_wins, day)
+        )
+        if conn.execute('SELECT 1 FROM period.period_stats WHERE date = ?', (day,)).fetchone() is None:
+            return None
+        # 总专注时长与 calculate_period_stats 一致：优先 daily_stats (已按差值修正)
+        daily = conn.execute('SELECT total_focus_time FROM daily_stats WHERE date = ?', (day,)).fetchone()
+        total_focus = daily[0] if daily else metrics.focus_seconds
+        events = conn.execute('''
+            SELECT app_name, clean_title, total_duration, category FROM core.core_events
+            WHERE date = ? AND category IN ('focus', 'entertainment')
+            ORDER BY rank ASC
+        ''', (day,)).fetchall()
+        focus_events = [e for e in events if e['category'] == 'focus'][:3]
+        ent_events = [e for e in events if e['category'] == 'entertainment'][:2]
+        return build_period_row(day, metrics.snapshot(), total_focus, focus_events, ent_events)
+
+    # ---------- 撤销日志 ----------
+
+    @staticmethod
+    def record_run(conn, run_id, rules_json, changes):
+        conn.execute(
+            'INSERT INTO reclassify_runs (run_id, created_ts, rules, sessions, duration) VALUES (?, ?, ?, ?, ?)',
+            (run_id, time.time(), rules_json, len(changes), sum(c['duration'] for c in changes))
+        )
+        conn.executemany(
+            '''INSERT INTO reclassify_journal (run_id, session_id, day, duration, old_status, new_status)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            [(run_id, c['id'], c['day'], c['duration'], c['old_status'], c['new_status']) for c in changes]
+        )
+
+    @staticmethod
+    def get_undo_changes(conn, run_id):
+        """撤销某次执行需要的反向变更 (只还原之后没有再被改动过的会话)"""
+        rows = conn.execute('''
+            SELECT j.session_id AS id, j.day, j.duration, j.new_status AS old_status, j.old_status AS new_status
+            FROM reclassify_journal j
+            JOIN window_sessions s ON s.id = j.session_id AND s.status IS j.new_status
+            WHERE j.run_id = ?
+            ORDER BY j.session_id
+        ''', (run_id,)).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def mark_undone(conn, run_id):
+        conn.execute('UPDATE reclassify_runs SET undone_ts = ? WHERE run_id = ?', (time.time(), run_id))
+
+    @staticmethod
+    def get_run(run_id):
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT * FROM reclassify_runs WHERE run_id = ?', (run_id,)).fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    @staticmethod
+    def list_runs(limit=20):
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT run_id, created_ts, sessions, duration, undone_ts FROM reclassify_runs '
+                'ORDER BY created_ts DESC LIMIT ?', (limit,)
+            ).fetchall()
+            return [dict(r) for r in rows]
+
+    @staticmethod
+    def get_day_totals(conn, days):
+        """daily_stats 中的 (专注, 娱乐) 总时长，用于预览报告"""
+        if not days:
+            return {}
+        rows = conn.execute(
+            f"SELECT date, total_focus_time, total_entertainment_time FROM daily_stats "
+            f"WHERE date IN ({','.join('?' * len(days))})", list(days)
+        ).fetchall()
+        return {str(r['date']): (r['total_focus_time'] or 0, r['total_entertainment_time'] or 0) for r in rows}
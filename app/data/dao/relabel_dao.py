@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import time
+
+from app.data.core.database import get_db_connection
+
+
+class RelabelDAO:
+    """历史重分类任务数据访问对象 (relabel_jobs / relabel_keys / relabel_changes / relabel_days)"""
+
+    # ---------- 任务 ----------
+
+    @staticmethod
+    def create_job(job_id: str, model: str, prompt_version: str):
+        now = time.time()
+        with get_db_connection() as conn:
+            max_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM window_sessions').fetchone()[0]
+            conn.execute(
+                '''INSERT INTO relabel_jobs (job_id, model, prompt_version, phase, max_session_id, created_ts, updated_ts)
+                   VALUES (?, ?, ?, 'scan', ?, ?, ?)''',
+                (job_id, model, prompt_version, max_id, now, now)
+            )
+            conn.commit()
+
+    @staticmethod
+    def get_job(job_id: str):
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT * FROM relabel_jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    @staticmethod
+    def latest_job(unfinished_only: bool = False):
+        sql = 'SELECT * FROM relabel_jobs'
+        if unfinished_only:
+            sql += " WHERE phase != 'done'"
+        with get_db_connection() as conn:
+            row = conn.execute(sql + ' ORDER BY created_ts DESC LIMIT 1').fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    @staticmethod
+    def set_phase(job_id: str, phase: str):
+        with get_db_connection() as conn:
+            conn.execute(
+                'UPDATE relabel_jobs SET phase = ?, updated_ts = ? WHERE job_id = ?',
+                (phase, time.time(), job_id)
+            )
+            conn.commit()
+
+    # ---------- 扫描 ----------
+
+    @staticmethod
+    def get_sessions_after(after_id: int, upto_id: int, limit: int):
+        """按 id 顺序分页读取会话 (只取分类需要的字段)"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT id, start_time, window_title, process_name, status, duration
+                   FROM window_sessions WHERE id > ? AND id <= ? ORDER BY id ASC LIMIT ?''',
+                (after_id, upto_id, limit)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def add_keys(job_id: str, keys: dict, scanned_upto: int):
+        """
+        累加一批扫描结果并推进扫描检查点 (同一事务，中断后不会重复累加)
+        keys: {(process_key, title_key): {sample_title, sample_process, sample_duration, total_duration, session_count}}
+        """
+        with get_db_connection() as conn:
+            conn.executemany(
+                '''INSERT INTO relabel_keys (job_id, process_key, title_key, sample_title, sample_process,
+                                             sample_duration, total_duration, session_count)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (job_id, process_key, title_key) DO UPDATE SET
+                       sample_title = CASE WHEN excluded.sample_duration > sample_duration
+                                           THEN excluded.sample_title ELSE sample_title END,
+                       sample_process = CASE WHEN excluded.sample_duration > sample_duration
+                                             THEN excluded.sample_process ELSE sample_process END,
+                       sample_duration = MAX(sample_duration, excluded.sample_duration),
+                       total_duration = total_duration + excluded.total_duration,
+                       session_count = session_count + excluded.session_count''',
+                [(job_id, pk, tk, v['sample_title'], v['sample_process'], v['sample_duration'],
+                  v['total_duration'], v['session_count']) for (pk, tk), v in keys.items()]
+            )
+            conn.execute(
+                'UPDATE relabel_jobs SET scanned_upto = ?, updated_ts = ? WHERE job_id = ?',
+                (scanned_upto, time.time(), job_id)
+            )
+            conn.commit()
+
+    # ---------- 分类 ----------
+
+    @staticmethod
+    def get_pending_keys(job_id: str, limit: int):
+        """待分类的键，时长大的优先 (中途停下时最有价值的部分已经完成)"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT process_key, title_key, sample_title, sample_process, attempts
+                   FROM relabel_keys WHERE job_id = ? AND state = 'pending'
+                   ORDER BY total_duration DESC LIMIT ?''',
+                (job_id, limit)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def save_labels(job_id: str, labels):
+        """labels: [(process_key, title_key, status, summary, confidence)]"""
+        with get_db_connection() as conn:
+            conn.executemany(
+                '''UPDATE relabel_keys SET status = ?, summary = ?, confidence = ?, state = 'done'
+                   WHERE job_id = ? AND process_key = ? AND title_key = ?''',
+                [(status, summary, confidence, job_id, pk, tk) for pk, tk, status, summary, confidence in labels]
+            )
+            conn.execute('UPDATE relabel_jobs SET updated_ts = ? WHERE job_id = ?', (time.time(), job_id))
+            conn.commit()
+
+    @staticmethod
+    def record_failures(job_id: str, keys, max_attempts: int):
+        """记录失败次数，达到上限的键标记为 failed (保留原标签)"""
+        with get_db_connection() as conn:
+            conn.executemany(
+                '''UPDATE relabel_keys
+                   SET attempts = attempts + 1,
+                       state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE state END
+                   WHERE job_id = ? AND process_key = ? AND title_key = ?''',
+                [(max_attempts, job_id, pk, tk) for pk, tk in keys]
+            )
+            conn.commit()
+
+    @staticmethod
+    def get_labels(job_id: str, min_confidence: float = 0.0):
+        """已完成分类的键 -> 新状态"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                '''SELECT process_key, title_key, status FROM relabel_keys
+                   WHERE job_id = ? AND state = 'done' AND confidence >= ?''',
+                (job_id, min_confidence)
+            ).fetchall()
+            return {(r['process_key'], r['title_key']): r['status'] for r in rows}
+
+    # ---------- 回写 ----------
+
+    @staticmethod
+    def apply_changes(job_id: str, changes, applied_upto: int):
+        """
+        回写一批标签变更，并在同一事务里：
+        记录变更、登记受影响日期、按差值修正 daily_stats、推进回写检查点。
+        changes: [{id, day, duration, old_status, new_status}]
+        """
+        focus = ('work', 'focus')
+        with get_db_connection() as conn:
+            deltas = {}
+            applied = 0
+            for c in changes:
+                # 只改仍是旧标签的会话 (期间被手动修改过的保持不动)
+                cur = conn.execute(
+                    'UPDATE window_sessions SET status = ? WHERE id = ? AND status IS ?',
+                    (c['new_status'], c['id'], c['old_status'])
+                )
+                if not cur.rowcount:
+                    continue
+                applied += 1
+                d = deltas.setdefault(c['day'], [0, 0])
+                conn.execute(
+                    '''INSERT OR IGNORE INTO relabel_changes (job_id, session_id, day, duration, old_status, new_status)
+                       VALUES (?, ?, ?, ?, ?, ?)''',
+                    (job_id, c['id'], c['day'], c['duration'], c['old_status'], c['new_status'])
+                )
+                for status, sign in ((c['old_status'], -1), (c['new_status'], 1)):
+                    if status in focus:
+                        d[0] += sign * c['duration']
+                    elif status == 'entertainment':
+                        d[1] += sign * c['duration']
+            for day, (focus_delta, ent_delta) in deltas.items():
+                conn.execute('INSERT OR IGNORE INTO relabel_days (job_id, day) VALUES (?, ?)', (job_id, day))
+                if focus_delta or ent_delta:
+                    # 没有 daily_stats 记录的日期不补建，period_stats 重算时会从会话表计算
+                    conn.execute('''
+                        UPDATE daily_stats
+                        SET total_focus_time = MAX(0, total_focus_time + ?),
+                            total_entertainment_time = MAX(0, total_entertainment_time + ?)
+                        WHERE date = ?
+                    ''', (focus_delta, ent_delta, day))
+                    conn.execute('''
+                        UPDATE daily_stats
+                        SET efficiency_score = CASE
+                            WHEN (total_focus_time + total_entertainment_time) > 0
+                            THEN (total_focus_time * 100 / (total_focus_time + total_entertainment_time))
+                            ELSE 0 END
+                        WHERE date = ?
+                    ''', (day,))
+            conn.execute(
+                '''UPDATE relabel_jobs SET applied_upto = ?, changed_sessions = changed_sessions + ?, updated_ts = ?
+                   WHERE job_id = ?''',
+                (applied_upto, applied, time.time(), job_id)
+            )
+            conn.commit()
+            return applied
+
+    @staticmethod
+    def get_dirty_days(job_id: str):
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT day FROM relabel_days WHERE job_id = ? AND rebuilt = 0 ORDER BY day', (job_id,)
+            ).fetchall()
+            return [r['day'] for r in rows]
+
+    @staticmethod
+    def mark_day_rebuilt(job_id: str, day: str):
+        with get_db_connection() as conn:
+            conn.execute('UPDATE relabel_days SET rebuilt = 1 WHERE job_id = ? AND day = ?', (job_id, day))
+            conn.commit()
+
+    # ---------- 进度 ----------
+
+    @staticmethod
+    def summary(job_id: str) -> dict:
+        with get_db_connection() as conn:
+            states = {r['state']: r['n'] for r in conn.execute(
+                'SELECT state, COUNT(*) AS n FROM relabel_keys WHERE job_id = ? GROUP BY state', (job_id,)
+            ).fetchall()}
+            transitions = [dict(r) for r in conn.execute(
+                '''SELECT old_status, new_status, COUNT(*) AS sessions, SUM(duration) AS duration
+                   FROM relabel_changes WHERE job_id = ? GROUP BY old_status, new_status
+                   ORDER BY duration DESC''', (job_id,)
+            ).fetchall()]
+        return {"keys": states, "transitions": transitions}
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+会话指标引擎：按时间顺序单次遍历 window_sessions，累加出
+专注/娱乐总时长、最长心流、意志力胜利、黄金时段、专注/碎片比、切换频率。
+calculate_period_stats、AnalysisDAO、StatsDAO 与日报都使用这里的统一口径。
+"""
+import copy
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app.data.core.database import get_db_connection
+
+FOCUS_STATUSES = ('work', 'focus')
+DISTRACTION_STATUSES = ('entertainment', 'other', 'unknown')
+
+STREAK_GAP_SECONDS = 120        # 专注会话之间间隔小于 2 分钟视为同一段心流
+WILLPOWER_FOCUS_SECONDS = 300   # 意志力胜利：专注(>5min) -> 短暂走神(<5min) -> 回到专注
+MIN_ACTIVE_HOURS = 0.5          # 活跃不足半小时不计算切换频率
+
+CACHE_DAYS = 8
+
+
+def _parse_time(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def efficiency_score(total_focus, willpower_wins):
+    """period_stats 效能指数：基础分 60 + 每小时专注 5 分 + 每次意志力胜利 2 分，上限 100"""
+    return min(100, int(60 + total_focus / 3600 * 5 + willpower_wins * 2))
+
+
+class SessionMetrics:
+    """
+    流式指标累加器：按 start_time 顺序 add() 会话，状态保留在对象中，
+    追加新会话只需处理新增的行；snapshot() 随时给出当前指标
+    """
+
+    def __init__(self):
+        self.sessions = 0
+        self.focus_seconds = 0
+        self.focus_sessions = 0
+        self.entertainment_seconds = 0
+        self.distraction_seconds = 0
+        self.distraction_sessions = 0
+        self.max_streak = 0
+        self.willpower_wins = 0
+        self.hour_focus = {}
+        self.first_start = None
+        self.last_start = None
+        self._streak = 0
+        self._streak_end = None
+        # 0: 等待 >5min 的专注; 1: 专注中，等待走神; 2: 短暂走神，等待回到专注
+        self._willpower_state = 0
+
+    def add(self, start_time, duration, status):
+        start = _parse_time(start_time)
+        dur = int(duration or 0)
+        status = (status or '').lower()
+        is_focus = status in FOCUS_STATUSES
+        is_distraction = status in DISTRACTION_STATUSES
+
+        self.sessions += 1
+        if self.first_start is None:
+            self.first_start = start
+        self.last_start = start
+
+        if is_focus:
+            self.focus_seconds += dur
+            self.focus_sessions += 1
+            self.hour_focus[start.hour] = self.hour_focus.get(start.hour, 0) + dur
+            # 最长心流：间隔小于 2 分钟的专注会话合并
+            if self._streak_end is not None and (start - self._streak_end).total_seconds() < STREAK_GAP_SECONDS:
+                self._streak += dur
+            else:
+                self._streak = dur
+            self._streak_end = start + timedelta(seconds=dur)
+            self.max_streak = max(self.max_streak, self._streak)
+        elif is_distraction:
+            self.distraction_seconds += dur
+            self.distraction_sessions += 1
+            if status == 'entertainment':
+                self.entertainment_seconds += dur
+
+        state = self._willpower_state
+        if state == 0:
+            if is_focus and dur > WILLPOWER_FOCUS_SECONDS:
+                state = 1
+        elif state == 1:
+            if is_distraction:
+                state = 2 if dur < WILLPOWER_FOCUS_SECONDS else 0
+        elif state == 2:
+            if is_focus:
+                self.willpower_wins += 1
+                state = 1 if dur > WILLPOWER_FOCUS_SECONDS else 0
+            elif is_distraction:
+                state = 0
+        self._willpower_state = state
+
+    def extend(self, rows):
+        """rows: 按 start_time 排序的 (start_time, duration, status) 或含这些键的行"""
+        for r in rows:
+            if isinstance(r, (tuple, list)):
+                self.add(*r[:3])
+            else:
+                self.add(r['start_time'], r['duration'], r['status'])
+        return self
+
+    @property
+    def peak_hour(self):
+        return max(self.hour_focus, key=self.hour_focus.get) if self.hour_focus else 0
+
+    @property
+    def focus_fragmentation_ratio(self):
+        """平均专注会话时长 / 平均走神会话时长；没有走神时给高分 10.0"""
+        avg_focus = self.focus_seconds / self.focus_sessions if self.focus_sessions else 0
+        avg_distraction = self.distraction_seconds / self.distraction_sessions if self.distraction_sessions else 0
+        if avg_distraction > 0:
+            return round(avg_focus / avg_distraction, 2)
+        return 10.0 if avg_focus > 0 else 0.0
+
+    @property
+    def context_switch_freq(self):
+        """每活跃小时的会话数，活跃时长 = 最后一条会话开始 - 第一条会话开始"""
+        if not self.sessions:
+            return 0.0
+        active_hours = (self.last_start - self.first_start).total_seconds() / 3600
+        if active_hours <= MIN_ACTIVE_HOURS:
+            return 0.0
+        return round(self.sessions / active_hours, 1)
+
+    def snapshot(self) -> dict:
+        return {
+            'sessions': self.sessions,
+            'total_focus': self.focus_seconds,
+            'total_entertainment': self.entertainment_seconds,
+            'max_streak': self.max_streak,
+            'willpower_wins': self.willpower_wins,
+            'peak_hour': self.peak_hour,
+            'efficiency_score': efficiency_score(self.focus_seconds, self.willpower_wins),
+            'focus_fragmentation_ratio': self.focus_fragmentation_ratio,
+            'context_switch_freq': self.context_switch_freq,
+        }
+
+
+# ---------- 按天增量缓存 ----------
+# date -> {'metrics': 已确认会话的累加器, 'upto': 已确认的最大会话 id, 'fingerprint': (条数, 专注, 走神, 娱乐)}
+# 当天最后一条会话仍在增长 (update_session_duration)，不并入已确认状态，每次在副本上补算
+_day_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _fingerprint_query(conn, start_ts, end_ts, upto):
+    row = conn.execute(f'''
+        SELECT COUNT(*),
+               TOTAL(CASE WHEN status IN ('work', 'focus') THEN duration END),
+               TOTAL(CASE WHEN status IN ('entertainment', 'other', 'unknown') THEN duration END),
+               TOTAL(CASE WHEN status = 'entertainment' THEN duration END)
+        FROM window_sessions
+        WHERE start_time BETWEEN ? AND ? AND id <= ?
+    ''', (start_ts, end_ts, upto)).fetchone()
+    return (row[0], int(row[1]), int(row[2]), int(row[3]))
+
+
+def _new_entry():
+    return {'metrics': SessionMetrics(), 'upto': 0, 'fingerprint': (0, 0, 0, 0)}
+
+
+def get_day_metrics(target_date) -> SessionMetrics:
+    """
+    某一天的指标。同一进程内重复调用只读取上次之后新增的会话；
+    已确认部分用一次聚合查询校验，会话被重分类、删除或补录到中间时自动全量重算
+    """
+    target_date = str(target_date)
+    start_ts = f"{target_date} 00:00:00"
+    end_ts = f"{target_date} 23:59:59"
+
+    with _cache_lock, get_db_connection() as conn:
+        entry = _day_cache.get(target_date)
+        if entry and _fingerprint_query(conn, start_ts, end_ts, entry['upto']) != entry['fingerprint']:
+            entry = None
+
+        rows = conn.execute('''
+            SELECT id, start_time, duration, status FROM window_sessions
+            WHERE start_time BETWEEN ? AND ? AND id > ?
+            ORDER BY start_time ASC, id ASC
+        ''', (start_ts, end_ts, entry['upto'] if entry else 0)).fetchall()
+
+        last = entry['metrics'].last_start if entry else None
+        if entry and rows and last is not None and _parse_time(rows[0]['start_time']) < last:
+            # 新会话插在已确认区间之前 (手动补录)，顺序被打乱，只能重算
+            entry = None
+            rows = conn.execute('''
+                SELECT id, start_time, duration, status FROM window_sessions
+                WHERE start_time BETWEEN ? AND ?
+                ORDER BY start_time ASC, id ASC
+            ''', (start_ts, end_ts)).fetchall()
+        if entry is None:
+            entry = _new_entry()
+
+        # 除最后一条外都并入已确认状态；最后一条 id 较小时 (顺序异常) 也一并确认，由校验兜底
+        open_row = None
+        if rows and all(r['id'] < rows[-1]['id'] for r in rows[:-1]):
+            open_row = rows[-1]
+        count, focus, distraction, ent = entry['fingerprint']
+        for r in rows:
+            if r is open_row:
+                continue
+            entry['metrics'].add(r['start_time'], r['duration'], r['status'])
+            entry['upto'] = max(entry['upto'], r['id'])
+            dur = int(r['duration'] or 0)
+            status = r['status']
+            count += 1
+            if status in FOCUS_STATUSES:
+                focus += dur
+            elif status in DISTRACTION_STATUSES:
+                distraction += dur
+                if status == 'entertainment':
+                    ent += dur
+        entry['fingerprint'] = (count, focus, distraction, ent)
+
+        _day_cache[target_date] = entry
+        _day_cache.move_to_end(target_date)
+        while len(_day_cache) > CACHE_DAYS:
+            _day_cache.popitem(last=False)
+
+        metrics = copy.deepcopy(entry['metrics'])
+    if open_row is not None:
+        metrics.add(open_row['start_time'], open_row['duration'], open_row['status'])
+    return metrics
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from app.data.core.database import (get_db_connection, get_attached_connection, get_core_events_db_connection,
+                                    get_period_stats_db_connection)
+from app.data.dao.backfill_dao import BackfillDAO
+from app.data.dao.core_events_extractor import select_core_events, ranked_core_events, write_core_events
+from app.data.dao.range_analytics import SessionFrame
+from app.data.dao.stats_calculator import build_period_row, write_period_stats
+
+CHUNK_DAYS = 31          # 每个 worker 任务处理的连续天数
+PARALLEL_MIN_DAYS = 14   # 脏日期少于这个数时在当前进程内计算，不值得启动进程池
+
+
+def _date_range(start_date, end_date):
+    d = datetime.strptime(str(start_date), "%Y-%m-%d")
+    end = datetime.strptime(str(end_date), "%Y-%m-%d")
+    while d <= end:
+        yield d.strftime("%Y-%m-%d")
+        d += timedelta(days=1)
+
+
+def _chunks(days):
+    """排好序的日期切成连续、且不超过 CHUNK_DAYS 的区间 [(first, last), ...]"""
+    chunks = []
+    for day in days:
+        if chunks:
+            first, last = chunks[-1]
+            prev = (datetime.strptime(day, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+            span = (datetime.strptime(day, "%Y-%m-%d") - datetime.strptime(first, "%Y-%m-%d")).days
+            if last == prev and span < CHUNK_DAYS:
+                chunks[-1][1] = day
+                continue
+        chunks.append([day, day])
+    return [tuple(c) for c in chunks]
+
+
+def _summary_rows(events, category):
+    """select_core_events 的结果转成 core_events 表的列名，供 build_period_row 生成每日摘要"""
+    return [{'app_name': e['app'], 'clean_title': e['title'], 'total_duration': e['duration']}
+            for e in events if e['category'] == category]
+
+
+def compute_days(first, last, incremental=False):
+    """
+    计算 [first, last] 每天的核心事件与 period_stats 行，返回 [(date, core_events, period_row)]
+    - incremental=False (并行 worker)：只读，核心事件全量扫描
+    - incremental=True (当前进程)：核心事件走增量累计表 (同步新修改的会话后按索引取 Top-N)
+    """
+    daily = SessionFrame.load(first, last).daily_metrics()
+    results = []
+    with (get_attached_connection() if incremental else get_db_connection()) as conn:
+        # 与 calculate_period_stats 一致：有 daily_stats 行时优先使用其专注总时长
+        focus_totals = {str(r['date']): r['total_focus_time'] for r in conn.execute(
+            'SELECT date, total_focus_time FROM daily_stats WHERE date BETWEEN ? AND ?', (first, last)
+        ).fetchall()}
+        cursor = conn.cursor()
+        for day in daily.index:
+            metrics = daily.loc[day]
+            if incremental:
+                events = ranked_core_events(conn, day, verbose=False)
+            else:
+                events = select_core_events(cursor, day, verbose=False)
+            total_focus = focus_totals[day] if day in focus_totals else int(metrics['total_focus'])
+            row = build_period_row(day, metrics, total_focus,
+                                   _summary_rows(events, 'focus'), _summary_rows(events, 'entertainment'))
+            results.append((day, events, row))
+        if incremental:
+            conn.commit()
+    return results
+
+
+class BackfillRunner:
+    """
+    core_events / period_stats 的幂等回填。
+    - 每天记录计算时的数据指纹 (会话数、最大会话 id、最近修改时间)，指纹没变且已有结果的日期直接跳过
+    - 脏日期按连续区间分块，多的时候分发到进程池并行计算 (worker 只读)
+    - 结果由当前进程按库各一个事务批量写入，最后记录指纹
+    """
+
+    def __init__(self, workers=None, verbose=True):
+        self.workers = workers if workers is not None else min(4, os.cpu_count() or 1)
+        self.verbose = verbose
+
+    def _log(self, msg):
+        if self.verbose:
+            print(f"[Backfill] {msg}")
+
+    def dirty_days(self, days):
+        """days 中需要重算的日期及其当前指纹"""
+        if not days:
+            return [], {}
+        first, last = min(days), max(days)
+        current = BackfillDAO.fingerprints(first, last)
+        stored = BackfillDAO.get_state(first, last)
+        computed = BackfillDAO.get_period_dates(first, last)
+        fingerprints = {d: current.get(d, "0::") for d in days}
+        dirty = [d for d in days if stored.get(d) != fingerprints[d] or d not in computed]
+        return dirty, fingerprints
+
+    def run_range(self, start_date, end_date, force=False) -> dict:
+        return self.run(list(_date_range(start_date, end_date)), force=force)
+
+    def run(self, days, force=False) -> dict:
+        t0 = time.perf_counter()
+        days = sorted(set(str(d) for d in days))
+        dirty, fingerprints = self.dirty_days(days)
+        if force:
+            dirty = days
+        report = {'days': len(days), 'computed': len(dirty), 'skipped': len(days) - len(dirty), 'elapsed': 0.0}
+        if not dirty:
+            report['elapsed'] = time.perf_counter() - t0
+            self._log(f"{len(days)} days up to date")
+            return report
+
+        chunks = _chunks(dirty)
+        results = []
+        # 打包后的可执行文件里不启动子进程 (需要 freeze_support 配合)，直接在本进程计算
+        parallel = self.workers > 1 and len(dirty) >= PARALLEL_MIN_DAYS and not getattr(sys, 'frozen', False)
+        if parallel:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+                for part in pool.map(compute_days, *zip(*chunks)):
+                    results.extend(part)
+        else:
+            for first, last in chunks:
+                results.extend(compute_days(first, last, incremental=True))
+
+        self._write(results, {d: fingerprints[d] for d in dirty})
+        report['elapsed'] = time.perf_counter() - t0
+        self._log(f"{len(days)} days: {len(dirty)} recomputed, {report['skipped']} unchanged "
+                  f"({report['elapsed']:.2f}s{', parallel' if parallel else ''})")
+        return report
+
+    @staticmethod
+    def _write(results, fingerprints):
+        """批量写入：core_events、period_stats、daily_stats.max_focus_streak 各一个事务，指纹最后写"""
+        with get_core_events_db_connection() as conn:
+            cursor = conn.cursor()
+            for day, events, _ in results:
+                write_core_events(cursor, day, events)
+            conn.commit()
+        with get_period_stats_db_connection() as conn:
+            write_period_stats(conn.cursor(), [row for _, _, row in results])
+            conn.commit()
+        with get_db_connection() as conn:
+            # 与 calculate_period_stats 一致，用重算的最长心流修正 daily_stats
+            conn.executemany('UPDATE daily_stats SET max_focus_streak = ? WHERE date = ?',
+                             [(row['max_streak'], day) for day, _, row in results])
+            BackfillDAO.save_state(conn, fingerprints)
+            conn.commit()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+对话上下文检索 (RAG)
+根据用户的问题，从全部历史中挑出最相关的会话、核心事项与每日汇总，
+在 token 预算内拼成提示词上下文。问题里的时间词 (今天/上周/本月/最近N天…)
+会限定检索的日期范围。
+"""
+
+import os
+import re
+import time
+import threading
+from datetime import date, timedelta
+
+from app.data.dao.context_index_dao import ContextIndexDAO, ngram_terms
+
+# 时间词与常见虚词：不参与关键词检索 (时间词已转换为日期范围)
+STOP_TERMS = {
+    '今天', '昨天', '上周', '本周', '这周', '本月', '上月', '个月', '这个', '最近', '天我',
+    '我的', '我在', '多少', '什么', '怎么', '时间', '小时', '一下', '哪些', '了多', '做了',
+    'how', 'much', 'did', 'what', 'the', 'last', 'this', 'week', 'month', 'today', 'yesterday',
+}
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', '1200'))
+REFRESH_INTERVAL = 60
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算：中文约 1 字 1 token，其余约 4 字符 1 token"""
+    cjk = len(re.findall(r'[一-鿿]', text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def parse_date_range(question: str, today: date = None):
+    """从问题中识别时间范围，返回 (start, end, 描述)；未识别到返回 (None, None, None)"""
+    today = today or date.today()
+    q = question.lower()
+    m = re.search(r'(?:最近|近|过去|past|last)\s*(\d+)\s*(?:天|days?)', q)
+    if m:
+        n = max(1, int(m.group(1)))
+        return today - timedelta(days=n - 1), today, f"最近{n}天"
+    monday = today - timedelta(days=today.weekday())
+    first = today.replace(day=1)
+    if '上周' in q or '上星期' in q or 'last week' in q:
+        return monday - timedelta(days=7), monday - timedelta(days=1), "上周"
+    if '本周' in q or '这周' in q or 'this week' in q:
+        return monday, today, "本周"
+    if '上个月' in q or '上月' in q or 'last month' in q:
+        prev_last = first - timedelta(days=1)
+        return prev_last.replace(day=1), prev_last, "上个月"
+    if '本月' in q or '这个月' in q or 'this month' in q:
+        return first, today, "本月"
+    if '昨天' in q or 'yesterday' in q:
+        y = today - timedelta(days=1)
+        return y, y, "昨天"
+    if '今天' in q or 'today' in q:
+        return today, today, "今天"
+    return None, None, None
+
+
+class ChatContextRetriever:
+    """
+    在 token 预算内组装对话上下文：
+    1. 日期范围内的每日汇总 (最多占预算的 1/3)
+    2. 与问题关键词最相关的会话 / 核心事项 (bm25 排序)
+    3. 问题里没有关键词时，按时长取范围内最主要的记录
+    所有行都是索引里预先序列化好的文本，拼接时无需任何解析。
+    """
+
+    _last_refresh = 0.0
+    _refresh_lock = threading.Lock()
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+
+    @classmethod
+    def ensure_fresh(cls, force: bool = False):
+        """节流的增量刷新 (最多每 REFRESH_INTERVAL 秒一次)"""
+        with cls._refresh_lock:
+            if not force and time.time() - cls._last_refresh < REFRESH_INTERVAL:
+                return
+            try:
+                ContextIndexDAO.refresh()
+            except Exception as e:
+                print(f"[ChatContext] Index refresh failed: {e}")
+            cls._last_refresh = time.time()
+
+    def retrieve(self, question: str, today: date = None) -> str:
+        """返回可直接放入系统提示词的上下文文本；索引不可用时返回 None"""
+        if not ContextIndexDAO.available():
+            return None
+        self.ensure_fresh()
+
+        start, end, label = parse_date_range(question, today)
+        start_s = start.isoformat() if start else None
+        end_s = end.isoformat() if end else None
+        terms = [t for t in ngram_terms(question) if t not in STOP_TERMS]
+
+        lines, used, seen = [], 0, set()
+        matched_seconds = 0
+
+        def take(rows, budget, count_matches=False):
+            nonlocal used, matched_seconds
+            added = 0
+            for r in rows:
+                if r['doc'] in seen:
+                    continue
+                cost = estimate_tokens(r['doc'])
+                if used + cost > budget:
+                    continue
+                seen.add(r['doc'])
+                lines.append(r['doc'])
+                used += cost
+                added += 1
+                if count_matches and r['source'] == 'session':
+                    matched_seconds += float(r['duration'] or 0)
+            return added
+
+        if start_s:
+            take(sorted(ContextIndexDAO.by_range(start_s, end_s, sources=['day'], limit=62), key=lambda r: r['day']),
+                 self.token_budget // 3)
+        matched = 0
+        if terms:
+            matched = take(ContextIndexDAO.search(terms, start_s, end_s), self.token_budget, count_matches=True)
+        if not matched:
+            if not start_s:
+                end = today or date.today()
+                start_s, end_s = (end - timedelta(days=6)).isoformat(), end.isoformat()
+            take(ContextIndexDAO.by_range(start_s, end_s, sources=['session', 'core']), self.token_budget)
+
+        if not lines:
+            return ""
+        header = f"时间范围: {label} ({start_s} ~ {end_s})\n" if label else ""
+        footer = f"\n以上相关会话合计约 {matched_seconds / 3600:.1f} 小时" if matched_seconds else ""
+        return header + "\n".join(f"- {line}" for line in lines) + footer
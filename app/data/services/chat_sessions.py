@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+对话会话 (多轮记忆)
+每个会话有固定的系统提示词 + 历史消息，保存在内存 (空闲超时淘汰) 并持久化到 SQLite。
+每轮请求按 [系统提示词, 早期摘要, 历史消息..., 新问题] 组装，前缀与上一轮完全一致，
+Ollama 可以复用已缓存的 KV，追问只需处理新增的 token。
+历史超过 token 预算时，把较早的轮次折叠成摘要 (一次性改变前缀，之后重新稳定)。
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.data.dao.chat_session_dao import ChatSessionDAO
+from app.data.services.chat_context import estimate_tokens
+
+HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1500'))
+SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', '1800'))
+KEEP_RECENT_MESSAGES = 4          # 折叠时保留最近的消息 (2 轮) 原文
+MAX_CACHED_SESSIONS = 50
+PERSIST_DAYS = 30                 # 超过这么多天未使用的会话从数据库清除
+
+
+class ChatSession:
+    """单个会话的内存镜像"""
+
+    def __init__(self, session_id, system_prompt, summary=None, summarized_upto=0, messages=None):
+        self.session_id = session_id
+        self.system_prompt = system_prompt
+        self.summary = summary
+        self.summarized_upto = summarized_upto
+        self.messages = messages or []     # [{id, role, content}]，仅包含未折叠的消息
+        self.last_access = time.time()
+        self.lock = threading.Lock()
+        self.summarizing = False
+
+    def history(self):
+        """发给模型的历史消息 (不含系统提示词与新问题)"""
+        msgs = []
+        if self.summary:
+            msgs.append({"role": "system", "content": f"此前对话的摘要：{self.summary}"})
+        msgs.extend({"role": m["role"], "content": m["content"]} for m in self.messages)
+        return msgs
+
+    def known_text(self) -> str:
+        """本会话已经发给模型的全部文本，用于判断检索到的上下文是否需要补充"""
+        return "\n".join([self.system_prompt or "", self.summary or ""] + [m["content"] or "" for m in self.messages])
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(m["content"] or "") for m in self.messages) + estimate_tokens(self.summary or "")
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "summary": self.summary,
+            "messages": [{"role": m["role"], "content": m["content"]} for m in self.messages],
+        }
+
+
+class ChatSessionStore:
+    """
+    会话存储：内存 LRU + 空闲 TTL，未命中时从 SQLite 加载。
+    summarize(previous_summary, transcript) -> str | None 由调用方提供 (负责调用模型)，
+    在后台线程中执行，不阻塞当前回答。
+    """
+
+    def __init__(self, summarize: Callable[[Optional[str], str], Optional[str]] = None,
+                 ttl: int = SESSION_TTL, token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.summarize = summarize
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            purged = ChatSessionDAO.purge(time.time() - PERSIST_DAYS * 86400)
+            if purged:
+                print(f"[ChatSessions] Purged {purged} stale session(s)")
+        except Exception as e:
+            print(f"[ChatSessions] Purge failed: {e}")
+
+    def _evict(self, now):
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_access > self.ttl]
+        for sid in expired:
+            del self._sessions[sid]
+        while len(self._sessions) > MAX_CACHED_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """获取会话 (内存 -> SQLite)，不存在返回 None"""
+        if not session_id:
+            return None
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                row = ChatSessionDAO.get(session_id)
+                if row is None:
+                    return None
+                session = ChatSession(
+                    session_id, row["system_prompt"], row["summary"], row["summarized_upto"] or 0,
+                    ChatSessionDAO.get_messages(session_id, row["summarized_upto"] or 0)
+                )
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_access = now
+            return session
+
+    def create(self, system_prompt: str) -> ChatSession:
+        session_id = uuid.uuid4().hex
+        ChatSessionDAO.create(session_id, system_prompt)
+        session = ChatSession(session_id, system_prompt)
+        with self._lock:
+            self._evict(time.time())
+            self._sessions[session_id] = session
+        return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        ChatSessionDAO.delete(session_id)
+
+    def append_turn(self, session: ChatSession, user_msg: str, reply: str):
+        """记录一轮问答；历史超出预算时在后台折叠早期轮次"""
+        with session.lock:
+            for role, content in (("user", user_msg), ("assistant", reply)):
+                msg_id = ChatSessionDAO.add_message(session.session_id, role, content)
+                session.messages.append({"id": msg_id, "role": role, "content": content})
+            need_fold = (self.summarize is not None and not session.summarizing
+                         and session.history_tokens() > self.token_budget
+                         and len(session.messages) > KEEP_RECENT_MESSAGES)
+            if need_fold:
+                session.summarizing = True
+        if need_fold:
+            threading.Thread(target=self._fold, args=(session,), daemon=True).start()
+
+    def _fold(self, session: ChatSession):
+        """把除最近 KEEP_RECENT_MESSAGES 条以外的消息折叠进摘要"""
+        try:
+            with session.lock:
+                old = session.messages[:-KEEP_RECENT_MESSAGES]
+                previous = session.summary
+            transcript = "\n".join(
+                f"{'用户' if m['role'] == 'user' else '助手'}: {m['content']}" for m in old
+            )
+            summary = self.summarize(previous, transcript)
+            if not summary:
+                return
+            upto = old[-1]["id"]
+            with session.lock:
+                session.summary = summary.strip()
+                session.summarized_upto = upto
+                session.messages = [m for m in session.messages if m["id"] > upto]
+            ChatSessionDAO.update_summary(session.session_id, session.summary, upto)
+            print(f"[ChatSessions] Folded {len(old)} message(s) of {session.session_id[:8]} into summary")
+        except Exception as e:
+            print(f"[ChatSessions] Summarize failed: {e}")
+        finally:
+            session.summarizing = False
@@ -18,6 +18,7 @@ if project_root not in sys.path:
 
 from datetime import date, datetime
 from app.data.dao.activity_dao import ActivityDAO, StatsDAO, WindowSessionDAO
+from app.data.dao.period_baseline_dao import MIN_BASELINE_DAYS
 import json
 
 class ActivityHistoryManager:
@@ -45,6 +46,9 @@ class ActivityHistoryManager:
         # 记录当前连续专注时长 (秒)
         self._current_focus_streak_seconds = 0
         
+        # 当前同状态段已累计的时长 (秒)，record_interval 使用
+        self._run_duration = 0
+        
         # 意志力胜利检测状态: 记录进入当前状态前，是否处于 Focus 状态
         self._last_status_was_focus = False
         
@@ -124,9 +128,38 @@ class ActivityHistoryManager:
                 if raw_data:
                     self._last_raw_data = raw_data
     
-    def _save_record(self, status: str, duration: int, summary: str = None, raw_data: str = None, willpower_wins_increment: int = 0):
+    def record_interval(self, status: str, start_ts: float, end_ts: float, summary: str = None, raw_data: str = None):
+        """
+        按精确起止时间记录一段已结束且已有标签的区间 (供 TimeLedger 调用)。
+        与 update() 不同，这里的时长由焦点切换时刻决定，而不是 AI 结果到达的时刻。
+        """
+        duration = int(round(end_ts - start_ts))
+        if duration <= 0:
+            return
+
+        # 检测意志力胜利 (短暂娱乐后切回 Focus，且娱乐前处于 Focus)
+        willpower_win_increment = 0
+        if status in ['focus', 'work'] and self.current_status == 'entertainment':
+            if self._last_status_was_focus and 5 < self._run_duration < 300:
+                willpower_win_increment = 1
+
+        # 维护连续同状态的"段"，用于下一次意志力判断
+        if status != self.current_status:
+            self._last_status_was_focus = self.current_status in ['focus', 'work']
+            self.current_status = status
+            self.status_start_time = start_ts
+            self._run_duration = 0
+        self._run_duration += duration
+        self._last_summary = summary
+        self._last_raw_data = raw_data
+
+        self._save_record(status, duration, summary, raw_data,
+                          willpower_wins_increment=willpower_win_increment, end_ts=end_ts)
+        self._update_cache(status, int(duration / 60), start_ts)
+
+    def _save_record(self, status: str, duration: int, summary: str = None, raw_data: str = None, willpower_wins_increment: int = 0, end_ts: float = None):
         """调用 DAO 保存数据 (自动处理跨日分割)"""
-        current_ts = time.time()
+        current_ts = end_ts if end_ts is not None else time.time()
         start_ts = current_ts - duration
         
         start_dt = datetime.fromtimestamp(start_ts)
@@ -213,9 +246,12 @@ class ActivityHistoryManager:
                                 'process': last_sess['process_name']
                             }
                     
+                    # 同标题且时间上首尾相接才合并 (迟到标签补记的区间可能与上一会话不相邻)
+                    last_end_ts = self._last_window_session.get('end_ts')
                     is_same_session = (
                         self._last_window_session['id'] is not None and
-                        window_title == self._last_window_session['title']
+                        window_title == self._last_window_session['title'] and
+                        (last_end_ts is None or abs((session_end_ts - duration) - last_end_ts) <= 5)
                     )
                     
                     session_status = status
@@ -229,6 +265,7 @@ class ActivityHistoryManager:
                         
                         if summary and summary != window_title:
                             WindowSessionDAO.update_session_summary(self._last_window_session['id'], summary)
+                        self._last_window_session['end_ts'] = session_end_ts
                     else:
                         # 是新会话，创建新记录
                         # start_time = end_ts - duration
@@ -243,7 +280,8 @@ class ActivityHistoryManager:
                             self._last_window_session = {
                                 'id': new_sess['id'],
                                 'title': new_sess['window_title'],
-                                'process': new_sess['process_name']
+                                'process': new_sess['process_name'],
+                                'end_ts': session_end_ts
                             }
                             
                 except Exception as e:
@@ -326,3 +364,24 @@ class ActivityHistoryManager:
     def should_remind(self, threshold: int = 30) -> bool:
         if self.current_status != 'entertainment': return False
         return self.get_current_duration() >= threshold
+
+    @staticmethod
+    def get_fatigue_severity(streak_seconds: int, norm=None) -> str:
+        """
+        按个人基线给疲劳提醒定级 (norm 默认读取截至昨天的基线)：
+        连续专注超过近 30 天最长心流的常态 (均值 + 1 个标准差) 为 high，
+        低于均值为 low，基线天数不足时为 medium
+        """
+        if norm is None:
+            try:
+                norm = StatsDAO.get_personal_norm()
+            except Exception as e:
+                print(f"[HistoryManager] Norm Error: {e}")
+        stats = (norm or {}).get('max_streak', {}).get(30)
+        if not stats or stats['n'] < MIN_BASELINE_DAYS:
+            return 'medium'
+        if streak_seconds >= stats['mean'] + stats['std']:
+            return 'high'
+        if streak_seconds < stats['mean']:
+            return 'low'
+        return 'medium'
@@ -0,0 +1,47 @@
+import os
+
+from app.data.dao.llm_cache_dao import LLMCacheDAO
+
+
+class LLMOutputCache:
+    """
+    LLM 输出缓存 (持久化，内容寻址)
+    以 hash(提示词模板版本, 模型, 输入上下文) 为键保存模型输出。
+    报告重新生成时，历史日期的输入没变就直接复用，只有数据变化的日期 (通常只有今天) 才调用模型。
+    修改提示词时提升模板版本号即可让旧条目自然失效。
+    """
+
+    def __init__(self, model: str = None, max_entries: int = None):
+        self.model = model or os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud')
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, kind: str, template_version: str, context, compute, scope: str = None):
+        """
+        命中缓存直接返回；否则调用 compute() 生成，结果非空时写入缓存。
+        kind / scope: 用于按类别、范围 (如日期) 显式失效
+        """
+        key = LLMCacheDAO.make_key(template_version, self.model, context)
+        try:
+            output = LLMCacheDAO.get(key)
+        except Exception as e:
+            print(f"[LLMOutputCache] Read failed: {e}")
+            output = None
+        if output is not None:
+            self.hits += 1
+            return output
+
+        self.misses += 1
+        output = compute()
+        if output:
+            try:
+                LLMCacheDAO.put(key, output, kind=kind, scope=scope, model=self.model,
+                                template_version=template_version, max_entries=self.max_entries)
+            except Exception as e:
+                print(f"[LLMOutputCache] Write failed: {e}")
+        return output
+
+    @staticmethod
+    def invalidate(kind: str = None, scope: str = None) -> int:
+        return LLMCacheDAO.invalidate(kind, scope)
@@ -0,0 +1,226 @@
+import re
+import json
+import uuid
+from datetime import datetime
+
+from app.data.core.database import get_attached_connection
+from app.data.dao.reclassify_dao import ReclassifyDAO, day_deltas
+
+VALID_STATUSES = ('work', 'focus', 'entertainment', 'idle')
+
+# 默认规则 (来自 check_and_fix_all_stats 的硬编码修复)：这些应用一律视为工作
+# 微信个人使用较多，不在自动修复范围内
+DEFAULT_RULES = [
+    {"name": "communication", "process": r"feishu|lark|dingtalk|wechatwork", "status": "work",
+     "from": ["entertainment", "unknown", "misc"]},
+    {"name": "meetings", "process": r"teams|zoom|meeting|tencentmeeting|wemeetapp", "status": "work",
+     "from": ["entertainment", "unknown", "misc"]},
+    {"name": "dev", "process": r"trae|code|pycharm|idea64|studio|sublime|notepad\+\+", "status": "work",
+     "from": ["entertainment", "unknown", "misc"]},
+    {"name": "office", "process": r"word|excel|powerpoint|wps", "status": "work",
+     "from": ["entertainment", "unknown", "misc"]},
+]
+
+
+class ReclassifyEngine:
+    """
+    规则驱动的历史重分类。
+    规则: [{"name", "process": 正则, "title": 正则, "status": 新状态, "from": [仅改这些旧状态]}]
+    process / title 至少给一个，均为不区分大小写的 search；按顺序匹配，第一条命中的规则生效。
+    手动补录 (Manual) 的会话不参与。
+    - preview(): 只读，返回将要发生的变化 (按规则 / 状态流转 / 日期汇总)
+    - apply():   一次扫描找出变化的会话，在同一事务里回写会话、按差值修正 daily_stats 总时长、
+                 重算受影响日期的 core_events 与会话类指标 (period_stats 整行)，并写入撤销日志
+    - undo():    按撤销日志还原某次执行 (之后又被改动过的会话不动)，同样同步派生表
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self._compiled = [self._compile(i, r) for i, r in enumerate(self.rules)]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _compile(index, rule):
+        if rule.get('status') not in VALID_STATUSES:
+            raise ValueError(f"Rule {index}: status must be one of {VALID_STATUSES}, got {rule.get('status')!r}")
+        if not rule.get('process') and not rule.get('title'):
+            raise ValueError(f"Rule {index}: needs a 'process' or 'title' pattern")
+        try:
+            return {
+                'process': re.compile(rule['process'], re.I) if rule.get('process') else None,
+                'title': re.compile(rule['title'], re.I) if rule.get('title') else None,
+                'status': rule['status'],
+                'from': set(rule['from']) if rule.get('from') else None,
+            }
+        except re.error as e:
+            raise ValueError(f"Rule {index}: invalid pattern ({e})")
+
+    def match(self, process_name, window_title, status):
+        """命中的规则序号；不需要改动 (未命中、已是目标状态、手动会话) 返回 None"""
+        if (process_name or '').lower() == 'manual':
+            return None
+        for i, rule in enumerate(self._compiled):
+            if rule['process'] and not rule['process'].search(process_name or ''):
+                continue
+            if rule['title'] and not rule['title'].search(window_title or ''):
+                continue
+            if rule['from'] is not None and status not in rule['from']:
+                return None
+            return None if rule['status'] == status else i
+        return None
+
+    def _changes(self, conn, start_day, end_day):
+        changes = ReclassifyDAO.find_changes(conn, self.match, start_day, end_day)
+        for c in changes:
+            c['new_status'] = self._compiled[c['rule']]['status']
+        return changes
+
+    # ---------- 预览 ----------
+
+    def _report(self, conn, changes):
+        by_rule, transitions, days = {}, {}, {}
+        for c in changes:
+            r = by_rule.setdefault(c['rule'], {'sessions': 0, 'duration': 0, 'samples': []})
+            r['sessions'] += 1
+            r['duration'] += c['duration']
+            if len(r['samples']) < 3 and c['window_title'] not in r['samples']:
+                r['samples'].append(c['window_title'])
+            t = transitions.setdefault((c['old_status'], c['new_status']), [0, 0])
+            t[0] += 1
+            t[1] += c['duration']
+        deltas = day_deltas(changes)
+        totals = ReclassifyDAO.get_day_totals(conn, list(deltas))
+        for day, (focus_delta, ent_delta) in sorted(deltas.items()):
+            focus, ent = totals.get(day, (None, None))
+            days[day] = {
+                'focus_before': focus, 'focus_after': None if focus is None else max(0, focus + focus_delta),
+                'ent_before': ent, 'ent_after': None if ent is None else max(0, ent + ent_delta),
+            }
+        return {
+            'sessions': len(changes),
+            'duration': sum(c['duration'] for c in changes),
+            'rules': [dict(name=self.rules[i].get('name') or f"rule {i}", **v) for i, v in sorted(by_rule.items())],
+            'transitions': [{'old_status': o, 'new_status': n, 'sessions': s, 'duration': d}
+                            for (o, n), (s, d) in sorted(transitions.items(), key=lambda x: -x[1][1])],
+            'days': days,
+        }
+
+    def preview(self, start_day=None, end_day=None) -> dict:
+        """dry run：不写库"""
+        with get_attached_connection() as conn:
+            return self._report(conn, self._changes(conn, start_day, end_day))
+
+    # ---------- 执行 / 撤销 ----------
+
+    def apply(self, start_day=None, end_day=None) -> dict:
+        """执行并返回报告 (含 run_id，供 undo 使用)；没有变化时不记录执行"""
+        with get_attached_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')  # 扫描与回写之间不允许其他写入插入
+            try:
+                changes = self._changes(conn, start_day, end_day)
+                report = self._report(conn, changes)
+                report['run_id'] = None
+                if changes:
+                    run_id = uuid.uuid4().hex[:12]
+                    ReclassifyDAO.record_run(conn, run_id, json.dumps(self.rules, ensure_ascii=False), changes)
+                    ReclassifyDAO.apply_changes(conn, changes)
+                    report['run_id'] = run_id
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        self._reindex(report['days'])
+        print(f"[Reclassify] Applied run {report['run_id']}: {report['sessions']} sessions")
+        return report
+
+    @staticmethod
+    def undo(run_id) -> int:
+        """撤销某次执行，返回还原的会话数"""
+        run = ReclassifyDAO.get_run(run_id)
+        if run is None:
+            raise ValueError(f"Unknown run {run_id}")
+        if run['undone_ts']:
+            return 0
+        with get_attached_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                changes = ReclassifyDAO.get_undo_changes(conn, run_id)
+                days = ReclassifyDAO.apply_changes(conn, changes) if changes else []
+                ReclassifyDAO.mark_undone(conn, run_id)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        ReclassifyEngine._reindex(days)
+        print(f"[Reclassify] Undid run {run_id}: {len(changes)} of {run['sessions']} sessions restored")
+        return len(changes)
+
+    @staticmethod
+    def relabel_interval(window_title, process_name, start_ts, end_ts, old_status, new_status):
+        """
+        迟到的标签修正账本的兜底标签：把该区间落成的会话从 old_status 改为 new_status，
+        与 apply() 相同地在一个事务里同步派生表 (不记入撤销日志)。返回受影响的日期
+        """
+        start_time, end_time = (datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") for ts in (start_ts, end_ts))
+        with get_attached_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                changes = ReclassifyDAO.find_interval_sessions(
+                    conn, window_title, process_name, start_time, end_time, old_status
+                )
+                for c in changes:
+                    c['new_status'] = new_status
+                days = ReclassifyDAO.apply_changes(conn, changes) if changes else []
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        ReclassifyEngine._reindex(days)
+        return days
+
+    @staticmethod
+    def _reindex(days):
+        """对话检索索引是派生缓存，不放在主事务里，事务提交后再刷新"""
+        if not days:
+            return
+        try:
+            from app.data.dao.context_index_dao import ContextIndexDAO
+            if ContextIndexDAO.available():
+                ContextIndexDAO.reindex_days(list(days))
+        except Exception as e:
+            print(f"[Reclassify] Reindex failed: {e}")
+
+    @staticmethod
+    def runs(limit=20):
+        return ReclassifyDAO.list_runs(limit)
+
+
+def format_report(report, dry_run=False) -> str:
+    """把 preview/apply 的报告格式化为文本"""
+    verb = "would change" if dry_run else "changed"
+    lines = [f"{report['sessions']} sessions, {report['duration'] / 3600:.2f}h {verb}"]
+    if report.get('run_id'):
+        lines[0] += f" (run {report['run_id']}, undo with --undo {report['run_id']})"
+    if report['rules']:
+        lines.append("By rule:")
+        for r in report['rules']:
+            lines.append(f"  {r['name']:<20} {r['sessions']:>6} sessions {r['duration'] / 3600:>8.2f}h  "
+                         f"e.g. {' | '.join(t or '' for t in r['samples'])}")
+    if report['transitions']:
+        lines.append("Transitions:")
+        for t in report['transitions']:
+            lines.append(f"  {t['old_status']} -> {t['new_status']}: {t['sessions']} sessions, "
+                         f"{t['duration'] / 3600:.2f}h")
+    if report['days']:
+        lines.append("daily_stats (focus / entertainment, hours):")
+        for day, d in report['days'].items():
+            if d['focus_before'] is None:
+                lines.append(f"  {day}  (no daily_stats row)")
+                continue
+            lines.append(f"  {day}  focus {d['focus_before'] / 3600:.2f} -> {d['focus_after'] / 3600:.2f}  "
+                         f"ent {d['ent_before'] / 3600:.2f} -> {d['ent_after'] / 3600:.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+[正在使用]
+时间账本 (业务逻辑层)
+焦点一切换就把窗口区间精确落账，标签 (AI / 缓存 / 规则) 可以稍后再补上。
+区间"已结束 + 已有标签"后，才通过 ActivityHistoryManager 计入
+activity_logs / daily_stats / window_sessions 等派生统计。
+连续专注、意志力胜利依赖区间先后顺序，因此只按时间顺序计入最前面连续一段已有标签的区间，
+遇到尚无标签的区间就停下，等它的标签到达后再继续。
+等待有上限：结束超过 LABEL_WAIT_SECONDS 仍无标签的区间 (模型持续输出无效、后端长期不可达)
+先以兜底标签计入，之后迟到的标签经重分类 (ReclassifyEngine) 修正已落库的会话与派生统计。
+这样 LLM 再慢，时长统计也精确到秒，分类器可以完全异步运行。
+"""
+
+import time
+import json
+
+from app.data.dao.activity_dao import IntervalDAO
+from app.data.dao.core_event_aggregates import CoreEventAggregateDAO
+from app.data.services.history_service import ActivityHistoryManager
+from app.data.services.reclassify_engine import ReclassifyEngine
+
+
+class TimeLedger:
+    """窗口区间账本"""
+
+    LABEL_WAIT_SECONDS = 10 * 60   # 区间结束后最多等待标签这么久，之后以兜底标签计入
+    FALLBACK_SOURCE = 'fallback'
+
+    def __init__(self, history_manager: ActivityHistoryManager = None, on_unlabeled_close=None):
+        self.history = history_manager or ActivityHistoryManager()
+        # 区间结束时仍无标签的回调 (参数为区间 dict)，由调用方交给分类队列补标签
+        self.on_unlabeled_close = on_unlabeled_close
+        # 当前正在进行的区间 (内存镜像，避免每秒查库)
+        self._open = None
+        # 账本见过的最新时刻 (切换/结束)，判断标签是否等待超时
+        self._now = None
+
+        # 上次异常退出遗留的未结束区间无法得知结束时间，直接丢弃
+        dropped = IntervalDAO.close_dangling(time.time())
+        if dropped:
+            print(f"[TimeLedger] Dropped {dropped} dangling interval(s) from previous run")
+        # 上次退出前已结束且已有标签、但尚未计入统计的区间，补记一次
+        # (无标签的区间先交给离线队列，下一次切换时再按等待上限处理)
+        self._settle_ready()
+
+    @property
+    def current_interval_id(self):
+        return self._open['id'] if self._open else None
+
+    def current_label(self):
+        """当前区间的标签 (status, summary)，尚未分类时返回 None"""
+        if self._open and self._open.get('status'):
+            return self._open['status'], self._open.get('summary')
+        return None
+
+    def switch(self, window_title: str, process_name: str, ts: float = None) -> int:
+        """焦点切换：在切换时刻结束上一区间并开启新区间，返回新区间 ID"""
+        ts = ts if ts is not None else time.time()
+        self.close(ts)
+        self._now = max(self._now or ts, ts)
+        interval_id = IntervalDAO.open_interval(window_title, process_name, ts)
+        self._open = {
+            'id': interval_id,
+            'start_ts': ts,
+            'window_title': window_title,
+            'process_name': process_name,
+            'status': None,
+            'summary': None,
+            'label_source': None,
+            'raw_data': None
+        }
+        return interval_id
+
+    def close(self, ts: float = None):
+        """结束当前区间 (如已有标签则立即计入统计)"""
+        if not self._open:
+            return
+        ts = ts if ts is not None else time.time()
+        self._now = max(self._now or ts, ts)
+        IntervalDAO.close_interval(self._open['id'], ts)
+        closed, self._open = self._open, None
+        if closed['status'] is None and self.on_unlabeled_close is not None:
+            try:
+                self.on_unlabeled_close(dict(closed, end_ts=ts))
+            except Exception as e:
+                print(f"[TimeLedger] Unlabeled close hook error: {e}")
+        self._settle_ready()
+
+    def attach_label(self, interval_id: int, status: str, summary: str = None,
+                     source: str = 'ai', raw_data: str = None):
+        """
+        为区间补上标签。
+        - 区间仍在进行：仅记录标签，结束时再计入统计
+        - 区间已结束：立即补记到派生统计 (迟到的 AI 结果)
+        - 区间已按兜底标签计入：改写标签，并经重分类修正已落库的会话与派生统计
+        """
+        iv = None
+        if self._open and self._open['id'] == interval_id:
+            if raw_data is None:
+                raw_data = self._build_raw_data(self._open['window_title'], self._open['process_name'], None)
+        else:
+            iv = IntervalDAO.get_interval(interval_id)
+            if iv is None:
+                return
+            if raw_data is None:
+                raw_data = self._build_raw_data(iv['window_title'], iv['process_name'], None)
+            if iv['settled']:
+                if iv['label_source'] == self.FALLBACK_SOURCE and source != self.FALLBACK_SOURCE:
+                    self._correct_fallback(iv, status, summary, source, raw_data)
+                return
+
+        IntervalDAO.set_label(interval_id, status, summary, source, raw_data)
+        if self._open and self._open['id'] == interval_id:
+            self._open.update({
+                'status': status,
+                'summary': summary,
+                'label_source': source,
+                'raw_data': raw_data
+            })
+        else:
+            self._settle_ready()
+
+    def attach_fallback(self, interval_id: int):
+        """分类已放弃 (离线队列超过重试上限)：仍无标签的区间以兜底标签计入"""
+        iv = self._open if self._open and self._open['id'] == interval_id else IntervalDAO.get_interval(interval_id)
+        if iv is None or iv['status'] is not None:
+            return
+        status, summary = self.fallback_label(iv)
+        self.attach_label(interval_id, status, summary, source=self.FALLBACK_SOURCE)
+
+    @staticmethod
+    def fallback_label(iv):
+        """兜底标签 (status, summary)：空窗口或进程名按锁屏离开处理，其余记为 unknown"""
+        if not (iv['window_title'] or '').strip() or not (iv['process_name'] or '').strip():
+            return "entertainment", "锁屏离开"
+        return "unknown", None
+
+    def _correct_fallback(self, iv, status, summary, source, raw_data):
+        """迟到的标签替换已计入统计的兜底标签：会话从兜底状态改为新状态，派生表按重分类的方式同步"""
+        if not IntervalDAO.replace_fallback_label(iv['id'], status, summary, source, raw_data):
+            return
+        if status == iv['status']:
+            return
+        try:
+            days = ReclassifyEngine.relabel_interval(
+                iv['window_title'], iv['process_name'], iv['start_ts'], iv['end_ts'], iv['status'], status
+            )
+            if days:
+                print(f"[TimeLedger] Corrected fallback label of interval {iv['id']}: {iv['status']} -> {status}")
+        except Exception as e:
+            print(f"[TimeLedger] Fallback correction error: {e}")
+
+    def flush(self, ts: float = None):
+        """
+        检查点：把当前已有标签的区间在 ts 处切开并计入统计，
+        续接的新区间沿用同一标签 (同一窗口，标签直到新结果到达前都有效)。
+        用于长时间停留在同一窗口时保持统计实时。
+        """
+        if not self._open or not self._open.get('status'):
+            return
+        ts = ts if ts is not None else time.time()
+        prev = self._open
+        self.switch(prev['window_title'], prev['process_name'], ts)
+        self.attach_label(self._open['id'], prev['status'], prev['summary'],
+                          prev['label_source'], prev['raw_data'])
+
+    def _settle_ready(self):
+        """
+        将 已结束 + 已有标签 的区间按时间顺序计入派生统计。
+        遇到第一个尚无标签的已结束区间即停止，保证 record_interval 看到的顺序与实际一致；
+        它结束已超过 LABEL_WAIT_SECONDS 时改用兜底标签计入，不让一个区间卡住之后的全部统计。
+        """
+        days = set()
+        try:
+            for iv in IntervalDAO.get_unsettled_closed():
+                if iv['status'] is None:
+                    if self._now is None or self._now - iv['end_ts'] < self.LABEL_WAIT_SECONDS:
+                        break
+                    iv['status'], iv['summary'] = self.fallback_label(iv)
+                    iv['raw_data'] = self._build_raw_data(iv['window_title'], iv['process_name'], None)
+                    IntervalDAO.set_label(iv['id'], iv['status'], iv['summary'], self.FALLBACK_SOURCE, iv['raw_data'])
+                    print(f"[TimeLedger] Interval {iv['id']} unlabeled for {self.LABEL_WAIT_SECONDS}s, "
+                          f"settled as '{iv['status']}'")
+                self.history.record_interval(
+                    iv['status'], iv['start_ts'], iv['end_ts'],
+                    summary=iv['summary'], raw_data=iv['raw_data']
+                )
+                IntervalDAO.mark_settled(iv['id'])
+                days.update(time.strftime("%Y-%m-%d", time.localtime(ts)) for ts in (iv['start_ts'], iv['end_ts']))
+        except Exception as e:
+            print(f"[TimeLedger] Settle Error: {e}")
+        # 会话已落库，把差值计入核心事件累计表 (读取 Top-N 时无需再扫描全天)
+        if days:
+            try:
+                CoreEventAggregateDAO.refresh(days)
+            except Exception as e:
+                print(f"[TimeLedger] Core events sync error: {e}")
+
+    @staticmethod
+    def _build_raw_data(window_title, process_name, ai_raw):
+        return json.dumps({
+            "window": window_title,
+            "process": process_name,
+            "ai_raw": ai_raw
+        }, ensure_ascii=False)
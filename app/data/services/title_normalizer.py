@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+[正在使用]
+窗口标题归一化 (共享)
+规则来自数据文件 title_rules.json (浏览器后缀、IDE 文件名提取、站点映射、日报分类关键词)，
+加载时一次编译；结果按 (应用, 标题) 放进有界 LRU 缓存，同一标题不再重复跑正则。
+核心事件提取、日志处理、日报分类与分类缓存的活动键都使用这里的结果。
+
+DATA_DIR 下放一份 title_rules.json 即可覆盖内置规则 (规则版本变化时核心事件累计表会按天重建)。
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from functools import lru_cache
+
+from app.core.config import DATA_DIR
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'title_rules.json')
+USER_RULES_PATH = os.path.join(DATA_DIR, 'title_rules.json')
+CACHE_SIZE = 4096
+
+
+class TitleNormalizer:
+    """
+    规则结构见 title_rules.json:
+    - passthrough_apps: 标题原样返回的应用 (手动补录的会话，标题即用户输入的摘要)
+    - app_groups: 按进程名关键字匹配的应用组 (按顺序，第一个命中的生效)
+        sites    [关键词, 归类名]：标题包含关键词 (不区分大小写，按顺序) 直接归为该站点
+        strip    去除的后缀正则
+        split    取第一个出现的分隔符之前的部分
+        basename 标题是路径时只保留文件名
+    - suffixes: 不知道应用时去除的软件名后缀
+    - noise:    所有标题通用的噪声 (如未读数 "(3) ")
+    - categories / default_category: 日报时间块分类 (关键词匹配标题+摘要，或进程名精确匹配)
+    """
+
+    def __init__(self, rules, cache_size=CACHE_SIZE):
+        self.rules = rules
+        self.version = hashlib.sha1(json.dumps(rules, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+        self._passthrough = {a.lower() for a in rules.get('passthrough_apps', [])}
+        self._groups = []
+        for group in rules.get('app_groups', []):
+            self._groups.append({
+                'match': [m.lower() for m in group.get('match', [])],
+                'sites': [(k.lower(), v) for k, v in group.get('sites', [])],
+                'strip': [re.compile(p) for p in group.get('strip', [])],
+                'split': group.get('split', []),
+                'basename': bool(group.get('basename')),
+            })
+        self._suffixes = [re.compile(p) for p in rules.get('suffixes', [])]
+        self._noise = [re.compile(p) for p in rules.get('noise', [])]
+        self._categories = [(c['name'], tuple(k.lower() for k in c.get('keywords', [])), frozenset(c.get('processes', [])))
+                            for c in rules.get('categories', [])]
+        self._default_category = rules.get('default_category', 'other')
+
+        self._clean = lru_cache(maxsize=cache_size)(self._clean_uncached)
+        self._strip = lru_cache(maxsize=cache_size)(self._strip_uncached)
+        self._category = lru_cache(maxsize=cache_size)(self._category_uncached)
+
+    @classmethod
+    def from_file(cls, path, cache_size=CACHE_SIZE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), cache_size=cache_size)
+
+    # ---------- 对外接口 (带缓存) ----------
+
+    def clean(self, title, app_name):
+        """清洗窗口标题，去除噪音；空标题返回 "Unknown Task"，清洗后为空时返回应用名"""
+        return self._clean(app_name or "", title or "")
+
+    def strip_suffix(self, title):
+        """不区分应用，只去掉软件名后缀与通用噪声 (日志处理的主题提取使用)"""
+        return self._strip(title or "")
+
+    def category(self, process_name, text):
+        """日报时间块分类：text 为标题 + 摘要"""
+        return self._category((process_name or "").lower(), (text or "").lower())
+
+    def cache_info(self):
+        return {name: fn.cache_info()._asdict()
+                for name, fn in (('clean', self._clean), ('strip', self._strip), ('category', self._category))}
+
+    def clear_cache(self):
+        self._clean.cache_clear()
+        self._strip.cache_clear()
+        self._category.cache_clear()
+
+    # ---------- 实现 ----------
+
+    def _group_for(self, app_lower):
+        for group in self._groups:
+            if any(m in app_lower for m in group['match']):
+                return group
+        return None
+
+    def _clean_uncached(self, app_name, title):
+        if not title:
+            return "Unknown Task"
+        t = title.strip()
+        app_lower = app_name.lower()
+        if app_lower in self._passthrough:
+            return t
+
+        group = self._group_for(app_lower)
+        if group is not None:
+            if group['sites']:
+                t_lower = t.lower()
+                for keyword, site in group['sites']:
+                    if keyword in t_lower:
+                        return site  # 直接归类为大类
+            for p in group['strip']:
+                t = p.sub('', t)
+            for sep in group['split']:
+                if sep in t:
+                    t = t.split(sep)[0]
+                    break
+            if group['basename'] and ("\\" in t or "/" in t):
+                t = os.path.basename(t)
+
+        for p in self._noise:
+            t = p.sub('', t.strip())
+        t = t.strip()
+        return t if t else app_name
+
+    def _strip_uncached(self, title):
+        t = title
+        for p in self._suffixes + self._noise:
+            t = p.sub('', t)
+        return t
+
+    def _category_uncached(self, proc, text):
+        for name, keywords, processes in self._categories:
+            if proc in processes or any(k in text for k in keywords):
+                return name
+        return self._default_category
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_normalizer() -> TitleNormalizer:
+    """进程内共享的归一化器 (优先使用 DATA_DIR 下的用户规则文件)"""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                path = USER_RULES_PATH if os.path.exists(USER_RULES_PATH) else RULES_PATH
+                try:
+                    _default = TitleNormalizer.from_file(path)
+                except (OSError, ValueError) as e:
+                    print(f"[TitleNormalizer] Failed to load {path}: {e}, using bundled rules")
+                    _default = TitleNormalizer.from_file(RULES_PATH)
+    return _default
@@ -4,6 +4,8 @@ from typing import Dict, List, Optional
 import json
 
 from app.data.core.database import get_db_connection, get_period_stats_db_connection, get_core_events_db_connection
+from app.data.dao.period_rollup_dao import PeriodRollupDAO
+from app.data.dao.period_baseline_dao import PeriodBaselineDAO
 from app.data.web_report.templates import REPORT_TEMPLATE
 
 class ReportGenerator:
@@ -47,7 +49,8 @@ class ReportGenerator:
                 "peak_day": formatted_data["peak_day_info"],
                 "daily_logs": formatted_data["daily_logs_for_ai"],
                 "period_stats_rows": formatted_data.get("period_stats_rows", []),
-                "top_apps": formatted_data.get("top_apps", "")
+                "top_apps": formatted_data.get("top_apps", ""),
+                "baseline": formatted_data.get("baseline")
             }
             try:
                 ai_result = ai_callback(ai_context)
@@ -61,6 +64,36 @@ class ReportGenerator:
         # 4. 最终渲染
         return self._render_template(formatted_data, ai_result)
 
+    def get_period_overview(self, period_type: str = 'week', count: int = 12) -> Dict:
+        """
+        长周期概览 (最近 N 周 / 月 / 年)：直接读取 period_rollups 的 count 行，不扫描会话。
+        :return: {periods: [每个周期的汇总], summary: 整个区间的合计}
+        """
+        periods = PeriodRollupDAO.get_recent(period_type, count)
+        active = [p for p in periods if p["active_days"]]
+        total_focus = sum(p["total_focus"] for p in periods)
+        active_days = sum(p["active_days"] for p in periods)
+        best = max(active, key=lambda p: p["best_day_focus"]) if active else None
+        hist = [sum(p["peak_hour_hist"][h] for p in periods if p["peak_hour_hist"]) for h in range(24)]
+
+        summary = {
+            "start_date": periods[0]["start_date"],
+            "end_date": periods[-1]["end_date"],
+            "total_focus_hours": round(total_focus / 3600, 1),
+            "avg_focus_hours": round(total_focus / active_days / 3600, 1) if active_days else 0,
+            "active_days": active_days,
+            "willpower_wins": sum(p["willpower_wins"] for p in periods),
+            "max_streak_min": int(max((p["max_streak"] for p in periods), default=0) / 60),
+            # 按有效天数加权
+            "avg_efficiency": round(sum(p["avg_efficiency"] * p["active_days"] for p in active) / active_days, 1) if active_days else 0,
+            "best_period": max(active, key=lambda p: p["total_focus"])["period_key"] if active else None,
+            "best_day": best["best_day"] if best else None,
+            "best_day_hours": round(best["best_day_focus"] / 3600, 1) if best else 0,
+            "peak_hour": max(range(24), key=lambda h: (hist[h], -h)) if any(hist) else None,
+            "peak_hour_hist": hist,
+        }
+        return {"period_type": period_type, "periods": periods, "summary": summary}
+
     def _fetch_data(self, start_date: date, end_date: date) -> Dict:
         """从数据库拉取原始数据"""
         data = {
@@ -88,10 +121,10 @@ class ReportGenerator:
             cursor = conn.execute("""
                 SELECT start_time, end_time, duration, window_title, process_name
                 FROM window_sessions
-                WHERE date(start_time) BETWEEN ? AND ?
+                WHERE start_time BETWEEN ? AND ?
                 ORDER BY duration DESC
                 LIMIT 1
-            """, (s_str, e_str))
+            """, (f"{s_str} 00:00:00", f"{e_str} 23:59:59"))
             row = cursor.fetchone()
             if row:
                 data["peak_session"] = dict(row)
@@ -158,6 +191,8 @@ class ReportGenerator:
                 })
             data["period_summary_map"] = period_map
             data["period_stats_rows"] = period_rows
+            # 报告区间开始前的个人基线 (30 天常态)，用于与本期对比
+            data["baseline"] = PeriodBaselineDAO.norm(conn.cursor(), start_date)
 
         return data
 
@@ -298,6 +333,7 @@ class ReportGenerator:
             
             daily_logs_for_ai.append({
                 "date": fmt_date,
+                "iso_date": d_str,
                 "items_context": items_context_str, # 新字段：包含多条记录
                 "hours": row_data["hours"]
             })
@@ -324,7 +360,8 @@ class ReportGenerator:
             "peak_day_info": peak_day_info,
             "daily_rows_data": daily_rows_data,
             "daily_logs_for_ai": daily_logs_for_ai,
-            "period_stats_rows": data.get("period_stats_rows", [])
+            "period_stats_rows": data.get("period_stats_rows", []),
+            "baseline": data.get("baseline")
         }
 
     def _render_template(self, data: Dict, ai_result: Dict) -> str:
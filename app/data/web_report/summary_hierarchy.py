@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+长周期报告的分层摘要 (map-reduce)
+日摘要 -> 周摘要 -> 月摘要，每一层的结果都写入 LLM 输出缓存并复用。
+已经过去的周/月输入不会再变化，所以 90 天报告在低层缓存就绪后只需要少量新的模型调用
+(通常只有本周与本月)。
+"""
+import concurrent.futures
+from datetime import datetime, date
+from typing import Callable, Dict, List, Optional
+
+
+# 修改提示词时同步提升版本号，旧缓存随之失效
+WEEKLY_PROMPT_VERSION = "weekly_summary/v1"
+MONTHLY_PROMPT_VERSION = "monthly_summary/v1"
+
+WEEKLY_PROMPT = """
+Role: 你是一个极其敏锐的数据分析师。
+Task: 阅读用户在 {scope} 这一周每天的核心事项，概括这一周的主线。
+Data Context:
+{lines}
+
+Constraints:
+- 只输出一句话，≤ 40 字，不要分点、不要加多余说明。
+- 抓住本周投入最多的 1-2 条主线；娱乐占比明显时简要提及。
+"""
+
+MONTHLY_PROMPT = """
+Role: 你是一个极其敏锐的数据分析师。
+Task: 阅读用户在 {scope} 这个月每一周的摘要，概括这个月的主线与变化。
+Data Context:
+{lines}
+
+Constraints:
+- 只输出一到两句话，≤ 60 字，不要分点、不要加多余说明。
+- 指出本月的主要投入方向，以及前后几周的节奏变化。
+"""
+
+# 报告跨度超过这些天数时，致追梦者寄语改用更高一层的摘要作为上下文
+WEEKLY_LEVEL_MIN_DAYS = 8
+MONTHLY_LEVEL_MIN_DAYS = 32
+
+
+def week_key(d: date) -> str:
+    iso = d.isocalendar()
+    return f"{iso[0]}-W{iso[1]:02d}"
+
+
+def month_key_of_week(wk: str) -> str:
+    """ISO 周按其周四所在月份归属"""
+    year, week = wk.split("-W")
+    thursday = date.fromisocalendar(int(year), int(week), 4)
+    return thursday.strftime("%Y-%m")
+
+
+def _parse_date(d) -> date:
+    if isinstance(d, date):
+        return d
+    return datetime.strptime(str(d), "%Y-%m-%d").date()
+
+
+class SummaryHierarchy:
+    """
+    分层摘要流水线
+    summarize(kind, template_version, scope, prompt) -> str | None
+        由调用方提供：负责查缓存 / 走 LLM 调度器调用模型
+    """
+
+    def __init__(self, summarize: Callable[[str, str, str, str], Optional[str]], max_workers: int = 4):
+        self.summarize = summarize
+        self.max_workers = max_workers
+
+    def _reduce_level(self, groups: Dict[str, List[str]], kind: str, version: str, template: str) -> Dict[str, str]:
+        """同一层内的各分组并发提交 (实际排队与并发上限由 LLM 调度器控制)"""
+        results = {}
+
+        def run(scope, lines):
+            prompt = template.format(scope=scope, lines="\n".join(lines))
+            return scope, self.summarize(kind, version, scope, prompt)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(run, scope, lines) for scope, lines in sorted(groups.items())]
+            for fut in concurrent.futures.as_completed(futures):
+                try:
+                    scope, text = fut.result()
+                    if text:
+                        results[scope] = text.strip()
+                except Exception as e:
+                    print(f"[SummaryHierarchy] {kind} failed: {e}")
+        return results
+
+    def build(self, daily: List[Dict]) -> Dict:
+        """
+        daily: [{"date": "YYYY-MM-DD", "line": "1月21日: 编写后端代码，调试脚本 (3.1h)"}, ...]
+        返回 {"daily": [...], "weekly": {周: 摘要}, "monthly": {月: 摘要}}
+        跨度不足 WEEKLY_LEVEL_MIN_DAYS / MONTHLY_LEVEL_MIN_DAYS 时跳过对应层级
+        """
+        weeks: Dict[str, List[str]] = {}
+        for item in sorted(daily, key=lambda x: x["date"]):
+            weeks.setdefault(week_key(_parse_date(item["date"])), []).append(item["line"])
+
+        weekly = {}
+        if len(daily) >= WEEKLY_LEVEL_MIN_DAYS:
+            weekly = self._reduce_level(weeks, "weekly_summary", WEEKLY_PROMPT_VERSION, WEEKLY_PROMPT)
+
+        monthly = {}
+        if len(daily) >= MONTHLY_LEVEL_MIN_DAYS and weekly:
+            months: Dict[str, List[str]] = {}
+            for wk in sorted(weekly):
+                months.setdefault(month_key_of_week(wk), []).append(f"{wk}: {weekly[wk]}")
+            monthly = self._reduce_level(months, "monthly_summary", MONTHLY_PROMPT_VERSION, MONTHLY_PROMPT)
+
+        return {"daily": [d["line"] for d in daily], "weekly": weekly, "monthly": monthly}
+
+    @staticmethod
+    def narrative_context(levels: Dict, max_chars: int = 800) -> str:
+        """为最终寄语挑选最合适的一层：月 > 周 > 日，截断到 max_chars"""
+        if levels.get("monthly"):
+            lines = [f"{k}: {v}" for k, v in sorted(levels["monthly"].items())]
+        elif levels.get("weekly"):
+            lines = [f"{k}: {v}" for k, v in sorted(levels["weekly"].items())]
+        else:
+            lines = levels.get("daily", [])
+        text = "；".join(lines)
+        return text if len(text) <= max_chars else text[:max_chars] + "…"
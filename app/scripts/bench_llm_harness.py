@@ -0,0 +1,408 @@
+"""
+LLM 基准测试工具 (配合 Mock Ollama，无需真实模型)
+启动本地 Mock 服务，依次驱动：
+- client:   LangflowClient.call_flow 并发调用
+- classify: AIProcessor.classify 结构化分类，并核对标签是否符合 Mock 规则
+- stream:   流式调用的首 token 时间 (TTFT) 与总耗时
+- worker:   按 AI Worker 的流水线回放一段窗口切换序列
+            (标题归一化 -> 分类缓存 -> _classifier_loop 异步分类 -> 写回缓存)
+            完整主循环依赖真实的焦点检测 (win32/pynput)，这里只回放其分类路径
+- report:   在临时数据目录中生成模拟历史，调用 /api/report/generate (冷启动 + 缓存命中)
+- recovery: 让 Mock 全部失败一段时间再恢复，统计熔断期间的快速失败与恢复耗时
+输出各场景的 p50/p95/p99 延迟、吞吐与错误数。
+
+用法:
+    python app/scripts/bench_llm_harness.py --latency 0.05 --tps 200 --requests 200 --concurrency 4
+    python app/scripts/bench_llm_harness.py --scenarios client,recovery --failure-rate 0.1 --json result.json
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+# Add project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+SCENARIOS = ["client", "classify", "stream", "worker", "report", "recovery"]
+
+# 分类样本：(窗口标题, 进程名, Mock 规则下的期望状态)
+WINDOW_SAMPLES = [
+    ("web_API.py - flow-state - Visual Studio Code", "Code.exe", "学习工作"),
+    ("季度报告.docx - Word", "WINWORD.EXE", "学习工作"),
+    ("Python 官方文档 - Microsoft Edge", "msedge.exe", "学习工作"),
+    ("【4K】年度最佳动画 - 哔哩哔哩 (゜-゜)つロ 干杯~-bilibili", "msedge.exe", "娱乐"),
+    ("YouTube - Google Chrome", "chrome.exe", "娱乐"),
+    ("Steam", "steam.exe", "娱乐"),
+    ("Windows 默认锁屏界面", "LockApp.exe", "休息"),
+    ("(3) 微信", "WeChat.exe", "学习工作"),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+class Result:
+    """单个场景的结果"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.wall = 0.0
+        self.extra = {}
+
+    def row(self):
+        ms = [v * 1000 for v in self.latencies]
+        n = len(ms) + self.errors
+        return {
+            "scenario": self.name,
+            "n": n,
+            "ok": len(ms),
+            "errors": self.errors,
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "throughput_rps": round(n / self.wall, 2) if self.wall else 0,
+            **self.extra,
+        }
+
+
+def _drive(result, fn, items, concurrency):
+    """并发执行 fn(item)；返回 None 或抛异常记为错误"""
+    lock = threading.Lock()
+
+    def one(item):
+        t0 = time.perf_counter()
+        try:
+            ok = fn(item) is not None
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with lock:
+            if ok:
+                result.latencies.append(elapsed)
+            else:
+                result.errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, items))
+    result.wall = time.perf_counter() - t0
+    return result
+
+
+# ---------- 场景 ----------
+
+def scenario_client(args, server):
+    from app.service.ai.langflow_client import LangflowClient
+    from app.service.ai.llm_scheduler import Priority
+    client = LangflowClient(timeout=30)
+    result = Result("client")
+    return _drive(result, lambda i: client.call_flow("bench", f"第 {i} 次请求", priority=Priority.CHAT),
+                  range(args.requests), args.concurrency)
+
+
+def scenario_classify(args, server):
+    from app.service.detector.detector_logic import classify
+    result = Result("classify")
+    correct = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal correct
+        title, proc, expected = WINDOW_SAMPLES[i % len(WINDOW_SAMPLES)]
+        data = classify(f"窗口: '{title}' | 进程: {proc} | 持续: 12.00s")
+        if data and data.get("状态") == expected:
+            with lock:
+                correct += 1
+        return data
+
+    _drive(result, one, range(args.requests), args.concurrency)
+    result.extra["label_agreement"] = round(correct / max(1, len(result.latencies)), 3)
+    return result
+
+
+def scenario_stream(args, server):
+    from app.service.ai.langflow_client import LangflowClient
+    client = LangflowClient(timeout=30)
+    result = Result("stream")
+    ttfts = []
+    lock = threading.Lock()
+
+    def one(i):
+        t0 = time.perf_counter()
+        first = None
+        parts = []
+        for delta in client.stream_flow("bench", f"流式请求 {i}"):
+            if delta and first is None:
+                first = time.perf_counter() - t0
+            parts.append(delta)
+        if first is None:
+            return None
+        with lock:
+            ttfts.append(first)
+        return "".join(parts)
+
+    _drive(result, one, range(max(1, args.requests // 10)), args.concurrency)
+    result.extra["ttft_p50_ms"] = round(percentile(ttfts, 50) * 1000, 2)
+    result.extra["ttft_p95_ms"] = round(percentile(ttfts, 95) * 1000, 2)
+    return result
+
+
+def scenario_worker(args, server):
+    """按 AI Worker 的分类路径回放窗口切换：缓存命中直接出标签，未命中交给后台分类线程"""
+    from app.service.monitor_service import _classifier_loop, map_ai_status
+    from app.service.detector.detector_logic import classify
+    from app.service.detector.classification_cache import ClassificationCache
+    from app.service.detector.title_canonicalizer import TitleCanonicalizer
+
+    canonicalizer = TitleCanonicalizer()
+    cache = ClassificationCache(key_fn=canonicalizer.activity_key)
+    jobs, results = queue.Queue(), queue.Queue()
+    running = threading.Event()
+    running.set()
+    failed_jobs = []
+    threading.Thread(target=_classifier_loop, args=(jobs, results, running, classify, lambda job, err=None: failed_jobs.append(job)),
+                     daemon=True).start()
+
+    rng = random.Random(42)
+    trace = []
+    for i in range(args.requests):
+        title, proc, _ = rng.choice(WINDOW_SAMPLES)
+        # 模拟标题噪声：未读计数变化
+        if rng.random() < 0.3:
+            title = f"({rng.randint(1, 9)}) {title}"
+        trace.append((title, proc))
+
+    result = Result("worker")
+    hits = misses = suppressed = 0
+    last = (None, None)
+    t_start = time.perf_counter()
+    for title, proc in trace:
+        if not canonicalizer.is_meaningful_change(last[0], last[1], title, proc):
+            suppressed += 1
+            last = (title, proc)
+            continue
+        last = (title, proc)
+        t0 = time.perf_counter()
+        cached = cache.get(title, proc, min_confidence=0.5)
+        if cached:
+            hits += 1
+            result.latencies.append(time.perf_counter() - t0)
+            continue
+        misses += 1
+        jobs.put({"interval_id": None, "window_title": title, "process_name": proc, "duration": 12.0})
+        try:
+            job, ai_data = results.get(timeout=60)
+        except queue.Empty:
+            result.errors += 1
+            continue
+        if not ai_data:
+            result.errors += 1
+            continue
+        status = map_ai_status(ai_data.get("状态", "focus"), title)
+        cache.put(title, proc, status, ai_data.get("活动摘要", ""), ai_raw=ai_data,
+                  confidence=ai_data.get("confidence", 1.0))
+        result.latencies.append(time.perf_counter() - t0)
+    result.wall = time.perf_counter() - t_start
+    running.clear()
+    result.extra.update({"cache_hits": hits, "llm_calls": misses, "noise_suppressed": suppressed,
+                         "offline_queued": len(failed_jobs)})
+    return result
+
+
+def _seed_history(days):
+    """在 (临时) 数据目录中写入 days 天的模拟窗口会话与每日统计"""
+    from app.data.core.database import init_db, get_db_connection
+    init_db()
+    rng = random.Random(7)
+    today = date.today()
+    with get_db_connection() as conn:
+        for d in range(days):
+            day = today - timedelta(days=d)
+            hour = 9
+            focus = entertainment = 0
+            for title, proc, expected in rng.sample(WINDOW_SAMPLES, 5):
+                status = {"学习工作": "work", "娱乐": "entertainment", "休息": "rest"}[expected]
+                minutes = rng.randint(20, 90)
+                start = f"{day} {hour:02d}:00:00"
+                end = f"{day} {hour:02d}:{min(59, minutes):02d}:00"
+                conn.execute(
+                    '''INSERT INTO window_sessions (start_time, end_time, window_title, process_name, status, duration, summary)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                    (start, end, title, proc, status, minutes * 60, None)
+                )
+                hour += 2
+                if status == "work":
+                    focus += minutes * 60
+                elif status == "entertainment":
+                    entertainment += minutes * 60
+            conn.execute(
+                '''INSERT OR REPLACE INTO daily_stats (date, total_focus_time, total_entertainment_time, efficiency_score)
+                   VALUES (?, ?, ?, ?)''',
+                (day.isoformat(), focus, entertainment, rng.randint(50, 95))
+            )
+        conn.commit()
+
+
+def scenario_report(args, server):
+    from app.service.API.web_API import create_app
+    _seed_history(args.report_days)
+    app = create_app()
+    client = app.test_client()
+    result = Result("report")
+    t_start = time.perf_counter()
+    for label in ("cold", "warm"):
+        before = server.stats.get("requests", 0)
+        t0 = time.perf_counter()
+        resp = client.post('/api/report/generate', json={"days": args.report_days})
+        elapsed = time.perf_counter() - t0
+        if resp.status_code == 200:
+            result.latencies.append(elapsed)
+        else:
+            result.errors += 1
+        result.extra[f"{label}_s"] = round(elapsed, 2)
+        result.extra[f"{label}_llm_calls"] = server.stats.get("requests", 0) - before
+    result.wall = time.perf_counter() - t_start
+    return result
+
+
+def scenario_recovery(args, server):
+    """全部失败 outage 秒后恢复：统计熔断期间的快速失败，以及恢复后第一次成功所需时间"""
+    from app.service.ai.langflow_client import LangflowClient, get_shared_breaker
+    from app.service.ai.llm_scheduler import Priority
+    breaker = get_shared_breaker()
+    breaker.reset_timeout = args.breaker_reset
+    client = LangflowClient(timeout=10)
+    result = Result("recovery")
+
+    saved = dict(server.config)
+    server.config.update(failure_rate=1.0, failure_mode="error")
+    outage_end = time.time() + args.outage
+    fast_fail = 0
+    t_start = time.perf_counter()
+    while time.time() < outage_end:
+        t0 = time.perf_counter()
+        ok = client.call_flow("bench", "outage", priority=Priority.REALTIME)
+        elapsed = time.perf_counter() - t0
+        if ok is None:
+            result.errors += 1
+            if elapsed < 0.01:
+                fast_fail += 1
+        time.sleep(0.05)
+    server.config.update(failure_rate=saved["failure_rate"], failure_mode=saved["failure_mode"])
+
+    restored = time.perf_counter()
+    recovered_after = None
+    while time.perf_counter() - restored < args.breaker_reset + 10:
+        t0 = time.perf_counter()
+        if client.call_flow("bench", "recovery", priority=Priority.REALTIME) is not None:
+            result.latencies.append(time.perf_counter() - t0)
+            recovered_after = time.perf_counter() - restored
+            break
+        result.errors += 1
+        time.sleep(0.1)
+    result.wall = time.perf_counter() - t_start
+    result.extra.update({
+        "breaker_fast_failures": fast_fail,
+        "recovered_after_s": round(recovered_after, 2) if recovered_after is not None else None,
+        "breaker_state": breaker.state,
+    })
+    return result
+
+
+def print_table(rows):
+    cols = ["scenario", "n", "ok", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+    print(" ".join(f"{c:>14}" for c in cols))
+    for row in rows:
+        print(" ".join(f"{str(row[c]):>14}" for c in cols))
+        extra = {k: v for k, v in row.items() if k not in cols}
+        if extra:
+            print(" " * 15 + "  ".join(f"{k}={v}" for k, v in extra.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 基准测试 (Mock Ollama)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"逗号分隔，可选: {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock 首 token 延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--tps", type=float, default=500.0, help="Mock 生成速度 (token/秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-mode", default="error", choices=["error", "timeout", "garbage", "disconnect"])
+    parser.add_argument("--parallel", type=int, default=None, help="LLM 调度器并发上限 (默认同 --concurrency)")
+    parser.add_argument("--report-days", type=int, default=14)
+    parser.add_argument("--outage", type=float, default=3.0, help="recovery 场景的故障时长 (秒)")
+    parser.add_argument("--breaker-reset", type=float, default=2.0, help="recovery 场景的熔断恢复探测间隔 (秒)")
+    parser.add_argument("--data-dir", default=None, help="数据目录 (默认使用临时目录，不影响真实数据)")
+    parser.add_argument("--json", default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    tmp_dir = None
+    if not args.data_dir:
+        tmp_dir = args.data_dir = tempfile.mkdtemp(prefix="flowstate-bench-")
+    # 必须在导入 app.data 之前设置
+    os.environ["FLOW_STATE_DATA_DIR"] = args.data_dir
+
+    from app.scripts.mock_ollama import start_mock_server
+    server, base_url = start_mock_server(
+        latency=args.latency, jitter=args.jitter, tps=args.tps,
+        failure_rate=args.failure_rate, failure_mode=args.failure_mode, hang_seconds=2.0, seed=1,
+    )
+    os.environ["OLLAMA_BASE_URL"] = base_url
+    os.environ.setdefault("OLLAMA_MODEL", "mock:latest")
+
+    from app.data.core.database import init_db
+    from app.service.ai.llm_scheduler import Priority, configure_scheduler
+    init_db()
+    # 基准测试关注调用链路本身，取消各类别的速率上限
+    configure_scheduler(max_concurrency=args.parallel or args.concurrency,
+                        rate_limits={p: None for p in Priority})
+
+    print(f"Mock Ollama: {base_url}  latency={args.latency}s jitter={args.jitter}s tps={args.tps} "
+          f"failure_rate={args.failure_rate} ({args.failure_mode})  data_dir={args.data_dir}\n")
+
+    runners = {
+        "client": scenario_client, "classify": scenario_classify, "stream": scenario_stream,
+        "worker": scenario_worker, "report": scenario_report, "recovery": scenario_recovery,
+    }
+    rows = []
+    try:
+        for name in scenarios:
+            print(f"--- {name} ---")
+            rows.append(runners[name](args, server).row())
+    finally:
+        server.shutdown()
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": rows}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Ollama 传输层延迟基准
+对比「每次 requests.post 新建连接」与「共享连接池 Session」的调用延迟，
+并验证 /api/chat 不可用时回退探测只发生一次。
+
+用法:
+    python app/scripts/bench_ollama_transport.py --requests 200 --latency 0.005
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Add project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.scripts.mock_ollama import start_mock_server
+from app.service.ai.ollama_transport import OllamaTransport
+
+PAYLOAD = {"model": "mock:latest", "messages": [{"role": "user", "content": "窗口: 'x' | 进程: code.exe"}], "stream": False}
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def _report(name, latencies, wall):
+    ms = [v * 1000 for v in latencies]
+    print(f"{name:<28} n={len(ms):<5} mean={statistics.mean(ms):7.2f}ms  "
+          f"p50={_percentile(ms, 50):7.2f}ms  p95={_percentile(ms, 95):7.2f}ms  "
+          f"total={wall:6.2f}s")
+
+
+def _run(call, n, workers):
+    latencies = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        for i in range(n):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(one, range(n)))
+    return latencies, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama 传输层延迟基准")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock 服务模拟的生成延迟 (秒)")
+    parser.add_argument("--workers", type=int, default=5, help="并发场景的线程数 (对应报告生成的线程池)")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency)
+    print(f"Mock Ollama: {base_url}\n")
+    transport = OllamaTransport(base_url)
+
+    def bare():
+        requests.post(f"{base_url}/api/chat", json=PAYLOAD, timeout=30).json()
+
+    def pooled():
+        transport.post("/api/chat", PAYLOAD).json()
+
+    for workers in (1, args.workers):
+        label = "串行" if workers == 1 else f"并发x{workers}"
+        _report(f"requests.post ({label})", *_run(bare, args.requests, workers))
+        _report(f"pooled session ({label})", *_run(pooled, args.requests, workers))
+    server.shutdown()
+
+    # 回退探测：旧版 Ollama 没有 /api/chat，统计实际打到 /api/chat 的次数
+    server, base_url = start_mock_server(latency=args.latency, no_chat=True)
+    os.environ['OLLAMA_BASE_URL'] = base_url
+    from app.service.ai.langflow_client import LangflowClient
+    client = LangflowClient(timeout=30)
+    probes = 0
+    orig_post = client.transport.post
+
+    def counting_post(path, *a, **kw):
+        nonlocal probes
+        if path == "/api/chat":
+            probes += 1
+        return orig_post(path, *a, **kw)
+
+    client.transport.post = counting_post
+    for _ in range(20):
+        client.call_flow("bench", "hello")
+    print(f"\n/api/chat 不可用时 20 次调用的探测次数: {probes}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
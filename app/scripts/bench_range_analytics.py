@@ -0,0 +1,203 @@
+"""
+区间分析基准：列式向量化 (SessionFrame) vs 逐行实现
+在临时数据目录中生成 --days 天的模拟会话，对比：
+- legacy:  旧版 AnalysisDAO.get_daily_breakdown / get_willpower_victories (每天一个连接、多次查询、逐行循环)
+- metrics: 每天读取会话后用 SessionMetrics 逐行累加 (单日统计的实现)
+- frame:   SessionFrame 一次读取整个区间 (之后只重读变化的日期)，按天指标用 cumsum 分组等数组运算得出
+并逐天核对 frame 与 SessionMetrics 的结果是否一致。
+
+用法:
+    python app/scripts/bench_range_analytics.py --days 365 --sessions-per-day 300
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+
+# Add project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+STATUSES = ["work", "work", "focus", "entertainment", "other", "unknown", "idle"]
+APPS = ["Code.exe", "WINWORD.EXE", "msedge.exe", "chrome.exe", "WeChat.exe", "steam.exe", "explorer.exe"]
+
+
+def seed(days, per_day):
+    from app.data.core.database import init_db, get_db_connection
+    init_db()
+    rng = random.Random(3)
+    first = date.today() - timedelta(days=days - 1)
+    rows = []
+    for d in range(days):
+        t = datetime.combine(first + timedelta(days=d), datetime.min.time()) + timedelta(hours=8)
+        for _ in range(per_day):
+            dur = rng.choice([20, 60, 150, 280, 320, 600, 1500])
+            rows.append((t.strftime("%Y-%m-%d %H:%M:%S"), (t + timedelta(seconds=dur)).strftime("%Y-%m-%d %H:%M:%S"),
+                         f"window {rng.randint(0, 40)}", rng.choice(APPS), rng.choice(STATUSES), dur))
+            t += timedelta(seconds=dur + rng.choice([0, 5, 30, 90, 240]))
+            if t.hour == 23 and t.minute > 50:
+                break
+    with get_db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO window_sessions (start_time, end_time, window_title, process_name, status, duration) '
+            'VALUES (?, ?, ?, ?, ?, ?)', rows)
+        conn.commit()
+    return first.isoformat(), (first + timedelta(days=days - 1)).isoformat(), len(rows)
+
+
+def _days(start_date, end_date):
+    d = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    while d <= end:
+        yield d.strftime("%Y-%m-%d")
+        d += timedelta(days=1)
+
+
+def legacy_daily_breakdown(start_date, end_date):
+    """重构前的 AnalysisDAO.get_daily_breakdown：每天 3 次查询 + 逐行合并"""
+    from app.data.core.database import get_db_connection
+    results = []
+    for day in _days(start_date, end_date):
+        day_start, day_end = f"{day} 00:00:00", f"{day} 23:59:59"
+        with get_db_connection() as conn:
+            focus = conn.execute(
+                "SELECT SUM(duration) FROM window_sessions WHERE start_time BETWEEN ? AND ? AND status IN ('work', 'focus')",
+                (day_start, day_end)).fetchone()[0] or 0
+            rows = conn.execute(
+                'SELECT duration, status FROM window_sessions WHERE start_time BETWEEN ? AND ? ORDER BY start_time ASC',
+                (day_start, day_end)).fetchall()
+            max_streak = current = 0
+            for r in rows:
+                if r['status'] in ['work', 'focus']:
+                    current += r['duration']
+                else:
+                    max_streak = max(max_streak, current)
+                    current = 0
+            max_streak = max(max_streak, current)
+            top = conn.execute(
+                "SELECT window_title, SUM(duration) AS total_dur FROM window_sessions WHERE start_time BETWEEN ? AND ? "
+                "AND status IN ('work', 'focus') GROUP BY window_title ORDER BY total_dur DESC LIMIT 1",
+                (day_start, day_end)).fetchone()
+            results.append({"date": day, "focus_hours": round(focus / 3600, 1),
+                            "max_streak_minutes": int(max_streak / 60),
+                            "top_activity_raw": top['window_title'] if top else "无记录"})
+    return results
+
+
+def legacy_willpower(start_date, end_date):
+    """重构前的 AnalysisDAO.get_willpower_victories：整个区间逐行跑状态机"""
+    from app.data.core.database import get_db_connection
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            'SELECT status, duration FROM window_sessions WHERE start_time BETWEEN ? AND ? ORDER BY start_time ASC',
+            (f"{start_date} 00:00:00", f"{end_date} 23:59:59")).fetchall()
+    wins = state = 0
+    for r in rows:
+        is_focus = r['status'] in ['work', 'focus']
+        is_distraction = r['status'] in ['entertainment', 'other', 'unknown']
+        if state == 0:
+            if is_focus and r['duration'] > 300:
+                state = 1
+        elif state == 1:
+            if is_distraction:
+                state = 2 if r['duration'] < 300 else 0
+        elif state == 2:
+            if is_focus:
+                wins += 1
+                state = 1 if r['duration'] > 300 else 0
+            elif is_distraction:
+                state = 0
+    return wins
+
+
+def metrics_per_day(start_date, end_date):
+    """逐天读取会话并用 SessionMetrics 逐行累加"""
+    from app.data.core.database import get_db_connection
+    from app.data.dao.session_metrics import SessionMetrics
+    out = {}
+    with get_db_connection() as conn:
+        for day in _days(start_date, end_date):
+            rows = conn.execute(
+                'SELECT start_time, duration, status FROM window_sessions WHERE start_time BETWEEN ? AND ? '
+                'ORDER BY start_time ASC, id ASC', (f"{day} 00:00:00", f"{day} 23:59:59")).fetchall()
+            out[day] = SessionMetrics().extend(rows).snapshot()
+    return out
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="区间分析基准 (向量化 vs 逐行)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--sessions-per-day", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3, help="每项取最快的一次")
+    parser.add_argument("--data-dir", default=None, help="数据目录 (默认使用临时目录，不影响真实数据)")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if not args.data_dir:
+        tmp_dir = args.data_dir = tempfile.mkdtemp(prefix="flowstate-bench-")
+    # 必须在导入 app.data 之前设置
+    os.environ["FLOW_STATE_DATA_DIR"] = args.data_dir
+
+    try:
+        start_date, end_date, n = seed(args.days, args.sessions_per_day)
+        print(f"Seeded {n} sessions over {args.days} days ({start_date} .. {end_date})  data_dir={args.data_dir}\n")
+
+        from app.data.dao.range_analytics import SessionFrame
+        from app.data.dao.analysis_dao import AnalysisDAO
+
+        _, t_cold = timed(lambda: SessionFrame.load(start_date, end_date), 1)
+        frame, t_load = timed(lambda: SessionFrame.load(start_date, end_date), args.repeat)
+        # 帧会缓存按天结果，计时前清空，测的是一次完整计算
+        daily, t_daily = timed(lambda: (frame._memo_cache.clear(), frame.daily_metrics())[1], args.repeat)
+        rows = [
+            ("legacy get_daily_breakdown", timed(lambda: legacy_daily_breakdown(start_date, end_date), args.repeat)[1]),
+            ("legacy get_willpower_victories", timed(lambda: legacy_willpower(start_date, end_date), args.repeat)[1]),
+            ("SessionMetrics per day", None),
+            ("SessionFrame.load (cold)", t_cold),
+            ("SessionFrame.load (cached columns)", t_load),
+            ("SessionFrame.daily_metrics", t_daily),
+            ("SessionFrame.top_apps + hour_histogram",
+             timed(lambda: (frame.top_apps(), frame.hour_histogram(), frame.top_titles_by_day()), args.repeat)[1]),
+            ("AnalysisDAO.get_daily_breakdown", timed(lambda: AnalysisDAO.get_daily_breakdown(start_date, end_date), args.repeat)[1]),
+            ("AnalysisDAO.get_willpower_victories",
+             timed(lambda: AnalysisDAO.get_willpower_victories(start_date, end_date), args.repeat)[1]),
+        ]
+        reference, t_metrics = timed(lambda: metrics_per_day(start_date, end_date), args.repeat)
+        rows[2] = ("SessionMetrics per day", t_metrics)
+
+        for name, ms in rows:
+            print(f"{name:<42} {ms:10.1f} ms")
+
+        # 逐天核对向量化结果与 SessionMetrics
+        mismatches = []
+        for day, expected in reference.items():
+            got = daily.loc[day].to_dict()
+            for key, value in expected.items():
+                if abs(float(got[key]) - float(value)) > 1e-9:
+                    mismatches.append((day, key, value, got[key]))
+        print(f"\nSessionFrame vs SessionMetrics: {len(reference)} days checked, {len(mismatches)} mismatches")
+        for m in mismatches[:10]:
+            print("  ", m)
+        if mismatches:
+            sys.exit(1)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
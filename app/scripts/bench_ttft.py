@@ -0,0 +1,119 @@
+"""
+实时分类请求的首 token 延迟 (TTFT) 测量
+对比两种请求结构：
+  before: 系统提示词 + 当前时间在前、输入在后，拼成一条 user 消息，不指定 keep_alive
+  after:  固定系统提示词作为独立 system 消息，可变数据放在末尾，显式 keep_alive
+每种结构先卸载模型测一次冷启动，再连续测若干次热请求。
+
+用法 (需要本地 Ollama 或 mock_ollama.py):
+    python app/scripts/bench_ttft.py --runs 5
+    python app/scripts/bench_ttft.py --base-url http://127.0.0.1:11500 --model mock:latest
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import statistics
+
+import requests
+
+# Add project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.service.detector.detector_logic import AIProcessor
+
+SAMPLE_WINDOWS = [
+    ("main.py - flow-state - Visual Studio Code", "Code.exe"),
+    ("Python 官方文档 - Google Chrome", "chrome.exe"),
+    ("哔哩哔哩 (゜-゜)つロ 干杯~ - Microsoft Edge", "msedge.exe"),
+    ("微信", "WeChat.exe"),
+]
+
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def build_before(model, system_prompt, text):
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": f"{system_prompt}\n【当前系统时间】：{_now()}\n\nUser Input: {text}"}],
+        "stream": True
+    }
+
+
+def build_after(model, system_prompt, text, keep_alive):
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt.strip()},
+            {"role": "user", "content": f"User Input: {text}\n【当前系统时间】：{_now()}"}
+        ],
+        "stream": True,
+        "keep_alive": keep_alive
+    }
+
+
+def measure_ttft(session, base_url, payload):
+    """返回 (首个非空 token 到达耗时, 总耗时)，单位秒"""
+    t0 = time.perf_counter()
+    ttft = None
+    with session.post(f"{base_url}/api/chat", json=payload, stream=True, timeout=(3, 600)) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            if ttft is None:
+                try:
+                    chunk = json.loads(line)
+                    if chunk.get("message", {}).get("content") or chunk.get("done"):
+                        ttft = time.perf_counter() - t0
+                except ValueError:
+                    ttft = time.perf_counter() - t0
+    total = time.perf_counter() - t0
+    return (ttft if ttft is not None else total), total
+
+
+def unload(session, base_url, model):
+    """keep_alive=0 让 Ollama 立即卸载模型，用于测量冷启动"""
+    try:
+        session.post(f"{base_url}/api/generate", json={"model": model, "keep_alive": 0}, timeout=(3, 60))
+    except requests.RequestException:
+        pass
+
+
+def run_case(name, session, base_url, model, build, runs):
+    unload(session, base_url, model)
+    window, proc = SAMPLE_WINDOWS[0]
+    cold, _ = measure_ttft(session, base_url, build(f"窗口: '{window}' | 进程: {proc} | 持续: 12.00s"))
+    warm = []
+    for i in range(runs):
+        window, proc = SAMPLE_WINDOWS[(i + 1) % len(SAMPLE_WINDOWS)]
+        ttft, _ = measure_ttft(session, base_url, build(f"窗口: '{window}' | 进程: {proc} | 持续: {i + 6}.00s"))
+        warm.append(ttft)
+    print(f"{name:<8} cold={cold * 1000:8.1f}ms  warm mean={statistics.mean(warm) * 1000:8.1f}ms  "
+          f"min={min(warm) * 1000:8.1f}ms  max={max(warm) * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分类请求 TTFT 测量")
+    parser.add_argument("--base-url", default=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'))
+    parser.add_argument("--model", default=os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud'))
+    parser.add_argument("--keep-alive", default=os.getenv('OLLAMA_KEEP_ALIVE', '30m'))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    system_prompt = AIProcessor().system_prompt
+    session = requests.Session()
+    print(f"Ollama: {args.base_url}  模型: {args.model}\n")
+    run_case("before", session, args.base_url, args.model,
+             lambda text: build_before(args.model, system_prompt, text), args.runs)
+    run_case("after", session, args.base_url, args.model,
+             lambda text: build_after(args.model, system_prompt, text, args.keep_alive), args.runs)
+
+
+if __name__ == "__main__":
+    main()
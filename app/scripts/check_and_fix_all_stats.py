@@ -6,83 +6,60 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from app.data.core.database import get_db_path
+from app.data import ReclassifyEngine
 
 def check_and_fix_all_stats():
     db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
     print(f"Database: {db_path}")
     
     # --- Step 1: Global Misclassification Fix ---
+    # 默认规则 (办公/开发/会议类应用视为工作) 由重分类引擎执行：
+    # 一次扫描找出需要改动的会话，按差值修正 daily_stats / period_stats / core_events，可撤销
     print("\n[1] Fixing global misclassifications...")
-    # List of keywords/apps that should definitely be 'work'
-    # 'WeChat' is tricky, often personal, so skipping it for auto-fix unless it's WeChatWork
-    work_apps = [
-        'Feishu', 'Lark', 'DingTalk', 'WeChatWork', # Communication
-        'Teams', 'Zoom', 'Meeting', 'TencentMeeting', 'wemeetapp', # Meetings
-        'Trae', 'Code', 'PyCharm', 'idea64', 'studio', 'sublime', 'notepad++', # Dev
-        'Word', 'Excel', 'PowerPoint', 'WPS' # Office
-    ]
-    
-    total_fixed = 0
-    for app in work_apps:
-        cursor.execute("""
-            UPDATE window_sessions
-            SET status = 'work'
-            WHERE process_name LIKE ? 
-            AND status IN ('entertainment', 'unknown', 'misc')
-        """, (f'%{app}%',))
-        if cursor.rowcount > 0:
-            print(f"  - Fixed {cursor.rowcount} sessions for '{app}' -> 'work'")
-            total_fixed += cursor.rowcount
-            
-    print(f"  Total sessions reclassified: {total_fixed}")
+    report = ReclassifyEngine().apply()
+    for r in report['rules']:
+        print(f"  - Fixed {r['sessions']} sessions for '{r['name']}' -> 'work'")
+    print(f"  Total sessions reclassified: {report['sessions']}")
+    if report['run_id']:
+        print(f"  Undo with: python app/scripts/reclassify_sessions.py --undo {report['run_id']}")
 
     # --- Step 2: Recalculate and Sync daily_stats ---
     print("\n[2] Checking consistency between 'window_sessions' and 'daily_stats'...")
-    
-    # Get all unique dates from window_sessions
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    # 一次分组查询得到每天按会话计算的时长，并与 daily_stats 对齐 (不再逐日查询)
+    # Focus = work + focus
     cursor.execute("""
-        SELECT DISTINCT date(start_time) as d 
-        FROM window_sessions 
-        WHERE start_time IS NOT NULL 
-        ORDER BY d
+        SELECT s.d,
+               s.calc_focus, s.calc_ent,
+               ds.date AS stored_date,
+               COALESCE(ds.total_focus_time, 0) AS stored_focus,
+               COALESCE(ds.total_entertainment_time, 0) AS stored_ent
+        FROM (
+            SELECT date(start_time) AS d,
+                   SUM(CASE WHEN status IN ('work', 'focus') THEN duration ELSE 0 END) AS calc_focus,
+                   SUM(CASE WHEN status = 'entertainment' THEN duration ELSE 0 END) AS calc_ent
+            FROM window_sessions
+            WHERE start_time IS NOT NULL
+            GROUP BY d
+        ) s
+        LEFT JOIN daily_stats ds ON ds.date = s.d
+        WHERE s.d IS NOT NULL
+        ORDER BY s.d
     """)
-    dates = [row['d'] for row in cursor.fetchall() if row['d']]
+    rows = cursor.fetchall()
     
     updated_days = 0
     
-    for d in dates:
-        start_ts = f"{d} 00:00:00"
-        end_ts = f"{d} 23:59:59"
-        
-        # Calculate from raw data
-        # Focus = work + focus
-        cursor.execute("""
-            SELECT SUM(duration) as total
-            FROM window_sessions 
-            WHERE start_time BETWEEN ? AND ? 
-            AND status IN ('work', 'focus')
-        """, (start_ts, end_ts))
-        calc_focus = cursor.fetchone()['total'] or 0
-        
-        # Entertainment
-        cursor.execute("""
-            SELECT SUM(duration) as total
-            FROM window_sessions 
-            WHERE start_time BETWEEN ? AND ? 
-            AND status = 'entertainment'
-        """, (start_ts, end_ts))
-        calc_ent = cursor.fetchone()['total'] or 0
-        
-        # Get stored stats
-        cursor.execute("SELECT * FROM daily_stats WHERE date = ?", (d,))
-        stored = cursor.fetchone()
-        
-        stored_focus = stored['total_focus_time'] if stored else 0
-        stored_ent = stored['total_entertainment_time'] if stored else 0
+    for row in rows:
+        d = row['d']
+        calc_focus = row['calc_focus'] or 0
+        calc_ent = row['calc_ent'] or 0
+        stored_focus = row['stored_focus']
+        stored_ent = row['stored_ent']
+        stored = row['stored_date'] is not None
         
         # Check for discrepancy (allow small 60s diff)
         diff_focus = abs(calc_focus - stored_focus)
@@ -111,7 +88,7 @@ def check_and_fix_all_stats():
     conn.commit()
     conn.close()
     
-    print(f"\nDone. Sync complete for {len(dates)} days. Updated {updated_days} records.")
+    print(f"\nDone. Sync complete for {len(rows)} days. Updated {updated_days} records.")
 
 if __name__ == "__main__":
     check_and_fix_all_stats()
@@ -0,0 +1,312 @@
+"""
+本地 Mock Ollama 服务 (用于基准测试与离线调试，无需安装 Ollama 与下载模型)
+实现 /api/chat、/api/generate (支持 stream)、/api/tags，并可配置：
+- 首 token 延迟 (--latency / --jitter) 与生成速度 (--tps)
+- 失败率与失败方式 (--failure-rate / --failure-mode: error | timeout | garbage | disconnect)
+- 回复方式：rules (按窗口标题关键词给出分类结果，自由文本给固定回答) 或 canned (固定回复)
+- 模拟旧版 Ollama 不支持 /api/chat (--no-chat，返回 404)
+运行中可通过 POST /api/mock/config 修改配置 (如先全部失败、再恢复)，GET /api/mock/stats 查看请求统计。
+
+用法:
+    python app/scripts/mock_ollama.py --port 11500 --latency 0.05 --tps 80 --failure-rate 0.05
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 python run.py
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = json.dumps({"状态": "学习工作", "活动摘要": "编写代码", "confidence": 0.9}, ensure_ascii=False)
+DEFAULT_TEXT_REPLY = "这是 Mock 模型的回答：最近的投入主要集中在编写代码与撰写文档上，节奏稳定，继续保持。"
+
+# rules 模式下的关键词分类规则 (按顺序匹配窗口标题/进程名)
+ENTERTAINMENT_KEYWORDS = ["bilibili", "哔哩", "youtube", "抖音", "douyin", "netflix", "steam", "游戏", "music", "音乐", "视频"]
+REST_KEYWORDS = ["lockapp", "锁屏", "idle", "空闲", "screensaver"]
+
+DEFAULT_CONFIG = {
+    "latency": 0.0,          # 首 token 前的固定延迟 (秒)，模拟加载与处理提示词
+    "jitter": 0.0,           # 额外随机延迟上限 (秒)
+    "tps": 50.0,             # 流式生成速度 (token/秒)，0 表示不等待
+    "failure_rate": 0.0,     # 请求失败概率 (0~1)
+    "failure_mode": "error",  # error: 500 | timeout: 挂起后 500 | garbage: 200 但内容不是合法 JSON | disconnect: 直接断开
+    "hang_seconds": 5.0,     # timeout 模式的挂起时长
+    "responder": "rules",    # rules | canned
+    "canned_reply": None,    # canned 模式的固定回复 (默认 DEFAULT_REPLY)
+    "no_chat": False,
+    "models": ["mock:latest"],
+    "strict_models": False,  # True 时请求列表以外的模型返回 404 (model not found)
+    "model_profiles": {},    # 按模型覆盖 latency / tps，如 {"small:1b": {"latency": 0.05, "tps": 120}}
+}
+
+_TITLE_RE = re.compile(r"窗口[:：]\s*'?([^'|\n]+)")
+
+
+def rule_based_reply(prompt: str, structured: bool) -> str:
+    """rules 模式：结构化请求按关键词给出分类 JSON，自由文本请求返回固定回答"""
+    if not structured:
+        return DEFAULT_TEXT_REPLY
+    lower = prompt.lower()
+    m = _TITLE_RE.search(prompt)
+    title = (m.group(1).strip() if m else "当前窗口")[:20]
+    if any(k in lower for k in ENTERTAINMENT_KEYWORDS):
+        status, confidence = "娱乐", 0.9
+    elif any(k in lower for k in REST_KEYWORDS):
+        status, confidence = "休息", 0.8
+    else:
+        status, confidence = "学习工作", 0.85
+    return json.dumps({"状态": status, "活动摘要": title, "confidence": confidence}, ensure_ascii=False)
+
+
+_BATCH_LINE_RE = re.compile(r"^\s*(\d+)\.\s+(.+)$", re.M)
+
+
+def batch_rule_reply(prompt: str) -> str:
+    """批量分类请求 (format 含 results 数组)：对每一行 "序号. 窗口: ..." 按规则分类"""
+    results = []
+    for m in _BATCH_LINE_RE.finditer(prompt):
+        item = json.loads(rule_based_reply(m.group(2), True))
+        item["id"] = int(m.group(1))
+        results.append(item)
+    return json.dumps({"results": results}, ensure_ascii=False)
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 才能保持 keep-alive 连接
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写出，关闭 Nagle 以免 keep-alive 连接遇到 40ms 延迟确认
+    disable_nagle_algorithm = True
+    config = dict(DEFAULT_CONFIG)
+    stats = None
+    rng = random.Random()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, key):
+        with self.stats["lock"]:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _send_json(self, code, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except ValueError:
+            return {}
+
+    # ---------- 生成 ----------
+
+    @staticmethod
+    def _prompt_of(payload):
+        if "messages" in payload:
+            return "\n".join(m.get("content") or "" for m in payload["messages"])
+        return f"{payload.get('system') or ''}\n{payload.get('prompt') or ''}"
+
+    def _reply_for(self, payload):
+        if self.config["responder"] == "canned":
+            return self.config["canned_reply"] or DEFAULT_REPLY
+        fmt = payload.get("format")
+        structured = fmt is not None
+        # 只看本轮输入，系统提示词中的示例词汇不参与规则匹配
+        if "messages" in payload:
+            users = [m.get("content") or "" for m in payload["messages"] if m.get("role") == "user"]
+            latest = users[-1] if users else ""
+        else:
+            latest = payload.get("prompt") or ""
+        if isinstance(fmt, dict) and "results" in (fmt.get("properties") or {}):
+            return batch_rule_reply(latest)
+        return rule_based_reply(latest, structured)
+
+    def _timings(self, payload, reply, elapsed, tps):
+        """仿照 Ollama 响应中的计时字段 (纳秒)"""
+        prompt_tokens = max(1, len(self._prompt_of(payload)) // 2)
+        eval_count = max(1, len(reply))
+        tps = tps or 1000.0
+        eval_ns = int(eval_count / tps * 1e9)
+        return {
+            "total_duration": int(elapsed * 1e9) + eval_ns,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(elapsed * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": eval_ns,
+        }
+
+    def _maybe_fail(self):
+        """按失败率模拟故障：不失败返回 None；已发出错误响应 (或断开) 返回 "handled"；garbage 模式返回 "garbage" """
+        if self.config["failure_rate"] <= 0 or self.rng.random() >= self.config["failure_rate"]:
+            return None
+        self._count("failures")
+        mode = self.config["failure_mode"]
+        if mode == "garbage":
+            return "garbage"
+        if mode == "disconnect":
+            self.close_connection = True
+            try:
+                self.connection.shutdown(2)
+            except OSError:
+                pass
+            return "handled"
+        if mode == "timeout":
+            time.sleep(self.config["hang_seconds"])
+        self._send_json(500, {"error": "mock failure"})
+        return "handled"
+
+    def _profile(self, model, key):
+        return self.config["model_profiles"].get(model, {}).get(key, self.config[key])
+
+    def _send_stream(self, key, payload, reply, elapsed, tps):
+        """流式响应：NDJSON + chunked 编码，逐个字符推送；客户端断开时停止生成"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        model = payload.get("model", self.config["models"][0])
+        delay = 1.0 / tps if tps else 0
+        try:
+            for ch in reply:
+                if key == "message":
+                    obj = {"model": model, "message": {"role": "assistant", "content": ch}, "done": False}
+                else:
+                    obj = {"model": model, "response": ch, "done": False}
+                self._write_chunk(json.dumps(obj, ensure_ascii=False) + "\n")
+                if delay:
+                    time.sleep(delay)
+            final = {"model": model, "done": True}
+            final.update({"message": {"role": "assistant", "content": ""}} if key == "message" else {"response": ""})
+            final.update(self._timings(payload, reply, elapsed, tps))
+            self._write_chunk(json.dumps(final) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self._count("client_disconnects")
+            self.close_connection = True
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    # ---------- 路由 ----------
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": name, "size": 0} for name in self.config["models"]]})
+        elif self.path == "/api/mock/stats":
+            with self.stats["lock"]:
+                self._send_json(200, {k: v for k, v in self.stats.items() if k != "lock"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path == "/api/mock/config":
+            self.config.update({k: v for k, v in payload.items() if k in DEFAULT_CONFIG})
+            self._send_json(200, self.config)
+            return
+
+        is_chat = self.path == "/api/chat" and not self.config["no_chat"]
+        if not (is_chat or self.path == "/api/generate"):
+            self._send_json(404, {"error": "404 page not found"})
+            return
+        model = payload.get("model", self.config["models"][0])
+        if self.config["strict_models"] and model not in self.config["models"]:
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return
+
+        self._count("requests")
+        t0 = time.perf_counter()
+        delay = self._profile(model, "latency") + (self.rng.uniform(0, self.config["jitter"]) if self.config["jitter"] else 0)
+        tps = self._profile(model, "tps")
+        if delay:
+            time.sleep(delay)
+        failure = self._maybe_fail()
+        if failure == "handled":
+            return
+
+        reply = self._reply_for(payload)
+        if failure == "garbage":
+            reply = "抱歉，我无法以 JSON 格式回答 {状态: ???"
+        if (payload.get("options") or {}).get("num_predict") == 1:
+            reply = reply[:1]  # 预热请求只生成 1 个 token
+        key = "message" if is_chat else "response"
+        elapsed = time.perf_counter() - t0
+
+        if payload.get("stream"):
+            self._send_stream(key, payload, reply, elapsed, tps)
+        else:
+            if tps:
+                time.sleep(len(reply) / tps)
+            body = {"model": model, "done": True}
+            body.update({"message": {"role": "assistant", "content": reply}} if is_chat else {"response": reply})
+            body.update(self._timings(payload, reply, elapsed, tps))
+            self._send_json(200, body)
+        self._count("completed")
+
+
+def start_mock_server(port: int = 0, latency: float = 0.0, no_chat: bool = False, seed: int = None, **options):
+    """
+    在后台线程启动 Mock 服务，返回 (server, base_url)。port=0 表示自动分配端口。
+    options: DEFAULT_CONFIG 中的其他配置项 (tps、failure_rate、failure_mode、responder、models…)
+    运行中可修改 server.config (与 POST /api/mock/config 等价)
+    """
+    unknown = set(options) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown mock options: {sorted(unknown)}")
+    config = dict(DEFAULT_CONFIG, latency=latency, no_chat=no_chat, **options)
+    if "tps" not in options:
+        config["tps"] = 0.0  # 程序内使用时默认不模拟生成耗时
+    handler = type("ConfiguredMockOllamaHandler", (MockOllamaHandler,), {
+        "config": config,
+        "stats": {"lock": threading.Lock()},
+        "rng": random.Random(seed),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.config = config
+    server.stats = handler.stats
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 Mock Ollama 服务")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.0, help="首 token 前的固定延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限 (秒)")
+    parser.add_argument("--tps", type=float, default=50.0, help="生成速度 (token/秒)，0 表示不等待")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="请求失败概率 (0~1)")
+    parser.add_argument("--failure-mode", choices=["error", "timeout", "garbage", "disconnect"], default="error")
+    parser.add_argument("--responder", choices=["rules", "canned"], default="rules")
+    parser.add_argument("--models", default="mock:latest", help="逗号分隔的模型列表 (/api/tags)")
+    parser.add_argument("--no-chat", action="store_true", help="模拟不支持 /api/chat 的旧版 Ollama")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(
+        args.port, args.latency, args.no_chat, seed=args.seed,
+        jitter=args.jitter, tps=args.tps, failure_rate=args.failure_rate, failure_mode=args.failure_mode,
+        responder=args.responder, models=[m.strip() for m in args.models.split(",") if m.strip()],
+    )
+    print(f"Mock Ollama 已启动: {base_url}  (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
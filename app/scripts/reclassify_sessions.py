@@ -0,0 +1,64 @@
+"""
+按规则对历史会话重新分类 (进程名 / 窗口标题正则 -> 状态)
+先预览再执行，执行后可按 run id 撤销；派生统计按差值修正，不做全量重算。
+
+规则文件 (JSON 列表，按顺序匹配，第一条命中的生效)：
+    [
+      {"name": "dev", "process": "code|pycharm", "status": "work", "from": ["entertainment"]},
+      {"name": "bilibili", "title": "哔哩哔哩|bilibili", "status": "entertainment"}
+    ]
+
+用法:
+    python app/scripts/reclassify_sessions.py --rules rules.json               # 预览 (dry run)
+    python app/scripts/reclassify_sessions.py --rules rules.json --apply --since 2026-01-01
+    python app/scripts/reclassify_sessions.py --list
+    python app/scripts/reclassify_sessions.py --undo <run_id>
+不传 --rules 时使用内置的默认规则 (办公/开发/会议类应用视为工作)。
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.data import init_db, ReclassifyEngine
+from app.data.services.reclassify_engine import format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-based retroactive reclassification of window sessions")
+    parser.add_argument("--rules", help="JSON rule file (default: built-in rules)")
+    parser.add_argument("--since", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last day (YYYY-MM-DD)")
+    parser.add_argument("--apply", action="store_true", help="write changes (default is a dry run)")
+    parser.add_argument("--undo", metavar="RUN_ID", help="revert a previous run")
+    parser.add_argument("--list", action="store_true", help="list previous runs")
+    args = parser.parse_args()
+
+    init_db()
+
+    if args.list:
+        for r in ReclassifyEngine.runs():
+            created = datetime.fromtimestamp(r['created_ts']).strftime('%Y-%m-%d %H:%M')
+            state = "undone" if r['undone_ts'] else "active"
+            print(f"{r['run_id']}  {created}  {r['sessions']:>6} sessions  {r['duration'] / 3600:>8.2f}h  {state}")
+        return
+
+    if args.undo:
+        ReclassifyEngine.undo(args.undo)
+        return
+
+    engine = ReclassifyEngine.from_file(args.rules) if args.rules else ReclassifyEngine()
+    if args.apply:
+        report = engine.apply(args.since, args.until)
+    else:
+        report = engine.preview(args.since, args.until)
+    print(format_report(report, dry_run=not args.apply))
+    if not args.apply and report['sessions']:
+        print("\nDry run only. Re-run with --apply to write these changes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+历史会话批量重分类 (换模型或改提示词之后使用)
+按 (进程, 归一化标题) 去重后每个键只请求一次 LLM，批量请求 + 有限并发；
+标签回写会话表后按差值修正 daily_stats，并只重算受影响日期的 period_stats / core_events。
+进度保存在数据库中，中断 (Ctrl+C、模型不可用) 后用 --resume 继续。
+
+用法:
+    python app/scripts/relabel_history.py                 # 新建任务并运行
+    python app/scripts/relabel_history.py --resume        # 继续最近一个未完成的任务
+    python app/scripts/relabel_history.py --status        # 查看最近任务的进度
+    OLLAMA_MODEL=qwen2.5:7b python app/scripts/relabel_history.py --batch-size 25 --concurrency 3 --rate-limit 0
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.data.core.database import init_db
+from app.data.dao.relabel_dao import RelabelDAO
+from app.service.ai.llm_scheduler import Priority, configure_scheduler
+from app.service.relabel_service import RelabelJob
+
+
+def print_status(job):
+    s = job.status()
+    print(f"Job {s.get('job_id')}  model={s.get('model')}  prompt={s.get('prompt_version')}  phase={s.get('phase')}")
+    print(f"  sessions scanned up to id {s.get('scanned_upto')}, applied up to id {s.get('applied_upto')} "
+          f"(of {s.get('max_session_id')})")
+    print(f"  keys: {s['keys']}  changed sessions: {s.get('changed_sessions')}")
+    for t in s['transitions']:
+        print(f"  {t['old_status']} -> {t['new_status']}: {t['sessions']} sessions, {(t['duration'] or 0) / 3600:.1f}h")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk re-label historical window sessions with the current model")
+    parser.add_argument("--resume", nargs="?", const="", default=None, metavar="JOB_ID",
+                        help="continue a job (default: the latest unfinished one)")
+    parser.add_argument("--status", action="store_true", help="show progress of the latest job and exit")
+    parser.add_argument("--batch-size", type=int, default=20, help="windows per LLM request")
+    parser.add_argument("--concurrency", type=int, default=2, help="parallel LLM requests")
+    parser.add_argument("--rate-limit", type=int, default=30,
+                        help="max LLM requests per minute (0 = unlimited, e.g. when the app is not running)")
+    parser.add_argument("--min-confidence", type=float, default=0.5,
+                        help="only apply labels at or above this confidence")
+    args = parser.parse_args()
+
+    init_db()
+    # 独立进程：并发与限速都在本进程内生效，默认与应用内批量任务一致，避免独占 Ollama
+    configure_scheduler(max_concurrency=args.concurrency, rate_limits={Priority.BATCH: args.rate_limit or None})
+    options = dict(batch_size=args.batch_size, concurrency=args.concurrency, min_confidence=args.min_confidence)
+
+    if args.status:
+        job = RelabelDAO.latest_job()
+        if not job:
+            print("No relabel job yet.")
+            return
+        print_status(RelabelJob(job['job_id'], **options))
+        return
+
+    if args.resume is not None:
+        job = RelabelJob.resume(args.resume or None, **options)
+        if job is None:
+            print("No unfinished relabel job to resume.")
+            return
+    else:
+        job = RelabelJob.create(**options)
+
+    try:
+        finished = job.run()
+    except KeyboardInterrupt:
+        print("\nInterrupted, progress saved. Continue with --resume.")
+        finished = False
+    print_status(job)
+    if not finished:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@ import os
 import multiprocessing
 import time
 import sys
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import concurrent.futures
 
+# 报告提示词模板版本：修改下方对应提示词时同步提升，旧的 LLM 输出缓存随之失效
+CORE_ITEMS_PROMPT_VERSION = "core_items/v1"
+ENCOURAGEMENT_PROMPT_VERSION = "encouragement/v1"
+
 def get_resource_path(relative_path):
     """ 获取资源绝对路径，兼容打包前后的环境 """
     if hasattr(sys, '_MEIPASS'):
@@ -15,6 +19,23 @@ def get_resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
+def _history_record(s):
+    """window_sessions 行 -> 看板历史列表的一条记录"""
+    title = s.get('summary') or s.get('window_title') or 'Unknown'
+    content_str = f"Status: {s.get('status')} | Duration: {s.get('duration')}s"
+    if s.get('process_name'):
+        content_str += f" | App: {s.get('process_name')}"
+    return {
+        'id': s.get('id'),
+        'timestamp': s.get('start_time'),
+        'app_name': s.get('process_name', 'Unknown'),
+        'window_title': title,
+        'content': content_str,
+        'duration': s.get('duration'),
+        'status': s.get('status')
+    }
+
+
 def create_app(ai_busy_flag=None):
     # 使用兼容打包路径的方式定位 templates 和 static 目录
     # 策略：
@@ -55,58 +76,85 @@ def create_app(ai_busy_flag=None):
     def health_check():
         return jsonify({'status': 'ok', 'message': 'Flow State Web Server is running'})
 
+    @app.route('/api/llm/metrics')
+    def llm_metrics():
+        """LLM 调度器指标：本进程 (对话、报告) + AI Worker 进程 (实时分类、后台任务)"""
+        import json
+        from app.service.ai.llm_scheduler import get_scheduler
+        from app.core.config import DATA_DIR
+        worker = None
+        try:
+            with open(os.path.join(DATA_DIR, "llm_metrics_worker.json"), encoding="utf-8") as f:
+                worker = json.load(f)
+        except (OSError, ValueError):
+            pass
+        return jsonify({"web": get_scheduler().metrics(), "worker": worker})
+
     @app.route('/api/history/scroll')
     def get_history_scroll():
+        """
+        历史列表分页：?cursor=<上一页返回的 next_cursor>&per_page=20
+        按 (start_time, id) 键集分页；第一页同时返回 version，之后用 /api/history/changes?since=version 取增量
+        """
         try:
-            page = request.args.get('page', 1, type=int)
-            per_page = request.args.get('per_page', 20, type=int)
-            offset = (page - 1) * per_page
-
-            import sqlite3
-            from app.data.core.database import get_db_path
-            db_path = get_db_path()
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            cursor.execute(
-                "SELECT * FROM window_sessions ORDER BY start_time DESC LIMIT ? OFFSET ?",
-                (per_page, offset),
-            )
-            rows = cursor.fetchall()
-
-            records = []
-            for s in rows:
-                s = dict(s)
-                title = s.get('summary') or s.get('window_title') or 'Unknown'
-                content_str = f"Status: {s.get('status')} | Duration: {s.get('duration')}s"
-                if s.get('process_name'):
-                    content_str += f" | App: {s.get('process_name')}"
-                records.append({
-                    'id': s.get('id'),
-                    'timestamp': s.get('start_time'),
-                    'app_name': s.get('process_name', 'Unknown'),
-                    'window_title': title,
-                    'content': content_str,
-                    'duration': s.get('duration'),
-                    'status': s.get('status')
-                })
-            conn.close()
-            return jsonify({"data": records, "page": page, "has_more": len(records) == per_page})
+            from app.data.dao.activity_dao import WindowSessionDAO
+            per_page = min(max(request.args.get('per_page', 20, type=int), 1), 200)
+            before = None
+            cursor = request.args.get('cursor')
+            if cursor:
+                # 游标格式: "YYYY-MM-DD HH:MM:SS|<id>"，格式不对时返回 400 而不是 500
+                start_time, sep, session_id = cursor.rpartition('|')
+                try:
+                    from datetime import datetime
+                    datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+                    if not sep or not session_id.isdigit():
+                        raise ValueError(cursor)
+                except ValueError:
+                    return jsonify({"error": f"invalid cursor: {cursor}", "data": []}), 400
+                before = (start_time, int(session_id))
+
+            version = WindowSessionDAO.get_change_version() if before is None else None
+            rows = WindowSessionDAO.get_sessions_page(before, per_page)
+            records = [_history_record(s) for s in rows]
+            next_cursor = f"{rows[-1]['start_time']}|{rows[-1]['id']}" if rows else None
+            return jsonify({"data": records, "next_cursor": next_cursor,
+                            "has_more": len(records) == per_page, "version": version})
         except Exception as e:
             return jsonify({"error": str(e), "data": []}), 500
 
+    @app.route('/api/history/changes')
+    def get_history_changes():
+        """
+        增量刷新：?since=<version>，返回序号之后新增或修改的会话 (upserts) 与删除的会话 id (deleted)。
+        has_more 为 true 时用返回的 version 继续取
+        """
+        try:
+            from app.data.dao.activity_dao import WindowSessionDAO
+            since = request.args.get('since', 0, type=int)
+            limit = min(max(request.args.get('limit', 500, type=int), 1), 2000)
+            sessions, deleted, version = WindowSessionDAO.get_changes_since(since, limit)
+            return jsonify({
+                "upserts": [_history_record(s) for s in sessions],
+                "deleted": deleted,
+                "version": version,
+                "has_more": len(sessions) + len(deleted) == limit
+            })
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/api/history/check_update')
     def check_update():
         try:
             from app.data.dao.activity_dao import WindowSessionDAO
             last_session = WindowSessionDAO.get_last_session()
+            version = WindowSessionDAO.get_change_version()
             if last_session:
                 return jsonify({
                     "latest_id": last_session.get('id'),
-                    "latest_timestamp": last_session.get('start_time')
+                    "latest_timestamp": last_session.get('start_time'),
+                    "version": version
                 })
-            return jsonify({"latest_id": 0, "latest_timestamp": ""})
+            return jsonify({"latest_id": 0, "latest_timestamp": "", "version": version})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -114,24 +162,10 @@ def create_app(ai_busy_flag=None):
     def get_recent_history():
         try:
             from app.data.dao.activity_dao import WindowSessionDAO
-            records = []
-            sessions = WindowSessionDAO.get_today_sessions()
+            days = request.args.get('days', 1, type=int)
+            sessions = WindowSessionDAO.get_recent_sessions(days)
             sessions.reverse()
-            for s in sessions:
-                title = s.get('summary') or s.get('window_title') or 'Unknown'
-                content_str = f"Status: {s.get('status')} | Duration: {s.get('duration')}s"
-                if s.get('process_name'):
-                    content_str += f" | App: {s.get('process_name')}"
-                records.append({
-                    'id': s.get('id'),
-                    'timestamp': s.get('start_time'),
-                    'app_name': s.get('process_name', 'Unknown'),
-                    'window_title': title,
-                    'content': content_str,
-                    'duration': s.get('duration'),
-                    'status': s.get('status')
-                })
-            return jsonify(records)
+            return jsonify([_history_record(s) for s in sessions])
         except Exception:
             return jsonify([])
 
@@ -161,6 +195,22 @@ def create_app(ai_busy_flag=None):
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+    @app.route('/api/stats/periods')
+    def get_period_stats():
+        """
+        长周期统计：?type=week|month|year&count=12
+        例：最近 12 周 type=week&count=12，今年 type=year&count=1，今年各月 type=month&count=<当前月份>
+        """
+        period_type = request.args.get('type', 'week')
+        count = min(max(request.args.get('count', 12, type=int), 1), 120)
+        if period_type not in ('week', 'month', 'year'):
+            return jsonify({"error": f"unknown period type: {period_type}"}), 400
+        try:
+            from app.data.web_report.report_generator import ReportGenerator
+            return jsonify(ReportGenerator().get_period_overview(period_type, count))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/api/report/generate', methods=['POST'])
     def generate_report_api():
         data = request.json or {}
@@ -170,23 +220,24 @@ def create_app(ai_busy_flag=None):
             flag.value = True
         try:
             from app.data.web_report.report_generator import ReportGenerator
-            from app.data.dao.core_events_extractor import extract_core_events
-            from app.data.dao.stats_calculator import calculate_period_stats
+            from app.data.services.backfill_runner import BackfillRunner
             from datetime import date, timedelta
             try:
+                # 只重算数据有变化的日期 (按天指纹)，其余日期沿用已有的 core_events / period_stats
                 end_d = date.today()
-                start_d = end_d - timedelta(days=days - 1)
-                cur = start_d
-                while cur <= end_d:
-                    d_str = cur.strftime('%Y-%m-%d')
-                    extract_core_events(d_str)
-                    calculate_period_stats(d_str)
-                    cur += timedelta(days=1)
-            except Exception:
-                pass
+                BackfillRunner().run_range(end_d - timedelta(days=days - 1), end_d)
+            except Exception as e:
+                print(f"[Report] Backfill failed: {e}")
 
             from app.service.ai.langflow_client import LangflowClient
+            from app.service.ai.llm_scheduler import Priority, get_scheduler
+            import uuid
+            from app.data import LLMOutputCache
             client = LangflowClient()
+            # 历史日期输入没变时直接复用缓存的输出，只为数据有变化的日期调用模型
+            llm_cache = LLMOutputCache(model=client.model)
+            # 报告的所有调用以批量优先级排队，共用一个标签，出错时可一并取消
+            report_tag = f"report-{uuid.uuid4()}"
 
             def ai_callback(context):
                 core_items = {}
@@ -211,7 +262,12 @@ Constraints:
 - 示例："编写后端代码，调试脚本，看B站"
 """
                     try:
-                        res = client.call_flow('summary', prompt_event)
+                        res = llm_cache.get_or_compute(
+                            'core_items', CORE_ITEMS_PROMPT_VERSION,
+                            {"date": date_str, "items": items_info},
+                            lambda: client.call_flow('summary', prompt_event, priority=Priority.BATCH, tag=report_tag),
+                            scope=log.get('iso_date')
+                        )
                         return (date_str, res) if res else None
                     except Exception:
                         return None
@@ -246,7 +302,25 @@ Constraints:
                 best_hour = Counter(peak_hours).most_common(1)[0][0] if peak_hours else 0
                 avg_frag = round(sum(frag_vals)/len(frag_vals), 2) if frag_vals else 0
                 avg_switch = round(sum(switch_vals)/len(switch_vals), 1) if switch_vals else 0
-                summary_join = '；'.join(summaries[:3])
+                # 分层摘要：日 -> 周 -> 月 (各层缓存复用)，长周期报告的寄语覆盖整个周期而不只是前 3 天
+                from app.data.web_report.summary_hierarchy import SummaryHierarchy
+                summary_by_date = {r.get('date'): r.get('daily_summary') for r in rows if r.get('daily_summary')}
+                daily_lines = []
+                for log in context['daily_logs']:
+                    text = core_items.get(log['date']) or summary_by_date.get(log.get('iso_date')) or ''
+                    if text and log.get('iso_date'):
+                        daily_lines.append({"date": log['iso_date'], "line": f"{log['date']}: {text} ({log.get('hours', 0)}h)"})
+                hierarchy = SummaryHierarchy(
+                    lambda kind, version, scope, prompt: llm_cache.get_or_compute(
+                        kind, version, prompt,
+                        lambda: client.call_flow(kind, prompt, priority=Priority.BATCH, tag=report_tag),
+                        scope=scope
+                    )
+                )
+                if daily_lines:
+                    summary_join = SummaryHierarchy.narrative_context(hierarchy.build(daily_lines))
+                else:
+                    summary_join = '；'.join(summaries[:3])
                 avg_per_day = round(total_focus_hours / days_len, 1)
                 frag_state = '专注占优' if avg_frag >= 1.2 else ('碎片偏多' if avg_frag < 0.8 else '相对平衡')
                 switch_state = '切换较频繁' if avg_switch > 18 else ('切换略多' if avg_switch > 12 else '切换控制良好')
@@ -254,6 +328,12 @@ Constraints:
                     f"近{days_len}天平均每天专注约{avg_per_day}小时，克制分心{wins}次。"
                     f"黄金时段多在{best_hour}点，{frag_state}；每小时切换约{avg_switch}次，尽量控制在十几次以内。"
                 )
+                # 与报告开始前 30 天的个人常态比较 (基线天数不足时不提)
+                from app.data.dao.period_baseline_dao import MIN_BASELINE_DAYS
+                norm_focus = ((context.get('baseline') or {}).get('total_focus') or {}).get(30)
+                if norm_focus and norm_focus['n'] >= MIN_BASELINE_DAYS and norm_focus['mean'] > 0:
+                    change = round((avg_per_day * 3600 / norm_focus['mean'] - 1) * 100)
+                    metrics_hint += f"与此前30天的个人常态 (日均{round(norm_focus['mean'] / 3600, 1)}小时) 相比{'多' if change >= 0 else '少'}{abs(change)}%。"
                 prompt_enc = f"""
 Role: 你是一位洞察力敏锐且富有同理心的成长教练。
 Task: 根据用户的行为数据，写一段“致追梦者”的复盘寄语。
@@ -271,12 +351,22 @@ Style:
 - 语气要自然流畅，像朋友间的深度对话，严禁使用“建议1：”、“综上所述”等公文式措辞。
 - 篇幅控制在 150 字以内。
 """
-                encouragement = client.call_flow('enc', prompt_enc) or "AI 暂时繁忙，但数据见证了你的努力。继续加油！"
+                encouragement = llm_cache.get_or_compute(
+                    'encouragement', ENCOURAGEMENT_PROMPT_VERSION,
+                    {"summaries": summary_join, "top_apps": top_apps, "metrics": metrics_hint},
+                    lambda: client.call_flow('enc', prompt_enc, priority=Priority.BATCH, tag=report_tag),
+                    scope=context.get('period')
+                ) or "AI 暂时繁忙，但数据见证了你的努力。继续加油！"
+                print(f"[Report] LLM 输出缓存: 命中 {llm_cache.hits} / 调用模型 {llm_cache.misses}")
                 return {"core_items": core_items, "encouragement": encouragement}
 
             from app.data.web_report.report_generator import ReportGenerator
             generator = ReportGenerator()
-            report_md = generator.generate_report(days=days, ai_callback=ai_callback)
+            try:
+                report_md = generator.generate_report(days=days, ai_callback=ai_callback)
+            except Exception:
+                get_scheduler().cancel(report_tag)
+                raise
             return jsonify({"report": report_md})
         except Exception as e:
             import traceback
@@ -286,6 +376,17 @@ Style:
             if flag:
                 flag.value = False
 
+    @app.route('/api/report/cache/clear', methods=['POST'])
+    def clear_report_cache():
+        """显式失效报告的 LLM 输出缓存，可按 kind (core_items/encouragement) 与 scope (日期) 过滤"""
+        data = request.json or {}
+        try:
+            from app.data import LLMOutputCache
+            removed = LLMOutputCache.invalidate(data.get('kind'), data.get('scope'))
+            return jsonify({"removed": removed})
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/api/generate_report_old', methods=['POST'])
     def generate_report_old():
         flag = app.config.get('AI_BUSY_FLAG')
@@ -298,6 +399,81 @@ Style:
             if flag:
                 flag.value = False
 
+    def build_recent_activity_context():
+        """检索索引不可用时的退路：最近 20 条活动记录"""
+        from app.data.dao.activity_dao import ActivityDAO
+        recent_activities = ActivityDAO.get_recent_activities(limit=20)
+        lines = []
+        for act in recent_activities or []:
+            title = act.get('summary') or "未知窗口"
+            if 'raw_data' in act and act['raw_data']:
+                try:
+                    import json
+                    rd = json.loads(act['raw_data'])
+                    title = rd.get('window', title)
+                except Exception:
+                    pass
+            ts = act.get('timestamp')
+            lines.append(f"- [{ts}] {title} (状态: {act.get('status')})")
+        return "\n".join(lines)
+
+    def build_chat_system_prompt(user_msg=""):
+        """对话的系统提示词：按问题从全部历史中检索相关记录作为参考"""
+        context_str = None
+        try:
+            from app.data import ChatContextRetriever
+            context_str = ChatContextRetriever().retrieve(user_msg)
+        except Exception as e:
+            print(f"[Chat] Context retrieval failed: {e}")
+        if context_str is None:
+            context_str = build_recent_activity_context()
+        return f"""
+你是一个 Flow State 效率助手。用户正在询问关于他的工作/学习情况。
+以下是从用户历史记录中检索到的相关信息（作为参考）：
+{context_str}
+
+请根据上述记录回答用户的问题。如果记录中没有相关信息，请诚实回答。
+保持回答简练、友好、有建设性。不要使用 JSON 格式回复，直接输出 Markdown 文本。
+"""
+
+    def summarize_chat(previous_summary, transcript):
+        """把较早的对话轮次折叠成摘要 (后台批量优先级，不与实时分类和对话抢占)"""
+        from app.service.detector.detector_logic import analyze
+        from app.service.ai.llm_scheduler import Priority
+        prompt = (f"已有摘要：{previous_summary or '无'}\n\n新增对话：\n{transcript}\n\n"
+                  f"请把以上内容合并为一段不超过 150 字的对话摘要，保留用户关心的问题、提到的数据与结论。")
+        text = analyze(prompt, system_prompt="你负责压缩对话历史，只输出摘要正文。",
+                       json_mode=False, priority=Priority.BATCH)
+        return text or None
+
+    from app.data import ChatSessionStore
+    chat_sessions = ChatSessionStore(summarize=summarize_chat)
+
+    def prepare_chat_turn(user_msg, session_id=None):
+        """
+        组装一轮对话：返回 (会话, 系统提示词, 历史消息, 本轮 user 消息)
+        新会话时检索上下文并固定进系统提示词；追问时只把尚未发过的相关记录附在本轮问题后面
+        """
+        session = chat_sessions.get(session_id)
+        now_str = time.strftime("%Y-%m-%d %H:%M:%S")
+        if session is None:
+            session = chat_sessions.create(build_chat_system_prompt(user_msg))
+            user_content = f"{user_msg}\n【当前系统时间】：{now_str}"
+        else:
+            extra = []
+            try:
+                from app.data import ChatContextRetriever
+                known = session.known_text()
+                retrieved = ChatContextRetriever().retrieve(user_msg) or ""
+                extra = [line for line in retrieved.splitlines() if line.startswith("- ") and line[2:] not in known]
+            except Exception as e:
+                print(f"[Chat] Context retrieval failed: {e}")
+            user_content = user_msg
+            if extra:
+                user_content += "\n\n（补充参考记录）\n" + "\n".join(extra)
+            user_content += f"\n【当前系统时间】：{now_str}"
+        return session, session.system_prompt, session.history(), user_content
+
     @app.route('/api/chat', methods=['POST'])
     def chat_with_ai():
         data = request.json or {}
@@ -308,38 +484,83 @@ Style:
         if flag:
             flag.value = True
         try:
-            from app.data.dao.activity_dao import ActivityDAO
             from app.service.detector.detector_logic import analyze
-            recent_activities = ActivityDAO.get_recent_activities(limit=20)
-            lines = []
-            for act in recent_activities or []:
-                title = act.get('summary') or "未知窗口"
-                if 'raw_data' in act and act['raw_data']:
-                    try:
-                        import json
-                        rd = json.loads(act['raw_data'])
-                        title = rd.get('window', title)
-                    except Exception:
-                        pass
-                ts = act.get('timestamp')
-                lines.append(f"- [{ts}] {title} (状态: {act.get('status')})")
-            context_str = "\n".join(lines)
-            system_prompt = f"""
-你是一个 Flow State 效率助手。用户正在询问关于他的工作/学习情况。
-以下是用户最近的活动记录（作为参考）：
-{context_str}
-
-请根据上述记录回答用户的问题。如果记录中没有相关信息，请诚实回答。
-保持回答简练、友好、有建设性。不要使用 JSON 格式回复，直接输出 Markdown 文本。
-"""
-            response_text = analyze(user_msg, system_prompt=system_prompt, json_mode=False)
-            return jsonify({"response": response_text})
+            session, system_prompt, history, user_content = prepare_chat_turn(user_msg, data.get('session_id'))
+            response_text = analyze(user_content, system_prompt=system_prompt, json_mode=False, history=history)
+            if response_text:
+                chat_sessions.append_turn(session, user_content, response_text)
+            return jsonify({"response": response_text, "session_id": session.session_id})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
         finally:
             if flag:
                 flag.value = False
 
+    @app.route('/api/chat/stream', methods=['GET', 'POST'])
+    def chat_stream():
+        """
+        流式对话 (Server-Sent Events)
+        data: {"delta": "..."} 逐段推送；结束时 event: done (附 session_id)；
+        出错时 event: failed (reason 为 circuit_open 表示 Ollama 熔断中，empty 表示未得到回答)
+        客户端断开后生成器被关闭，排队中的请求取消、生成中的请求立即断开 Ollama 连接
+        """
+        if request.method == 'POST':
+            data = request.json or {}
+        else:
+            data = request.args
+        user_msg = data.get('message', '')
+        if not user_msg:
+            return jsonify({"error": "Empty message"}), 400
+
+        import json
+        from app.service.detector.detector_logic import stream
+        from app.service.ai.circuit_breaker import CircuitOpenError
+        session, system_prompt, history, user_content = prepare_chat_turn(user_msg, data.get('session_id'))
+        flag = app.config.get('AI_BUSY_FLAG')
+
+        def sse():
+            if flag:
+                flag.value = True
+            parts = []
+            try:
+                try:
+                    for delta in stream(user_content, system_prompt=system_prompt, history=history):
+                        if not delta:
+                            yield ": ping\n\n"  # 心跳，断开的客户端在写入时被发现
+                            continue
+                        parts.append(delta)
+                        yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+                except CircuitOpenError:
+                    failure = {'error': 'AI 服务暂时不可用，请稍后再试', 'reason': 'circuit_open'}
+                    yield f"event: failed\ndata: {json.dumps(failure, ensure_ascii=False)}\n\n"
+                    return
+                if parts:
+                    chat_sessions.append_turn(session, user_content, "".join(parts))
+                    yield f"event: done\ndata: {json.dumps({'session_id': session.session_id})}\n\n"
+                else:
+                    failure = {'error': 'AI 暂时不可用', 'reason': 'empty'}
+                    yield f"event: failed\ndata: {json.dumps(failure, ensure_ascii=False)}\n\n"
+            finally:
+                if flag:
+                    flag.value = False
+
+        return Response(
+            stream_with_context(sse()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Chat-Session': session.session_id}
+        )
+
+    @app.route('/api/chat/session/<session_id>', methods=['GET', 'DELETE'])
+    def chat_session(session_id):
+        """查看 (GET) 或结束并删除 (DELETE) 一个对话会话"""
+        if request.method == 'DELETE':
+            chat_sessions.delete(session_id)
+            return jsonify({"deleted": session_id})
+        session = chat_sessions.get(session_id)
+        if session is None:
+            return jsonify({"error": "Session not found"}), 404
+        return jsonify(session.to_dict())
+
     @app.route('/api/settings/autostart', methods=['GET', 'POST'])
     def autostart_setting():
         try:
@@ -447,8 +668,11 @@ Style:
     return app
 
 
-def run_server(port=5000, ai_busy_flag=None):
+def run_server(port=5000, ai_busy_flag=None, llm_shared=None):
     print(f"【Web服务进程】启动 (PID: {multiprocessing.current_process().pid}) http://127.0.0.1:{port}")
+    # 与 AI Worker 共享 LLM 并发上限，实时分类优先于本进程的对话与报告
+    from app.service.ai.llm_scheduler import configure_scheduler
+    configure_scheduler(llm_shared)
     app = create_app(ai_busy_flag)
     app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
 
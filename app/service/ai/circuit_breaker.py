@@ -0,0 +1,70 @@
+import time
+import threading
+
+
+class CircuitOpenError(Exception):
+    """熔断中，请求未发出 (供流式调用方区分"服务不可用"与"模型返回空内容")"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    简单熔断器 (closed -> open -> half_open)
+    - closed: 正常放行，连续失败达到阈值后熔断
+    - open: 直接拒绝，reset_timeout 秒后进入 half_open
+    - half_open: 只放行一个探测请求，成功则恢复，失败则继续熔断
+    Ollama 挂掉时让调用方立即失败，而不是每次都等到超时。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.time() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # HALF_OPEN: 只放行一个探测请求
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print("[CircuitBreaker] Ollama reachable again, circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"[CircuitBreaker] Circuit opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.time()
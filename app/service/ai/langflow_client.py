@@ -1,39 +1,232 @@
 import os
-import requests
 import json
+import time
+import queue
+import threading
+
+from app.service.ai.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.service.ai.ollama_transport import get_transport
+from app.service.ai.llm_scheduler import Priority, get_scheduler, DeadlineExceeded, RequestCancelled
+
+# 进程内共享的熔断器：同一进程里所有客户端实例共同感知 Ollama 是否可用
+_shared_breaker = CircuitBreaker()
+
+def get_shared_breaker():
+    return _shared_breaker
 
 class LangflowClient:
-    def __init__(self, timeout: int = 180):
+    def __init__(self, timeout: int = 180, breaker: CircuitBreaker = None):
         # 按照用户要求，改为直接调用 Ollama 端口
         # 默认 Ollama 地址: http://localhost:11434
         self.ollama_base_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
         # 用户指定的模型: gpt-oss:20b-cloud (修正了拼写错误)
         self.model = os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud')
         self.timeout = timeout
+        self.breaker = breaker or _shared_breaker
+        # 模型常驻时长：显式传给 Ollama，避免默认 5 分钟空闲后被卸载，下次切换窗口时冷启动
+        self.keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        # 最近一次请求 Ollama 的时间 (供保温逻辑判断是否需要 ping)
+        self.last_call_ts = 0.0
+        # 共享连接池 (keep-alive)，同时记住可用端点
+        self.transport = get_transport(self.ollama_base_url)
 
-    def call_flow(self, flow: str, text: str):
+    def call_flow(self, flow: str, text: str, response_format=None, system: str = None,
+                  priority=Priority.BATCH, deadline=-1, tag=None, history=None):
         """
         替代原本的 Langflow 调用，直接调用 Ollama。
         参数 flow 在此处仅作记录，不再影响路由，统一使用指定模型处理。
+        response_format: 可选，Ollama 的 format 参数 ("json" 或 JSON Schema dict)，约束模型只输出合法 JSON。
+        system: 可选，固定不变的系统提示词，作为独立的 system 消息放在最前面，
+                让 Ollama 能复用该前缀的 KV 缓存；可变内容放在 text 中。
+        priority / deadline / tag: 交给 LLM 调度器排队 (见 llm_scheduler)，超过截止时间或被取消时返回 None。
+        history: 可选，多轮对话的历史消息 [{"role", "content"}]，放在 system 之后、本轮 text 之前。
+                 每轮前缀不变时 Ollama 只需处理新增的 token。
+        熔断器打开时直接返回 None，不发起网络请求。
+        """
+        def _do_call():
+            if not self.breaker.allow_request():
+                return None
+            self.last_call_ts = time.time()
+            result = self._call_chat(text, response_format, system, history)
+            if result is None:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return result
+
+        try:
+            return get_scheduler().run(_do_call, priority, deadline, tag)
+        except (DeadlineExceeded, RequestCancelled) as e:
+            print(f"[OllamaClient] Request '{flow}' dropped by scheduler: {e}")
+            return None
+
+    def warm_up(self, system: str = None) -> bool:
+        """
+        预热：让 Ollama 加载模型并处理一遍系统提示词前缀 (只生成 1 个 token)。
+        Worker 启动时以及用户活跃期间定期调用，不计入熔断统计；以批量优先级排队，不抢占实时分类。
+        """
+        def _do_warm_up():
+            self.last_call_ts = time.time()
+            endpoint = self.transport.endpoint
+            payload = self._build_payload(endpoint, "ping", system)
+            payload["options"] = {"num_predict": 1}
+            resp = self.transport.post(f"/api/{endpoint}", payload, read_timeout=self.timeout)
+            return resp.status_code == 200
+
+        try:
+            return get_scheduler().run(_do_warm_up, Priority.BATCH, deadline=60)
+        except Exception as e:
+            print(f"[OllamaClient] Warm-up failed: {e}")
+            return False
+
+    def stream_flow(self, flow: str, text: str, system: str = None, priority=Priority.CHAT, deadline=-1,
+                    heartbeat: float = 5.0, history=None):
+        """
+        流式调用 (stream: true)，逐段 yield 模型输出。
+        请求同样经过 LLM 调度器排队；排队或生成期间超过 heartbeat 秒没有新内容时 yield ""
+        (心跳)，便于上层及时发现客户端断开。
+        调用方关闭生成器 (如 SSE 客户端断开) 时：排队中的请求被取消，生成中的请求直接关闭与 Ollama 的连接
+        (预填充或两段输出之间的长时间等待也不例外)，模型立即释放。
+        熔断中时抛出 CircuitOpenError，与"模型返回空内容"区分开。
+        """
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        done = object()
+        rejected = object()
+        # 生成中的 HTTP 响应，调用方离开时由这里关闭 (打断阻塞中的读取)
+        streaming = {}
+
+        def _do_stream():
+            ok = False
+            try:
+                if not self.breaker.allow_request():
+                    chunks.put(rejected)
+                    return
+                self.last_call_ts = time.time()
+                ok = self._stream_chat(text, system, chunks.put, cancelled, history, active=streaming)
+                if ok or cancelled.is_set():
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+            finally:
+                chunks.put(done)
+
+        req = get_scheduler().submit(_do_stream, priority, deadline)
+        last_yield = time.time()
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=0.5)
+                except queue.Empty:
+                    if req.done() and chunks.empty():
+                        # 未执行就被调度器丢弃 (超时/取消)
+                        break
+                    if time.time() - last_yield >= heartbeat:
+                        last_yield = time.time()
+                        yield ""
+                    continue
+                if item is done:
+                    break
+                if item is rejected:
+                    raise CircuitOpenError("Ollama circuit is open")
+                last_yield = time.time()
+                yield item
+        finally:
+            cancelled.set()
+            if req.cancel():
+                print(f"[OllamaClient] Stream '{flow}' cancelled before start")
+            resp = streaming.get('resp')
+            if resp is not None:
+                resp.close()
+
+    def _stream_chat(self, text: str, system, emit, cancelled, history=None, active=None) -> bool:
         """
+        执行一次流式请求，把增量文本交给 emit；正常结束返回 True。
+        active: 可选 dict，响应对象登记在 active['resp']，供调用方在另一线程关闭连接
+        """
+        endpoint = self.transport.endpoint
+        payload = self._build_payload(endpoint, text, system, history=history)
+        payload["stream"] = True
+        try:
+            with self.transport.post(f"/api/{endpoint}", payload, read_timeout=self.timeout, stream=True) as resp:
+                if active is not None:
+                    active['resp'] = resp
+                if cancelled.is_set():
+                    # 连接建立前调用方已离开
+                    return False
+                if resp.status_code == 404 and endpoint == self.transport.ENDPOINT_CHAT \
+                        and "model" not in resp.text.lower():
+                    print(f"[OllamaClient] /api/chat not found (404), falling back to /api/generate...")
+                    self.transport.remember_endpoint(self.transport.ENDPOINT_GENERATE)
+                    return self._stream_chat(text, system, emit, cancelled, history, active)
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if cancelled.is_set():
+                        # 客户端已离开：关闭连接，Ollama 随即停止生成
+                        print("[OllamaClient] Stream cancelled by client, closing connection")
+                        return False
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    delta = self._extract_text(data)
+                    if delta:
+                        emit(delta)
+                    if data.get("done"):
+                        break
+            return True
+        except Exception as e:
+            if cancelled.is_set():
+                # 调用方离开时关闭了连接，阻塞中的读取随之中断
+                print("[OllamaClient] Stream cancelled by client, connection closed")
+            else:
+                print(f"[OllamaClient] Stream error: {e}")
+            return False
+
+    def _build_payload(self, endpoint: str, text: str, system: str = None, response_format=None, history=None):
+        if endpoint == self.transport.ENDPOINT_GENERATE:
+            prompt = text
+            if history:
+                # /api/generate 没有消息列表，把历史按固定格式拼在前面 (同样保持前缀稳定)
+                roles = {"user": "用户", "assistant": "助手", "system": "背景"}
+                lines = [f"{roles.get(m['role'], m['role'])}: {m['content']}" for m in history]
+                prompt = "\n".join(lines + [f"用户: {text}", "助手:"])
+            payload = {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False
+            }
+            if system:
+                payload["system"] = system
+        else:
+            messages = []
+            if system:
+                messages.append({"role": "system", "content": system})
+            if history:
+                messages.extend(history)
+            messages.append({"role": "user", "content": text})
+            payload = {
+                "model": self.model,
+                "messages": messages,
+                "stream": False
+            }
+        payload["keep_alive"] = self.keep_alive
+        if response_format is not None:
+            payload["format"] = response_format
+        return payload
+
+    def _call_chat(self, text: str, response_format=None, system: str = None, history=None):
+        # 本进程已确认 /api/chat 不可用时，直接走 /api/generate，不再重复探测
+        if self.transport.endpoint == self.transport.ENDPOINT_GENERATE:
+            return self._call_generate_fallback(text, response_format, system, history)
+
         # 优先尝试 /api/chat 接口
         url = f"{self.ollama_base_url}/api/chat"
         
         # 构造 Ollama 请求
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "user", "content": text}
-            ],
-            "stream": False
-        }
+        payload = self._build_payload(self.transport.ENDPOINT_CHAT, text, system, response_format, history)
 
         try:
-            resp = requests.post(
-                url,
-                json=payload,
-                timeout=self.timeout
-            )
+            resp = self.transport.post("/api/chat", payload, read_timeout=self.timeout)
             
             # 特殊处理 404 错误，尝试回退或提供更明确的报错
             if resp.status_code == 404:
@@ -45,9 +238,11 @@ class LangflowClient:
                 
                 # 如果不是模型错误，可能是端点不支持，尝试 /api/generate
                 print(f"[OllamaClient] /api/chat not found (404), falling back to /api/generate...")
-                return self._call_generate_fallback(text)
+                self.transport.remember_endpoint(self.transport.ENDPOINT_GENERATE)
+                return self._call_generate_fallback(text, response_format, system, history)
 
             resp.raise_for_status()
+            self.transport.remember_endpoint(self.transport.ENDPOINT_CHAT)
             data = resp.json()
             return self._extract_text(data)
         except Exception as e:
@@ -55,18 +250,13 @@ class LangflowClient:
             print(f"[OllamaClient] Error calling Ollama ({url}): {e}")
             return None
 
-    def _call_generate_fallback(self, text: str):
+    def _call_generate_fallback(self, text: str, response_format=None, system: str = None, history=None):
         """
         回退方法：使用 /api/generate 接口
         """
-        url = f"{self.ollama_base_url}/api/generate"
-        payload = {
-            "model": self.model,
-            "prompt": text,
-            "stream": False
-        }
+        payload = self._build_payload(self.transport.ENDPOINT_GENERATE, text, system, response_format, history)
         try:
-            resp = requests.post(url, json=payload, timeout=self.timeout)
+            resp = self.transport.post("/api/generate", payload, read_timeout=self.timeout)
             resp.raise_for_status()
             data = resp.json()
             return self._extract_text(data)
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    """优先级：数值越小越优先"""
+    REALTIME = 0   # 实时窗口分类
+    CHAT = 1       # 交互式对话
+    BATCH = 2      # 报告生成、预分类、离线回填等批量任务
+
+
+class DeadlineExceeded(Exception):
+    """请求在截止时间前未能开始执行"""
+
+
+class RequestCancelled(Exception):
+    """请求在排队期间被取消"""
+
+
+# 每类请求的默认排队截止时间 (秒)，None 表示不限
+DEFAULT_DEADLINES = {
+    Priority.REALTIME: 60,
+    Priority.CHAT: 120,
+    Priority.BATCH: None,
+}
+
+# 每类请求的速率上限 (每分钟最多开始执行的次数)，None 表示不限
+DEFAULT_RATE_LIMITS = {
+    Priority.REALTIME: None,
+    Priority.CHAT: 20,
+    Priority.BATCH: 30,
+}
+
+
+def create_shared_state(max_concurrency: int = None):
+    """
+    创建跨进程共享的调度状态 (在 run.py 主进程中调用，传给 AI Worker 与 Web 进程)
+    - slots: 全局并发上限 (所有进程合计同时在 Ollama 上执行的请求数)
+    - realtime_demand: 正在排队/执行的实时请求数，其他进程的低优先级请求据此让路
+    """
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv('OLLAMA_NUM_PARALLEL', '1'))
+    return {
+        "slots": multiprocessing.BoundedSemaphore(max_concurrency),
+        "realtime_demand": multiprocessing.Value('i', 0),
+        "max_concurrency": max_concurrency,
+    }
+
+
+class LLMRequest:
+    """一次已提交的 LLM 调用 (类似 Future)"""
+
+    def __init__(self, fn, priority, deadline_ts=None, tag=None):
+        self.fn = fn
+        self.priority = Priority(priority)
+        self.deadline_ts = deadline_ts
+        self.tag = tag
+        self.enqueued_ts = time.time()
+        self.started_ts = None
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._cancelled = False
+
+    def cancel(self) -> bool:
+        """取消排队中的请求；已开始执行的请求无法中断，返回 False"""
+        if self.started_ts is not None or self._done.is_set():
+            return False
+        self._cancelled = True
+        return True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """阻塞等待结果；排队超时抛 DeadlineExceeded，被取消抛 RequestCancelled"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("LLM request still pending")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _finish(self, result=None, error=None):
+        self._result = result
+        self._error = error
+        self._done.set()
+
+
+class LLMScheduler:
+    """
+    LLM 请求调度器 (监控、报告、对话共用)
+    - 优先级：实时分类 > 交互对话 > 批量任务，同优先级先进先出
+    - 全局并发上限：本进程内 max_concurrency，加上可选的跨进程信号量
+    - 每类速率上限：滑动窗口计数，超限的请求留在队列中，不阻塞其他类别
+    - 截止时间与取消：过期或取消的请求不会再占用模型
+    - 指标：各类队列深度、执行中数量、排队等待时间
+    """
+
+    MAX_YIELD = 30
+
+    def __init__(self, max_concurrency: int = 1, shared=None, rate_limits=None, deadlines=None):
+        self.max_concurrency = max_concurrency
+        self.shared = shared
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = {p: 0 for p in Priority}
+        self._starts = {p: deque() for p in Priority}
+
+        # 指标
+        self._completed = {p: 0 for p in Priority}
+        self._failed = {p: 0 for p in Priority}
+        self._expired = {p: 0 for p in Priority}
+        self._cancelled = {p: 0 for p in Priority}
+        self._waits = {p: deque(maxlen=200) for p in Priority}
+
+        self._stopped = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    # ---------- 提交 ----------
+
+    def submit(self, fn, priority=Priority.BATCH, deadline=-1, tag=None) -> LLMRequest:
+        """
+        提交一个 LLM 调用。
+        deadline: 最长排队秒数；-1 使用该类别默认值，None 表示不限
+        tag: 可选标签，配合 cancel(tag) 批量取消
+        """
+        priority = Priority(priority)
+        if deadline == -1:
+            deadline = self.deadlines.get(priority)
+        req = LLMRequest(fn, priority, time.time() + deadline if deadline else None, tag)
+        if self._stopped:
+            req._finish(error=RequestCancelled("LLM scheduler stopped"))
+            return req
+        if priority == Priority.REALTIME:
+            self._change_realtime_demand(1)
+        with self._cond:
+            heapq.heappush(self._heap, (int(priority), next(self._seq), req))
+            self._cond.notify_all()
+        return req
+
+    def stop(self, timeout: float = 5.0):
+        """停止派发：仍在排队的请求以 RequestCancelled 结束，执行中的请求照常完成"""
+        with self._cond:
+            self._stopped = True
+            while self._heap:
+                req = heapq.heappop(self._heap)[2]
+                self._drop(req, RequestCancelled("LLM scheduler stopped"), self._cancelled)
+            self._cond.notify_all()
+        if self._dispatcher is not threading.current_thread():
+            self._dispatcher.join(timeout)
+
+    def run(self, fn, priority=Priority.BATCH, deadline=-1, tag=None):
+        """提交并阻塞等待结果"""
+        return self.submit(fn, priority, deadline, tag).result()
+
+    def cancel(self, tag) -> int:
+        """取消所有带该标签且仍在排队的请求，返回取消数量"""
+        count = 0
+        with self._cond:
+            for _, _, req in self._heap:
+                if req.tag == tag and req.cancel():
+                    count += 1
+            self._cond.notify_all()
+        return count
+
+    # ---------- 调度 ----------
+
+    def _change_realtime_demand(self, delta):
+        if self.shared is None:
+            return
+        demand = self.shared["realtime_demand"]
+        with demand.get_lock():
+            demand.value = max(0, demand.value + delta)
+
+    def _rate_ok(self, priority, now):
+        limit = self.rate_limits.get(priority)
+        if not limit:
+            return True
+        starts = self._starts[priority]
+        while starts and starts[0] < now - 60:
+            starts.popleft()
+        return len(starts) < limit
+
+    def _yield_to_realtime(self, req, now):
+        """
+        其他进程有实时请求在排队/执行时，低优先级请求暂缓。
+        最多让路 MAX_YIELD 秒，避免对方进程异常退出、计数未归零时永远饿死。
+        """
+        if self.shared is None or req.priority == Priority.REALTIME:
+            return False
+        if now - req.enqueued_ts > self.MAX_YIELD:
+            return False
+        own = sum(1 for _, _, r in self._heap if r.priority == Priority.REALTIME) + self._in_flight[Priority.REALTIME]
+        return self.shared["realtime_demand"].value > own
+
+    def _drop(self, req, error, counter):
+        counter[req.priority] += 1
+        if req.priority == Priority.REALTIME:
+            self._change_realtime_demand(-1)
+        req._finish(error=error)
+
+    def _pick(self, now):
+        """从堆中挑选下一个可执行的请求 (顺带清理过期/取消的请求)，没有则返回 None"""
+        kept, picked = [], None
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            req = item[2]
+            if req.cancelled:
+                self._drop(req, RequestCancelled("LLM request cancelled"), self._cancelled)
+                continue
+            if req.deadline_ts is not None and now > req.deadline_ts:
+                self._drop(req, DeadlineExceeded(f"{req.priority.name} request waited {now - req.enqueued_ts:.1f}s"), self._expired)
+                continue
+            if picked is None and self._rate_ok(req.priority, now) and not self._yield_to_realtime(req, now):
+                picked = req
+                continue
+            kept.append(item)
+        for item in kept:
+            heapq.heappush(self._heap, item)
+        return picked
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                req = None
+                while req is None:
+                    if self._stopped:
+                        return
+                    if sum(self._in_flight.values()) < self.max_concurrency:
+                        req = self._pick(time.time())
+                    if req is None:
+                        self._cond.wait(timeout=0.5)
+                now = time.time()
+                req.started_ts = now
+                self._in_flight[req.priority] += 1
+                self._starts[req.priority].append(now)
+                self._waits[req.priority].append(now - req.enqueued_ts)
+            threading.Thread(target=self._execute, args=(req,), daemon=True).start()
+
+    def _execute(self, req):
+        slots = self.shared["slots"] if self.shared is not None else None
+        if slots is not None:
+            # 等待跨进程名额时同样受截止时间约束，过期的请求不再占用模型
+            if req.deadline_ts is None:
+                acquired = slots.acquire()
+            else:
+                acquired = slots.acquire(timeout=max(0.0, req.deadline_ts - time.time()))
+            if not acquired:
+                with self._cond:
+                    self._in_flight[req.priority] -= 1
+                    self._cond.notify_all()
+                    self._drop(req, DeadlineExceeded(
+                        f"{req.priority.name} request waited {time.time() - req.enqueued_ts:.1f}s for a global slot"
+                    ), self._expired)
+                return
+        result, error = None, None
+        try:
+            result = req.fn()
+        except Exception as e:
+            error = e
+        finally:
+            if slots is not None:
+                slots.release()
+        with self._cond:
+            self._in_flight[req.priority] -= 1
+            if error is None:
+                self._completed[req.priority] += 1
+            else:
+                self._failed[req.priority] += 1
+            self._cond.notify_all()
+        if req.priority == Priority.REALTIME:
+            self._change_realtime_demand(-1)
+        req._finish(result, error)
+
+    # ---------- 指标 ----------
+
+    def metrics(self) -> dict:
+        with self._cond:
+            depth = {p: 0 for p in Priority}
+            for _, _, req in self._heap:
+                depth[req.priority] += 1
+            classes = {}
+            for p in Priority:
+                waits = sorted(self._waits[p])
+                classes[p.name.lower()] = {
+                    "queue_depth": depth[p],
+                    "in_flight": self._in_flight[p],
+                    "completed": self._completed[p],
+                    "failed": self._failed[p],
+                    "expired": self._expired[p],
+                    "cancelled": self._cancelled[p],
+                    "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0,
+                    "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0,
+                    "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0,
+                }
+        result = {"pid": os.getpid(), "max_concurrency": self.max_concurrency, "classes": classes, "ts": time.time()}
+        if self.shared is not None:
+            result["global_realtime_demand"] = self.shared["realtime_demand"].value
+        return result
+
+    def dump_metrics(self, path):
+        """把指标写入 JSON 文件，供其他进程 (Web API) 读取"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.metrics(), f)
+        os.replace(tmp, path)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def configure_scheduler(shared=None, max_concurrency: int = None, rate_limits=None) -> LLMScheduler:
+    """
+    在进程启动时调用一次，安装本进程的调度器 (传入 create_shared_state 的结果即可跨进程协调)
+    rate_limits: 可选，覆盖各类别的速率上限 (如基准测试时 {Priority.BATCH: None} 取消限速)
+    """
+    global _scheduler
+    if max_concurrency is None:
+        max_concurrency = shared["max_concurrency"] if shared else int(os.getenv('OLLAMA_NUM_PARALLEL', '1'))
+    with _scheduler_lock:
+        # 重复配置时先停掉旧实例的派发线程，避免两个调度器同时派发
+        if _scheduler is not None:
+            _scheduler.stop()
+        _scheduler = LLMScheduler(max_concurrency=max_concurrency, shared=shared, rate_limits=rate_limits)
+        return _scheduler
+
+
+def get_scheduler() -> LLMScheduler:
+    """获取本进程的调度器 (未配置时创建一个仅限本进程的实例)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(max_concurrency=int(os.getenv('OLLAMA_NUM_PARALLEL', '1')))
+        return _scheduler
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import random
+import hashlib
+import statistics
+
+from app.core.config import DATA_DIR
+from app.service.ai.ollama_transport import get_transport
+
+# 修改测试方式 (样本格式、指标计算) 时提升版本号，旧的缓存结果随之失效
+BENCHMARK_VERSION = "classify-bench/v1"
+CACHE_PATH = os.path.join(DATA_DIR, "model_benchmarks.json")
+CACHE_MAX_AGE = 7 * 86400
+
+# 没有历史记录时使用的固定样本：(窗口标题, 进程名, 参照标签)
+FALLBACK_SAMPLES = [
+    ("web_API.py - flow-state - Visual Studio Code", "Code.exe", "work"),
+    ("季度报告.docx - Word", "WINWORD.EXE", "work"),
+    ("Python 官方文档 - Microsoft Edge", "msedge.exe", "work"),
+    ("【4K】年度最佳动画 - 哔哩哔哩 (゜-゜)つロ 干杯~-bilibili", "msedge.exe", "entertainment"),
+    ("YouTube - Google Chrome", "chrome.exe", "entertainment"),
+    ("Steam", "steam.exe", "entertainment"),
+]
+
+# 推荐标准：与现有标签一致率、合法输出率的下限
+MIN_AGREEMENT = 0.8
+MIN_VALID_RATE = 0.9
+
+
+def _bucket(status):
+    """把内部状态归并成可比较的大类 (work / focus 视为同一类)"""
+    if status in ("work", "focus"):
+        return "work"
+    return status
+
+
+class ModelBenchmark:
+    """
+    模型延迟/质量自动基准
+    用用户自己历史中的窗口分类样本，逐个模型测量：
+    首 token 时间 (TTFT)、总耗时、生成速度 (tokens/s)、与现有标签的一致率、合法输出率。
+    结果按模型缓存 (model_benchmarks.json)，据此推荐「足够准确里最快」的模型。
+    """
+
+    def __init__(self, base_url: str = None, sample_size: int = 8, read_timeout: float = 120.0):
+        self.transport = get_transport(base_url)
+        self.sample_size = sample_size
+        self.read_timeout = read_timeout
+        self.keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+
+    # ---------- 样本 ----------
+
+    def load_samples(self):
+        """从历史中按标签均衡抽取样本；历史不足时用固定样本补齐"""
+        samples = []
+        try:
+            from app.data.dao.activity_dao import IntervalDAO
+            rows = IntervalDAO.get_labeled_samples()
+            by_label = {}
+            for r in rows:
+                by_label.setdefault(_bucket(r["status"]), []).append((r["window_title"], r["process_name"], r["status"]))
+            rng = random.Random(0)  # 固定种子：同一份历史每次抽到同样的样本，结果可比
+            while len(samples) < self.sample_size and any(by_label.values()):
+                for label in sorted(by_label):
+                    if by_label[label] and len(samples) < self.sample_size:
+                        samples.append(by_label[label].pop(rng.randrange(len(by_label[label]))))
+        except Exception as e:
+            print(f"[ModelBenchmark] Load history samples failed: {e}")
+        for s in FALLBACK_SAMPLES:
+            if len(samples) >= self.sample_size:
+                break
+            samples.append(s)
+        return samples
+
+    @staticmethod
+    def samples_fingerprint(samples) -> str:
+        raw = json.dumps(samples, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(f"{BENCHMARK_VERSION}\x1f{raw}".encode("utf-8")).hexdigest()[:16]
+
+    # ---------- 测量 ----------
+
+    def _classify_once(self, model, text):
+        """流式请求一次分类，返回 (ttft 秒, 总耗时 秒, tokens/s, 输出文本)"""
+        from app.service.detector.detector_logic import ai_processor, CLASSIFICATION_SCHEMA
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": ai_processor.system_prompt.strip()},
+                {"role": "user", "content": ai_processor._build_input(text)},
+            ],
+            "stream": True,
+            "format": CLASSIFICATION_SCHEMA,
+            "keep_alive": self.keep_alive,
+        }
+        t0 = time.perf_counter()
+        ttft = None
+        parts = []
+        final = {}
+        with self.transport.post("/api/chat", payload, read_timeout=self.read_timeout, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                delta = (data.get("message") or {}).get("content") or ""
+                if delta and ttft is None:
+                    ttft = time.perf_counter() - t0
+                parts.append(delta)
+                if data.get("done"):
+                    final = data
+                    break
+        total = time.perf_counter() - t0
+        tps = None
+        if final.get("eval_count") and final.get("eval_duration"):
+            tps = final["eval_count"] / (final["eval_duration"] / 1e9)
+        return ttft if ttft is not None else total, total, tps, "".join(parts)
+
+    def run_model(self, model, samples=None, progress=None):
+        """
+        测试单个模型，返回结果 dict。
+        第一次请求单独计为加载耗时 (load_ms)，之后的请求才计入延迟统计。
+        progress(done, total): 可选进度回调
+        """
+        from app.service.detector.detector_logic import ClassificationResult
+        from app.service.monitor_service import map_ai_status
+
+        samples = samples or self.load_samples()
+        result = {
+            "model": model, "n": len(samples), "version": BENCHMARK_VERSION,
+            "fingerprint": self.samples_fingerprint(samples), "ts": time.time(), "error": None,
+        }
+        try:
+            t0 = time.perf_counter()
+            self._classify_once(model, "窗口: 'ping' | 进程: ping | 持续: 1.00s")
+            result["load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+
+        ttfts, totals, speeds = [], [], []
+        agree = valid = 0
+        for i, (title, proc, label) in enumerate(samples):
+            try:
+                ttft, total, tps, text = self._classify_once(model, f"窗口: '{title}' | 进程: {proc} | 持续: 30.00s")
+                ttfts.append(ttft)
+                totals.append(total)
+                if tps:
+                    speeds.append(tps)
+                parsed = ClassificationResult.from_text(text)
+                valid += 1
+                if _bucket(map_ai_status(parsed.status, title)) == _bucket(label):
+                    agree += 1
+            except Exception as e:
+                print(f"[ModelBenchmark] {model} sample failed: {e}")
+            if progress:
+                progress(i + 1, len(samples))
+
+        n = max(1, len(samples))
+        result.update({
+            "ttft_ms": round(statistics.median(ttfts) * 1000, 1) if ttfts else None,
+            "total_ms": round(statistics.median(totals) * 1000, 1) if totals else None,
+            "tokens_per_s": round(statistics.median(speeds), 1) if speeds else None,
+            "agreement": round(agree / n, 3),
+            "valid_rate": round(valid / n, 3),
+        })
+        return result
+
+    def run(self, models, progress=None, use_cache=True):
+        """
+        测试多个模型 (顺序执行，避免互相抢占显存)，返回 {model: result}
+        同一份样本、未过期的缓存结果直接复用。
+        progress(model, done, total): 可选进度回调
+        """
+        samples = self.load_samples()
+        fingerprint = self.samples_fingerprint(samples)
+        cache = load_cached_results() if use_cache else {}
+        results = {}
+        for model in models:
+            cached = cache.get(model)
+            if (cached and cached.get("fingerprint") == fingerprint and not cached.get("error")
+                    and time.time() - cached.get("ts", 0) < CACHE_MAX_AGE):
+                results[model] = cached
+                continue
+            cb = (lambda done, total, m=model: progress(m, done, total)) if progress else None
+            results[model] = self.run_model(model, samples, cb)
+            cache[model] = results[model]
+            save_cached_results(cache)
+        return results
+
+
+def load_cached_results() -> dict:
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {m: r for m, r in data.items() if r.get("version") == BENCHMARK_VERSION}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cached_results(results: dict):
+    tmp = f"{CACHE_PATH}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, CACHE_PATH)
+
+
+def recommend(results: dict, min_agreement: float = MIN_AGREEMENT, min_valid_rate: float = MIN_VALID_RATE):
+    """在一致率与合法率达标的模型中选总耗时最短的；都不达标时选一致率最高的。无可用结果返回 None"""
+    usable = [r for r in results.values() if not r.get("error") and r.get("total_ms") is not None]
+    if not usable:
+        return None
+    qualified = [r for r in usable if r["agreement"] >= min_agreement and r["valid_rate"] >= min_valid_rate]
+    if qualified:
+        return min(qualified, key=lambda r: r["total_ms"])["model"]
+    return max(usable, key=lambda r: (r["agreement"], -r["total_ms"]))["model"]
@@ -0,0 +1,134 @@
+import time
+import threading
+
+from app.data.dao.activity_dao import ClassificationQueueDAO
+
+
+class ClassificationDrainer:
+    """
+    离线分类队列的后台排空线程。
+    - Ollama 不可达 / 过慢时，未分类区间持久化在 classification_queue 中
+    - 焦点离开时仍无标签的区间 (停留过短、分析排队中) 也实时入队，到期即处理
+    - 熔断器放行后按批次重试，失败则指数退避；超过 MAX_ATTEMPTS 次仍失败即放弃，
+      移出队列并通知主循环以兜底标签计入 (之后不再重试，该区间不会一直卡住派生统计)
+    - 分类结果投递到 Worker 的结果队列，由主循环统一补记到时间账本
+      (账本会回填 window_sessions、每日统计与核心事件累计表)
+    """
+
+    BASE_BACKOFF = 15       # 首次重试间隔 (秒)
+    MAX_BACKOFF = 30 * 60   # 最大重试间隔 (秒)
+    MAX_ATTEMPTS = 8        # 最多尝试次数 (按退避间隔累计约 1 小时)
+    BATCH_SIZE = 20
+
+    def __init__(self, results, running_event, classify, breaker, label_cache=None, poll_interval: float = 5.0):
+        self.results = results
+        self.running_event = running_event
+        self.classify = classify
+        self.breaker = breaker
+        self.label_cache = label_cache
+        self.poll_interval = poll_interval
+        self._thread = None
+
+    def start(self):
+        # 运行期间漏掉的区间都会实时入队，这里只兜底上次异常退出时尚未返回的分析
+        requeued = ClassificationQueueDAO.enqueue_unlabeled()
+        if requeued:
+            print(f"[OfflineQueue] Recovered {requeued} unlabeled interval(s) after unclean exit")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def enqueue(job, error=None):
+        """分类失败的任务入队，稍后重试"""
+        ClassificationQueueDAO.enqueue(
+            job["interval_id"], job["window_title"], job["process_name"],
+            job.get("duration", 0), next_attempt_ts=time.time() + ClassificationDrainer.BASE_BACKOFF
+        )
+
+    @staticmethod
+    def enqueue_missed(job):
+        """焦点离开时仍无标签的区间入队，立即到期 (同一活动键有缓存标签时直接复用)"""
+        ClassificationQueueDAO.enqueue(
+            job["interval_id"], job["window_title"], job["process_name"],
+            job.get("duration", 0), next_attempt_ts=0
+        )
+
+    def _backoff(self, attempts):
+        return min(self.MAX_BACKOFF, self.BASE_BACKOFF * (2 ** attempts))
+
+    def _run(self):
+        while self.running_event.is_set():
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"[OfflineQueue] Drain error: {e}")
+            time.sleep(self.poll_interval)
+
+    def drain_once(self):
+        """处理一批到期的队列项，返回成功补记的条数"""
+        if self.breaker.state == self.breaker.OPEN:
+            return 0
+        items = ClassificationQueueDAO.get_due(time.time(), limit=self.BATCH_SIZE)
+        if not items:
+            return 0
+
+        # 同一窗口只请求一次模型，结果复用给同批次的其他区间
+        groups = {}
+        for item in items:
+            key = (item["window_title"], item["process_name"])
+            groups.setdefault(key, []).append(item)
+
+        done = 0
+        for (window_title, process_name), group in groups.items():
+            ai_data, source = None, 'ai'
+            if self.label_cache is not None:
+                cached = self.label_cache.get(window_title, process_name, min_confidence=0.5)
+                if cached and cached.get("ai_raw"):
+                    ai_data, source = cached["ai_raw"], 'cache'
+
+            if ai_data is None:
+                duration = sum(i["duration"] or 0 for i in group)
+                prompt = f"窗口: '{window_title}' | 进程: {process_name} | 持续: {duration:.2f}s"
+                ai_data = self.classify(prompt)
+
+            if ai_data is None:
+                now = time.time()
+                for item in group:
+                    attempts = (item["attempts"] or 0) + 1
+                    if attempts >= self.MAX_ATTEMPTS:
+                        # 放弃：移出队列，由主循环通过 ledger.attach_fallback 补上兜底标签
+                        ClassificationQueueDAO.remove(item["interval_id"])
+                        self.results.put(({
+                            "interval_id": item["interval_id"],
+                            "window_title": window_title,
+                            "process_name": process_name,
+                            "duration": item["duration"] or 0,
+                            "queued": True,
+                            "gave_up": True
+                        }, None))
+                        print(f"[OfflineQueue] Gave up on interval {item['interval_id']} after {attempts} attempts")
+                        continue
+                    ClassificationQueueDAO.reschedule(
+                        item["interval_id"], attempts, now + self._backoff(attempts), "unreachable or invalid output"
+                    )
+                # 模型仍不可用，本批次剩余部分等下一轮
+                if self.breaker.state != self.breaker.CLOSED:
+                    break
+                continue
+
+            for item in group:
+                job = {
+                    "interval_id": item["interval_id"],
+                    "window_title": window_title,
+                    "process_name": process_name,
+                    "duration": item["duration"] or 0,
+                    "queued": True,
+                    "source": source
+                }
+                self.results.put((job, ai_data))
+                ClassificationQueueDAO.remove(item["interval_id"])
+                done += 1
+
+        if done:
+            print(f"[OfflineQueue] Back-filled {done} queued interval(s), {ClassificationQueueDAO.count()} remaining")
+        return done
@@ -0,0 +1,71 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OllamaTransport:
+    """
+    Ollama HTTP 传输层 (进程内共享)
+    - 共享 requests.Session + 连接池，复用 keep-alive 连接，省去每次请求的 TCP 握手
+    - 连接超时与读取超时分开：Ollama 不可达时快速失败，模型生成慢时耐心等待
+    - 记住可用的端点 (/api/chat 或 /api/generate)，回退探测每个进程只发生一次
+    """
+
+    ENDPOINT_CHAT = "chat"
+    ENDPOINT_GENERATE = "generate"
+
+    def __init__(self, base_url: str, pool_connections: int = 4, pool_maxsize: int = 8,
+                 connect_timeout: float = 3.0, read_timeout: float = 180.0):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self.session = requests.Session()
+        # 不在传输层做自动重试，失败交给熔断器与离线队列处理
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._endpoint = None   # None 表示尚未确定，先按 /api/chat 尝试
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        return self._endpoint or self.ENDPOINT_CHAT
+
+    def remember_endpoint(self, endpoint: str):
+        with self._lock:
+            if self._endpoint != endpoint:
+                print(f"[OllamaTransport] 使用端点: /api/{endpoint}")
+            self._endpoint = endpoint
+
+    def timeout(self, read_timeout: float = None):
+        return (self.connect_timeout, read_timeout if read_timeout is not None else self.read_timeout)
+
+    def post(self, path: str, payload: dict, read_timeout: float = None, **kwargs):
+        return self.session.post(f"{self.base_url}{path}", json=payload,
+                                 timeout=self.timeout(read_timeout), **kwargs)
+
+    def get(self, path: str, read_timeout: float = None, **kwargs):
+        return self.session.get(f"{self.base_url}{path}", timeout=self.timeout(read_timeout), **kwargs)
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url: str = None) -> OllamaTransport:
+    """按 base_url 获取进程内共享的传输实例"""
+    base_url = (base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')).rstrip("/")
+    with _transports_lock:
+        transport = _transports.get(base_url)
+        if transport is None:
+            transport = OllamaTransport(
+                base_url,
+                pool_maxsize=int(os.getenv('OLLAMA_POOL_MAXSIZE', '8')),
+                connect_timeout=float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '3')),
+            )
+            _transports[base_url] = transport
+        return transport
@@ -0,0 +1,69 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ClassificationCache:
+    """
+    窗口分类结果缓存 (进程内 LRU)
+    键: (进程名, 窗口标题)  值: 状态 + 活动摘要
+    同一窗口再次获得焦点时直接复用标签，无需等待 LLM。
+    可传入 key_fn (如 TitleCanonicalizer.activity_key)，让仅有噪声差异的标题共享同一条缓存。
+    条目带有模型给出的 confidence：有效期按置信度缩放，低置信度标签更快过期、更早重新分析。
+    """
+
+    MIN_TTL = 60
+
+    def __init__(self, max_size: int = 512, ttl: float = 1800, key_fn=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_fn = key_fn
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, window_title: str, process_name: str):
+        if self.key_fn is not None:
+            return self.key_fn(window_title, process_name)
+        return ((process_name or "").lower(), window_title or "")
+
+    def get(self, window_title: str, process_name: str, min_confidence: float = 0.0):
+        """
+        命中返回 {'status', 'summary', 'ai_raw', 'confidence', 'ts'}，
+        未命中、已过期或置信度低于 min_confidence 返回 None
+        """
+        key = self.make_key(window_title, process_name)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['ts'] > entry['ttl']:
+                del self._data[key]
+                return None
+            if entry['confidence'] < min_confidence:
+                return None
+            self._data.move_to_end(key)
+            return dict(entry)
+
+    def put(self, window_title: str, process_name: str, status: str, summary: str,
+            ai_raw: dict = None, confidence: float = 1.0):
+        key = self.make_key(window_title, process_name)
+        confidence = min(max(float(confidence), 0.0), 1.0)
+        with self._lock:
+            self._data[key] = {
+                'status': status,
+                'summary': summary,
+                'ai_raw': ai_raw,
+                'confidence': confidence,
+                'ttl': max(self.MIN_TTL, self.ttl * confidence),
+                'ts': time.time()
+            }
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __contains__(self, item):
+        window_title, process_name = item
+        return self.get(window_title, process_name) is not None
+
+    def __len__(self):
+        return len(self._data)
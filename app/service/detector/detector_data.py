@@ -21,9 +21,11 @@ import pynput
 from pynput import mouse, keyboard
 
 # 焦点识别相关
-import win32gui
-import win32process
-import psutil
+try:
+    import win32gui
+except ImportError:
+    win32gui = None # 非 Windows 平台，焦点窗口由 WindowSource 获取
+from app.service.detector.window_source import get_window_source
 
 #焦点截图相关
 import os
@@ -256,6 +258,8 @@ class FocusDetector:
         self._thread = None
         self._stop_event = Event()
         self._focus_start_time = None
+        # 窗口来源 (Win32 / X11)
+        self.window_source = get_window_source()
         #截图
         self._last_screenshot_time = 0
         self.screenshot_interval = 5  # 秒
@@ -264,40 +268,19 @@ class FocusDetector:
     def _get_active_window_info(self) -> Optional[Dict]:
         """获取当前活动窗口信息"""
         try:
-            # 获取前台窗口句柄
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                # 锁屏或无焦点时，返回特定标记
-                return {
-                    "window_title": "Lock Screen",
-                    "process_name": "LockApp.exe",
-                    "process_id": 0,
-                    "hwnd": 0
-                }
-            
-            # 获取窗口标题
-            window_title = win32gui.GetWindowText(hwnd)
-            
-            # 获取进程ID
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            
-            # 获取进程信息
-            try:
-                process = psutil.Process(pid)
-                process_name = process.name()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                process_name = "Unknown"
-            
-            return {
-                "window_title": window_title,
-                "process_name": process_name,
-                "process_id": pid,
-                "hwnd": hwnd
-            }
+            return self.window_source.get_active_window()
         except Exception as e:
             print(f"获取活动窗口信息失败: {e}")
             return None
     
+    def list_open_windows(self) -> List[Dict]:
+        """枚举当前打开的顶层窗口"""
+        try:
+            return self.window_source.list_windows()
+        except Exception as e:
+            print(f"枚举窗口失败: {e}")
+            return []
+    
     def _detection_thread(self):
         """检测线程"""
         while not self._stop_event.is_set():
@@ -472,35 +455,13 @@ def detect_focus_events(focus_detector: FocusDetector):
         
         try:
             # print(f"[焦点切换] {info_str}") # 可选：先打印原始信息
-            ai_result = AI.analyze(info_str)
-            # 尝试解析 JSON
+            # 结构化输出：模型按 Schema 返回，校验失败时已约束重试一次
+            result = AI.ai_processor.classify_result(info_str)
             import json
-            try:
-                if isinstance(ai_result, str):
-                    # 尝试清理可能存在的 Markdown 标记
-                    clean_result = ai_result.strip()
-                    # 移除 ```json 标记
-                    if clean_result.startswith("```json"):
-                        clean_result = clean_result[7:]
-                    elif clean_result.startswith("```"):
-                        clean_result = clean_result[3:]
-                    
-                    # 移除结尾的 ```
-                    if clean_result.endswith("```"):
-                        clean_result = clean_result[:-3]
-                    
-                    # 再次去除空白字符
-                    clean_result = clean_result.strip()
-                    
-                    # 打印清洗后的结果，方便调试
-                    # print(f"DEBUG: Cleaned Result: {clean_result}")
-                    
-                    data = json.loads(clean_result)
-                    print(f"\n[AI 分析] {json.dumps(data, ensure_ascii=False)}")
-                else:
-                    print(f"\n[AI 分析] {ai_result}")
-            except json.JSONDecodeError:
-                print(f"\n[AI 分析] (原始输出) {ai_result}")
+            if result:
+                print(f"\n[AI 分析] {json.dumps(result.to_dict(), ensure_ascii=False)}")
+            else:
+                print("\n[AI 分析] 无有效结果 (模型不可达或输出不符合契约)")
                 
             print(f"源数据: {info_str}\n")
         except Exception as e:
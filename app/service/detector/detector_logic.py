@@ -2,7 +2,7 @@ import os
 import datetime
 import uuid
 import json
-import re
+from dataclasses import dataclass, asdict
 
 # 1. 强制不走代理（关键步骤！）
 os.environ["NO_PROXY"] = "localhost,127.0.0.1"
@@ -11,13 +11,82 @@ os.environ["HTTP_PROXY"] = ""
 os.environ["HTTPS_PROXY"] = ""
 
 from app.service.ai.langflow_client import LangflowClient
+from app.service.ai.llm_scheduler import Priority
+
+# 窗口分类的输出契约：通过 Ollama 的 format 参数下发，模型只能生成符合该 Schema 的 JSON
+CLASSIFICATION_STATUSES = ["学习工作", "娱乐", "休息"]
+CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "状态": {"type": "string", "enum": CLASSIFICATION_STATUSES},
+        "活动摘要": {"type": "string"},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1}
+    },
+    "required": ["状态", "活动摘要", "confidence"]
+}
+
+# 批量分类：一次请求分类多个窗口，按输入序号 (id) 返回
+BATCH_CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": dict(id={"type": "integer"}, **CLASSIFICATION_SCHEMA["properties"]),
+                "required": ["id"] + CLASSIFICATION_SCHEMA["required"]
+            }
+        }
+    },
+    "required": ["results"]
+}
+
+
+@dataclass
+class ClassificationResult:
+    """校验通过的窗口分类结果"""
+    status: str
+    summary: str
+    confidence: float
+
+    @classmethod
+    def from_text(cls, text):
+        """解析并校验模型输出，不符合契约时抛出 ValueError (附带原因，用于约束重试)"""
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            raise ValueError("输出不是合法 JSON")
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data):
+        """校验已解析的 JSON 对象"""
+        if not isinstance(data, dict):
+            raise ValueError("输出不是 JSON 对象")
+
+        status = data.get("状态")
+        if status not in CLASSIFICATION_STATUSES:
+            raise ValueError(f"状态必须是 {'/'.join(CLASSIFICATION_STATUSES)} 之一，实际为 {status!r}")
+        summary = data.get("活动摘要")
+        if not isinstance(summary, str) or not summary.strip():
+            raise ValueError("活动摘要不能为空")
+        confidence = data.get("confidence")
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+            raise ValueError(f"confidence 必须是 0~1 之间的数字，实际为 {confidence!r}")
+        return cls(status=status, summary=summary.strip(), confidence=float(confidence))
+
+    def to_dict(self):
+        """转换为 Worker/缓存/区间 raw_data 使用的字段名"""
+        d = asdict(self)
+        return {"状态": d["status"], "活动摘要": d["summary"], "confidence": d["confidence"]}
+
 
 class AIProcessor:
     def __init__(self):
         # 统一客户端（环境变量控制）
         self.client = LangflowClient()
         
-        # 默认 System Prompt (保留作为文档，实际上现在通过 LangFlow 流程控制)
+        # 默认 System Prompt (窗口分类)，作为固定的 system 消息发送
         self.system_prompt = """
 你是专业用户活动总结助手，根据【窗口标题】【进程名】【持续时间】推断用户实际正在做的行为，并返回精炼的活动摘要。
 **只允许用JSON返回结果，禁止其他任何词句；摘要必须精准反映窗口内容，不能输出“浏览网页”、“可能进行xx”等模板，也不能简单复述窗口标题原文。**
@@ -29,32 +98,34 @@ class AIProcessor:
 - 严禁输出“学习工作/娱乐”、“可能xx”等模糊描述。
 - “活动摘要”不能直接粘贴输入内容，限20字以内。
 
+- “confidence”为你对判断的把握程度，0~1 之间的小数。
+
 输出示例（严格参照，禁止多字段或少字段）：
 {
-  "日期": "YYYY-MM-DD HH:MM",
   "状态": "学习工作/娱乐/休息",
-  "持续时间": "XXs",
-  "活动摘要": "具体活动简述，20字内"
+  "活动摘要": "具体活动简述，20字内",
+  "confidence": 0.9
 }
 """
 
-    def process(self, text, system_prompt=None, json_mode=True):
-        # 获取当前实时时间
+    def _build_input(self, text):
+        # 可变数据 (输入、当前时间) 一律放在最后，固定的系统提示词单独作为 system 消息，
+        # 这样每次请求的前缀完全相同，Ollama 可以复用前缀的 KV 缓存
         now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
+        return f"User Input: {text}\n【当前系统时间】：{now_str}"
+
+    def warm_up(self):
+        """加载模型并预先处理分类系统提示词前缀"""
+        return self.client.warm_up(system=self.system_prompt.strip())
+
+    def process(self, text, system_prompt=None, json_mode=True, priority=Priority.CHAT, history=None):
         # 构造输入值
-        # 注意：LangFlow 的 Input 组件通常只需要一个 input_value 字符串
-        # 我们把 system_prompt 和 text 拼接起来，或者只传 text
-        # 如果 system_prompt 很重要，最好将其硬编码在 LangFlow 的 Prompt 组件中
-        # 这里我们将它们合并，以便 LangFlow 可以通过单一输入接收所有上下文
+        # system_prompt 作为独立的 system 消息发送 (固定前缀)，text 与当前时间放在 user 消息末尾
+        # history: 多轮对话的历史消息，此时 text 原样发送 (由调用方组装并记录，保证下一轮前缀一致)
         
         # 优先使用传入的 system_prompt，否则使用默认的
-        current_sys_prompt = system_prompt if system_prompt else self.system_prompt
-        
-        if current_sys_prompt:
-            final_input = f"{current_sys_prompt}\n【当前系统时间】：{now_str}\n\nUser Input: {text}"
-        else:
-            final_input = f"【当前系统时间】：{now_str}\n\nUser Input: {text}"
+        current_sys_prompt = (system_prompt if system_prompt else self.system_prompt).strip()
+        final_input = text if history is not None else self._build_input(text)
 
         # Request payload configuration 
         payload = { 
@@ -65,16 +136,17 @@ class AIProcessor:
         payload["session_id"] = str(uuid.uuid4()) 
         
         try:
-            result_text = self.client.call_flow('detector', final_input) or ''
-            if json_mode:
+            # json_mode 下让 Ollama 以 JSON 模式输出，无需再从自由文本中正则抠取
+            result_text = self.client.call_flow(
+                'detector', final_input, response_format="json" if json_mode else None,
+                system=current_sys_prompt, priority=priority, history=history
+            ) or ''
+            if json_mode and result_text:
                 try:
-                    json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                    if json_match:
-                        clean_json_str = json_match.group(0)
-                        json.loads(clean_json_str)
-                        return clean_json_str
-                except Exception:
-                    pass
+                    json.loads(result_text)
+                except ValueError:
+                    print(f"[AIProcessor] JSON 模式输出无法解析: {result_text[:100]}")
+                    return ''
             return result_text
 
         except Exception as e:
@@ -83,13 +155,106 @@ class AIProcessor:
             if json_mode:
                  return f'{{"error": "{error_msg}"}}'
             return error_msg
-        
+
+    def stream(self, text, system_prompt=None, priority=Priority.CHAT, history=None):
+        """流式生成 (对话用)，逐段 yield 文本；空字符串为心跳。history 含义同 process"""
+        current_sys_prompt = (system_prompt if system_prompt else self.system_prompt).strip()
+        final_input = text if history is not None else self._build_input(text)
+        yield from self.client.stream_flow('chat', final_input, system=current_sys_prompt, priority=priority,
+                                           history=history)
+
+    def classify_result(self, text, priority=Priority.REALTIME):
+        """
+        窗口分类 (结构化输出)。
+        请求时下发 CLASSIFICATION_SCHEMA，返回校验后的 ClassificationResult；
+        输出违反契约时带上错误原因约束重试一次。
+        模型不可达 (或熔断中) 以及重试后仍不合法时返回 None。
+        """
+        system = self.system_prompt.strip()
+        final_input = self._build_input(text)
+        result_text = self.client.call_flow('detector', final_input, response_format=CLASSIFICATION_SCHEMA,
+                                          system=system, priority=priority)
+        if result_text is None:
+            return None
+        try:
+            return ClassificationResult.from_text(result_text)
+        except ValueError as e:
+            print(f"[AIProcessor] 输出不符合分类契约 ({e})，约束重试一次")
+            retry_input = (
+                f"{final_input}\n\n你上一次的输出不符合要求：{e}。"
+                f"请只输出一个包含 状态、活动摘要、confidence 三个字段的 JSON 对象。"
+            )
+
+        result_text = self.client.call_flow('detector', retry_input, response_format=CLASSIFICATION_SCHEMA,
+                                          system=system, priority=priority)
+        if result_text is None:
+            return None
+        try:
+            return ClassificationResult.from_text(result_text)
+        except ValueError as e:
+            print(f"[AIProcessor] 重试后输出仍不合法: {e}")
+            return None
+
+    def classify(self, text, priority=Priority.REALTIME):
+        """
+        窗口分类专用入口。
+        成功返回 dict (状态 / 活动摘要 / confidence)；失败返回 None，
+        调用方据此把区间放入离线分类队列，而不是丢弃。
+        priority: 实时分类默认最高优先级；预分类、离线回填等后台任务传 Priority.BATCH
+        """
+        result = self.classify_result(text, priority)
+        return result.to_dict() if result else None
+
+    def classify_batch(self, texts, priority=Priority.BATCH):
+        """
+        批量窗口分类 (历史重分类等后台任务用)。
+        多个窗口合并到一次请求中，按输入顺序返回 dict 列表；
+        模型漏掉或输出不合法的条目为 None，由调用方逐条重试。
+        """
+        if not texts:
+            return []
+        lines = "\n".join(f"{i}. {t}" for i, t in enumerate(texts, 1))
+        final_input = self._build_input(
+            f"\n{lines}\n\n以上共 {len(texts)} 个窗口，请逐个分类，"
+            f"输出 {{\"results\": [...]}}，每项包含 id (上面的序号)、状态、活动摘要、confidence。"
+        )
+        result_text = self.client.call_flow('detector', final_input, response_format=BATCH_CLASSIFICATION_SCHEMA,
+                                          system=self.system_prompt.strip(), priority=priority)
+        results = [None] * len(texts)
+        if result_text is None:
+            return results
+        try:
+            items = json.loads(result_text).get("results") or []
+        except (AttributeError, ValueError):
+            print(f"[AIProcessor] 批量分类输出无法解析: {result_text[:100]}")
+            return results
+        for item in items:
+            try:
+                idx = int(item.get("id")) - 1
+                if 0 <= idx < len(texts) and results[idx] is None:
+                    results[idx] = ClassificationResult.from_dict(item).to_dict()
+            except (AttributeError, TypeError, ValueError):
+                continue
+        return results
+
 
 # 单例实例
 ai_processor = AIProcessor()
 
-def analyze(text, system_prompt=None, json_mode=True):
-    return ai_processor.process(text, system_prompt, json_mode)
+def analyze(text, system_prompt=None, json_mode=True, priority=Priority.CHAT, history=None):
+    return ai_processor.process(text, system_prompt, json_mode, priority, history)
+
+def stream(text, system_prompt=None, priority=Priority.CHAT, history=None):
+    return ai_processor.stream(text, system_prompt, priority, history)
+
+def classify(text, priority=Priority.REALTIME):
+    return ai_processor.classify(text, priority)
+
+def classify_batch(texts, priority=Priority.BATCH):
+    return ai_processor.classify_batch(texts, priority)
+
+def warm_up():
+    return ai_processor.warm_up()
 
 if __name__ == "__main__":
     while True:
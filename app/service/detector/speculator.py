@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import deque
+
+
+class SpeculativeClassifier:
+    """
+    打开窗口的推测性预分类。
+    在空闲时刻 (实时分析没有待处理任务) 枚举当前打开的顶层窗口，
+    对尚不在分类缓存中的窗口以低优先级预先分类，
+    这样用户切换过去时直接命中缓存，无需等待一次完整的 LLM 往返。
+    后台调用受每小时预算限制，避免抢占模型。
+    """
+
+    def __init__(self, list_windows, label_cache, classify, store, is_idle, running_event,
+                 budget_per_hour: int = 30, scan_interval: float = 30.0):
+        """
+        Args:
+            list_windows: 返回当前打开窗口列表的函数 (WindowSource.list_windows)
+            label_cache: ClassificationCache
+            classify: 分类函数，返回 AI 结果 dict 或 None
+            store: 回调 store(window_title, process_name, ai_data)，把结果写入缓存
+            is_idle: 返回 True 表示实时分析空闲，可以进行后台调用
+            budget_per_hour: 每小时最多发起的后台 LLM 调用次数
+        """
+        self.list_windows = list_windows
+        self.label_cache = label_cache
+        self.classify = classify
+        self.store = store
+        self.is_idle = is_idle
+        self.running_event = running_event
+        self.budget_per_hour = budget_per_hour
+        self.scan_interval = scan_interval
+
+        self._call_times = deque()
+        self._speculated = set()   # 本进程内预分类过的窗口键
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # 统计
+        self.speculative_calls = 0
+        self.speculation_hits = 0
+        self.switches = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record_switch(self, window_title, process_name, served_from_cache: bool):
+        """Worker 每次焦点切换时调用，统计由预分类命中的切换次数"""
+        key = self.label_cache.make_key(window_title, process_name)
+        with self._lock:
+            self.switches += 1
+            if served_from_cache and key in self._speculated:
+                self.speculation_hits += 1
+                # 用户已实际访问，后续命中归功于正常缓存
+                self._speculated.discard(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "speculative_calls": self.speculative_calls,
+                "speculation_hits": self.speculation_hits,
+                "switches": self.switches,
+                "budget_left": self._budget_left()
+            }
+
+    def _budget_left(self) -> int:
+        cutoff = time.time() - 3600
+        while self._call_times and self._call_times[0] < cutoff:
+            self._call_times.popleft()
+        return max(0, self.budget_per_hour - len(self._call_times))
+
+    def _run(self):
+        while self.running_event.is_set():
+            time.sleep(self.scan_interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[Speculator] Error: {e}")
+
+    def run_once(self) -> int:
+        """执行一轮预分类，返回本轮发起的 LLM 调用次数"""
+        calls = 0
+        if not self.is_idle():
+            return calls
+        for w in self.list_windows():
+            window_title = w.get("window_title") or ""
+            process_name = w.get("process_name") or ""
+            if not window_title.strip() or not process_name.strip():
+                continue
+            if self.label_cache.get(window_title, process_name) is not None:
+                continue
+            # 每次调用前都重新确认：实时分析优先，预算用尽即停
+            with self._lock:
+                if self._budget_left() <= 0:
+                    break
+            if not self.is_idle():
+                break
+
+            prompt = f"窗口: '{window_title}' | 进程: {process_name} | 持续: 0.00s"
+            ai_data = self.classify(prompt)
+            with self._lock:
+                self._call_times.append(time.time())
+                self.speculative_calls += 1
+            calls += 1
+            if ai_data is None:
+                # 模型不可用，本轮放弃
+                break
+            self.store(window_title, process_name, ai_data)
+            with self._lock:
+                self._speculated.add(self.label_cache.make_key(window_title, process_name))
+        return calls
@@ -0,0 +1,121 @@
+import re
+import time
+import threading
+from functools import lru_cache
+
+from app.data.services.title_normalizer import get_normalizer
+
+
+# 所有应用通用的标题噪声 (变化不代表用户换了一件事)
+COMMON_NOISE_PATTERNS = [
+    r'^\(\d+\+?\)\s*',                 # 未读计数 "(3) ..."
+    r'^\[\d+\+?\]\s*',                 # 未读计数 "[3] ..."
+    r'\s*\(\d+\+?\)$',                 # 结尾未读计数 "... (3)"
+    r'^[●•*]\s*',                      # 未保存/新消息标记
+    r' 和另外 \d+ 个页面.*',            # Edge 多标签后缀
+    r' and \d+ more pages?.*',
+    r'\b\d{1,2}:\d{2}(:\d{2})?\s*/\s*\d{1,2}:\d{2}(:\d{2})?\b',  # 视频播放进度 "12:34 / 45:00"
+]
+
+# 按应用配置的规则 (进程名包含 match 中任一关键字即生效)
+#   noise: 额外的噪声正则
+#   key:   'clean' 使用共享标题归一化器 (title_normalizer) 的结果作为活动键 (同一站点/文件视为同一件事)
+#          'stripped' 仅去噪后的完整标题作为活动键 (标题任何实质变化都重新分析)
+DEFAULT_APP_RULES = [
+    {
+        "match": ["weixin", "wechat", "qq", "feishu", "lark", "dingtalk", "telegram", "slack", "teams"],
+        "noise": [r'(对方)?正在输入[.…]*', r'\s*is typing\.*', r'\s*-\s*\d+ 条新消息'],
+        "key": "clean"
+    },
+    {
+        "match": ["chrome", "msedge", "edge", "firefox", "browser"],
+        "noise": [r'^▶\s*', r'\s*-\s*(正在播放|Playing)\b.*', r'\s*\(Playing\)'],
+        "key": "clean"
+    },
+    {
+        "match": ["code", "trae", "pycharm", "idea", "studio"],
+        "noise": [],
+        "key": "clean"
+    },
+]
+
+
+class TitleCanonicalizer:
+    """
+    窗口标题语义归一化。
+    在共享标题归一化 (title_normalizer) 的基础上去除未读计数、多标签后缀、视频进度、输入中提示等噪声，
+    得到稳定的"活动键"。活动键不变的标题变化视为噪声：
+    不重置窗口计时，也不触发新的 LLM 分析。
+    """
+
+    def __init__(self, app_rules=None, common_noise=None, cache_size=2048):
+        self.app_rules = []
+        for rule in (app_rules if app_rules is not None else DEFAULT_APP_RULES):
+            self.app_rules.append({
+                "match": [m.lower() for m in rule.get("match", [])],
+                "noise": [re.compile(p) for p in rule.get("noise", [])],
+                "key": rule.get("key", "clean")
+            })
+        self.common_noise = [re.compile(p) for p in (common_noise if common_noise is not None else COMMON_NOISE_PATTERNS)]
+        self.normalizer = get_normalizer()
+        # 分类缓存每次查找都要算活动键，按 (标题, 进程名) 缓存
+        self._activity_key = lru_cache(maxsize=cache_size)(self._activity_key_uncached)
+
+        # 统计：原始标题变化次数 vs 有意义的变化次数
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self.raw_changes = 0
+        self.meaningful_changes = 0
+
+    def _rule_for(self, process_name):
+        proc = (process_name or "").lower()
+        for rule in self.app_rules:
+            if any(m in proc for m in rule["match"]):
+                return rule
+        return None
+
+    def strip_noise(self, window_title, process_name):
+        t = (window_title or "").strip()
+        rule = self._rule_for(process_name)
+        patterns = self.common_noise + (rule["noise"] if rule else [])
+        for p in patterns:
+            t = p.sub('', t)
+        return t.strip()
+
+    def activity_key(self, window_title, process_name):
+        """稳定的活动键: (进程名, 归一化标题)"""
+        return self._activity_key(window_title, process_name)
+
+    def _activity_key_uncached(self, window_title, process_name):
+        stripped = self.strip_noise(window_title, process_name)
+        rule = self._rule_for(process_name)
+        if rule is None or rule["key"] == "clean":
+            key_title = self.normalizer.clean(stripped, process_name or "") if stripped else ""
+        else:
+            key_title = stripped
+        return ((process_name or "").lower(), key_title)
+
+    def is_meaningful_change(self, old_title, old_process, new_title, new_process):
+        """判断一次标题变化是否代表用户换了活动，并更新统计"""
+        if (old_title, old_process) == (new_title, new_process):
+            return False
+        meaningful = (
+            old_title is None or
+            self.activity_key(old_title, old_process) != self.activity_key(new_title, new_process)
+        )
+        with self._lock:
+            self.raw_changes += 1
+            if meaningful:
+                self.meaningful_changes += 1
+        return meaningful
+
+    def stats(self) -> dict:
+        """每小时分析次数的削减情况 (每次标题变化原本都会触发一次分析)"""
+        with self._lock:
+            hours = max((time.time() - self._started_at) / 3600, 1e-6)
+            return {
+                "raw_changes_per_hour": round(self.raw_changes / hours, 1),
+                "analyses_per_hour": round(self.meaningful_changes / hours, 1),
+                "suppressed": self.raw_changes - self.meaningful_changes,
+                "reduction": round(1 - self.meaningful_changes / self.raw_changes, 3) if self.raw_changes else 0.0
+            }
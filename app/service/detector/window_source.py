@@ -0,0 +1,152 @@
+import sys
+import subprocess
+from typing import Dict, List, Optional
+
+import psutil
+
+try:
+    import win32gui
+    import win32process
+    import win32con
+except ImportError:
+    win32gui = None
+
+
+# ============ 窗口来源抽象 ============
+
+class WindowSource:
+    """
+    窗口来源抽象：屏蔽不同平台获取窗口信息的差异。
+    窗口信息统一为 dict: window_title / process_name / process_id / hwnd
+    """
+
+    def get_active_window(self) -> Optional[Dict]:
+        """获取当前前台窗口"""
+        raise NotImplementedError
+
+    def list_windows(self) -> List[Dict]:
+        """枚举当前打开的顶层窗口 (用于预分类等后台任务)"""
+        return []
+
+    @staticmethod
+    def _process_name(pid) -> str:
+        try:
+            return psutil.Process(pid).name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError, TypeError):
+            return "Unknown"
+
+
+class Win32WindowSource(WindowSource):
+    """Windows: 基于 win32gui"""
+
+    def get_active_window(self) -> Optional[Dict]:
+        # 获取前台窗口句柄
+        hwnd = win32gui.GetForegroundWindow()
+        if not hwnd:
+            # 锁屏或无焦点时，返回特定标记
+            return {
+                "window_title": "Lock Screen",
+                "process_name": "LockApp.exe",
+                "process_id": 0,
+                "hwnd": 0
+            }
+        return self._describe(hwnd)
+
+    def list_windows(self) -> List[Dict]:
+        handles = []
+
+        def _collect(hwnd, _):
+            # 只保留可见、有标题、无所有者的顶层窗口 (排除工具窗口、弹出菜单)
+            if not win32gui.IsWindowVisible(hwnd):
+                return True
+            if win32gui.GetWindow(hwnd, win32con.GW_OWNER):
+                return True
+            if not win32gui.GetWindowText(hwnd):
+                return True
+            handles.append(hwnd)
+            return True
+
+        win32gui.EnumWindows(_collect, None)
+        return [self._describe(h) for h in handles]
+
+    def _describe(self, hwnd) -> Dict:
+        # 获取窗口标题 & 进程ID
+        window_title = win32gui.GetWindowText(hwnd)
+        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        return {
+            "window_title": window_title,
+            "process_name": self._process_name(pid),
+            "process_id": pid,
+            "hwnd": hwnd
+        }
+
+
+class X11WindowSource(WindowSource):
+    """
+    Linux (X11): 通过 EWMH 根窗口属性 _NET_ACTIVE_WINDOW / _NET_CLIENT_LIST 获取，
+    使用 xprop 读取，无需额外 Python 依赖。
+    """
+
+    def get_active_window(self) -> Optional[Dict]:
+        ids = self._root_window_ids("_NET_ACTIVE_WINDOW")
+        if not ids or ids[0] == 0:
+            return None
+        return self._describe(ids[0])
+
+    def list_windows(self) -> List[Dict]:
+        windows = []
+        for wid in self._root_window_ids("_NET_CLIENT_LIST"):
+            info = self._describe(wid)
+            if info and info["window_title"]:
+                windows.append(info)
+        return windows
+
+    @staticmethod
+    def _xprop(args) -> str:
+        try:
+            return subprocess.run(
+                ["xprop"] + args, capture_output=True, text=True, timeout=2
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    def _root_window_ids(self, atom) -> List[int]:
+        # 输出形如: _NET_CLIENT_LIST(WINDOW): window id # 0x1e00003, 0x2a00007
+        out = self._xprop(["-root", atom])
+        if "#" not in out:
+            return []
+        ids = []
+        for part in out.split("#", 1)[1].split(","):
+            part = part.strip()
+            try:
+                ids.append(int(part, 16))
+            except ValueError:
+                pass
+        return ids
+
+    def _describe(self, wid) -> Optional[Dict]:
+        out = self._xprop(["-id", hex(wid), "_NET_WM_NAME", "_NET_WM_PID"])
+        if not out:
+            return None
+        title, pid = "", 0
+        for line in out.splitlines():
+            if line.startswith("_NET_WM_NAME") and "=" in line:
+                title = line.split("=", 1)[1].strip().strip('"')
+            elif line.startswith("_NET_WM_PID") and "=" in line:
+                try:
+                    pid = int(line.split("=", 1)[1].strip())
+                except ValueError:
+                    pid = 0
+        return {
+            "window_title": title,
+            "process_name": self._process_name(pid) if pid else "Unknown",
+            "process_id": pid,
+            "hwnd": wid
+        }
+
+
+def get_window_source() -> WindowSource:
+    """按平台选择窗口来源"""
+    if sys.platform.startswith("win") and win32gui is not None:
+        return Win32WindowSource()
+    return X11WindowSource()
@@ -1,244 +1,401 @@
 import time
 import multiprocessing
+import threading
 import traceback
 import json
+import queue
+import functools
 from queue import Empty
 
-def ai_monitor_worker(msg_queue, running_event, ai_busy_flag=None):
+
+def map_ai_status(status_raw, window_title=""):
+    """将 AI 返回的中文状态映射为内部状态"""
+    if "娱乐" in status_raw or "休息" in status_raw:
+        return "entertainment"
+    elif "Lock Screen" in window_title: # 特殊处理锁屏
+        return "idle"
+    elif "工作" in status_raw or "学习" in status_raw:
+        return "work"
+    return "focus"
+
+
+def _classifier_loop(jobs, results, running_event, classify, on_failure):
+    """
+    后台分类线程：从 jobs 取出待分析窗口，调用 Ollama，结果放入 results。
+    LLM 再慢也不会阻塞主循环的焦点采样与区间落账。
+    模型不可达或输出无法解析时交给 on_failure (放入离线分类队列)。
+    """
+    while running_event.is_set():
+        try:
+            job = jobs.get(timeout=1.0)
+        except Empty:
+            continue
+        ai_data = None
+        try:
+            prompt = f"窗口: '{job['window_title']}' | 进程: {job['process_name']} | 持续: {job['duration']:.2f}s"
+            print(f"[AI Worker] 请求分析: {prompt}")
+            ai_data = classify(prompt)
+            if ai_data is None:
+                print(f"[AI Worker] 分析失败，放入离线队列: {job['window_title']}")
+                on_failure(job)
+        except Exception as e:
+            print(f"[AI Worker] AI 分析出错: {e}")
+            on_failure(job)
+        results.put((job, ai_data))
+
+
+def _keep_warm_loop(running_event, warm_up, last_call_ts, is_active, interval):
+    """
+    保温线程：启动时预热一次模型；之后用户活跃且超过 interval 秒没有请求 Ollama 时 ping 一次，
+    保证下一次窗口切换不会遇到模型冷加载。
+    """
+    t0 = time.time()
+    ok = warm_up()
+    print(f"[AI Worker] 模型预热{'完成' if ok else '失败'} ({time.time() - t0:.2f}s)")
+    while running_event.is_set():
+        time.sleep(5)
+        if not is_active():
+            continue
+        if time.time() - last_call_ts() > interval:
+            warm_up()
+
+
+def ai_monitor_worker(msg_queue, running_event, ai_busy_flag=None, llm_shared=None):
     """
     独立进程：AI 监控 Worker (新版)
     负责：
     1. 获取当前焦点窗口信息 (FocusDetector)
-    2. 调用 Ollama 进行语义分析 (AIProcessor)
-    3. 解析 JSON 结果并存入数据库 (HistoryManager)
+    2. 焦点切换时立即在时间账本 (TimeLedger) 中精确落账
+    3. 后台线程调用 Ollama 进行语义分析 (AIProcessor)，标签迟到后再补记
     4. 推送到 UI 队列
+    llm_shared: run.py 创建的跨进程 LLM 调度状态，与 Web 进程共享并发上限与实时优先级
     """
     print(f"【AI监控进程】启动 (PID: {multiprocessing.current_process().pid})...")
-    
+
     try:
         # 导入新版检测器组件
         # 注意：在子进程中导入，避免主进程上下文污染
+        from app.service.ai.llm_scheduler import Priority, configure_scheduler
+        from app.core.config import DATA_DIR
+        import os
+        scheduler = configure_scheduler(llm_shared)
+
         from app.service.detector.detector_data import FocusDetector
-        from app.service.detector.detector_logic import analyze
-        from app.data import ActivityHistoryManager
-        
+        from app.service.detector.detector_logic import classify, warm_up, ai_processor
+        from app.service.detector.classification_cache import ClassificationCache
+        from app.service.ai.langflow_client import get_shared_breaker
+        from app.service.ai.offline_queue import ClassificationDrainer
+        from app.service.detector.speculator import SpeculativeClassifier
+        from app.service.detector.title_canonicalizer import TitleCanonicalizer
+        from app.data import ActivityHistoryManager, TimeLedger
+
         # 初始化组件
         focus_detector = FocusDetector(check_interval=50.0)
         focus_detector.start()
-        
+
+        def on_unlabeled_close(iv):
+            """
+            焦点离开时区间仍无标签 (停留过短、或另一个分析仍在进行)：
+            交给离线分类队列补标签 (队列会优先复用同一活动键的缓存标签)。
+            正在分析的区间除外，它的结果稍后会直接补记。
+            """
+            if iv['id'] == pending_interval_id:
+                return
+            if not (iv['window_title'] or '').strip() or not (iv['process_name'] or '').strip():
+                return
+            ClassificationDrainer.enqueue_missed({
+                "interval_id": iv['id'],
+                "window_title": iv['window_title'],
+                "process_name": iv['process_name'],
+                "duration": iv['end_ts'] - iv['start_ts']
+            })
+
         history_manager = ActivityHistoryManager()
-        
+        pending_interval_id = None  # 已提交、尚未返回结果的区间
+        ledger = TimeLedger(history_manager, on_unlabeled_close=on_unlabeled_close)
+        # 标题归一化：未读计数、视频进度等噪声变化不算切换，也共享同一条缓存
+        canonicalizer = TitleCanonicalizer()
+        label_cache = ClassificationCache(key_fn=canonicalizer.activity_key)
+
+        # 异步分类器
+        classify_jobs = queue.Queue()
+        classify_results = queue.Queue()
+        classifier_thread = threading.Thread(
+            target=_classifier_loop,
+            args=(classify_jobs, classify_results, running_event, classify, ClassificationDrainer.enqueue),
+            daemon=True
+        )
+        classifier_thread.start()
+
+        # 后台任务 (离线回填、预分类) 以批量优先级排队，不与实时分类抢模型
+        classify_batch = functools.partial(classify, priority=Priority.BATCH)
+
+        # 离线分类队列：Ollama 恢复后退避重试并回填 (熔断期间不会拖慢主循环)
+        drainer = ClassificationDrainer(
+            classify_results, running_event, classify_batch, get_shared_breaker(), label_cache
+        )
+        drainer.start()
+
+        def store_label(window_title, process_name, ai_data):
+            """映射 AI 结果并写入分类缓存，返回 (status, summary)"""
+            status = map_ai_status(ai_data.get("状态", "focus"), window_title)
+            summary = ai_data.get("活动摘要", f"使用 {process_name}")
+            label_cache.put(window_title, process_name, status, summary, ai_raw=ai_data,
+                            confidence=ai_data.get("confidence", 1.0))
+            return status, summary
+
+        # 推测性预分类：空闲时预先分类其他打开的窗口，切换过去即命中缓存
+        breaker = get_shared_breaker()
+        speculator = SpeculativeClassifier(
+            focus_detector.list_open_windows, label_cache, classify_batch, store_label,
+            is_idle=lambda: (pending_interval_id is None and classify_jobs.empty()
+                             and breaker.state == breaker.CLOSED),
+            running_event=running_event
+        )
+        speculator.start()
+        SPECULATION_REPORT_INTERVAL = 600
+        last_speculation_report = time.time()
+        # 调度器指标写入文件，供 Web 进程的 /api/llm/metrics 读取
+        METRICS_DUMP_INTERVAL = 30
+        last_metrics_dump = 0
+        metrics_path = os.path.join(DATA_DIR, "llm_metrics_worker.json")
+
         # 状态追踪
         last_analysis_time = 0
-        last_analyzed_window = None # 记录上次分析过的窗口
-        ANALYSIS_INTERVAL = 60  # 加快分析频率 (原为10秒)
-        
+        last_analyzed_window = None # 记录上次分析过的窗口 (活动键)
+        ANALYSIS_INTERVAL = 60  # 同一窗口定期重新分析的间隔
+        FLUSH_INTERVAL = 60     # 长时间停留在同一窗口时，账本检查点间隔
+        last_flush_time = time.time()
+
         current_focus_start = time.time()
-        last_window_title = ""
-        
+        last_window_key = None
+        last_raw_window = (None, None)
+
+        # 模型保温：启动预热 + 用户活跃期间定期 ping (间隔需小于 OLLAMA_KEEP_ALIVE)
+        KEEP_WARM_INTERVAL = 600
+        ACTIVE_WINDOW_SEC = 900   # 最近 15 分钟内切换过窗口且未锁屏，视为用户活跃
+        last_switch_ts = time.time()
+        threading.Thread(
+            target=_keep_warm_loop,
+            args=(running_event, warm_up, lambda: ai_processor.client.last_call_ts,
+                  lambda: (time.time() - last_switch_ts < ACTIVE_WINDOW_SEC
+                           and bool(last_window_key and last_window_key[1])
+                           and breaker.state == breaker.CLOSED),
+                  KEEP_WARM_INTERVAL),
+            daemon=True
+        ).start()
+
         # 新增：全局专注计时器 (跨窗口、跨分析周期)
         # 用于记录连续专注的时长
-        global_focus_start_time = None
-        
-        # 新增：当前状态计时器 (用于娱乐提醒)
-        # 记录当前状态 (status) 是从什么时候开始的
-        current_status_start_time = time.time()
-        last_status_type = "focus" # 默认初始状态
-        entertainment_block_start = 0
+        ui_state = {
+            "global_focus_start_time": None,
+            "current_status_start_time": time.time(),
+            "last_status_type": "focus", # 默认初始状态
+            "entertainment_block_start": 0
+        }
         MICRO_BREAK_SEC = 90
-        
+        CACHE_MIN_CONFIDENCE = 0.5  # 低于该置信度的缓存标签不直接复用，切换过去后重新分析
+
+        def push_ui(status, summary, status_raw, window_duration):
+            """构造推送到 UI 的消息 (使用本地维护的计时器计算连续时长)"""
+            current_time = time.time()
+            if status != ui_state["last_status_type"]:
+                ui_state["current_status_start_time"] = current_time
+                if status == 'entertainment':
+                    if ui_state["entertainment_block_start"] == 0:
+                        ui_state["entertainment_block_start"] = current_time
+                else:
+                    if ui_state["last_status_type"] == 'entertainment' and ui_state["entertainment_block_start"] > 0:
+                        ui_state["entertainment_block_start"] = 0
+                ui_state["last_status_type"] = status
+            ent_start = ui_state["entertainment_block_start"]
+            if status == 'entertainment':
+                current_activity_duration = int(current_time - ent_start) if ent_start else 0
+            else:
+                current_activity_duration = 0
+            if status in ['work', 'focus']:
+                if ui_state["global_focus_start_time"] is None:
+                    ui_state["global_focus_start_time"] = current_time
+                total_focus_duration = int(current_time - ui_state["global_focus_start_time"])
+            elif status == 'entertainment':
+                ent_elapsed = int(current_time - ent_start) if ent_start else 0
+                if ui_state["global_focus_start_time"] is not None and ent_elapsed > MICRO_BREAK_SEC:
+                    ui_state["global_focus_start_time"] = None
+                gfs = ui_state["global_focus_start_time"]
+                total_focus_duration = int(current_time - gfs) if gfs else 0
+            else:
+                ui_state["global_focus_start_time"] = None
+                total_focus_duration = 0
+
+            ui_msg = {
+                "status": status,
+                "duration": total_focus_duration, # 专注总时长 (给主界面)
+                "current_activity_duration": current_activity_duration, # 当前活动时长 (给提醒逻辑)
+                "current_window_duration": int(window_duration), # 窗口停留时长
+                "message": summary,  # UI 上显示摘要
+                "timestamp": time.strftime("%H:%M:%S"),
+                "debug_info": f"AI: {status_raw}"
+            }
+
+            if not msg_queue.full():
+                msg_queue.put(ui_msg)
+
         while running_event.is_set():
             start_loop = time.time()
-            
+
             # --- 检查来自 UI 的重置信号 ---
             try:
                 import os
                 if os.path.exists("reset_focus.signal"):
                     print("[AI Worker] Received reset signal from UI. Resetting focus timer.")
-                    global_focus_start_time = None
+                    ui_state["global_focus_start_time"] = None
                     # 也可以选择重置 current_status_start_time，视需求而定
-                    current_status_start_time = time.time() 
+                    ui_state["current_status_start_time"] = time.time()
                     os.remove("reset_focus.signal")
             except Exception as e:
                 print(f"[AI Worker] Error checking signal file: {e}")
             # ---------------------------
-            
+
             try:
                 # 1. 获取基础焦点数据 (高频)
                 focus_info = focus_detector.get_current_focus()
-                
+
                 if not focus_info:
                     time.sleep(1)
                     continue
-                    
+
                 window_title = focus_info.get("window_title", "")
                 process_name = focus_info.get("process_name", "")
-                
-                # 简单的状态重置检测
-                if window_title != last_window_title:
-                    current_focus_start = time.time()
-                    last_window_title = window_title
-                
+
+                # 2. 焦点切换：立即在账本中精确落账，并尝试用规则/缓存即时打标签
+                # 以活动键判断切换，标题噪声变化 (未读计数、播放进度等) 不重置计时
+                window_key = canonicalizer.activity_key(window_title, process_name)
+                switched = False
+                if (window_title, process_name) != last_raw_window:
+                    switched = canonicalizer.is_meaningful_change(
+                        last_raw_window[0], last_raw_window[1], window_title, process_name
+                    )
+                    last_raw_window = (window_title, process_name)
+                if switched:
+                    now = time.time()
+                    current_focus_start = now
+                    last_switch_ts = now
+                    last_window_key = window_key
+                    interval_id = ledger.switch(window_title, process_name, now)
+
+                    if not window_title.strip() or not process_name.strip():
+                        # 规则标签：空窗口或进程名，判定为锁屏离开
+                        print(f"[AI Worker] 检测到空窗口或进程名，判定为锁屏离开: '{window_title}' | '{process_name}'")
+                        ledger.attach_label(interval_id, "entertainment", "锁屏离开", source='rule')
+                        last_analyzed_window = window_key
+                        last_analysis_time = now
+                        push_ui("entertainment", "锁屏离开", "rule", 0)
+                    else:
+                        cached = label_cache.get(window_title, process_name, min_confidence=CACHE_MIN_CONFIDENCE)
+                        speculator.record_switch(window_title, process_name, served_from_cache=bool(cached))
+                        if cached:
+                            # 缓存标签：同一窗口近期分析过，直接复用
+                            ledger.attach_label(interval_id, cached['status'], cached['summary'], source='cache')
+                            last_analyzed_window = window_key
+                            last_analysis_time = now
+                            push_ui(cached['status'], cached['summary'], "cache", 0)
+
                 duration = time.time() - current_focus_start
-                
-                # 2. AI 深度分析
-                # 触发条件: 
+
+                # 3. 提交异步 AI 分析
+                # 触发条件:
                 # A. 持续时间 > 5秒 (避免抖动)
-                # B. (距离上次分析超过间隔 OR 窗口标题发生了变化)
-                #    这里我们加入 "窗口变化" 作为触发条件，实现"拿到结果就触发"
-                #    同时保留最小间隔限制，防止同一窗口频繁重复分析
-                
-                ai_result = None
-                summary = ""
-                status = "focus" # 默认状态
-                
-                # 检查是否是新窗口（与上次分析时的窗口不同）
-                # 注意：last_window_title 是用来判断是否重置计时的，这里我们需要一个变量记录"上次分析过的窗口"
-                # 但简单起见，如果 duration > 5 且 还没分析过当前窗口，就应该触发
-                
-                # 简化逻辑：只要满足时长，且 (时间间隔够了 OR 是个新任务)，就尝试分析
-                # 为了防止同一任务刷屏，我们引入一个标志位
-                
+                # B. 当前窗口尚未分析过 OR 距离上次分析超过间隔
+                # C. 没有尚未返回的分析任务 (避免排队堆积)
                 should_analyze = False
-                if duration > 5:
-                    # 场景1: 这是一个新窗口，且还没被分析过 (利用 last_analysis_time 粗略控制是不够的)
-                    # 我们需要记录上一次成功分析的窗口名
-                    if 'last_analyzed_window' not in locals():
-                        last_analyzed_window = None
-                        
-                    if window_title != last_analyzed_window:
-                         should_analyze = True
-                    # 场景2: 同一窗口停留很久了，定期重新分析一下 (比如每60秒)，以免漏掉状态变化
-                    elif (time.time() - last_analysis_time > ANALYSIS_INTERVAL): 
-                         should_analyze = True
-                         
+                has_identity = bool(window_title.strip() and process_name.strip())
+                if duration > 5 and pending_interval_id is None and has_identity:
+                    if window_key != last_analyzed_window:
+                        should_analyze = True
+                    elif time.time() - last_analysis_time > ANALYSIS_INTERVAL:
+                        should_analyze = True
+
                 if should_analyze:
-                    # --- 错峰执行检查 (已移除，允许并行) ---
-                    # if ai_busy_flag and ai_busy_flag.value:
-                    #     print(f"[AI Worker] AI正忙(Web端占用)，跳过本次实时分析: {window_title}")
-                    #     ... (代码已移除以支持并行)
-                        
+                    pending_interval_id = ledger.current_interval_id
+                    last_analyzed_window = window_key
+                    last_analysis_time = time.time()
+                    classify_jobs.put({
+                        "interval_id": pending_interval_id,
+                        "window_title": window_title,
+                        "process_name": process_name,
+                        "duration": duration
+                    })
+
+                # 4. 回收分析结果：补记到对应区间 (区间可能早已结束，账本会回填统计并同步核心事件累计表)
+                while True:
+                    try:
+                        job, ai_data = classify_results.get_nowait()
+                    except Empty:
+                        break
+                    if job["interval_id"] == pending_interval_id:
+                        pending_interval_id = None
+                    if not ai_data:
+                        if job.get("gave_up"):
+                            # 离线队列已放弃：仍无标签的区间以兜底标签计入，不再卡住之后的统计
+                            ledger.attach_fallback(job["interval_id"])
+                        continue
+
+                    # 提取关键字段并写入缓存
+                    # 兼容 AI 可能返回的不同字段名 (容错)
+                    status_raw = ai_data.get("状态", "focus")
+                    status, summary = store_label(job["window_title"], job["process_name"], ai_data)
+
+                    # 打印调试
+                    print(f"[AI Worker] 分析结果: {status} | {summary}")
+
+                    # 注意：这里我们把 raw_data 存为 JSON 字符串以便后续回溯
+                    raw_data_str = json.dumps({
+                        "window": job["window_title"],
+                        "process": job["process_name"],
+                        "ai_raw": ai_data
+                    }, ensure_ascii=False)
+                    source = job.get("source", 'ai')
+                    ledger.attach_label(job["interval_id"], status, summary, source=source, raw_data=raw_data_str)
+
+                    # 只有结果属于当前窗口时才刷新 UI
+                    if canonicalizer.activity_key(job["window_title"], job["process_name"]) == last_window_key:
+                        if job["interval_id"] != ledger.current_interval_id:
+                            # 等待期间发生过检查点切分，续接区间同样采用新标签
+                            ledger.attach_label(ledger.current_interval_id, status, summary, source=source, raw_data=raw_data_str)
+                        push_ui(status, summary, status_raw, time.time() - current_focus_start)
+
+                # 5. 长时间停留在同一窗口：定期检查点，保持统计实时
+                if time.time() - last_flush_time > FLUSH_INTERVAL:
+                    ledger.flush()
+                    last_flush_time = time.time()
+
+                if time.time() - last_speculation_report > SPECULATION_REPORT_INTERVAL:
+                    print(f"[AI Worker] 预分类统计: {speculator.stats()}")
+                    print(f"[AI Worker] 标题归一化统计: {canonicalizer.stats()}")
+                    last_speculation_report = time.time()
+
+                if time.time() - last_metrics_dump > METRICS_DUMP_INTERVAL:
                     try:
-                        ai_data = None
-                        json_str = ""
-                        
-                        # 1. 优先检查空值情况 (如果窗口标题或进程名为空)
-                        if not window_title.strip() or not process_name.strip():
-                             print(f"[AI Worker] 检测到空窗口或进程名，判定为锁屏离开: '{window_title}' | '{process_name}'")
-                             ai_data = {
-                                 "状态": "娱乐", 
-                                 "活动摘要": "锁屏离开"
-                             }
-                        
-                        # 2. 如果不是空值，则调用 AI 分析
-                        if ai_data is None:
-                            prompt = f"窗口: '{window_title}' | 进程: {process_name} | 持续: {duration:.2f}s"
-                            print(f"[AI Worker] 请求分析: {prompt}")
-                            
-                            # 调用 Ollama
-                            json_str = analyze(prompt)
-                            
-                            # 解析 JSON
-                            ai_data = json.loads(json_str)
-                        
-                        # 提取关键字段
-                        # 兼容 AI 可能返回的不同字段名 (容错)
-                        status_raw = ai_data.get("状态", "focus")
-                        # 简单的状态映射
-                        if "娱乐" in status_raw or "休息" in status_raw:
-                            status = "entertainment"
-                        elif "Lock Screen" in window_title: # 特殊处理锁屏
-                            status = "idle"
-                        elif "工作" in status_raw or "学习" in status_raw:
-                            status = "work"
-                        else:
-                            status = "focus"
-                            
-                        summary = ai_data.get("活动摘要", f"使用 {process_name}")
-                        
-                        # 打印调试
-                        print(f"[AI Worker] 分析结果: {status} | {summary}")
-                        
-                        last_analysis_time = time.time()
-                        last_analyzed_window = window_title # 标记已分析
-                        
-                        # 3. 存入数据库
-                        # 注意：这里我们把 raw_data 存为 JSON 字符串以便后续回溯
-                        raw_data_str = json.dumps({
-                            "window": window_title,
-                            "process": process_name,
-                            "ai_raw": ai_data
-                        }, ensure_ascii=False)
-                        
-                        history_manager.update(status, summary=summary, raw_data=raw_data_str)
-                        
-                        # 构造推送到 UI 的消息
-                        # 修改持续专注时间的逻辑：
-                        # 使用本地维护的 global_focus_start_time 来计算连续时长
-                        
-                        current_time = time.time()
-                        if status != last_status_type:
-                            current_status_start_time = current_time
-                            if status == 'entertainment':
-                                if entertainment_block_start == 0:
-                                    entertainment_block_start = current_time
-                            else:
-                                if last_status_type == 'entertainment' and entertainment_block_start > 0:
-                                    last_entertainment_duration = int(current_time - entertainment_block_start)
-                                    entertainment_block_start = 0
-                            last_status_type = status
-                        if status == 'entertainment':
-                            current_activity_duration = int(current_time - entertainment_block_start) if entertainment_block_start else 0
-                        else:
-                            current_activity_duration = 0
-                        if status in ['work', 'focus']:
-                            if global_focus_start_time is None:
-                                global_focus_start_time = current_time
-                            total_focus_duration = int(current_time - global_focus_start_time)
-                        elif status == 'entertainment':
-                            ent_elapsed = int(current_time - entertainment_block_start) if entertainment_block_start else 0
-                            if global_focus_start_time is not None and ent_elapsed > MICRO_BREAK_SEC:
-                                global_focus_start_time = None
-                            total_focus_duration = int(current_time - global_focus_start_time) if global_focus_start_time else 0
-                        else:
-                            global_focus_start_time = None
-                            total_focus_duration = 0
-                        
-                        ui_msg = {
-                            "status": status,
-                            "duration": total_focus_duration, # 专注总时长 (给主界面)
-                            "current_activity_duration": current_activity_duration, # 当前活动时长 (给提醒逻辑)
-                            "current_window_duration": int(duration), # 窗口停留时长
-                            "message": summary,  # UI 上显示摘要
-                            "timestamp": time.strftime("%H:%M:%S"),
-                            "debug_info": f"AI: {status_raw}"
-                        }
-                        
-                        if not msg_queue.full():
-                            msg_queue.put(ui_msg)
-                            
-                    except json.JSONDecodeError:
-                        print(f"[AI Worker] JSON 解析失败: {json_str}")
-                    except Exception as e:
-                        print(f"[AI Worker] AI 分析出错: {e}")
-                
-                # 如果没有触发 AI 分析，也可以推送一个轻量级的心跳包给 UI (可选)
-                # 或者依靠上面的 AI 分析结果来更新
-                pass
-                
+                        scheduler.dump_metrics(metrics_path)
+                    except OSError as e:
+                        print(f"[AI Worker] 写入调度指标失败: {e}")
+                    last_metrics_dump = time.time()
+
             except Exception as e:
                 print(f"【AI监控进程】循环错误: {e}")
                 traceback.print_exc()
-            
+
             # 控制循环频率
             elapsed = time.time() - start_loop
             if elapsed < 1.0:
                 time.sleep(1.0 - elapsed)
-                
+
     except Exception as e:
         print(f"【AI监控进程】致命错误: {e}")
         traceback.print_exc()
     finally:
+        if 'ledger' in locals():
+            ledger.close()
         if 'focus_detector' in locals():
             focus_detector.stop()
         print("【AI监控进程】已退出")
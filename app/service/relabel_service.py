@@ -0,0 +1,221 @@
+import os
+import time
+import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.data.dao.relabel_dao import RelabelDAO
+from app.service.detector.title_canonicalizer import TitleCanonicalizer
+from app.service.monitor_service import map_ai_status
+
+FOCUS_STATUSES = ('work', 'focus')
+
+
+def prompt_version() -> str:
+    """分类系统提示词的指纹：提示词变化后应重新跑一次重分类"""
+    from app.service.detector.detector_logic import ai_processor
+    return hashlib.sha256(ai_processor.system_prompt.strip().encode("utf-8")).hexdigest()[:12]
+
+
+class RelabelJob:
+    """
+    历史会话批量重分类 (换模型或提示词后使用)，可断点续跑。
+    1. scan:     按 id 分页扫描 window_sessions，按 (进程, 归一化标题) 去重计数
+    2. classify: 每个键只请求一次 LLM，多个键合并进一次批量请求，并发受限
+    3. apply:    把变化的标签回写会话表，按差值修正 daily_stats，记录受影响的日期
+    4. rebuild:  只对受影响的日期重算 period_stats、core_events 与对话检索索引
+    每一步的进度都与数据写入在同一事务中落库，中断后从检查点继续，不会重复计数。
+    """
+
+    SCAN_CHUNK = 2000
+
+    def __init__(self, job_id: str, batch_size: int = 20, concurrency: int = 2, max_attempts: int = 3,
+                 min_confidence: float = 0.5, classify_batch=None, classify=None, canonicalizer=None,
+                 breaker=None):
+        self.job_id = job_id
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.min_confidence = min_confidence
+        self.canonicalizer = canonicalizer or TitleCanonicalizer()
+        if classify_batch is None or classify is None:
+            from app.service.ai.llm_scheduler import Priority
+            from app.service.detector import detector_logic
+            classify_batch = classify_batch or (lambda texts: detector_logic.classify_batch(texts, Priority.BATCH))
+            classify = classify or (lambda text: detector_logic.classify(text, Priority.BATCH))
+        self.classify_batch = classify_batch
+        self.classify = classify
+        if breaker is None:
+            from app.service.ai.langflow_client import get_shared_breaker
+            breaker = get_shared_breaker()
+        self.breaker = breaker
+
+    @classmethod
+    def create(cls, **kwargs):
+        job_id = uuid.uuid4().hex[:12]
+        RelabelDAO.create_job(job_id, os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud'), prompt_version())
+        print(f"[Relabel] Created job {job_id}")
+        return cls(job_id, **kwargs)
+
+    @classmethod
+    def resume(cls, job_id: str = None, **kwargs):
+        """继续指定任务或最近一个未完成的任务，没有则返回 None"""
+        job = RelabelDAO.get_job(job_id) if job_id else RelabelDAO.latest_job(unfinished_only=True)
+        if not job:
+            return None
+        print(f"[Relabel] Resuming job {job['job_id']} at phase '{job['phase']}'")
+        return cls(job['job_id'], **kwargs)
+
+    def status(self) -> dict:
+        job = RelabelDAO.get_job(self.job_id) or {}
+        job.update(RelabelDAO.summary(self.job_id))
+        return job
+
+    def run(self) -> bool:
+        """执行到结束返回 True；LLM 不可用而暂停时返回 False (稍后 resume 即可)"""
+        phases = {
+            'scan': (self._scan, 'classify'),
+            'classify': (self._classify, 'apply'),
+            'apply': (self._apply, 'rebuild'),
+            'rebuild': (self._rebuild, 'done'),
+        }
+        while True:
+            job = RelabelDAO.get_job(self.job_id)
+            if job is None or job['phase'] == 'done':
+                return True
+            step, next_phase = phases[job['phase']]
+            if not step(job):
+                return False
+            RelabelDAO.set_phase(self.job_id, next_phase)
+
+    # ---------- 阶段 ----------
+
+    def _key_of(self, row):
+        if not row['window_title'] or (row['process_name'] or '').lower() == 'manual':
+            return None  # 手动补录的会话以用户填写为准
+        return self.canonicalizer.activity_key(row['window_title'], row['process_name'])
+
+    def _scan(self, job):
+        after_id = job['scanned_upto']
+        scanned = 0
+        while True:
+            rows = RelabelDAO.get_sessions_after(after_id, job['max_session_id'], self.SCAN_CHUNK)
+            if not rows:
+                break
+            keys = {}
+            for row in rows:
+                key = self._key_of(row)
+                if key is None:
+                    continue
+                entry = keys.get(key)
+                duration = int(row['duration'] or 0)
+                if entry is None:
+                    entry = keys[key] = {'sample_title': row['window_title'], 'sample_process': row['process_name'],
+                                         'sample_duration': duration, 'total_duration': 0, 'session_count': 0}
+                elif duration > entry['sample_duration']:
+                    entry.update(sample_title=row['window_title'], sample_process=row['process_name'],
+                                 sample_duration=duration)
+                entry['total_duration'] += duration
+                entry['session_count'] += 1
+            after_id = rows[-1]['id']
+            RelabelDAO.add_keys(self.job_id, keys, after_id)
+            scanned += len(rows)
+        summary = RelabelDAO.summary(self.job_id)
+        print(f"[Relabel] Scanned {scanned} sessions, {sum(summary['keys'].values())} distinct keys")
+        return True
+
+    @staticmethod
+    def _prompt_for(key):
+        return f"窗口: '{key['sample_title']}' | 进程: {key['sample_process']} | 持续: 30.00s"
+
+    def _classify_group(self, keys):
+        """一组键 -> [(key, ai_data 或 None)]；首次尝试走批量请求，重试的键逐个请求"""
+        if len(keys) == 1 or keys[0]['attempts'] > 0:
+            return [(k, self.classify(self._prompt_for(k))) for k in keys]
+        return list(zip(keys, self.classify_batch([self._prompt_for(k) for k in keys])))
+
+    def _classify(self, job):
+        done = 0
+        started = time.time()
+        while True:
+            pending = RelabelDAO.get_pending_keys(self.job_id, self.batch_size * self.concurrency * 4)
+            if not pending:
+                break
+            fresh = [k for k in pending if k['attempts'] == 0]
+            retry = [k for k in pending if k['attempts'] > 0]
+            groups = [fresh[i:i + self.batch_size] for i in range(0, len(fresh), self.batch_size)]
+            groups += [[k] for k in retry]
+
+            succeeded = 0
+            with ThreadPoolExecutor(max_workers=self.concurrency) as ex:
+                futures = {ex.submit(self._classify_group, g): g for g in groups}
+                for fut in as_completed(futures):
+                    try:
+                        results = fut.result()
+                    except Exception as e:
+                        print(f"[Relabel] Batch failed: {e}")
+                        results = [(k, None) for k in futures[fut]]
+                    labels, failed = [], []
+                    for key, ai_data in results:
+                        if ai_data is None:
+                            failed.append((key['process_key'], key['title_key']))
+                            continue
+                        status = map_ai_status(ai_data.get('状态', ''), key['sample_title'])
+                        labels.append((key['process_key'], key['title_key'], status,
+                                       ai_data.get('活动摘要'), ai_data.get('confidence', 1.0)))
+                    if labels:
+                        RelabelDAO.save_labels(self.job_id, labels)
+                        succeeded += len(labels)
+                    # 熔断中 (模型不可达) 的失败不消耗重试次数，只有模型给出了不合法输出才计数
+                    if failed and self.breaker.state == self.breaker.CLOSED:
+                        RelabelDAO.record_failures(self.job_id, failed, self.max_attempts)
+            if succeeded == 0 and self.breaker.state != self.breaker.CLOSED:
+                print("[Relabel] LLM unavailable, job paused (resume later)")
+                return False
+            done += succeeded
+            rate = done / max(time.time() - started, 1e-6)
+            print(f"[Relabel] Classified {done} keys ({rate:.1f} keys/s)")
+        return True
+
+    def _apply(self, job):
+        labels = RelabelDAO.get_labels(self.job_id, self.min_confidence)
+        after_id = job['applied_upto']
+        changed = 0
+        while True:
+            rows = RelabelDAO.get_sessions_after(after_id, job['max_session_id'], self.SCAN_CHUNK)
+            if not rows:
+                break
+            changes = []
+            for row in rows:
+                key = self._key_of(row)
+                new_status = labels.get(key) if key else None
+                old_status = row['status']
+                if new_status is None or new_status == old_status:
+                    continue
+                if new_status in FOCUS_STATUSES and old_status in FOCUS_STATUSES:
+                    continue  # work / focus 在统计上等价，不做无意义的改动
+                changes.append({'id': row['id'], 'day': (row['start_time'] or '')[:10],
+                                'duration': int(row['duration'] or 0),
+                                'old_status': old_status, 'new_status': new_status})
+            after_id = rows[-1]['id']
+            changed += RelabelDAO.apply_changes(self.job_id, changes, after_id)
+        print(f"[Relabel] Applied {changed} session label changes")
+        return True
+
+    def _rebuild(self, job):
+        from app.data.dao.stats_calculator import calculate_period_stats
+        from app.data.dao.core_events_extractor import extract_core_events
+        from app.data.dao.context_index_dao import ContextIndexDAO
+
+        days = RelabelDAO.get_dirty_days(self.job_id)
+        for day in days:
+            calculate_period_stats(day)
+            extract_core_events(day)
+            try:
+                if ContextIndexDAO.available():
+                    ContextIndexDAO.reindex_days([day])
+            except Exception as e:
+                print(f"[Relabel] Reindex {day} failed: {e}")
+            RelabelDAO.mark_day_rebuilt(self.job_id, day)
+        print(f"[Relabel] Rebuilt aggregates for {len(days)} days")
+        return True
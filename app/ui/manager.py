@@ -141,7 +141,9 @@ class FlowStateApp(QtCore.QObject):
                 if existing is not None and not existing.isHidden():
                     return
 
-                self.fatigue_dialog = FatigueReminderDialog(severity='medium', duration=minutes)
+                # 与个人最长心流的常态比较定级 (超过平时水平时提醒更强烈)
+                severity = ActivityHistoryManager.get_fatigue_severity(duration)
+                self.fatigue_dialog = FatigueReminderDialog(severity=severity, duration=minutes)
                 self.fatigue_dialog.setWindowFlags(
                     self.fatigue_dialog.windowFlags() | QtCore.Qt.WindowStaysOnTopHint
                 )
@@ -1,8 +1,38 @@
 # -*- coding: utf-8 -*-
+import os
 import sys
 import requests
 from PySide6 import QtWidgets, QtCore, QtGui
 
+from app.service.ai.model_benchmark import ModelBenchmark, recommend, load_cached_results
+
+
+class BenchmarkThread(QtCore.QThread):
+    """后台逐个测试模型，避免阻塞对话框"""
+    progress = QtCore.Signal(str, int, int)   # 模型, 已完成样本, 样本总数
+    finished_results = QtCore.Signal(dict)
+
+    def __init__(self, models, parent=None):
+        super().__init__(parent)
+        self.models = models
+
+    def _on_progress(self, model, done, total):
+        # 对话框关闭时请求中断：在当前这条样本结束后退出，不必等全部模型测完
+        if self.isInterruptionRequested():
+            raise InterruptedError("benchmark cancelled")
+        self.progress.emit(model, done, total)
+
+    def run(self):
+        try:
+            results = ModelBenchmark().run(self.models, progress=self._on_progress)
+        except InterruptedError:
+            return
+        except Exception as e:
+            print(f"[ModelSelection] Benchmark failed: {e}")
+            results = {}
+        self.finished_results.emit(results)
+
+
 class CustomTitleBar(QtWidgets.QWidget):
     """自定义标题栏"""
     def __init__(self, title, parent=None):
@@ -54,7 +84,7 @@ class ModelSelectionDialog(QtWidgets.QDialog):
         super().__init__(parent)
         self.setWindowFlags(QtCore.Qt.FramelessWindowHint | QtCore.Qt.WindowStaysOnTopHint)
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
-        self.setFixedSize(420, 260)
+        self.setFixedSize(460, 400)
         
         self.selected_model = default_model
         self.default_model = default_model
@@ -140,11 +170,43 @@ class ModelSelectionDialog(QtWidgets.QDialog):
         self.status_label = QtWidgets.QLabel("正在获取本地模型...")
         self.status_label.setStyleSheet("color: #8D6E63; font-size: 12px; font-family: 'Microsoft YaHei';")
         self.content_layout.addWidget(self.status_label)
+
+        # 基准结果 (延迟 / 与历史标签一致率)
+        self.bench_label = QtWidgets.QLabel("")
+        self.bench_label.setWordWrap(True)
+        self.bench_label.setTextFormat(QtCore.Qt.RichText)
+        self.bench_label.setStyleSheet("color: #5D4037; font-size: 12px; font-family: 'Microsoft YaHei';")
+        self.content_layout.addWidget(self.bench_label)
         
         self.content_layout.addStretch()
         
         # 按钮区域
         btn_layout = QtWidgets.QHBoxLayout()
+
+        self.bench_btn = QtWidgets.QPushButton("测试模型")
+        self.bench_btn.setCursor(QtCore.Qt.PointingHandCursor)
+        self.bench_btn.setFixedSize(100, 36)
+        self.bench_btn.setToolTip("用你的历史窗口记录测试各模型的速度与准确度，并推荐最合适的模型")
+        self.bench_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #FFFFFF;
+                color: #558B2F;
+                border: 2px solid #96C24B;
+                border-radius: 18px;
+                font-family: "Microsoft YaHei";
+                font-weight: bold;
+                font-size: 13px;
+            }
+            QPushButton:hover {
+                background-color: #F1F8E9;
+            }
+            QPushButton:disabled {
+                color: #BCAAA4;
+                border-color: #D7CCC8;
+            }
+        """)
+        self.bench_btn.clicked.connect(self.start_benchmark)
+        btn_layout.addWidget(self.bench_btn)
         btn_layout.addStretch()
         
         self.start_btn = QtWidgets.QPushButton("启动项目")
@@ -192,8 +254,12 @@ class ModelSelectionDialog(QtWidgets.QDialog):
         self._dragging = False
         self._drag_start_pos = QtCore.QPoint()
 
+        self.bench_thread = None
+
         # 初始化数据
         self.load_models()
+        # 之前测过的结果直接展示并预选推荐模型
+        self.show_benchmark_results(load_cached_results())
 
     def load_models(self):
         """加载本地 Ollama 模型"""
@@ -201,7 +267,8 @@ class ModelSelectionDialog(QtWidgets.QDialog):
         
         try:
             # 尝试从 Ollama API 获取模型列表
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
+            base_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434').rstrip("/")
+            response = requests.get(f"{base_url}/api/tags", timeout=2)
             if response.status_code == 200:
                 data = response.json()
                 ollama_models = [m['name'] for m in data.get('models', [])]
@@ -227,11 +294,74 @@ class ModelSelectionDialog(QtWidgets.QDialog):
         # 默认选中第一个
         self.model_combo.setCurrentIndex(0)
 
+    def model_names(self):
+        return [self.model_combo.itemText(i) for i in range(self.model_combo.count())]
+
+    def start_benchmark(self):
+        """在后台测试下拉框中的全部模型"""
+        if self.bench_thread is not None and self.bench_thread.isRunning():
+            return
+        self.bench_btn.setEnabled(False)
+        self.status_label.setText("正在测试模型，首次加载模型可能较慢...")
+        self.status_label.setStyleSheet("color: #8D6E63; font-size: 12px; font-family: 'Microsoft YaHei';")
+        self.bench_thread = BenchmarkThread(self.model_names(), self)
+        self.bench_thread.progress.connect(self.on_benchmark_progress)
+        self.bench_thread.finished_results.connect(self.on_benchmark_finished)
+        self.bench_thread.start()
+
+    def on_benchmark_progress(self, model, done, total):
+        self.status_label.setText(f"正在测试 {model} ({done}/{total})")
+
+    def on_benchmark_finished(self, results):
+        self.bench_btn.setEnabled(True)
+        if not results:
+            self.status_label.setText("测试失败，请确认 Ollama 已启动")
+            self.status_label.setStyleSheet("color: #D32F2F; font-size: 12px; font-family: 'Microsoft YaHei';")
+            return
+        self.status_label.setText(f"已完成 {len(results)} 个模型的测试")
+        self.status_label.setStyleSheet("color: #558B2F; font-size: 12px; font-family: 'Microsoft YaHei';")
+        self.show_benchmark_results(results)
+
+    def show_benchmark_results(self, results):
+        """展示各模型的测试结果，并选中推荐模型"""
+        names = self.model_names()
+        results = {m: r for m, r in results.items() if m in names}
+        if not results:
+            return
+        best = recommend(results)
+        rows = []
+        for model in names:
+            r = results.get(model)
+            if r is None:
+                continue
+            if r.get("error") or r.get("total_ms") is None:
+                rows.append(f"{model}: <span style='color:#D32F2F'>不可用</span>")
+                continue
+            speed = f" · {r['tokens_per_s']:.0f} tok/s" if r.get("tokens_per_s") else ""
+            line = (f"{model}: {r['total_ms'] / 1000:.2f}s/次{speed} · "
+                    f"一致率 {r['agreement']:.0%} · 合法率 {r['valid_rate']:.0%}")
+            if model == best:
+                line = f"<b style='color:#558B2F'>{line} · 推荐</b>"
+            rows.append(line)
+        self.bench_label.setText("<br>".join(rows))
+        if best in names:
+            self.model_combo.setCurrentIndex(names.index(best))
+
     def accept(self):
         """确认选择"""
         self.selected_model = self.model_combo.currentText()
+        self.stop_benchmark()
         super().accept()
 
+    def reject(self):
+        self.stop_benchmark()
+        super().reject()
+
+    def stop_benchmark(self):
+        if self.bench_thread is not None and self.bench_thread.isRunning():
+            self.bench_thread.requestInterruption()
+            self.bench_thread.wait()
+
     # --- 拖动逻辑 ---
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton:
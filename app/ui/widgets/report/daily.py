@@ -107,18 +107,9 @@ class SimpleDailyReport(QtWidgets.QWidget):
 
         # 2. Timeline Logs
         self.time_blocks = self._load_timeline_blocks()
-        self.peak_flow_mins = 0
-        try:
-            if self.max_streak:
-                 self.peak_flow_mins = int(self.max_streak / 60)
-            else:
-                peak = 0
-                for b in self.time_blocks:
-                    if b.get("type") == "A":
-                        peak = max(peak, int(b.get("duration_sec") or 0))
-                self.peak_flow_mins = int(peak / 60) if peak > 0 else self.peak_flow_mins
-        except Exception:
-            pass
+        # Peak flow comes from daily_stats (recomputed by SessionMetrics above); timeline
+        # blocks merge across 15-minute gaps and are for display only, not a streak fallback.
+        self.peak_flow_mins = int((self.max_streak or 0) / 60)
 
     def _load_timeline_blocks(self):
         try:
@@ -290,34 +281,10 @@ class SimpleDailyReport(QtWidgets.QWidget):
         ]
 
     def _session_category(self, session: dict) -> str:
-        proc = (session.get("process_name") or "").lower()
+        # 分类关键词在 title_rules.json 的 categories 中维护，与核心事件共用同一个归一化器
+        from app.data.services.title_normalizer import get_normalizer
         title = (session.get("window_title") or "") + " " + (session.get("summary") or "")
-        t = title.lower()
-
-        short_video_keys = [
-            "douyin", "\u6296\u97f3", "tiktok", "kuaishou", "\u5feb\u624b", "youtube",
-            "bilibili", "\u54d4\u54e9\u54d4\u54e9", "\u817e\u8baf\u89c6\u9891", "\u7231\u5947\u827a", "iqiyi",
-        ]
-        game_keys = [
-            "steam", "epic", "genshin", "\u539f\u795e", "league", "lol", "valorant", "\u6e38\u620f", "taptap",
-        ]
-        study_keys = [
-            "leetcode", "\u529b\u6263", "\u725b\u5ba2", "csdn", "github", "stackoverflow", "wikipedia",
-            "\u6162\u5b66", "\u5b66\u4e60", "docs", "notion", "\u6559\u7a0b", "\u8bfe\u7a0b", "\u6162\u8bfb",
-        ]
-
-        if any(k in t for k in short_video_keys):
-            return "short_video"
-        if any(k in t for k in game_keys) or proc in ["steam.exe", "epicgameslauncher.exe"]:
-            return "game"
-        if any(k in t for k in study_keys):
-            return "study"
-
-        if proc in ["chrome.exe", "msedge.exe", "firefox.exe"]:
-            return "web_other"
-        if proc in ["pycharm64.exe", "idea64.exe", "code.exe"]:
-            return "study"
-        return "other"
+        return get_normalizer().category(session.get("process_name"), title)
 
     def _block_category(self, block: dict) -> str:
         if block.get("type") == "B":
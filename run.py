@@ -62,6 +62,7 @@ signal.signal(signal.SIGTERM, force_exit)
 from app.ui.main import main
 from app.service.API.web_API import run_server
 from app.service.monitor_service import ai_monitor_worker
+from app.service.ai.llm_scheduler import create_shared_state
 from app.ui.widgets.dialogs.model_selection import show_model_selection
 
 def ensure_ollama_running():
@@ -134,6 +135,9 @@ if __name__ == "__main__":
     # 新增: AI 占用标志 (True=忙碌, False=空闲)
     # 使用 'b' (boolean) 或 'i' (int) 类型
     ai_busy_flag = multiprocessing.Value('b', False)
+
+    # 新增: LLM 调度共享状态 (全局并发上限 + 实时请求计数)，AI 进程与 Web 进程共用
+    llm_shared = create_shared_state()
     
     # 2. 创建运行标志事件 (控制进程退出)
     running_event = multiprocessing.Event()
@@ -142,7 +146,7 @@ if __name__ == "__main__":
     # 3. 启动 AI 监控进程
     ai_process = multiprocessing.Process(
         target=ai_monitor_worker, 
-        args=(msg_queue, running_event, ai_busy_flag),
+        args=(msg_queue, running_event, ai_busy_flag, llm_shared),
         name="AI_Monitor_Process"
     )
     ai_process.daemon = True  # 关键：设置为守护进程
@@ -151,7 +155,7 @@ if __name__ == "__main__":
     # 4. 启动 Web 服务进程 (完全独立，不需要 Queue)
     web_process = multiprocessing.Process(
         target=run_server, 
-        kwargs={'port': 8080, 'ai_busy_flag': ai_busy_flag},
+        kwargs={'port': 8080, 'ai_busy_flag': ai_busy_flag, 'llm_shared': llm_shared},
         name="Web_Server_Process"
     )
     web_process.daemon = True  # 关键：设置为守护进程
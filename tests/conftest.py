@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置：数据目录指向临时目录 (必须在导入 app 之前设置)，
+每个用例使用一套全新的数据库。
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DATA_DIR = tempfile.mkdtemp(prefix="flow_state_test_")
+os.environ["FLOW_STATE_DATA_DIR"] = _DATA_DIR
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def fresh_db():
+    """清空临时数据目录中的数据库并重新建表"""
+    from app.data.core.database import init_db
+    for name in os.listdir(_DATA_DIR):
+        path = os.path.join(_DATA_DIR, name)
+        if os.path.isfile(path):
+            os.remove(path)
+    init_db()
+    yield _DATA_DIR
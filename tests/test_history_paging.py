@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from app.data.core.database import get_db_connection
+from app.data.dao.activity_dao import WindowSessionDAO
+
+
+def _insert(start_times):
+    with get_db_connection() as conn:
+        for s in start_times:
+            conn.execute('INSERT INTO window_sessions (start_time, end_time, window_title, process_name, status, duration) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', (s, s, 'w', 'p.exe', 'focus', 60))
+        conn.commit()
+
+
+def _all_pages(limit):
+    pages, before = [], None
+    while True:
+        rows = WindowSessionDAO.get_sessions_page(before, limit)
+        if not rows:
+            return pages
+        pages.append([r['id'] for r in rows])
+        before = (rows[-1]['start_time'], rows[-1]['id'])
+
+
+def test_keyset_pages_cover_every_row_once_including_ties(fresh_db):
+    # 同一秒内的多条会话靠 id 排序
+    _insert([f"2026-07-01 10:00:{s:02d}" for s in (0, 0, 0, 5, 5, 9, 9, 9, 9, 30)])
+    pages = _all_pages(3)
+    ids = [i for p in pages for i in p]
+    assert sorted(ids) == list(range(1, 11))
+    assert len(ids) == len(set(ids))
+    assert ids == [10, 9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_inserts_between_pages_do_not_shift_later_pages(fresh_db):
+    _insert([f"2026-07-01 10:{m:02d}:00" for m in range(10)])
+    first = WindowSessionDAO.get_sessions_page(None, 4)
+    _insert(["2026-07-01 11:00:00", "2026-07-01 11:01:00"])  # 翻页期间产生的新会话
+    second = WindowSessionDAO.get_sessions_page((first[-1]['start_time'], first[-1]['id']), 4)
+    assert [r['id'] for r in first] == [10, 9, 8, 7]
+    assert [r['id'] for r in second] == [6, 5, 4, 3]
+
+
+def test_changes_since_reports_updates_and_deletes(fresh_db):
+    _insert(["2026-07-01 10:00:00", "2026-07-01 10:01:00", "2026-07-01 10:02:00"])
+    version = WindowSessionDAO.get_change_version()
+    assert version == 3
+
+    WindowSessionDAO.update_session_summary(1, "写周报")
+    WindowSessionDAO.delete_session(2)
+    _insert(["2026-07-01 10:03:00"])
+
+    sessions, deleted, new_version = WindowSessionDAO.get_changes_since(version)
+    assert sorted(s['id'] for s in sessions) == [1, 4]
+    assert next(s for s in sessions if s['id'] == 1)['summary'] == "写周报"
+    assert deleted == [2]
+    assert new_version == WindowSessionDAO.get_change_version()
+    assert WindowSessionDAO.get_changes_since(new_version) == ([], [], new_version)
+
+
+def test_changes_since_respects_limit(fresh_db):
+    _insert([f"2026-07-01 10:{m:02d}:00" for m in range(5)])
+    sessions, _, version = WindowSessionDAO.get_changes_since(0, limit=2)
+    assert [s['id'] for s in sessions] == [1, 2]
+    sessions, _, version = WindowSessionDAO.get_changes_since(version, limit=10)
+    assert [s['id'] for s in sessions] == [3, 4, 5]
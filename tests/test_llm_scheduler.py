@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from app.service.ai import llm_scheduler
+from app.service.ai.llm_scheduler import (
+    DeadlineExceeded, LLMScheduler, Priority, RequestCancelled, configure_scheduler, create_shared_state,
+)
+
+
+def test_priority_order():
+    scheduler = LLMScheduler(max_concurrency=1)
+    gate = threading.Event()
+    order = []
+    blocker = scheduler.submit(gate.wait, Priority.BATCH)
+    time.sleep(0.1)
+    reqs = [scheduler.submit(lambda p=p: order.append(p), p) for p in (Priority.BATCH, Priority.CHAT, Priority.REALTIME)]
+    gate.set()
+    blocker.result(5)
+    for r in reqs:
+        r.result(5)
+    assert order == [Priority.REALTIME, Priority.CHAT, Priority.BATCH]
+    scheduler.stop()
+
+
+def test_deadline_applies_while_waiting_for_global_slot():
+    shared = create_shared_state(max_concurrency=1)
+    scheduler = LLMScheduler(max_concurrency=2, shared=shared)
+    shared["slots"].acquire()  # 另一个进程占着唯一的名额
+    try:
+        ran = []
+        req = scheduler.submit(lambda: ran.append(1), Priority.REALTIME, deadline=0.3)
+        with pytest.raises(DeadlineExceeded):
+            req.result(5)
+        assert ran == []
+        assert scheduler.metrics()["classes"]["realtime"]["expired"] == 1
+        assert scheduler.metrics()["classes"]["realtime"]["in_flight"] == 0
+        assert shared["realtime_demand"].value == 0
+    finally:
+        shared["slots"].release()
+    scheduler.stop()
+
+
+def test_reconfigure_stops_previous_dispatcher():
+    first = configure_scheduler(max_concurrency=1)
+    gate = threading.Event()
+    first.submit(gate.wait, Priority.BATCH)
+    time.sleep(0.1)
+    queued = first.submit(lambda: None, Priority.BATCH)
+
+    second = configure_scheduler(max_concurrency=1)
+    gate.set()
+    assert second is llm_scheduler.get_scheduler()
+    assert not first._dispatcher.is_alive()
+    with pytest.raises(RequestCancelled):
+        queued.result(5)
+    assert second.run(lambda: 42) == 42
+    second.stop()
+    llm_scheduler._scheduler = None
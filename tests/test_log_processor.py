@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from app.data.dao.log_processor import (  # noqa: E402
+    DEV, RESEARCH, BROWSING, SOCIAL, SYSTEM, INTERRUPTION_THRESHOLD, get_context, get_contexts, session_ids,
+)
+
+
+def reference_session_ids(days, contexts, durations):
+    """旧版 intelligent_merge 的逐行规则 (按天切分)，只输出每行的会话编号"""
+    ids, sid, cur_ctx, cur_day = [], -1, None, None
+    for day, ctx, dur in zip(days, contexts, durations):
+        merge = cur_day == day and (
+            ctx == cur_ctx or (cur_ctx == DEV and ctx == RESEARCH) or dur < INTERRUPTION_THRESHOLD
+        )
+        if not merge:
+            sid += 1
+            cur_ctx, cur_day = ctx, day
+        ids.append(sid)
+    return ids
+
+
+def _frame(rng, n):
+    t = datetime(2026, 6, 1, 22, 0, 0)
+    starts, durations = [], []
+    for _ in range(n):
+        starts.append(t.strftime("%Y-%m-%d %H:%M:%S"))
+        dur = rng.choice([5, 60, 119, 120, 300, 1800])
+        durations.append(dur)
+        t += timedelta(seconds=dur + rng.choice([0, 0, 3600]))
+    return pd.DataFrame({'start': starts, 'duration': durations})
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_session_ids_match_row_by_row_merge(seed):
+    rng = random.Random(seed)
+    df = _frame(rng, 200)
+    contexts = pd.Series([rng.choice([DEV, RESEARCH, BROWSING, SOCIAL, SYSTEM]) for _ in range(len(df))],
+                         index=df.index)
+    expected = reference_session_ids(df['start'].str.slice(0, 10), contexts, df['duration'])
+    assert session_ids(df, contexts).tolist() == expected
+
+
+def test_research_after_dev_merges_but_not_after_other_contexts():
+    df = pd.DataFrame({'start': [f"2026-06-01 09:0{i}:00" for i in range(4)], 'duration': [600] * 4})
+    contexts = pd.Series([DEV, RESEARCH, BROWSING, RESEARCH])
+    assert session_ids(df, contexts).tolist() == [0, 0, 1, 2]
+
+
+def test_get_contexts_matches_row_rule():
+    df = pd.DataFrame({
+        'app': ['Trae.exe', 'msedge.exe', 'msedge.exe', 'WeChat.exe', 'explorer.exe', None],
+        'summary': ['', '查看 Google 文档', '看视频', None, '', ''],
+    })
+    assert get_contexts(df).tolist() == [get_context(row) for _, row in df.iterrows()]
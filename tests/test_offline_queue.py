@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+
+from app.data.dao.activity_dao import ClassificationQueueDAO
+from app.service.ai.offline_queue import ClassificationDrainer
+
+
+class FakeBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, state="closed"):
+        self.state = state
+
+
+class FakeCache:
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    def get(self, window_title, process_name, min_confidence=0.0):
+        return self.entries.get((window_title, process_name))
+
+
+def _job(interval_id, title="A", process="a.exe"):
+    return {"interval_id": interval_id, "window_title": title, "process_name": process, "duration": 3}
+
+
+def _drainer(classify, breaker=None, cache=None):
+    results = queue.Queue()
+    drainer = ClassificationDrainer(results, threading.Event(), classify, breaker or FakeBreaker(), cache)
+    return drainer, results
+
+
+def test_missed_interval_is_due_immediately_and_reuses_cache(fresh_db):
+    ClassificationDrainer.enqueue_missed(_job(1))
+    ClassificationDrainer.enqueue_missed(_job(2))
+    calls = []
+    cache = FakeCache({("A", "a.exe"): {"ai_raw": {"状态": "工作"}}})
+    drainer, results = _drainer(lambda prompt: calls.append(prompt), cache=cache)
+
+    assert drainer.drain_once() == 2
+    assert calls == []
+    jobs = [results.get_nowait()[0] for _ in range(2)]
+    assert {j["interval_id"] for j in jobs} == {1, 2}
+    assert all(j["source"] == "cache" for j in jobs)
+    assert ClassificationQueueDAO.count() == 0
+
+
+def test_failed_job_waits_for_backoff(fresh_db):
+    ClassificationDrainer.enqueue(_job(1))
+    drainer, _ = _drainer(lambda prompt: {"状态": "工作"})
+    assert drainer.drain_once() == 0
+    assert ClassificationQueueDAO.count() == 1
+
+
+def test_unreachable_model_reschedules_group_once(fresh_db):
+    ClassificationDrainer.enqueue_missed(_job(1))
+    ClassificationDrainer.enqueue_missed(_job(2))
+    calls = []
+    drainer, results = _drainer(lambda prompt: calls.append(prompt))
+
+    assert drainer.drain_once() == 0
+    assert len(calls) == 1
+    assert results.empty()
+    assert ClassificationQueueDAO.get_due(0) == []
+    assert ClassificationQueueDAO.count() == 2
+
+
+def test_open_breaker_skips_drain(fresh_db):
+    ClassificationDrainer.enqueue_missed(_job(1))
+    drainer, _ = _drainer(lambda prompt: {"状态": "工作"}, breaker=FakeBreaker("open"))
+    assert drainer.drain_once() == 0
+
+
+def test_gives_up_after_max_attempts(fresh_db):
+    ClassificationDrainer.enqueue_missed(_job(1))
+    ClassificationQueueDAO.reschedule(1, ClassificationDrainer.MAX_ATTEMPTS - 1, 0)
+    drainer, results = _drainer(lambda prompt: None)
+
+    assert drainer.drain_once() == 0
+    job, ai_data = results.get_nowait()
+    assert (job["interval_id"], job["gave_up"], ai_data) == (1, True, None)
+    assert ClassificationQueueDAO.count() == 0
+
+
+def test_gave_up_interval_settles_with_fallback_label(fresh_db):
+    from app.data.dao.activity_dao import IntervalDAO
+    from app.data.services.time_ledger import TimeLedger
+
+    settled = []
+
+    class History:
+        def record_interval(self, status, start_ts, end_ts, summary=None, raw_data=None):
+            settled.append(status)
+
+    ledger = TimeLedger(History())
+    a = ledger.switch("A", "a.exe", 100)
+    ledger.switch("B", "b.exe", 110)
+    ledger.attach_fallback(a)
+    assert settled == ["unknown"]
+    assert IntervalDAO.get_interval(a)["label_source"] == "fallback"
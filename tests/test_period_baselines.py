@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import statistics
+from datetime import date, timedelta
+
+import pytest
+
+from app.data.core.database import get_period_stats_db_connection
+from app.data.dao.period_baseline_dao import PeriodBaselineDAO, describe, step
+from app.data.services.history_service import ActivityHistoryManager
+
+
+def _insert_days(cursor, start, focus_values):
+    for i, v in enumerate(focus_values):
+        if v is None:
+            continue
+        cursor.execute('''
+            INSERT INTO period_stats (date, total_focus, max_streak, context_switch_freq, focus_fragmentation_ratio)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (str(start + timedelta(days=i)), v, v // 2, 1.0, 0.5))
+
+
+def test_step_matches_windowed_mean_and_std():
+    values = [10, 20, None, 40, 5, 7, 9, 30, 11, None, 3, 50]
+    span = 7
+    state = (0, 0.0, 0.0, None, 0.0)
+    for i, v in enumerate(values):
+        leaving = values[i - span] if i >= span else None
+        state = step(state, v, leaving, span)
+        window = [x for x in values[max(0, i - span + 1):i + 1] if x is not None]
+        d = describe(state)
+        assert d['n'] == len(window)
+        assert d['mean'] == pytest.approx(statistics.fmean(window), abs=1e-3)
+        assert d['std'] == pytest.approx(statistics.pstdev(window), abs=1e-3)
+
+
+def test_incremental_update_equals_full_rebuild(fresh_db):
+    start = date(2026, 1, 1)
+    values = [3600 + 60 * ((i * 7) % 11) if i % 5 else None for i in range(40)]
+    with get_period_stats_db_connection() as conn:
+        cur = conn.cursor()
+        _insert_days(cur, start, values[:39])
+        PeriodBaselineDAO.update(cur, [start])
+        # 日结：只推进最后一天
+        _insert_days(cur, start + timedelta(days=39), values[39:])
+        PeriodBaselineDAO.update(cur, [start + timedelta(days=39)])
+        incremental = PeriodBaselineDAO.norm(cur, start + timedelta(days=40))
+
+        cur.execute('DELETE FROM period_baselines')
+        PeriodBaselineDAO.update(cur, [start])
+        rebuilt = PeriodBaselineDAO.norm(cur, start + timedelta(days=40))
+
+    assert incremental == rebuilt
+    last30 = [v for v in values[10:40] if v is not None]
+    assert incremental['total_focus'][30]['n'] == len(last30)
+    assert incremental['total_focus'][30]['mean'] == pytest.approx(statistics.fmean(last30), abs=1e-3)
+
+
+def test_norm_excludes_the_day_itself(fresh_db):
+    start = date(2026, 2, 1)
+    with get_period_stats_db_connection() as conn:
+        cur = conn.cursor()
+        _insert_days(cur, start, [100, 200, 300])
+        PeriodBaselineDAO.update(cur, [start])
+        norm = PeriodBaselineDAO.norm(cur, start + timedelta(days=2))
+        assert PeriodBaselineDAO.norm(cur, start) is None
+    assert norm['total_focus'][7]['n'] == 2
+    assert norm['total_focus'][7]['mean'] == 150
+
+
+def test_fatigue_severity_against_personal_streak():
+    norm = {'max_streak': {30: {'n': 20, 'mean': 3000, 'std': 600, 'ewma': 3000, 'ewstd': 600}}}
+    assert ActivityHistoryManager.get_fatigue_severity(2700, norm) == 'low'
+    assert ActivityHistoryManager.get_fatigue_severity(3300, norm) == 'medium'
+    assert ActivityHistoryManager.get_fatigue_severity(3600, norm) == 'high'
+    few_days = {'max_streak': {30: dict(norm['max_streak'][30], n=2)}}
+    assert ActivityHistoryManager.get_fatigue_severity(9000, few_days) == 'medium'
+
+
+def test_fatigue_severity_without_baseline(fresh_db):
+    assert ActivityHistoryManager.get_fatigue_severity(9000) == 'medium'
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from app.data.core.database import get_period_stats_db_connection
+from app.data.dao.period_rollup_dao import PeriodRollupDAO, build_rollup, period_bounds
+from app.data.dao.stats_calculator import build_period_row, write_period_stats
+
+
+def _metrics(entertainment=0, streak=0, wins=0, peak_hour=10):
+    return {
+        'total_entertainment': entertainment,
+        'max_streak': streak,
+        'willpower_wins': wins,
+        'peak_hour': peak_hour,
+        'focus_fragmentation_ratio': 0.1,
+        'context_switch_freq': 2.0,
+    }
+
+
+def test_period_bounds():
+    assert period_bounds('week', date(2026, 1, 1)) == ('2026-W01', date(2025, 12, 29), date(2026, 1, 4))
+    assert period_bounds('month', date(2024, 2, 10)) == ('2024-02', date(2024, 2, 1), date(2024, 2, 29))
+    assert period_bounds('year', '2026-07-04') == ('2026', date(2026, 1, 1), date(2026, 12, 31))
+
+
+def test_build_rollup_averages_only_active_days():
+    rows = [
+        {'date': date(2026, 3, 2), 'total_focus': 3600, 'total_entertainment': 600, 'max_streak': 1800,
+         'willpower_wins': 1, 'peak_hour': 9, 'efficiency_score': 70, 'focus_fragmentation_ratio': 0.2,
+         'context_switch_freq': 4.0},
+        {'date': date(2026, 3, 3), 'total_focus': 0, 'total_entertainment': 300, 'max_streak': 0,
+         'willpower_wins': 0, 'peak_hour': 0, 'efficiency_score': 60, 'focus_fragmentation_ratio': 0,
+         'context_switch_freq': 0},
+    ]
+    r = build_rollup('week', '2026-W10', date(2026, 3, 2), date(2026, 3, 8), rows)
+    assert r['days'] == 2 and r['active_days'] == 1
+    assert r['total_entertainment'] == 900
+    assert r['avg_focus'] == 3600
+    assert r['avg_efficiency'] == 70
+    assert r['peak_hour'] == 9
+    assert r['best_day'] == '2026-03-02'
+
+
+def test_write_period_stats_keeps_entertainment_and_refreshes_rollups(fresh_db):
+    rows = [
+        build_period_row('2026-03-02', _metrics(entertainment=600, streak=1200), 3600, [], []),
+        build_period_row('2026-03-03', _metrics(entertainment=900), 1800, [], []),
+    ]
+    with get_period_stats_db_connection() as conn:
+        write_period_stats(conn.cursor(), rows)
+        conn.commit()
+        stored = conn.execute("SELECT total_entertainment FROM period_stats ORDER BY date").fetchall()
+    assert [r[0] for r in stored] == [600, 900]
+
+    week = PeriodRollupDAO.get_recent('week', 1, today=date(2026, 3, 4))[0]
+    assert week['period_key'] == '2026-W10'
+    assert week['total_focus'] == 5400
+    assert week['total_entertainment'] == 1500
+
+    # 重写某天只影响该天所在的周期
+    rewrite = [build_period_row('2026-03-03', _metrics(entertainment=100), 1800, [], [])]
+    with get_period_stats_db_connection() as conn:
+        write_period_stats(conn.cursor(), rewrite)
+        conn.commit()
+    month = PeriodRollupDAO.get_recent('month', 1, today=date(2026, 3, 4))[0]
+    assert month['total_entertainment'] == 700
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.data.core.database import get_db_connection, get_period_stats_db_connection
+from app.data.services.reclassify_engine import ReclassifyEngine
+
+DAY = '2026-05-04'
+RULES = [{"name": "dev", "process": r"code", "status": "work", "from": ["entertainment"]}]
+
+
+@pytest.fixture
+def sessions(fresh_db):
+    rows = [
+        (f"{DAY} 09:00:00", "main.py - Code", "Code.exe", "entertainment", 600),
+        (f"{DAY} 09:10:00", "Bilibili", "chrome.exe", "entertainment", 300),
+        (f"{DAY} 09:15:00", "notes - Code", "Code.exe", "entertainment", 900),
+        (f"{DAY} 09:30:00", "Report", "Manual", "entertainment", 100),
+        (f"{DAY} 09:40:00", "util.py - Code", "Code.exe", "work", 1200),
+    ]
+    with get_db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO window_sessions (start_time, end_time, window_title, process_name, status, duration) '
+            'VALUES (?, ?, ?, ?, ?, ?)', [(s, s, t, p, st, d) for s, t, p, st, d in rows])
+        conn.execute('INSERT INTO daily_stats (date, total_focus_time, total_entertainment_time) VALUES (?, ?, ?)',
+                     (DAY, 1200, 1900))
+        conn.commit()
+    with get_period_stats_db_connection() as conn:
+        conn.execute('INSERT INTO period_stats (date, total_focus, total_entertainment, willpower_wins) '
+                     'VALUES (?, ?, ?, 0)', (DAY, 1200, 1900))
+        conn.commit()
+
+
+def _statuses():
+    with get_db_connection() as conn:
+        return [r[0] for r in conn.execute('SELECT status FROM window_sessions ORDER BY id')]
+
+
+def _daily():
+    with get_db_connection() as conn:
+        return tuple(conn.execute('SELECT total_focus_time, total_entertainment_time FROM daily_stats WHERE date = ?',
+                                  (DAY,)).fetchone())
+
+
+def _period():
+    with get_period_stats_db_connection() as conn:
+        return tuple(conn.execute('SELECT total_focus, total_entertainment FROM period_stats WHERE date = ?',
+                                  (DAY,)).fetchone())
+
+
+def test_preview_does_not_write(sessions):
+    report = ReclassifyEngine(RULES).preview()
+    assert report['sessions'] == 2
+    assert report['duration'] == 1500
+    assert report['days'][DAY]['focus_after'] == 2700
+    assert _statuses()[0] == 'entertainment'
+
+
+def test_apply_updates_sessions_and_derived_stats_by_delta(sessions):
+    report = ReclassifyEngine(RULES).apply()
+    assert report['run_id']
+    assert _statuses() == ['work', 'entertainment', 'work', 'entertainment', 'work']
+    assert _daily() == (2700, 400)
+    assert _period() == (2700, 400)
+    # 再次执行没有变化，不记录新的执行
+    assert ReclassifyEngine(RULES).apply()['run_id'] is None
+
+
+def test_apply_recomputes_session_metrics_for_affected_days(sessions):
+    ReclassifyEngine(RULES).apply()
+    # 改判后 notes(900) -> Manual 娱乐(100) -> util(1200) 构成一次意志力胜利
+    with get_db_connection() as conn:
+        daily = conn.execute('SELECT max_focus_streak, willpower_wins FROM daily_stats WHERE date = ?',
+                             (DAY,)).fetchone()
+    assert tuple(daily) == (1200, 1)
+    with get_period_stats_db_connection() as conn:
+        row = conn.execute('SELECT max_streak, willpower_wins, efficiency_score, focus_fragmentation_ratio, ai_insight '
+                           'FROM period_stats WHERE date = ?', (DAY,)).fetchall()
+        rollup = conn.execute("SELECT total_focus, willpower_wins FROM period_rollups WHERE period_type = 'week'"
+                              ).fetchone()
+    assert len(row) == 1
+    assert tuple(row[0])[:4] == (1200, 1, 65, 4.5)
+    assert row[0]['ai_insight']
+    assert tuple(rollup) == (2700, 1)
+
+
+def test_undo_restores_only_untouched_sessions(sessions):
+    run_id = ReclassifyEngine(RULES).apply()['run_id']
+    with get_db_connection() as conn:
+        # 执行之后用户又手动改了其中一条，撤销时保留
+        conn.execute("UPDATE window_sessions SET status = 'focus' WHERE id = 3")
+        conn.commit()
+
+    assert ReclassifyEngine.undo(run_id) == 1
+    assert _statuses() == ['entertainment', 'entertainment', 'focus', 'entertainment', 'work']
+    assert _daily() == (2100, 1000)
+    # 重复撤销不再生效
+    assert ReclassifyEngine.undo(run_id) == 0
+    assert ReclassifyEngine.runs()[0]['undone_ts'] is not None
+
+
+def test_invalid_rule_is_rejected():
+    with pytest.raises(ValueError):
+        ReclassifyEngine([{"process": "x", "status": "bogus"}])
+    with pytest.raises(ValueError):
+        ReclassifyEngine([{"status": "work"}])
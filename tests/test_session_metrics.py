@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.data.core.database import get_db_connection
+from app.data.dao.session_metrics import SessionMetrics, get_day_metrics
+
+
+def _rows(spec, start=datetime(2026, 3, 2, 9, 0, 0)):
+    """spec: [(间隔秒, 时长秒, 状态)] -> [(start_time, duration, status)]"""
+    rows, t = [], start
+    for gap, dur, status in spec:
+        t += timedelta(seconds=gap)
+        rows.append((t.strftime("%Y-%m-%d %H:%M:%S"), dur, status))
+        t += timedelta(seconds=dur)
+    return rows
+
+
+def test_streak_merges_focus_sessions_with_short_gaps():
+    m = SessionMetrics().extend(_rows([(0, 600, 'focus'), (60, 600, 'work'), (200, 300, 'focus')]))
+    assert m.max_streak == 1200
+    assert m.focus_seconds == 1500
+
+
+def test_willpower_win_needs_long_focus_then_short_distraction():
+    m = SessionMetrics().extend(_rows([
+        (0, 400, 'focus'), (0, 120, 'entertainment'), (0, 100, 'focus'),   # 胜利
+        (0, 100, 'entertainment'), (0, 400, 'focus'),                      # 前一段不足 5 分钟，不计
+        (0, 600, 'other'), (0, 400, 'focus'),                              # 走神过长，不计
+    ]))
+    assert m.willpower_wins == 1
+    assert m.entertainment_seconds == 220
+    assert m.distraction_seconds == 820
+
+
+def test_snapshot_ratios():
+    m = SessionMetrics().extend(_rows([(0, 1800, 'focus'), (0, 600, 'entertainment'), (1800, 1800, 'focus')]))
+    snap = m.snapshot()
+    assert snap['focus_fragmentation_ratio'] == 3.0
+    assert snap['context_switch_freq'] == round(3 / (4200 / 3600), 1)
+    assert snap['peak_hour'] == 9
+
+
+def _insert_sessions(rows):
+    with get_db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO window_sessions (start_time, end_time, window_title, process_name, status, duration) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(s, s, f"t{i % 5}", f"p{i % 3}.exe", status, dur) for i, (s, dur, status) in enumerate(rows)])
+        conn.commit()
+
+
+def _random_spec(rng, n):
+    statuses = ['focus', 'work', 'entertainment', 'other', 'unknown', 'idle']
+    return [(rng.choice([0, 30, 90, 150, 600]), rng.choice([20, 100, 250, 310, 900]), rng.choice(statuses))
+            for _ in range(n)]
+
+
+def test_day_metrics_incremental_matches_full_pass(fresh_db):
+    rng = random.Random(7)
+    rows = _rows(_random_spec(rng, 60))
+    day = rows[0][0][:10]
+    _insert_sessions(rows[:30])
+    get_day_metrics(day)
+    _insert_sessions(rows[30:])
+    expected = SessionMetrics().extend([r for r in rows if r[0].startswith(day)]).snapshot()
+    assert get_day_metrics(day).snapshot() == expected
+
+
+def test_session_frame_matches_session_metrics(fresh_db):
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    from app.data.dao.range_analytics import SessionFrame
+
+    rng = random.Random(11)
+    by_day = {}
+    for d in range(5):
+        rows = _rows(_random_spec(rng, 40), start=datetime(2026, 4, 1 + d, 8, 0, 0))
+        rows = [r for r in rows if r[0].startswith(f"2026-04-0{1 + d}")]
+        by_day[rows[0][0][:10]] = rows
+        _insert_sessions(rows)
+
+    daily = SessionFrame.load('2026-04-01', '2026-04-07').daily_metrics()
+    for day, rows in by_day.items():
+        expected = SessionMetrics().extend(rows).snapshot()
+        got = daily.loc[day].to_dict()
+        for key, value in expected.items():
+            assert float(got[key]) == pytest.approx(float(value)), (day, key)
+    assert int(daily.loc['2026-04-07', 'sessions']) == 0
+
+
+def test_session_frame_accessors_match_session_metrics(fresh_db):
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    from app.data.dao.range_analytics import SessionFrame
+
+    rng = random.Random(23)
+    # 跨越午夜的连续会话：心流与意志力状态必须在日界处重置
+    rows = _rows(_random_spec(rng, 400), start=datetime(2026, 5, 1, 20, 0, 0))
+    _insert_sessions(rows)
+    days = sorted({r[0][:10] for r in rows})
+
+    frame = SessionFrame.load(days[0], days[-1])
+    streaks, wins = frame.max_streaks(), frame.willpower_wins()
+    for i, day in enumerate(frame.dates):
+        expected = SessionMetrics().extend([r for r in rows if r[0].startswith(day)])
+        assert int(streaks[i]) == expected.max_streak, day
+        assert int(wins[i]) == expected.willpower_wins, day
+    # 各访问器共用同一次计算
+    assert frame.max_streaks() is streaks
+    assert int(frame.daily_metrics()['willpower_wins'].sum()) == int(wins.sum())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from app.data.dao.activity_dao import IntervalDAO
+from app.data.services.time_ledger import TimeLedger
+
+
+class RecordingHistory:
+    """只记录 record_interval 调用顺序的替身"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record_interval(self, status, start_ts, end_ts, summary=None, raw_data=None):
+        self.calls.append((status, start_ts, end_ts))
+
+
+def test_settles_only_contiguous_labeled_prefix(fresh_db):
+    history = RecordingHistory()
+    ledger = TimeLedger(history)
+
+    a = ledger.switch("A", "a.exe", 100)
+    b = ledger.switch("B", "b.exe", 110)
+    ledger.switch("C", "c.exe", 130)
+    # C 进行中；A 尚无标签，B 的标签先到
+    ledger.attach_label(b, "entertainment", "b")
+    assert history.calls == []
+
+    ledger.attach_label(a, "focus", "a")
+    assert history.calls == [("focus", 100, 110), ("entertainment", 110, 130)]
+    assert IntervalDAO.get_interval(a)["settled"] == 1
+    assert IntervalDAO.get_interval(b)["settled"] == 1
+
+
+def test_open_interval_label_settles_on_close(fresh_db):
+    history = RecordingHistory()
+    ledger = TimeLedger(history)
+
+    a = ledger.switch("A", "a.exe", 100)
+    ledger.attach_label(a, "work", "a")
+    assert history.calls == []
+    ledger.switch("B", "b.exe", 160)
+    assert history.calls == [("work", 100, 160)]
+
+
+def test_unlabeled_close_hook_receives_interval(fresh_db):
+    closed = []
+    ledger = TimeLedger(RecordingHistory(), on_unlabeled_close=closed.append)
+
+    a = ledger.switch("A", "a.exe", 100)
+    b = ledger.switch("B", "b.exe", 103)
+    ledger.attach_label(b, "focus", "b")
+    ledger.switch("C", "c.exe", 120)
+
+    assert [iv["id"] for iv in closed] == [a]
+    assert closed[0]["end_ts"] == 103
+    assert closed[0]["window_title"] == "A"
+
+
+def test_flush_splits_labeled_interval_and_keeps_label(fresh_db):
+    history = RecordingHistory()
+    ledger = TimeLedger(history)
+
+    a = ledger.switch("A", "a.exe", 100)
+    ledger.attach_label(a, "focus", "a")
+    ledger.flush(160)
+
+    assert history.calls == [("focus", 100, 160)]
+    assert ledger.current_interval_id != a
+    assert ledger.current_label() == ("focus", "a")
+
+
+def test_overdue_unlabeled_interval_settles_with_fallback(fresh_db):
+    history = RecordingHistory()
+    ledger = TimeLedger(history)
+
+    a = ledger.switch("A", "a.exe", 100)
+    b = ledger.switch("B", "b.exe", 110)
+    ledger.attach_label(b, "focus", "b")
+    ledger.switch("C", "c.exe", 130)
+    assert history.calls == []
+
+    # A 的标签迟迟不来：超过等待上限后以兜底标签计入，之后的区间不再被卡住
+    ledger.switch("D", "d.exe", 110 + TimeLedger.LABEL_WAIT_SECONDS)
+    assert history.calls[:2] == [("unknown", 100, 110), ("focus", 110, 130)]
+    iv = IntervalDAO.get_interval(a)
+    assert (iv["status"], iv["label_source"], iv["settled"]) == ("unknown", "fallback", 1)
+
+
+def test_late_label_corrects_fallback_session(fresh_db):
+    from app.data.core.database import get_db_connection
+    from app.data.services.history_service import ActivityHistoryManager
+
+    ledger = TimeLedger(ActivityHistoryManager())
+    t0 = 1_780_000_000
+    a = ledger.switch("Report.docx", "WINWORD.EXE", t0)
+    ledger.switch("Other", "x.exe", t0 + 600)
+    ledger.switch("More", "y.exe", t0 + 600 + TimeLedger.LABEL_WAIT_SECONDS)
+
+    def session():
+        with get_db_connection() as conn:
+            return conn.execute("SELECT status, duration FROM window_sessions WHERE window_title = 'Report.docx'"
+                                ).fetchone()
+
+    assert tuple(session()) == ("unknown", 600)
+    ledger.attach_label(a, "work", "写报告", source='ai')
+    assert tuple(session()) == ("work", 600)
+    assert IntervalDAO.get_interval(a)["label_source"] == "ai"
+
+    # 放弃分类不会覆盖已有的标签
+    ledger.attach_fallback(a)
+    assert IntervalDAO.get_interval(a)["status"] == "work"